@@ -0,0 +1,194 @@
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import casadi as ca
+import torch
+
+
+class DifferentiableRollout:
+    """
+    Differentiable model of the environment dynamics and reward.
+
+    The step maps the state, the previous control input and the normalised action to the next state,
+    the applied control input and the reward, exactly as `TomatoEnv.step` with nominal parameters:
+    u = clip(u_prev + action * delta_u_max, u_min, u_max), x_next = F(x, u, d, p), reward = `GreenhouseReward`.
+    The step uses the configured integrator of the env, `env.F`, and gradients are computed with CasADi adjoints through it.
+
+    `rollout` evaluates an open-loop action sequence over a horizon in one call and returns the reward sum
+    and its gradient with respect to the actions and the parameters. `RolloutFunction` and `StepFunction`
+    expose both as PyTorch autograd functions; `policy_rollout` unrolls a torch policy through the model.
+
+    Args:
+        env: the GreenLight environment (TomatoEnv) that is modelled.
+        horizon (int): number of time steps of the open-loop rollouts.
+    """
+    def __init__(self, env, horizon: int):
+        self.env = env
+        self.nx, self.nu, self.nd, self.n_params = env.nx, env.nu, env.nd, env.num_params
+        self.horizon = horizon
+
+        F = env.F
+        reward = env.reward.casadi_function(self.nx, self.nu)
+
+        x = ca.MX.sym("x", self.nx)
+        u_prev = ca.MX.sym("u_prev", self.nu)
+        a = ca.MX.sym("a", self.nu)
+        d = ca.MX.sym("d", self.nd)
+        p = ca.MX.sym("p", self.n_params)
+        u = ca.fmin(ca.fmax(u_prev + a*env.delta_u_max, env.u_min), env.u_max)
+        x_next = F(x0=x, u=u, p=ca.vertcat(d, p))["xf"]
+        self.step = ca.Function(
+            "step", [x, u_prev, a, d, p], [x_next, u, reward(x, x_next, u)],
+            ["x", "u_prev", "a", "d", "p"], ["x_next", "u", "r"]
+        )
+        self._batched_steps: Dict[int, ca.Function] = {}
+
+        # open-loop rollout over the horizon, the state and control input are accumulated
+        A = ca.MX.sym("A", self.nu, horizon)
+        D = ca.MX.sym("D", self.nd, horizon)
+        _, _, R = self.step.mapaccum("rollout", horizon, 2)(x, u_prev, A, D, p)
+        total = ca.sum2(R)
+        self._rollout = ca.Function(
+            "rollout_grad", [x, u_prev, A, D, p], [total, ca.gradient(total, A), ca.gradient(total, p), R],
+            ["x0", "u0", "A", "D", "p"], ["R", "dR_dA", "dR_dp", "rewards"]
+        )
+
+    def batched_step(self, batch_size: int):
+        """Step function and its reverse mode (vector-Jacobian product) mapped over a batch."""
+        if batch_size not in self._batched_steps:
+            step = self.step.map(batch_size)
+            self._batched_steps[batch_size] = (step, step.reverse(1))
+        return self._batched_steps[batch_size]
+
+    def rollout(self, x0, u0, actions, weather=None, params=None):
+        """
+        Open-loop rollout of an action sequence.
+
+        Args:
+            x0 (np.ndarray): (nx,) initial state.
+            u0 (np.ndarray): (nu,) control input before the first step.
+            actions (np.ndarray): (horizon, nu) normalised actions.
+            weather (np.ndarray): (horizon, nd) weather data, defaults to the weather of the env from its current time step.
+            params (np.ndarray): (n_params,) model parameters, defaults to the nominal parameters of the env.
+        Returns:
+            total (float): sum of the rewards over the horizon.
+            dR_dA (np.ndarray): (horizon, nu) gradient of the total reward with respect to the actions.
+            dR_dp (np.ndarray): (n_params,) gradient of the total reward with respect to the parameters.
+            rewards (np.ndarray): (horizon,) rewards per time step.
+        """
+        if weather is None:
+            weather = self.env.weather_data[self.env.timestep:self.env.timestep+self.horizon]
+        params = self.env.p if params is None else params
+        total, dR_dA, dR_dp, rewards = self._rollout(
+            np.asarray(x0, dtype=float), np.asarray(u0, dtype=float),
+            np.asarray(actions, dtype=float).T, np.asarray(weather, dtype=float).T, np.asarray(params, dtype=float)
+        )
+        return float(total), dR_dA.full().T, dR_dp.full().flatten(), rewards.full().flatten()
+
+
+def _to_numpy(tensor: torch.Tensor) -> np.ndarray:
+    return tensor.detach().cpu().double().numpy()
+
+
+class RolloutFunction(torch.autograd.Function):
+    """
+    Total reward of open-loop action sequences, differentiable with respect to the actions and the parameters.
+
+    Usage: `RolloutFunction.apply(actions, params, model, x0, u0, weather)` with actions of shape (B, horizon, nu)
+    and params of shape (n_params,), returns the (B,) reward sums.
+    """
+    @staticmethod
+    def forward(ctx, actions, params, model: DifferentiableRollout, x0, u0, weather):
+        totals, grads_A, grads_p = [], [], []
+        p = _to_numpy(params)
+        for a in _to_numpy(actions):
+            total, dR_dA, dR_dp, _ = model.rollout(x0, u0, a, weather, p)
+            totals.append(total)
+            grads_A.append(dR_dA)
+            grads_p.append(dR_dp)
+        ctx.save_for_backward(
+            torch.as_tensor(np.array(grads_A), dtype=actions.dtype, device=actions.device),
+            torch.as_tensor(np.array(grads_p), dtype=params.dtype, device=params.device),
+        )
+        return torch.as_tensor(totals, dtype=actions.dtype, device=actions.device)
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        grads_A, grads_p = ctx.saved_tensors
+        grad_actions = grad_output[:, None, None] * grads_A if ctx.needs_input_grad[0] else None
+        grad_params = (grad_output[:, None] * grads_p).sum(0) if ctx.needs_input_grad[1] else None
+        return grad_actions, grad_params, None, None, None, None
+
+
+class StepFunction(torch.autograd.Function):
+    """
+    A batched, differentiable environment step.
+
+    Usage: `StepFunction.apply(x, u_prev, actions, d, params, model)` with x (B, nx), u_prev (B, nu),
+    actions (B, nu), weather d (nd,) and params (n_params,). Returns x_next (B, nx), u (B, nu) and rewards (B,).
+    The backward pass is the vector-Jacobian product of the step, computed with CasADi adjoints.
+    """
+    @staticmethod
+    def forward(ctx, x, u_prev, actions, d, params, model: DifferentiableRollout):
+        step, _ = model.batched_step(x.shape[0])
+        inputs = [_to_numpy(x).T, _to_numpy(u_prev).T, _to_numpy(actions).T, _to_numpy(d)[:, None], _to_numpy(params)[:, None]]
+        outputs = [out.full() for out in step(*inputs)]
+        ctx.model = model
+        ctx.inputs = inputs
+        ctx.outputs = outputs
+        dtype, device = x.dtype, x.device
+        x_next, u, r = (torch.as_tensor(out.T, dtype=dtype, device=device) for out in outputs)
+        return x_next, u, r.reshape(-1)
+
+    @staticmethod
+    def backward(ctx, grad_x_next, grad_u, grad_r):
+        _, step_reverse = ctx.model.batched_step(ctx.inputs[0].shape[1])
+        adjoints = [_to_numpy(grad_x_next).T, _to_numpy(grad_u).T, _to_numpy(grad_r)[None, :]]
+        grads = [g.full() for g in step_reverse(*ctx.inputs, *ctx.outputs, *adjoints)]
+        dtype, device = grad_x_next.dtype, grad_x_next.device
+        grad_x, grad_u_prev, grad_actions = (torch.as_tensor(g.T, dtype=dtype, device=device) for g in grads[:3])
+        # the weather and parameters are shared by the batch, their adjoints are summed over the batch
+        grad_d = torch.as_tensor(grads[3].sum(1), dtype=dtype, device=device) if ctx.needs_input_grad[3] else None
+        grad_params = torch.as_tensor(grads[4].sum(1), dtype=dtype, device=device) if ctx.needs_input_grad[4] else None
+        return grad_x, grad_u_prev, grad_actions, grad_d, grad_params, None
+
+
+def policy_rollout(
+    model: DifferentiableRollout,
+    policy: Callable[[torch.Tensor], torch.Tensor],
+    obs_fn: Callable[[torch.Tensor, torch.Tensor, int], torch.Tensor],
+    x0: torch.Tensor,
+    u0: torch.Tensor,
+    weather: Optional[np.ndarray] = None,
+    params: Optional[torch.Tensor] = None,
+    gamma: float = 1.0,
+):
+    """
+    Unrolls a policy through the differentiable model over the horizon of `model`.
+    Back-propagating through the returned return gives the analytic policy gradient.
+
+    Args:
+        model (DifferentiableRollout): differentiable environment model.
+        policy: maps a batch of observations to normalised actions in [-1, 1].
+        obs_fn: computes the observations from the state, the current control inputs and the time step in the horizon.
+        x0 (torch.Tensor): (B, nx) initial states.
+        u0 (torch.Tensor): (B, nu) initial control inputs.
+        weather (np.ndarray): (horizon, nd) weather data, defaults to the weather of the env from its current time step.
+        params (torch.Tensor): (n_params,) model parameters, defaults to the nominal parameters of the env.
+        gamma (float): discount factor.
+    Returns:
+        torch.Tensor: (B,) discounted returns.
+    """
+    env = model.env
+    if weather is None:
+        weather = env.weather_data[env.timestep:env.timestep+model.horizon]
+    if params is None:
+        params = torch.as_tensor(np.asarray(env.p, dtype=float), dtype=x0.dtype)
+    x, u = x0, u0
+    returns = torch.zeros(x0.shape[0], dtype=x0.dtype, device=x0.device)
+    for k in range(model.horizon):
+        actions = policy(obs_fn(x, u, k))
+        d = torch.as_tensor(weather[k], dtype=x0.dtype, device=x0.device)
+        x, u, r = StepFunction.apply(x, u, actions, d, params, model)
+        returns = returns + gamma**k * r
+    return returns
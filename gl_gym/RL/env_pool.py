@@ -0,0 +1,76 @@
+from typing import Any, Dict
+
+from stable_baselines3.common.vec_env import SubprocVecEnv, VecNormalize, VecMonitor, VecEnv
+
+from gl_gym.RL.utils import make_env
+from gl_gym.environments.surrogate import SurrogateVecEnv
+
+# parameters that define the model, its integrator and the observation space
+STRUCTURAL_PARAMS = ("num_params", "nx", "nu", "nd", "dt", "pred_horizon")
+
+
+class EnvPool:
+    """
+    Keeps the SubprocVecEnv workers alive across consecutive experiments.
+    Starting a worker imports torch/casadi/pandas and builds the integrator,
+    which dominates the start-up time of short runs and sweeps.
+    A pooled worker is re-parameterized in place through the `reconfigure` method of the environment.
+
+    Workers are cached by environment id, number of environments, train/eval usage
+    and the structural parameters that cannot be reconfigured.
+    The VecMonitor and VecNormalize wrappers are created fresh for every experiment.
+    Call `close()` once all experiments are done.
+    """
+    def __init__(self):
+        self._envs: Dict[Any, SubprocVecEnv] = {}
+
+    def _key(self, env_id, env_base_params, env_specific_params, n_envs, eval_env):
+        structure = tuple(env_base_params.get(name) for name in STRUCTURAL_PARAMS)
+        obs_modules = tuple(env_specific_params.get("observation_modules", []))
+        return (env_id, n_envs, eval_env, structure, obs_modules)
+
+    def make_vec_env(
+        self,
+        env_id: str,
+        env_base_params: Dict[str, Any],
+        env_specific_params: Dict[str, Any],
+        seed: int,
+        n_envs: int,
+        monitor_filename: str | None = None,
+        vec_norm_kwargs: Dict[str, Any] | None = None,
+        eval_env: bool = False
+        ) -> VecEnv:
+        """
+        Drop-in replacement for `gl_gym.RL.utils.make_vec_env` that reuses pooled workers.
+        """
+        key = self._key(env_id, env_base_params, env_specific_params, n_envs, eval_env)
+        if key not in self._envs:
+            vec_env_cls = SurrogateVecEnv if env_id == "SurrogateTomatoEnv" else SubprocVecEnv
+            self._envs[key] = vec_env_cls([
+                make_env(env_id, rank, seed, env_base_params, env_specific_params, eval_env=eval_env)
+                for rank in range(n_envs)
+            ])
+        else:
+            venv = self._envs[key]
+            for rank in range(n_envs):
+                venv.env_method(
+                    "reconfigure",
+                    env_specific_params=env_specific_params,
+                    base_env_params=env_base_params,
+                    seed=seed+rank,
+                    indices=rank
+                )
+
+        env = VecMonitor(self._envs[key], filename=monitor_filename)
+        if vec_norm_kwargs is not None:
+            env = VecNormalize(env, **vec_norm_kwargs)
+            if eval_env:
+                env.training = False
+                env.norm_reward = False
+        return env
+
+    def close(self):
+        """Shut down all pooled workers."""
+        for venv in self._envs.values():
+            venv.close()
+        self._envs = {}
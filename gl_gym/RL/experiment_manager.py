@@ -1,6 +1,7 @@
 import os
 import argparse
 import gc
+from copy import deepcopy
 import numpy as np
 
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
@@ -19,9 +20,11 @@ from gl_gym.RL.utils import (
     load_env_params, 
     wandb_init, 
     make_vec_env, 
+    pretrain_integrator_params,
     create_callbacks, 
     load_sweep_config
 )
+from gl_gym.RL.local_search import LocalHyperparameterSearch
 
 import wandb
 
@@ -72,7 +75,10 @@ class ExperimentManager:
         save_model=True,
         save_env=True,
         hp_tuning=False,
-        device="cpu"
+        device="cpu",
+        env_pool=None,
+        pretrain_integrator=None,
+        pretrain_fraction=0.0
     ):
         """Initialize the manager.
 
@@ -94,6 +100,11 @@ class ExperimentManager:
             save_env: Persist VecNormalize stats.
             hp_tuning: If True, run a W&B sweep instead of a single training run.
             device: Torch device (e.g., `cpu`, `cuda`, `cuda:0`).
+            env_pool: Optional `EnvPool` whose env workers are reused across runs
+                instead of being started and closed for every run.
+            pretrain_integrator: Optional integrator of the training envs (e.g., `reduced`) for the first
+                `pretrain_fraction` of the timesteps, after which training continues with the configured integrator.
+            pretrain_fraction: Fraction of `total_timesteps` trained with `pretrain_integrator`.
         """
         self.env_id = env_id
         self.project = project
@@ -114,6 +125,13 @@ class ExperimentManager:
         self.save_model = save_model
         self.save_env = save_env
         self.device = device
+        self.env_pool = env_pool
+        self.pretrain_integrator = pretrain_integrator
+        self.pretrain_fraction = pretrain_fraction
+        # validated before the envs are started
+        self.pretrain_env_params = None
+        if pretrain_integrator:
+            self.pretrain_env_params = pretrain_integrator_params(env_id, env_specific_params, pretrain_integrator)
         # self.continue_training = continue_training
         # self.continued_project = continued_project
         # self.continued_runname = continued_runname
@@ -156,9 +174,11 @@ class ExperimentManager:
             "gamma": gamma
         }
 
+        vec_env_fn = make_vec_env if self.env_pool is None else self.env_pool.make_vec_env
+
         # Setup new environment for training
         self.env_base_params["training"] = True
-        self.env = make_vec_env(
+        self.env = vec_env_fn(
             self.env_id,
             self.env_base_params,
             self.env_specific_params,
@@ -169,7 +189,7 @@ class ExperimentManager:
         )
 
         self.env_base_params["training"] = False
-        self.eval_env = make_vec_env(
+        self.eval_env = vec_env_fn(
             self.env_id,
             self.env_base_params,
             self.env_specific_params,
@@ -181,12 +201,18 @@ class ExperimentManager:
         )
 
 
-    def initialise_model(self):
-        """Instantiate the SB3 model and configure TensorBoard logging."""
+    def initialise_model(self, run_name=None):
+        """Instantiate the SB3 model and configure TensorBoard logging.
+
+        Args:
+            run_name: Name of the TensorBoard log directory. Defaults to the W&B run name.
+        """
+        if run_name is None:
+            run_name = self.run.name
         if self.stochastic:
-            tensorboard_log = f"train_data/{self.project}/{self.algorithm}/stochastic/logs/{self.run.name}"
+            tensorboard_log = f"train_data/{self.project}/{self.algorithm}/stochastic/logs/{run_name}"
         else:
-            tensorboard_log = f"train_data/{self.project}/{self.algorithm}/deterministic/logs/{self.run.name}"
+            tensorboard_log = f"train_data/{self.project}/{self.algorithm}/deterministic/logs/{run_name}"
 
         # Initialize a new model for training
         self.model = self.model_class(
@@ -313,6 +339,70 @@ class ExperimentManager:
             sweep_id = wandb.sweep(sweep=sweep_config, project=self.project)
             wandb.agent(sweep_id, function=self.run_single_sweep, count=100)
 
+    def local_hyperparameter_tuning(
+        self,
+        env_base_params,
+        env_specific_params,
+        hyperparameters,
+        study_name,
+        n_trials=100,
+        n_workers=1,
+        min_resource=None,
+        reduction_factor=3,
+        seed=666,
+    ):
+        """Run an offline sweep with ASHA early stopping, without the W&B service.
+
+        Samples from the same sweep spaces as `hyperparameter_tuning`. Trials and
+        intermediate evaluation rewards are stored in
+        `train_data/<project>/<algorithm>/<mode>/tuning/<study_name>.db`.
+
+        Args:
+            env_base_params: Unmodified base env settings, forwarded to each trial.
+            env_specific_params: Unmodified task settings, forwarded to each trial.
+            hyperparameters: Unmodified agent hyperparams, forwarded to each trial.
+            study_name: Name of the study; reusing a name extends the database.
+            n_trials: Number of sampled configurations.
+            n_workers: Number of trials trained in parallel processes.
+            min_resource: Timesteps before the first pruning decision.
+            reduction_factor: ASHA reduction factor.
+            seed: Seed for sampling configurations.
+        Returns: list of the best completed trials.
+        """
+        self.total_timesteps = 1.5e6 # standard run for 1.5M time steps
+        mode = "stochastic" if self.stochastic else "deterministic"
+        tuning_dir = f"train_data/{self.project}/{self.algorithm}/{mode}/tuning/"
+        sweep_config = load_sweep_config(self.hyp_config_path, self.env_id, self.algorithm)
+
+        settings = {
+            "env_id": self.env_id,
+            "project": self.project,
+            "env_base_params": env_base_params,
+            "env_specific_params": env_specific_params,
+            "hyperparameters": hyperparameters,
+            "study_name": study_name,
+            "n_eval_episodes": self.n_eval_episodes,
+            "algorithm": self.algorithm,
+            "env_seed": self.env_seed,
+            "model_seed": self.model_seed,
+            "stochastic": self.stochastic,
+            "device": self.device,
+            "save_dir": os.path.join(tuning_dir, "models") if self.save_model else None,
+        }
+        search = LocalHyperparameterSearch(
+            sweep_config,
+            settings,
+            storage_path=os.path.join(tuning_dir, f"{study_name}.db"),
+            max_resource=int(self.total_timesteps),
+            min_resource=min_resource,
+            reduction_factor=reduction_factor,
+            n_workers=n_workers,
+            seed=seed,
+        )
+        best_trials = search.optimize(n_trials)
+        search.storage.export_json(os.path.join(tuning_dir, f"{study_name}.json"))
+        return best_trials
+
     def run_experiment(self):
         """Train for `total_timesteps`, evaluate periodically, and persist artifacts.
 
@@ -342,8 +432,17 @@ class ExperimentManager:
             verbose=1 # verbose-2; debug messages.
         )
 
-        # Train the model
-        self.model.learn(total_timesteps=self.total_timesteps, callback=callbacks, reset_num_timesteps=False)
+        # Train the model, optionally pretrain on a cheaper integrator and fine-tune on the configured one
+        pretrain_timesteps = int(self.pretrain_fraction * self.total_timesteps) if self.pretrain_integrator else 0
+        if pretrain_timesteps > 0:
+            integrator = {
+                "integrator": self.env_specific_params.get("integrator", "monolithic"),
+                "integrator_params": self.env_specific_params.get("integrator_params", {}),
+            }
+            self.env.env_method("reconfigure", env_specific_params=self.pretrain_env_params)
+            self.model.learn(total_timesteps=pretrain_timesteps, callback=callbacks, reset_num_timesteps=False)
+            self.env.env_method("reconfigure", env_specific_params=integrator)
+        self.model.learn(total_timesteps=self.total_timesteps - pretrain_timesteps, callback=callbacks, reset_num_timesteps=False)
         if model_log_dir:
             self.model.save(os.path.join(model_log_dir, "last_model"))
 
@@ -354,8 +453,9 @@ class ExperimentManager:
 
         # Clean up and finalize the run
         self.run.finish()
-        self.env.close()
-        self.eval_env.close()
+        if self.env_pool is None:
+            self.env.close()
+            self.eval_env.close()
         del self.model, self.env, self.eval_env
         gc.collect()
 
@@ -374,11 +474,23 @@ def main():
     parser.add_argument("--save_model", default=True, action=argparse.BooleanOptionalAction, help="Whether to save the model")
     parser.add_argument("--save_env", default=True, action=argparse.BooleanOptionalAction, help="Whether to save the environment")
     parser.add_argument("--hyperparameter_tuning", default=False, action=argparse.BooleanOptionalAction, help="Perform hyperparameter tuning")
+    parser.add_argument("--tuning_backend", type=str, default="wandb", choices=["wandb", "local"], help="Run the sweep with W&B or with the offline local search")
+    parser.add_argument("--study_name", type=str, default="local_sweep", help="Name of the local search study")
+    parser.add_argument("--n_trials", type=int, default=100, help="Number of trials for the local search")
+    parser.add_argument("--n_workers", type=int, default=1, help="Number of parallel trials for the local search")
+    parser.add_argument("--min_resource", type=int, default=None, help="Timesteps before the first pruning decision of the local search")
+    parser.add_argument("--reduction_factor", type=int, default=3, help="ASHA reduction factor of the local search")
+    parser.add_argument("--pretrain_integrator", type=str, default=None, help="Integrator of the training envs during pretraining, e.g., reduced")
+    parser.add_argument("--pretrain_fraction", type=float, default=0.0, help="Fraction of the timesteps that is pretrained with --pretrain_integrator")
     args = parser.parse_args()
 
     env_config_path = f"gl_gym/configs/envs/"
     env_base_params, env_specific_params = load_env_params(args.env_id, env_config_path)
     hyperparameters = load_model_hyperparams(args.algorithm, args.env_id)
+    local_tuning = args.hyperparameter_tuning and args.tuning_backend == "local"
+    if local_tuning:
+        # trials build their own managers from the unmodified parameters
+        trial_params = deepcopy((env_base_params, env_specific_params, hyperparameters))
     # Initialize the experiment manager
     experiment_manager = ExperimentManager(
         env_id=args.env_id,
@@ -396,10 +508,22 @@ def main():
         save_model=args.save_model,
         save_env=args.save_env,
         hp_tuning=args.hyperparameter_tuning,
-        device=args.device
+        device=args.device,
+        pretrain_integrator=args.pretrain_integrator,
+        pretrain_fraction=args.pretrain_fraction
     )
 
-    if args.hyperparameter_tuning:
+    if local_tuning:
+        experiment_manager.local_hyperparameter_tuning(
+            *trial_params,
+            study_name=args.study_name,
+            n_trials=args.n_trials,
+            n_workers=args.n_workers,
+            min_resource=args.min_resource,
+            reduction_factor=args.reduction_factor,
+            seed=args.model_seed,
+        )
+    elif args.hyperparameter_tuning:
         # Perform hyperparameter tuning
         experiment_manager.hyperparameter_tuning()
     else:
@@ -0,0 +1,331 @@
+import os
+import json
+import time
+import sqlite3
+from copy import deepcopy
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from gl_gym.common.evaluation import evaluate_policy
+
+# env workers that are reused by the consecutive trials of a worker process
+_ENV_POOL = None
+
+
+def sample_config(parameters: Dict[str, Any], rng: np.random.Generator) -> Dict[str, Any]:
+    """
+    Draws a single configuration from a W&B style sweep parameter space.
+    Supports fixed values (`value`), categorical choices (`values`) and the
+    distributions used in `configs/sweeps/*.yml`.
+
+    Args:
+        parameters (dict): the `parameters` section of a sweep config
+        rng (np.random.Generator): random number generator
+    Returns:
+        config (dict): sampled hyperparameters
+    """
+    config = {}
+    for name, spec in parameters.items():
+        if "value" in spec:
+            config[name] = deepcopy(spec["value"])
+        elif "values" in spec:
+            values = spec["values"]
+            if not isinstance(values, list):
+                values = [values]
+            config[name] = deepcopy(values[rng.integers(len(values))])
+        elif "distribution" in spec:
+            config[name] = _sample_distribution(spec, rng)
+        else:
+            raise ValueError(f"Unsupported sweep specification for {name}: {spec}")
+    return config
+
+
+def _sample_distribution(spec: Dict[str, Any], rng: np.random.Generator):
+    dist = spec["distribution"]
+    low, high = float(spec["min"]), float(spec["max"])
+    if dist == "uniform":
+        return float(rng.uniform(low, high))
+    elif dist == "log_uniform_values":
+        return float(np.exp(rng.uniform(np.log(low), np.log(high))))
+    elif dist == "int_uniform":
+        return int(rng.integers(int(low), int(high) + 1))
+    elif dist == "q_uniform":
+        q = spec.get("q", 1)
+        return float(np.round(rng.uniform(low, high) / q) * q)
+    elif dist == "q_log_uniform_values":
+        q = spec.get("q", 1)
+        return float(np.round(np.exp(rng.uniform(np.log(low), np.log(high))) / q) * q)
+    raise ValueError(f"Unsupported distribution: {dist}")
+
+
+def rung_schedule(min_resource: int, max_resource: int, reduction_factor: int) -> List[int]:
+    """
+    Number of environment steps after which a trial is evaluated and possibly pruned.
+    Follows the geometric budget of successive halving: r_k = min_resource * eta^k,
+    the final rung always equals the full training budget.
+    """
+    rungs = []
+    resource = min_resource
+    while resource < max_resource:
+        rungs.append(int(resource))
+        resource *= reduction_factor
+    rungs.append(int(max_resource))
+    return rungs
+
+
+class TrialStorage:
+    """
+    Local SQLite database that stores the trials of a hyperparameter search
+    and the intermediate evaluation rewards they reported at each rung.
+    Each process opens its own connection, so the file can be shared by parallel trials.
+    """
+    def __init__(self, path: str, timeout: float = 60.):
+        self.path = path
+        self.timeout = timeout
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS trials ("
+                "trial_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "config TEXT NOT NULL, "
+                "state TEXT NOT NULL, "
+                "value REAL, "
+                "started REAL, "
+                "finished REAL)"
+            )
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS reports ("
+                "trial_id INTEGER NOT NULL, "
+                "rung INTEGER NOT NULL, "
+                "timesteps INTEGER NOT NULL, "
+                "value REAL NOT NULL, "
+                "PRIMARY KEY (trial_id, rung))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=self.timeout)
+
+    def create_trial(self, config: Dict[str, Any]) -> int:
+        with self._connect() as con:
+            cur = con.execute(
+                "INSERT INTO trials (config, state, started) VALUES (?, ?, ?)",
+                (json.dumps(config), "running", time.time())
+            )
+            return cur.lastrowid
+
+    def report(self, trial_id: int, rung: int, timesteps: int, value: float) -> None:
+        with self._connect() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO reports (trial_id, rung, timesteps, value) VALUES (?, ?, ?, ?)",
+                (trial_id, rung, timesteps, float(value))
+            )
+
+    def rung_values(self, rung: int) -> List[float]:
+        with self._connect() as con:
+            rows = con.execute("SELECT value FROM reports WHERE rung = ?", (rung,)).fetchall()
+        return [row[0] for row in rows]
+
+    def finish_trial(self, trial_id: int, state: str, value: Optional[float]) -> None:
+        with self._connect() as con:
+            con.execute(
+                "UPDATE trials SET state = ?, value = ?, finished = ? WHERE trial_id = ?",
+                (state, value, time.time(), trial_id)
+            )
+
+    def trials(self) -> List[Dict[str, Any]]:
+        with self._connect() as con:
+            rows = con.execute(
+                "SELECT trial_id, config, state, value, started, finished FROM trials ORDER BY trial_id"
+            ).fetchall()
+        return [
+            {"trial_id": r[0], "config": json.loads(r[1]), "state": r[2], "value": r[3], "started": r[4], "finished": r[5]}
+            for r in rows
+        ]
+
+    def best_trials(self, n: int = 5) -> List[Dict[str, Any]]:
+        """Completed trials sorted from best to worst final evaluation reward."""
+        completed = [t for t in self.trials() if t["state"] == "complete" and t["value"] is not None]
+        return sorted(completed, key=lambda t: t["value"], reverse=True)[:n]
+
+    def export_json(self, filename: str) -> None:
+        with open(filename, "w") as f:
+            json.dump(self.trials(), f, indent=2)
+
+
+class SuccessiveHalvingPruner:
+    """
+    Asynchronous successive halving (ASHA) pruner.
+    A trial that reaches rung k is only allowed to continue training
+    if its evaluation reward lies in the top 1/reduction_factor of all rewards
+    reported at that rung so far. No trial waits for others, so workers stay busy.
+
+    Args:
+        storage (TrialStorage): database holding the intermediate rewards
+        reduction_factor (int): fraction of trials (1/eta) that is promoted to the next rung
+    """
+    def __init__(self, storage: TrialStorage, reduction_factor: int = 3):
+        self.storage = storage
+        self.reduction_factor = reduction_factor
+
+    def should_prune(self, rung: int, value: float) -> bool:
+        competing = sorted(self.storage.rung_values(rung), reverse=True)
+        if not competing:
+            return False
+        promotable_idx = max(len(competing) // self.reduction_factor - 1, 0)
+        return value < competing[promotable_idx]
+
+
+def run_trial(
+    trial_id: int,
+    config: Dict[str, Any],
+    settings: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    Trains a single sampled configuration and reports its evaluation reward at every rung.
+    Runs in a worker process, hence all arguments are plain python objects.
+
+    Args:
+        trial_id (int): id of the trial in the storage
+        config (dict): sampled hyperparameters (sweep format)
+        settings (dict): search settings such as env parameters, rungs and paths
+    Returns:
+        result (dict): final state and reward of the trial
+    """
+    # import inside the worker to keep the driver process light
+    from stable_baselines3.common.vec_env import sync_envs_normalization
+    from gl_gym.RL.experiment_manager import ExperimentManager
+    from gl_gym.RL.env_pool import EnvPool
+
+    global _ENV_POOL
+    if _ENV_POOL is None:
+        _ENV_POOL = EnvPool()
+
+    storage = TrialStorage(settings["storage_path"])
+    pruner = SuccessiveHalvingPruner(storage, settings["reduction_factor"])
+
+    state, value, trained = "complete", None, 0
+    try:
+        # a config for which the envs or the model cannot be set up fails its own trial only
+        manager = ExperimentManager(
+            env_id=settings["env_id"],
+            project=settings["project"],
+            env_base_params=deepcopy(settings["env_base_params"]),
+            env_specific_params=deepcopy(settings["env_specific_params"]),
+            hyperparameters=deepcopy(settings["hyperparameters"]),
+            group=settings["study_name"],
+            n_eval_episodes=settings["n_eval_episodes"],
+            n_evals=len(settings["rungs"]),
+            algorithm=settings["algorithm"],
+            env_seed=settings["env_seed"],
+            model_seed=settings["model_seed"],
+            stochastic=settings["stochastic"],
+            save_model=False,
+            save_env=False,
+            hp_tuning=True,
+            device=settings["device"],
+            env_pool=_ENV_POOL,
+        )
+        run_name = f"{settings['study_name']}-trial-{trial_id}"
+        manager.init_envs(1 - config["gamma_offset"])
+        manager.build_model_hyperparameters(config)
+        manager.initialise_model(run_name=run_name)
+
+        for rung, budget in enumerate(settings["rungs"]):
+            manager.model.learn(total_timesteps=budget - trained, reset_num_timesteps=False)
+            trained = budget
+
+            sync_envs_normalization(manager.env, manager.eval_env)
+            manager.eval_env.env_method("_reset_eval_idx")
+            value, _, _ = evaluate_policy(
+                manager.model,
+                manager.eval_env,
+                n_eval_episodes=settings["n_eval_episodes"],
+                deterministic=True,
+            )
+            value = float(value)
+            storage.report(trial_id, rung, trained, value)
+
+            if rung < len(settings["rungs"]) - 1 and pruner.should_prune(rung, value):
+                state = "pruned"
+                break
+
+        if state == "complete" and settings["save_dir"] is not None:
+            save_path = os.path.join(settings["save_dir"], run_name)
+            os.makedirs(save_path, exist_ok=True)
+            manager.model.save(os.path.join(save_path, "last_model"))
+            manager.model.get_vec_normalize_env().save(os.path.join(save_path, "last_vecnormalize.pkl"))
+    except Exception as e:
+        print(f"Trial {trial_id} failed: {e}")
+        state = "failed"
+    finally:
+        storage.finish_trial(trial_id, state, value)
+
+    return {"trial_id": trial_id, "state": state, "value": value, "timesteps": trained}
+
+
+class LocalHyperparameterSearch:
+    """
+    Offline replacement for the W&B sweep service.
+    Samples configurations from the sweep spaces in `configs/sweeps/`,
+    trains them in parallel worker processes and stops poor trials early with ASHA.
+    All trials and intermediate rewards are kept in a local SQLite database.
+
+    Args:
+        sweep_config (dict): sweep config of the environment (from `load_sweep_config`)
+        settings (dict): experiment settings forwarded to each trial
+        storage_path (str): path of the SQLite database
+        max_resource (int): number of timesteps a trial trains when it is never pruned
+        min_resource (int): number of timesteps before the first evaluation
+        reduction_factor (int): ASHA reduction factor eta
+        n_workers (int): number of trials that train in parallel
+        seed (int): seed for sampling configurations
+    """
+    def __init__(
+        self,
+        sweep_config: Dict[str, Any],
+        settings: Dict[str, Any],
+        storage_path: str,
+        max_resource: int,
+        min_resource: Optional[int] = None,
+        reduction_factor: int = 3,
+        n_workers: int = 1,
+        seed: int = 666,
+    ):
+        if min_resource is None:
+            min_resource = max(int(max_resource // reduction_factor**3), 1)
+        self.parameters = sweep_config["parameters"]
+        self.storage = TrialStorage(storage_path)
+        self.n_workers = n_workers
+        self.rng = np.random.default_rng(seed)
+        self.settings = dict(settings)
+        self.settings.update({
+            "storage_path": storage_path,
+            "reduction_factor": reduction_factor,
+            "rungs": rung_schedule(int(min_resource), int(max_resource), reduction_factor),
+        })
+
+    def optimize(self, n_trials: int) -> List[Dict[str, Any]]:
+        """Runs `n_trials` trials and returns the best completed ones."""
+        ctx = mp.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.n_workers, mp_context=ctx) as executor:
+            futures = {}
+            for _ in range(n_trials):
+                config = sample_config(self.parameters, self.rng)
+                trial_id = self.storage.create_trial(config)
+                futures[executor.submit(run_trial, trial_id, config, self.settings)] = trial_id
+
+            for future in as_completed(futures):
+                trial_id = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # e.g., a worker process that died, the trial did not record its own state
+                    print(f"Trial {trial_id} failed: {e}")
+                    self.storage.finish_trial(trial_id, "failed", None)
+                    continue
+                print(f"Trial {result['trial_id']} {result['state']} after {result['timesteps']} steps, reward: {result['value']}")
+
+        return self.storage.best_trials()
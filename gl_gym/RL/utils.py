@@ -1,4 +1,5 @@
 import os
+import inspect
 import yaml
 from os.path import join
 from typing import Dict, Any, Callable, List, Optional, Union, Tuple
@@ -14,14 +15,16 @@ from wandb.integration.sb3 import WandbCallback
 from stable_baselines3.common.vec_env import SubprocVecEnv, VecNormalize, VecMonitor, VecEnv
 
 from gl_gym.common.callbacks import CustomWandbCallback, SaveVecNormalizeCallback, BaseCallback
-from gl_gym.environments.tomato_env import TomatoEnv
+from gl_gym.environments.tomato_env import TomatoEnv, INTEGRATORS
+from gl_gym.environments.surrogate import SurrogateTomatoEnv, SurrogateVecEnv
 
 from gl_gym.common.results import Results
 
 ACTIVATION_FN = {"ReLU": ReLU, "SiLU": SiLU, "Tanh":Tanh, "ELU": ELU}
 OPTIMIZER = {"ADAM": Adam}
 ENVS = {"TomatoEnv": TomatoEnv,
-        "LettuceEnv": LettuceEnv
+        "LettuceEnv": LettuceEnv,
+        "SurrogateTomatoEnv": SurrogateTomatoEnv,
         }
 
 def make_env(env_id, rank, seed, env_base_params, env_specific_params, eval_env):
@@ -60,7 +63,9 @@ def make_vec_env(
     # make dir if not exists
     if monitor_filename is not None and not os.path.exists(os.path.dirname(monitor_filename)):
         os.makedirs(os.path.dirname(monitor_filename), exist_ok=True)
-    env = SubprocVecEnv([make_env(env_id, rank, seed, env_base_params, env_specific_params, eval_env=eval_env) for rank in range(n_envs)])
+    # the surrogate envs are stepped in one process with a single batched forward pass
+    vec_env_cls = SurrogateVecEnv if env_id == "SurrogateTomatoEnv" else SubprocVecEnv
+    env = vec_env_cls([make_env(env_id, rank, seed, env_base_params, env_specific_params, eval_env=eval_env) for rank in range(n_envs)])
     env = VecMonitor(env, filename=monitor_filename)
 
     if vec_norm_kwargs is not None:
@@ -113,6 +118,24 @@ def load_env_params(env_id: str, path: str) -> Tuple[Dict, Dict, Dict]:
 
     return env_base_params, env_specific_params
 
+def pretrain_integrator_params(env_id: str, env_specific_params: Dict[str, Any], pretrain_integrator: str) -> Dict[str, Any]:
+    """
+    The env settings of the pretraining phase with `pretrain_integrator`.
+    The configured integrator_params, e.g., the tolerances and QSS states, are kept
+    as far as the pretraining integrator accepts them.
+    Raises a ValueError if the environment has no integrator setting or the integrator is unknown.
+    """
+    if "integrator" not in inspect.signature(ENVS[env_id].__init__).parameters:
+        raise ValueError(f"{env_id} has no integrator setting, it cannot be pretrained with another integrator.")
+    if pretrain_integrator not in INTEGRATORS:
+        raise ValueError(f"Unknown pretrain integrator {pretrain_integrator}, expected one of {list(INTEGRATORS)}.")
+    accepted = inspect.signature(INTEGRATORS[pretrain_integrator]).parameters
+    integrator_params = env_specific_params.get("integrator_params", {})
+    return {
+        "integrator": pretrain_integrator,
+        "integrator_params": {name: value for name, value in integrator_params.items() if name in accepted},
+    }
+
 def load_sweep_config(path: str, env_id: str, algorithm: str) -> Dict[str, Any]:
     with open(join(path, algorithm + ".yml"), "r") as f:
         sweep_config = yaml.load(f, Loader=yaml.FullLoader)
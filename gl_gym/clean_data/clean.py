@@ -1,185 +1,258 @@
-import pandas as pd
-import numpy as np
-from scipy.interpolate import PchipInterpolator
+import argparse
+import os
 from os.path import join
+from typing import Dict, Iterator, List, Optional
 
-#Define data types to read a CSV file
-dtypes = {
-    'Date': str,
-    'time': str,  # Read as string to handle 'HH:MM'
-    'Day/Night': str,
-    'Hour': str,  # Read as string to handle 'YYYY-MM-DD HH:MM:SS'
-    'External Total Solar Radiation': float,
-    'External Temperature': float,
-    'External Relative Humidity (RH)': float,
-    'Wind Speed': float,
-    'Datetime': str
-}
+import numpy as np
+import pandas as pd
+from scipy.interpolate import PchipInterpolator
 
-# Read CSV file
-csv_path = "/Users/fady/Desktop/test/GreenLight-Gym2/gl_gym/environments/weather/Egypt/Geneina2024.csv"
-try:
-    df = pd.read_csv(csv_path, dtype=dtypes, low_memory=False)
-except FileNotFoundError:
-    raise FileNotFoundError(f"CSV file not found in path: {csv_path}")
-except Exception as e:
-    raise Exception(f"An error occurred while reading the file: {e}")
-
-df.columns = [col.strip() for col in df.columns]  # Remove spaces from column names
-
-# Print columns for verification
-print("Columns in file:", df.columns.tolist())
-print("Data types:\n", df.dtypes)
-
-
-## Convert 'Hour' column from 'YYYY-MM-DD HH:MM:SS' to decimal numbers
-def convert_hour_to_float(hour):
-    try:
-        if pd.isna(hour):
-            return np.nan
-        if isinstance(hour, str):
-            # Extract hour and minutes from 'YYYY-MM-DD HH:MM:SS'
-            time_part = hour.split(' ')[-1]  # Take the part 'HH:MM:SS'
-            hours, minutes, _ = map(int, time_part.split(':'))
-            return hours + minutes / 60.0
-        return float(hour)
-    except (ValueError, AttributeError) as e:
-        print(f"Failed to convert value '{hour}' in column 'Hour': {e}")
-        return np.nan
-
-if 'Hour' in df.columns:
-    df['Hour'] = df['Hour'].apply(convert_hour_to_float)
-    invalid_hours = df['Hour'].isna()
-    if invalid_hours.any():
-        print("Invalid values in 'Hour':", df.loc[invalid_hours, 'Hour'].index.tolist())
-        print("Sample of original invalid values:", df.loc[invalid_hours, 'Hour'].head().tolist())
-        raise ValueError(f"Invalid or missing values in column 'Hour' after conversion. Unique values: {df['Hour'].unique()}")
-else:
-    raise KeyError(f"The column 'Hour' does not exist in the CSV file. Available columns: {df.columns.tolist()}")
-
-# Convert 'time' column from 'HH:MM' to seconds since the beginning of the day
-def convert_time_to_seconds(time_str):
-    try:
-        if pd.isna(time_str):
-            return np.nan
-        if isinstance(time_str, str):
-            hours, minutes = map(int, time_str.split(':'))
-            return hours * 3600 + minutes * 60
-        return float(time_str)
-    except (ValueError, AttributeError) as e:
-        print(f"Failed to convert value '{time_str}' in column 'time': {e}")
-        return np.nan
-
-if 'time' in df.columns:
-    df['time'] = df['time'].apply(convert_time_to_seconds)
-    if df['time'].isna().any():
-        raise ValueError(f"Invalid or missing values in column 'time'. Unique values: {df['time'].unique()}")
-
-# Create 'sky temperature' column if missing
-if 'sky temperature' not in df.columns:
-    df['sky temperature'] = df['External Temperature'] - 5.0
-    print("The 'sky temperature' column was created with default values")
-
-# Set column map
-column_mapping = {
-    'External Total Solar Radiation': 'External Total Solar Radiation',
-    'External Temperature': 'External Temperature',
-    'External Relative Humidity (RH)': 'External Relative Humidity (RH)',
-    'Wind Speed': 'Wind Speed',
-    'sky temperature': 'sky temperature',
-    'Datetime': 'Datetime'
+# station column names of the exported weather data, mapped to the columns of the simulator's weather files
+STATION_COLUMNS = {
+    "External Total Solar Radiation": "global radiation",
+    "External Temperature": "air temperature",
+    "External Relative Humidity (RH)": "RH",
+    "Wind Speed": "wind speed",
 }
 
-# Check for columns
-for input_col, output_col in column_mapping.items():
-    if input_col != 'Datetime' and input_col not in df.columns:
-        raise KeyError(f"Column '{input_col}' does not exist in CSV file. Available columns: {df.columns.tolist()}")
-
-# Convert 'Datetime' to seconds
-time = pd.to_datetime(df['Datetime'], errors='coerce')
-if time.isnull().any():
-    raise ValueError(f"Invalid date and time values in column 'Datetime'. Unique values: {df['Datetime'].unique()}")
-
-# Print the minimum and maximum dates to check
-print(f"Minimum date for 'Datetime': {time.min()}")
-print(f"Maximum date for 'Datetime': {time.max()}")
-
-# Correct dates to start from 2024-01-01
-if time.min().year != 2024:
-    print(f"WARNING: Dates in 'Datetime' are not in the year 2024. Minimum: {time.min()}")
-    time_offset = pd.Timestamp("2024-01-01") - time.min()
-    time = time + time_offset
-    print(f"Dates corrected to start from 2024-01-01. New minimum: {time.min()}")
-
-# Convert dates to seconds since the beginning of 2024
-time_seconds = (time - pd.Timestamp("2024-01-01")).dt.total_seconds()
-
-# Print the minimum and maximum time_seconds to check
-print(f"Minimum time_seconds: {time_seconds.min()}")
-print(f"Maximum time_seconds: {time_seconds.max()}")
-
-# Check that time_seconds contains positive values
-if (time_seconds < 0).any():
-    raise ValueError(f"The 'time_seconds' values contain negative values after correction. Minimum: {time_seconds.min()}")
-
-# Create a new time grid (5 minute intervals)
-start_time = max(time_seconds.iloc[0], 0)  # Ensure start_time is not negative
-end_time = time_seconds.iloc[-1]
-new_time = np.arange(start_time, end_time + 300, 300)
-
-# Print the minimum and maximum new_time for verification
-print(f"Minimum new_time: {new_time.min()}")
-print(f"Maximum new_time: {new_time.max()}")
-
-# Completion procedure
-interp_df = pd.DataFrame(index=new_time)
-for input_col, output_col in column_mapping.items():
-    if input_col != 'Datetime':
-        print(f"Column processing: {input_col} -> {output_col}")
-        if input_col in df.columns:
-            interp_df[output_col] = PchipInterpolator(time_seconds, df[input_col])(new_time)
-        else:
-            raise KeyError(f"Column '{input_col}' does not exist in df during interpolation")
-
-
-
-# Print the columns in interp_df for verification
-print("Columns in interp_df after interpolation:", interp_df.columns.tolist())
-
-
-# Add the remaining columns
-interp_df['Datetime'] = pd.to_datetime(new_time, unit='s', origin=pd.Timestamp("2024-01-01"))
-print(f"Minimum 'Datetime' date in interp_df: {interp_df['Datetime'].min()}")
-print(f"Maximum 'Datetime' date in interp_df: {interp_df['Datetime'].max()}")
-if interp_df['Datetime'].dt.year.min() != 2024:
-    raise ValueError(f"'Datetime' dates in interp_df do not start from 2024. Minimum: {interp_df['Datetime'].dt.year.min()}")
-
-
-interp_df['time'] = new_time
-interp_df['Date'] = interp_df['Datetime'].dt.date.astype(str)
-interp_df['Hour'] = interp_df['Datetime'].dt.hour + interp_df['Datetime'].dt.minute / 60.0
-
-
-# Check if 'External Total Solar Radiation' exists before creating 'Day/Night'
-if 'External Total Solar Radiation' not in interp_df.columns:
-    raise KeyError(f"Column 'External Total Solar Radiation' does not exist in interp_df. Available columns: {interp_df.columns.tolist()}")
-interp_df['Day/Night'] = np.where(interp_df['External Total Solar Radiation'] > 0, 'Day', 'Night')
-
-# Save clean file
-output_path = "/Users/fady/Desktop/test/GreenLight-Gym2/gl_gym/environments/weather/Egypt/Geneina2024_clean.csv"
-interp_df.to_csv(output_path, index=False)
-print(f"Clean data saved to {output_path} with {len(interp_df)} rows")
-
-
-# Create a Geneina2025.csv file
-df_2025 = interp_df.copy()
-df_2025['Datetime'] = df_2025['Datetime'] + pd.Timedelta(days=365)
-print(f"Minimum 'Datetime' date in df_2025: {df_2025['Datetime'].min()}")
-print(f"Maximum 'Datetime' date in df_2025: {df_2025['Datetime'].max()}")
-if df_2025['Datetime'].dt.year.min() != 2025:
-    raise ValueError(f"'Datetime' dates in df_2025 do not start from 2025. Minimum: {df_2025['Datetime'].dt.year.min()}")
-df_2025['Date'] = df_2025['Datetime'].dt.date.astype(str)
-df_2025['time'] = (df_2025['Datetime'] - pd.Timestamp("2025-01-01")).dt.total_seconds()
-df_2025['Hour'] = df_2025['Datetime'].dt.hour + df_2025['Datetime'].dt.minute / 60.0
-df_2025.to_csv("/Users/fady/Desktop/test/GreenLight-Gym2/gl_gym/environments/weather/Egypt/Geneina2025.csv", index=False)
-print("Genina2025.csv created")
\ No newline at end of file
+# columns of the weather files that are read by `load_weather_data`, see the README
+WEATHER_COLUMNS = [
+    "time", "global radiation", "wind speed", "air temperature",
+    "sky temperature", "??", "CO2 concentration", "day number", "RH"
+]
+
+
+def read_station_chunks(
+    csv_path: str,
+    columns: Dict[str, str] = STATION_COLUMNS,
+    datetime_column: str = "Datetime",
+    datetime_format: str = "%Y-%m-%d %H:%M:%S",
+    chunksize: int = 500_000,
+) -> Iterator[pd.DataFrame]:
+    """
+    Reads a weather station export in chunks of `chunksize` rows.
+    Only the datetime column and the station columns in `columns` are read.
+
+    Args:
+        csv_path (str): path to the station export.
+        columns (Dict[str, str]): station column names, mapped to the names in the weather files.
+        datetime_column (str): name of the column with the timestamps.
+        datetime_format (str): format of the timestamps, parsed by `pd.to_datetime`.
+        chunksize (int): number of rows per chunk.
+
+    Yields:
+        pd.DataFrame: the renamed columns of the chunk, indexed by the timestamps.
+    """
+    wanted = set(columns) | {datetime_column}
+    reader = pd.read_csv(csv_path, usecols=lambda name: name.strip() in wanted, dtype=str, chunksize=chunksize)
+    for chunk in reader:
+        chunk.columns = [name.strip() for name in chunk.columns]
+        missing = wanted - set(chunk.columns)
+        if missing:
+            raise KeyError(f"Columns {sorted(missing)} do not exist in {csv_path}.")
+
+        time = pd.to_datetime(chunk[datetime_column], format=datetime_format, errors="coerce")
+        if time.isna().any():
+            invalid = chunk.loc[time.isna(), datetime_column]
+            raise ValueError(f"Invalid timestamps in column '{datetime_column}', e.g., {invalid.iloc[0]!r} in row {invalid.index[0]}.")
+
+        values = pd.DataFrame(
+            {name: pd.to_numeric(chunk[station_name], errors="coerce").to_numpy() for station_name, name in columns.items()},
+            index=pd.DatetimeIndex(time),
+        )
+        yield values
+
+
+def detect_gaps(seconds: np.ndarray, start: float, end: float, max_gap: float) -> List[tuple]:
+    """
+    Finds the intervals without measurements that are longer than `max_gap` seconds,
+    including the intervals before the first and after the last measurement.
+
+    Returns:
+        List[tuple]: (start, end) in seconds of every gap.
+    """
+    edges = np.concatenate([[min(start, seconds[0])], seconds, [max(end, seconds[-1])]])
+    idx = np.flatnonzero(np.diff(edges) > max_gap)
+    return [(edges[i], edges[i+1]) for i in idx]
+
+
+def resample_year(
+    frame: pd.DataFrame,
+    year: int,
+    sample_period: float = 300.,
+    max_gap: float = 3600.,
+) -> tuple:
+    """
+    Resamples the measurements of a year to a constant sample period with PCHIP interpolation,
+    column by column on the rows with a valid measurement. Measurements of the neighbouring years
+    in `frame` are used for the interpolation at the start and end of the year.
+    Before the first and after the last measurement the values are held constant.
+
+    Args:
+        frame (pd.DataFrame): measurements, indexed by their timestamps.
+        year (int): the year to resample.
+        sample_period (float): [s] sample period of the weather file.
+        max_gap (float): [s] intervals without measurements longer than this are reported as gaps.
+
+    Returns:
+        time (np.ndarray): [s] time since the start of the year.
+        values (Dict[str, np.ndarray]): resampled columns.
+        gaps (List[dict]): the gaps of every column.
+    """
+    seconds = (frame.index - pd.Timestamp(year, 1, 1)).total_seconds().to_numpy()
+    order = np.argsort(seconds, kind="stable")
+    seconds = seconds[order]
+    unique = np.concatenate([[True], np.diff(seconds) > 0])
+
+    n_days = 366 if pd.Timestamp(year, 1, 1).is_leap_year else 365
+    time = np.arange(0., n_days*86400, sample_period)
+    values = {}
+    gaps = []
+    for name in frame.columns:
+        y = frame[name].to_numpy()[order]
+        valid = unique & ~np.isnan(y)
+        if valid.sum() < 2:
+            raise ValueError(f"Less than two measurements of '{name}' in {year}.")
+        t, y = seconds[valid], y[valid]
+        resampled = PchipInterpolator(t, y, extrapolate=False)(time)
+        resampled[time < t[0]] = y[0]
+        resampled[time > t[-1]] = y[-1]
+        values[name] = resampled
+        for start, end in detect_gaps(t, time[0], time[-1], max_gap):
+            gaps.append({"year": year, "column": name, "start": start, "end": end, "hours": (end - start) / 3600})
+    return time, values, gaps
+
+
+def to_weather_layout(time: np.ndarray, values: Dict[str, np.ndarray], sky_offset: float = 5.) -> pd.DataFrame:
+    """
+    Converts resampled measurements to the layout of the weather files read by `load_weather_data`.
+    Without measured sky temperature it is approximated as the air temperature minus `sky_offset`.
+    """
+    weather = pd.DataFrame({"time": time})
+    for name in ["global radiation", "wind speed", "air temperature", "RH"]:
+        weather[name] = values[name]
+    if "sky temperature" in values:
+        weather["sky temperature"] = values["sky temperature"]
+    else:
+        weather["sky temperature"] = values["air temperature"] - sky_offset
+    weather["global radiation"] = np.maximum(weather["global radiation"], 0.)
+    weather["wind speed"] = np.maximum(weather["wind speed"], 0.)
+    weather["RH"] = np.clip(weather["RH"], 0., 100.)
+    weather["??"] = 0.
+    weather["CO2 concentration"] = 400.
+    weather["day number"] = time / 86400
+    return weather[WEATHER_COLUMNS]
+
+
+def clean_station_csv(
+    csv_path: str,
+    output_dir: str,
+    location: str,
+    columns: Dict[str, str] = STATION_COLUMNS,
+    datetime_column: str = "Datetime",
+    datetime_format: str = "%Y-%m-%d %H:%M:%S",
+    sample_period: float = 300.,
+    max_gap: float = 3600.,
+    sky_offset: float = 5.,
+    years: Optional[List[int]] = None,
+    chunksize: int = 500_000,
+) -> pd.DataFrame:
+    """
+    Converts a (multi-year) weather station export into the weather files of the simulator,
+    `<output_dir>/<location>/<year>.csv`, with a constant sample period.
+
+    The export is streamed in chunks and must be sorted by time; a year is resampled and written
+    as soon as the first measurement of a later year is read. Hence, only about one year of
+    measurements is kept in memory.
+
+    Args:
+        csv_path (str): path to the station export.
+        output_dir (str): root directory of the weather data, e.g., gl_gym/environments/weather.
+        location (str): name of the location folder.
+        columns (Dict[str, str]): station column names, mapped to the names in the weather files.
+        datetime_column (str): name of the column with the timestamps.
+        datetime_format (str): format of the timestamps.
+        sample_period (float): [s] sample period of the weather files.
+        max_gap (float): [s] intervals without measurements longer than this are reported as gaps.
+        sky_offset (float): [°C] sky temperature below the air temperature, if it is not measured.
+        years (List[int], optional): only write these years. Defaults to all years in the export.
+        chunksize (int): number of rows that are read at once.
+
+    Returns:
+        pd.DataFrame: the gaps of every year and column.
+    """
+    os.makedirs(join(output_dir, location), exist_ok=True)
+    pending = {}
+    finished = set()
+    previous_tail = None
+    all_gaps = []
+
+    def finish(year):
+        nonlocal previous_tail
+        frame = pd.concat(pending.pop(year))
+        context = [frame]
+        if previous_tail is not None:
+            context.insert(0, previous_tail)
+        if year+1 in pending:
+            context.append(pending[year+1][0].iloc[:2])
+        # measurements that continue over the year boundary, for the interpolation of the next year
+        previous_tail = frame.iloc[-2:]
+        finished.add(year)
+        if years is not None and year not in years:
+            return
+        time, values, gaps = resample_year(pd.concat(context), year, sample_period, max_gap)
+        to_weather_layout(time, values, sky_offset).to_csv(join(output_dir, location, f"{year}.csv"), index=False)
+        all_gaps.extend(gaps)
+        print(f"{location}/{year}.csv: {len(frame)} measurements, {len(gaps)} gaps longer than {max_gap:.0f}s")
+
+    for chunk in read_station_chunks(csv_path, columns, datetime_column, datetime_format, chunksize):
+        for year, frame in chunk.groupby(chunk.index.year):
+            if year in finished:
+                raise ValueError(f"The measurements in {csv_path} are not sorted by time, {year} continues after a later year.")
+            pending.setdefault(year, []).append(frame)
+        latest = max(pending)
+        for year in sorted(pending):
+            if year < latest:
+                finish(year)
+    for year in sorted(pending):
+        finish(year)
+
+    return pd.DataFrame(all_gaps, columns=["year", "column", "start", "end", "hours"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a weather station export into the simulator's weather files.")
+    parser.add_argument("csv_path", type=str, help="Path to the station export")
+    parser.add_argument("--location", type=str, required=True, help="Name of the location folder")
+    parser.add_argument("--output_dir", type=str, default="gl_gym/environments/weather", help="Root directory of the weather data")
+    parser.add_argument("--datetime_column", type=str, default="Datetime", help="Column with the timestamps")
+    parser.add_argument("--datetime_format", type=str, default="%Y-%m-%d %H:%M:%S", help="Format of the timestamps")
+    parser.add_argument("--radiation", type=str, default="External Total Solar Radiation", help="Column with the global radiation [W/m2]")
+    parser.add_argument("--temperature", type=str, default="External Temperature", help="Column with the air temperature [°C]")
+    parser.add_argument("--rh", type=str, default="External Relative Humidity (RH)", help="Column with the relative humidity [%%]")
+    parser.add_argument("--wind", type=str, default="Wind Speed", help="Column with the wind speed [m/s]")
+    parser.add_argument("--sky", type=str, default=None, help="Column with the sky temperature [°C], if measured")
+    parser.add_argument("--sky_offset", type=float, default=5., help="Sky temperature below the air temperature, if not measured")
+    parser.add_argument("--sample_period", type=float, default=300., help="[s] sample period of the weather files")
+    parser.add_argument("--max_gap", type=float, default=3600., help="[s] report intervals without measurements longer than this")
+    parser.add_argument("--years", type=int, nargs="+", default=None, help="Only write these years")
+    parser.add_argument("--chunksize", type=int, default=500_000, help="Number of rows that are read at once")
+    args = parser.parse_args()
+
+    columns = {
+        args.radiation: "global radiation",
+        args.temperature: "air temperature",
+        args.rh: "RH",
+        args.wind: "wind speed",
+    }
+    if args.sky is not None:
+        columns[args.sky] = "sky temperature"
+
+    gaps = clean_station_csv(
+        args.csv_path, args.output_dir, args.location, columns, args.datetime_column, args.datetime_format,
+        args.sample_period, args.max_gap, args.sky_offset, args.years, args.chunksize,
+    )
+    if len(gaps):
+        gaps_path = join(args.output_dir, args.location, "gaps.csv")
+        gaps.to_csv(gaps_path, index=False)
+        print(f"{len(gaps)} gaps were interpolated, see {gaps_path}")
@@ -0,0 +1,162 @@
+import os
+import hashlib
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# columns of which the episode totals are summarised, Penalty is the sum of the violations
+SUMMED_COLUMNS = [
+    "cFruit", "Rewards", "EPI", "Revenue", "Heat costs", "CO2 costs", "Elec costs",
+    "temp_violation", "co2_violation", "rh_violation", "Penalty",
+]
+VIOLATION_COLUMNS = ["temp_violation", "co2_violation", "rh_violation"]
+
+# statistics over the episodes of the totals and of the cumulative curves
+QUANTILES = (0.05, 0.5, 0.95)
+STATS = ["mean", "std"] + [f"q{q:g}" for q in QUANTILES]
+
+
+def file_sha1(path: str, chunk_size: int = 1 << 20) -> str:
+    """Content hash of a results file."""
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def summary_path(results_path: str) -> str:
+    """The summary file that is stored alongside a results file, `<name>.summary.npz`."""
+    return os.path.splitext(results_path)[0] + ".summary.npz"
+
+
+def _stats(values: np.ndarray) -> np.ndarray:
+    """(len(STATS), ...) statistics over the first axis, ignoring the NaN padding of shorter episodes."""
+    quantile = np.nanquantile if np.isnan(values).any() else np.quantile
+    std = np.nanstd(values, axis=0, ddof=1) if len(values) > 1 else np.full(values.shape[1:], np.nan)
+    return np.concatenate([
+        np.nanmean(values, axis=0)[None],
+        std[None],
+        quantile(values, QUANTILES, axis=0),
+    ])
+
+
+class EpisodeAggregator:
+    """
+    Incremental summaries of an evaluation: the totals and the cumulative curves of `SUMMED_COLUMNS` are
+    computed per episode as the simulations finish, the statistics over the episodes are computed from these.
+    The summaries are saved alongside the results file with its content hash (see `summary_path`),
+    such that the result index and the plots only read the raw results of new or changed files.
+    """
+    def __init__(self) -> None:
+        self.metrics: Optional[List[str]] = None
+        self.episodes: List[int] = []
+        self.n_steps = 0
+        self._totals: List[np.ndarray] = []
+        self._curves: List[np.ndarray] = []
+        # statistics of the curves, for summaries that were loaded from file
+        self._curve_stats: Optional[np.ndarray] = None
+        self.sha1: Optional[str] = None
+
+    def add(self, data: np.ndarray, columns: Sequence[str], episode: Optional[int] = None) -> None:
+        """
+        Adds the results of a single episode.
+
+        Args:
+            data (np.ndarray): (n_steps, n_columns) results of the episode.
+            columns (Sequence[str]): the column names of the results.
+            episode (int, optional): episode number. Defaults to the number of added episodes.
+        """
+        if len(self._curves) != len(self._totals):
+            raise ValueError("Episodes cannot be added to summaries that were loaded from file.")
+        df = pd.DataFrame(np.asarray(data), columns=list(columns))
+        if all(col in df.columns for col in VIOLATION_COLUMNS):
+            df["Penalty"] = df[VIOLATION_COLUMNS].sum(axis=1)
+        metrics = [col for col in SUMMED_COLUMNS if col in df.columns]
+        if self.metrics is None:
+            self.metrics = metrics
+        elif metrics != self.metrics:
+            raise ValueError(f"The episode has the metrics {metrics}, instead of {self.metrics}.")
+        values = df[self.metrics].to_numpy(dtype=float)
+        curves = np.cumsum(values, axis=0)
+        self._totals.append(curves[-1] if len(curves) else np.zeros(len(self.metrics)))
+        self._curves.append(curves.T)
+        self.episodes.append(len(self.episodes) if episode is None else int(episode))
+        self.n_steps += len(values)
+        self._curve_stats = None
+
+    @classmethod
+    def from_results(cls, df: pd.DataFrame) -> "EpisodeAggregator":
+        """Summaries of a complete results file, episodes by the `episode` column."""
+        aggregator = cls()
+        if "episode" not in df.columns:
+            aggregator.add(df.to_numpy(), df.columns)
+            return aggregator
+        for episode, episode_df in df.groupby("episode", sort=False):
+            aggregator.add(episode_df.to_numpy(), df.columns, episode=episode)
+        return aggregator
+
+    @property
+    def n_episodes(self) -> int:
+        return len(self.episodes)
+
+    def totals(self) -> pd.DataFrame:
+        """(n_episodes, n_metrics) totals of the episodes."""
+        return pd.DataFrame(np.array(self._totals).reshape(-1, len(self.metrics or [])),
+                            index=pd.Index(self.episodes, name="episode"), columns=self.metrics)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per metric the statistics of `STATS` over the episode totals and the number of episodes."""
+        stats = _stats(np.array(self._totals).reshape(-1, len(self.metrics)))
+        return {
+            metric: {**{stat: float(stats[i, j]) for i, stat in enumerate(STATS)}, "n": self.n_episodes}
+            for j, metric in enumerate(self.metrics)
+        }
+
+    def curve_stats(self) -> np.ndarray:
+        """(n_metrics, len(STATS), n_steps) statistics over the episodes of the cumulative curves."""
+        if self._curve_stats is None:
+            n_steps = max(curve.shape[1] for curve in self._curves)
+            # episodes that ended early are padded with NaN
+            curves = np.full((self.n_episodes, len(self.metrics), n_steps), np.nan)
+            for i, curve in enumerate(self._curves):
+                curves[i, :, :curve.shape[1]] = curve
+            self._curve_stats = _stats(curves).transpose(1, 0, 2)
+        return self._curve_stats
+
+    def curves(self) -> Dict[str, pd.DataFrame]:
+        """Per metric a (n_steps, len(STATS)) frame of the statistics of the cumulative curves."""
+        stats = self.curve_stats()
+        return {metric: pd.DataFrame(stats[j].T, columns=STATS) for j, metric in enumerate(self.metrics)}
+
+    def save(self, path: str, sha1: str) -> None:
+        """Saves the summaries of the results file with content hash `sha1`."""
+        self.sha1 = sha1
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                sha1=np.array(sha1),
+                metrics=np.array(self.metrics),
+                episodes=np.array(self.episodes),
+                n_steps=np.array(self.n_steps),
+                totals=np.array(self._totals).reshape(-1, len(self.metrics)),
+                curve_stats=self.curve_stats().astype(np.float32),
+            )
+
+    @classmethod
+    def load(cls, path: str, sha1: Optional[str] = None) -> Optional["EpisodeAggregator"]:
+        """Loads saved summaries, None if these do not exist or belong to another version of the results (`sha1`)."""
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            if sha1 is not None and str(data["sha1"]) != sha1:
+                return None
+            aggregator = cls()
+            aggregator.sha1 = str(data["sha1"])
+            aggregator.metrics = [str(metric) for metric in data["metrics"]]
+            aggregator.episodes = [int(episode) for episode in data["episodes"]]
+            aggregator.n_steps = int(data["n_steps"])
+            aggregator._totals = list(data["totals"])
+            aggregator._curve_stats = data["curve_stats"].astype(float)
+        return aggregator
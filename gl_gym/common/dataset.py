@@ -0,0 +1,182 @@
+import os
+import json
+from os.path import join
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+# cost terms that are stored next to each transition, keys of the env info dict
+COST_KEYS = [
+    "EPI",
+    "revenue",
+    "variable_costs",
+    "fixed_costs",
+    "co2_cost",
+    "heat_cost",
+    "elec_cost",
+    "temp_violation",
+    "co2_violation",
+    "rh_violation",
+    "lamp_violation",
+]
+
+FIELDS = ["obs", "actions", "rewards", "next_obs", "dones", "costs"]
+
+
+def control_to_action(u: np.ndarray, u_prev: np.ndarray, delta_u_max: np.ndarray) -> np.ndarray:
+    """
+    Converts an absolute control input to the normalised action of the environment,
+    i.e., the inverse of `TomatoEnv.action_to_control`.
+    Changes larger than `delta_u_max` are clipped to [-1, 1].
+    """
+    return np.clip((u - u_prev) / delta_u_max, -1, 1).astype(np.float32)
+
+
+class EpisodeBuffer:
+    """
+    Collects the transitions of a single episode in memory before they are written as a dataset chunk.
+    """
+    def __init__(self):
+        self.data = {field: [] for field in FIELDS}
+
+    def add(self, obs, action, reward, next_obs, done, info):
+        self.data["obs"].append(np.asarray(obs, dtype=np.float32))
+        self.data["actions"].append(np.asarray(action, dtype=np.float32))
+        self.data["rewards"].append(np.float32(reward))
+        self.data["next_obs"].append(np.asarray(next_obs, dtype=np.float32))
+        self.data["dones"].append(bool(done))
+        self.data["costs"].append(np.array([info[key] for key in COST_KEYS], dtype=np.float32))
+
+    def __len__(self):
+        return len(self.data["rewards"])
+
+    def save(self, path: str) -> int:
+        """Writes every field as a separate .npy file, so it can be memory-mapped. Returns the chunk length."""
+        os.makedirs(path, exist_ok=True)
+        for field, values in self.data.items():
+            np.save(join(path, f"{field}.npy"), np.stack(values) if field != "dones" else np.array(values))
+        return len(self)
+
+
+def write_index(dataset_dir: str, chunks: List[Dict[str, Any]], metadata: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Writes the index of a dataset. Chunks that are already listed in an existing index are kept,
+    so a dataset can be extended by consecutive generation runs.
+
+    Args:
+        dataset_dir (str): directory of the dataset
+        chunks (list): dicts with at least the `name` and `length` of each chunk
+        metadata (dict): information about how the data was generated
+    """
+    index_file = join(dataset_dir, "index.json")
+    index = {"fields": FIELDS, "cost_keys": COST_KEYS, "metadata": {}, "chunks": []}
+    if os.path.exists(index_file):
+        with open(index_file, "r") as f:
+            index = json.load(f)
+    known = {chunk["name"] for chunk in index["chunks"]}
+    index["chunks"].extend([chunk for chunk in chunks if chunk["name"] not in known])
+    if metadata is not None:
+        index["metadata"].update(metadata)
+    with open(index_file + ".tmp", "w") as f:
+        json.dump(index, f, indent=2)
+    os.replace(index_file + ".tmp", index_file)
+
+
+class OfflineDataset:
+    """
+    Chunked on-disk dataset of environment transitions.
+    Chunks are memory-mapped, so minibatches are read from disk without loading the full dataset into RAM.
+
+    Layout:
+        <dataset_dir>/index.json
+        <dataset_dir>/<chunk>/{obs,actions,rewards,next_obs,dones,costs}.npy
+
+    Args:
+        dataset_dir (str): directory of the dataset
+    """
+    def __init__(self, dataset_dir: str):
+        self.dataset_dir = dataset_dir
+        with open(join(dataset_dir, "index.json"), "r") as f:
+            self.index = json.load(f)
+        self.cost_keys = self.index["cost_keys"]
+        self.chunks = [
+            {field: np.load(join(dataset_dir, chunk["name"], f"{field}.npy"), mmap_mode="r") for field in FIELDS}
+            for chunk in self.index["chunks"]
+        ]
+        lengths = [chunk["length"] for chunk in self.index["chunks"]]
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def get(self, indices: np.ndarray) -> Dict[str, np.ndarray]:
+        """Gathers the transitions at the given global indices."""
+        indices = np.asarray(indices)
+        chunk_ids = np.searchsorted(self.offsets, indices, side="right") - 1
+        batch = {
+            field: np.empty((len(indices),) + data.shape[1:], dtype=data.dtype)
+            for field, data in self.chunks[0].items()
+        }
+        for chunk_id in np.unique(chunk_ids):
+            mask = chunk_ids == chunk_id
+            local = indices[mask] - self.offsets[chunk_id]
+            for field in FIELDS:
+                batch[field][mask] = self.chunks[chunk_id][field][local]
+        return batch
+
+    def sample(self, batch_size: int, rng: Optional[np.random.Generator] = None) -> Dict[str, np.ndarray]:
+        """Samples a random minibatch of transitions (with replacement)."""
+        rng = rng if rng is not None else np.random.default_rng()
+        return self.get(rng.integers(len(self), size=batch_size))
+
+    def iterate(self, batch_size: int, shuffle: bool = True, rng: Optional[np.random.Generator] = None) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Streams minibatches over a single epoch.
+        Chunks are visited one at a time, which keeps the disk access sequential.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        chunk_order = rng.permutation(len(self.chunks)) if shuffle else np.arange(len(self.chunks))
+        for chunk_id in chunk_order:
+            chunk = self.chunks[chunk_id]
+            n = len(chunk["rewards"])
+            idx = rng.permutation(n) if shuffle else np.arange(n)
+            for start in range(0, n, batch_size):
+                batch_idx = np.sort(idx[start:start+batch_size])
+                yield {field: np.asarray(chunk[field][batch_idx]) for field in FIELDS}
+
+
+def fill_replay_buffer(model, dataset: OfflineDataset, max_transitions: Optional[int] = None, batch_size: int = 10000) -> int:
+    """
+    Prefills the replay buffer of an off-policy SB3 model (e.g., SAC) with offline transitions.
+    The dataset holds unnormalised observations and rewards, like the replay buffer of a
+    model that is trained with VecNormalize.
+
+    Args:
+        model: SB3 off-policy model with a `replay_buffer`
+        dataset (OfflineDataset): dataset to copy from
+        max_transitions (int): maximum number of transitions to add, defaults to the full dataset
+        batch_size (int): number of transitions that are read from disk at once
+    Returns:
+        n_added (int): number of transitions added to the buffer
+    """
+    buffer = model.replay_buffer
+    n_envs = buffer.n_envs
+    n_total = len(dataset) if max_transitions is None else min(len(dataset), max_transitions)
+    n_total -= n_total % n_envs
+    batch_size = max(batch_size - batch_size % n_envs, n_envs)
+
+    n_added = 0
+    for start in range(0, n_total, batch_size):
+        batch = dataset.get(np.arange(start, min(start + batch_size, n_total)))
+        for i in range(0, len(batch["rewards"]), n_envs):
+            sl = slice(i, i + n_envs)
+            buffer.add(
+                batch["obs"][sl],
+                batch["next_obs"][sl],
+                batch["actions"][sl],
+                batch["rewards"][sl],
+                batch["dones"][sl],
+                [{} for _ in range(n_envs)],
+            )
+            n_added += n_envs
+    return n_added
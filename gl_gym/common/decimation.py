@@ -0,0 +1,66 @@
+import numpy as np
+
+def minmax_decimate(x: np.ndarray, y: np.ndarray, n_out: int):
+    """
+    Min-max decimation of a series for display: the series is split into n_out/2 buckets,
+    and the minimum and maximum of every bucket are kept in their original order, such that peaks stay visible.
+
+    Args:
+        x (np.ndarray): (n,) x-values, e.g., the time steps.
+        y (np.ndarray): (n,) y-values.
+        n_out (int): maximum number of points to return.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the decimated x- and y-values.
+    """
+    x, y = np.asarray(x), np.asarray(y, dtype=float)
+    n = len(y)
+    n_buckets = n_out // 2
+    if n <= n_out or n_buckets < 1:
+        return x, y
+    # equal buckets of the leading points, the remainder is added to the last bucket
+    size = n // n_buckets
+    head = y[:size*n_buckets].reshape(n_buckets, size)
+    idx_min = np.nanargmin(head, axis=1) + np.arange(n_buckets)*size
+    idx_max = np.nanargmax(head, axis=1) + np.arange(n_buckets)*size
+    if size*n_buckets < n:
+        tail = y[size*(n_buckets-1):]
+        idx_min[-1] = np.nanargmin(tail) + size*(n_buckets-1)
+        idx_max[-1] = np.nanargmax(tail) + size*(n_buckets-1)
+    idx = np.unique(np.concatenate([idx_min, idx_max, [0, n-1]]))
+    return x[idx], y[idx]
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int):
+    """
+    Largest-Triangle-Three-Buckets downsampling of a series for display.
+    Keeps the first and last point, and from every bucket in between the point that spans the largest triangle
+    with the previously kept point and the mean of the next bucket.
+
+    Args:
+        x (np.ndarray): (n,) x-values, e.g., the time steps.
+        y (np.ndarray): (n,) y-values.
+        n_out (int): number of points to return.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the downsampled x- and y-values.
+    """
+    x, y = np.asarray(x), np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return x, y
+    xf = x.astype(float)
+    # bucket edges of the n-2 points between the first and the last one
+    edges = np.floor(np.linspace(1, n-1, n_out-1)).astype(int)
+    idx = np.empty(n_out, dtype=int)
+    idx[0], idx[-1] = 0, n-1
+    a = 0
+    for i in range(n_out-2):
+        start, stop = edges[i], edges[i+1]
+        if i < n_out-3:
+            next_x, next_y = xf[stop:edges[i+2]].mean(), y[stop:edges[i+2]].mean()
+        else:
+            next_x, next_y = xf[-1], y[-1]
+        area = np.abs((xf[a] - next_x)*(y[start:stop] - y[a]) - (xf[a] - xf[start:stop])*(next_y - y[a]))
+        a = start + int(np.nanargmax(area)) if np.any(np.isfinite(area)) else start
+        idx[i+1] = a
+    return x[idx], y[idx]
@@ -0,0 +1,133 @@
+import os
+import json
+import hashlib
+import tempfile
+from functools import lru_cache
+from glob import glob
+from os.path import join
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from gl_gym.common.aggregation import file_sha1
+
+# parameters that are part of the key through the scenario and uncertainty, or that do not change the evaluation
+SCENARIO_PARAMS = ("eval_options", "uncertainty_scale", "training")
+
+
+def config_sha1(*params: Dict[str, Any]) -> str:
+    """Hash of environment parameters, independent of the order of the keys."""
+    merged = {}
+    for p in params:
+        merged.update({k: v for k, v in p.items() if k not in SCENARIO_PARAMS})
+    return hashlib.sha1(json.dumps(merged, sort_keys=True, default=str).encode()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def code_sha1() -> str:
+    """
+    Hash of the simulation code, the sources of `gl_gym.environments` (environments, rewards, observations and models),
+    such that changes to the simulation invalidate the cached results.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sha1 = hashlib.sha1()
+    for path in sorted(glob(join(root, "environments", "**", "*.py"), recursive=True)):
+        sha1.update(os.path.relpath(path, root).encode())
+        sha1.update(file_sha1(path).encode())
+    return sha1.hexdigest()
+
+
+class EvaluationCache:
+    """
+    Cache of the evaluation results of trained models, a results array per simulation.
+    A simulation is keyed by the content hashes of the model checkpoint and the VecNormalize statistics,
+    the hash of the environment parameters, the hash of the simulation code (see `code_sha1`),
+    the scenario (growth year, start day and location), the uncertainty scale and the seed.
+    Retraining a model, changing the environment config or changing the environment code thus results in new keys.
+    Changes outside of `gl_gym.environments`, e.g., to the evaluation loop or installed packages, are not detected,
+    evaluate with `--no_cache` after those.
+    Results are written atomically, such that parallel evaluations can share the cache.
+
+    Args:
+        root (str): the cache directory. Defaults to `data/.eval_cache`.
+    """
+    def __init__(self, root: str = join("data", ".eval_cache")):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        # file hashes by (path, size, mtime), models are hashed once for all their seeds and scenarios
+        self._file_hashes: Dict[Tuple[str, int, float], str] = {}
+
+    def _file_sha1(self, path: str) -> str:
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+        if key not in self._file_hashes:
+            self._file_hashes[key] = file_sha1(path)
+        return self._file_hashes[key]
+
+    def key(
+        self,
+        model_path: str,
+        vecnormalize_path: str,
+        env_params: Sequence[Dict[str, Any]],
+        growth_year: int,
+        start_day: int,
+        location: str,
+        uncertainty: float,
+        seed: int,
+    ) -> str:
+        """
+        The key of a simulation.
+
+        Args:
+            model_path (str): the model checkpoint, e.g., `best_model.zip`.
+            vecnormalize_path (str): the VecNormalize statistics, e.g., `best_vecnormalize.pkl`.
+            env_params (Sequence[Dict]): the base and specific environment parameters.
+            growth_year (int), start_day (int), location (str): the scenario.
+            uncertainty (float): the parametric uncertainty scale.
+            seed (int): the seed of the simulation.
+        """
+        fields = {
+            "model": self._file_sha1(model_path),
+            "vecnormalize": self._file_sha1(vecnormalize_path),
+            "env": config_sha1(*env_params),
+            "code": code_sha1(),
+            "growth_year": int(growth_year),
+            "start_day": int(start_day),
+            "location": str(location),
+            "uncertainty": float(uncertainty),
+            "seed": int(seed),
+        }
+        return hashlib.sha1(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+
+    def path(self, key: str) -> str:
+        return join(self.root, key[:2], f"{key}.npz")
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, List[str]]]:
+        """The results and column names of a simulation, None if it is not cached."""
+        try:
+            with np.load(self.path(key)) as data:
+                return data["data"], [str(column) for column in data["columns"]]
+        except (FileNotFoundError, ValueError, EOFError, KeyError):
+            # missing, or a file of which the write was interrupted
+            return None
+
+    def put(self, key: str, data: np.ndarray, columns: Sequence[str], **metadata: Any) -> None:
+        """Stores the results of a simulation, with metadata such as the model name for inspection."""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(
+                    f,
+                    data=np.asarray(data),
+                    columns=np.array(list(columns)),
+                    metadata=np.array(json.dumps(metadata, default=str)),
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
@@ -0,0 +1,268 @@
+import os
+import re
+import json
+import sqlite3
+from os.path import join
+from typing import Any, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from gl_gym.common.aggregation import QUANTILES, STATS, EpisodeAggregator, file_sha1, summary_path
+from gl_gym.common.results import read_results
+
+# <project>/<mode>/<algorithm>/[<uncertainty>/]<model>-<growth_year><start_day>-<location>.csv
+RESULT_PATTERN = re.compile(
+    r"(?P<project>[^/]+)/(?P<mode>[^/]+)/(?P<algorithm>[^/]+)/(?:(?P<uncertainty>[0-9.]+)/)?"
+    r"(?P<model>.+)-(?P<growth_year>\d{4})(?P<start_day>\d+)-(?P<location>[^/]+)\.(?:csv|parquet|feather)"
+)
+
+FILE_FIELDS = [
+    "path", "project", "mode", "algorithm", "model", "growth_year", "start_day", "location",
+    "uncertainty", "n_episodes", "n_steps", "columns", "size", "mtime", "sha1",
+]
+SUMMARY_FIELDS = STATS + ["n"]
+# the quantiles, e.g., q0.05, are quoted in SQL
+SUMMARY_COLUMNS = ", ".join(f'"{field}"' for field in SUMMARY_FIELDS)
+
+
+class ResultIndex:
+    """
+    SQLite index of the evaluation results under a data directory, `data/<project>/<mode>/<algorithm>/...`.
+    Records per results file the model, growth year, start day, location and uncertainty,
+    and the statistics of the episode totals (`EpisodeAggregator`), such that plots can select files and
+    plot summary metrics without listing directories or reading the raw trajectories.
+    The evaluation scripts register their results, `scan` indexes files that were saved before.
+    The summaries are stored alongside the results files with the content hash of the results,
+    such that only new or changed results files are read.
+    Each call opens its own connection, so parallel evaluations can share the index.
+
+    Args:
+        root (str): data directory, paths in the index are relative to it.
+        path (str, optional): the index file. Defaults to `<root>/.result_index.sqlite`.
+    """
+    INDEX_FILE = ".result_index.sqlite"
+
+    def __init__(self, root: str = "data", path: Optional[str] = None, timeout: float = 60.):
+        self.root = root
+        self.path = path or join(root, self.INDEX_FILE)
+        self.timeout = timeout
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, "
+                "project TEXT, "
+                "mode TEXT, "
+                "algorithm TEXT, "
+                "model TEXT, "
+                "growth_year INTEGER, "
+                "start_day INTEGER, "
+                "location TEXT, "
+                "uncertainty REAL, "
+                "n_episodes INTEGER, "
+                "n_steps INTEGER, "
+                "columns TEXT, "
+                "size INTEGER, "
+                "mtime REAL, "
+                "sha1 TEXT)"
+            )
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "path TEXT NOT NULL, "
+                "metric TEXT NOT NULL, "
+                + "".join(f'"{stat}" REAL, ' for stat in STATS) +
+                "n INTEGER, "
+                "PRIMARY KEY (path, metric))"
+            )
+            # indexes of before the content hashes and quantiles were stored
+            for table, columns in [("files", ["sha1"]), ("summaries", STATS)]:
+                existing = {row[1] for row in con.execute(f"PRAGMA table_info({table})")}
+                for column in columns:
+                    if column not in existing:
+                        con.execute(f'ALTER TABLE {table} ADD COLUMN "{column}" {"TEXT" if column == "sha1" else "REAL"}')
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=self.timeout)
+
+    def _relpath(self, path: str) -> str:
+        return os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    def register(
+        self,
+        path: str,
+        df: Optional[pd.DataFrame] = None,
+        aggregator: Optional[EpisodeAggregator] = None,
+        **metadata: Any,
+    ) -> EpisodeAggregator:
+        """
+        Adds or updates a results file in the index.
+        The summaries are taken from `aggregator`, from the summary file if it matches the content of the results,
+        or are computed from the results, and are saved alongside the results.
+
+        Args:
+            path (str): the results file.
+            df (pd.DataFrame, optional): the results, to avoid reading the file again.
+            aggregator (EpisodeAggregator, optional): the summaries of the results, e.g., aggregated during the evaluation.
+            **metadata: project, mode, algorithm, model, growth_year, start_day, location and uncertainty.
+                Missing fields are parsed from the path.
+
+        Returns:
+            EpisodeAggregator: the summaries of the results.
+        """
+        rel = self._relpath(path)
+        match = RESULT_PATTERN.fullmatch(rel)
+        fields = {k: v for k, v in match.groupdict().items()} if match else {}
+        fields.update({k: v for k, v in metadata.items() if v is not None})
+        unknown = set(fields) - set(FILE_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown result metadata: {sorted(unknown)}")
+
+        sha1 = file_sha1(path)
+        if aggregator is None:
+            aggregator = EpisodeAggregator.load(summary_path(path), sha1)
+        if aggregator is None:
+            if df is None:
+                df = read_results(path)
+            aggregator = EpisodeAggregator.from_results(df)
+        if aggregator.sha1 != sha1:
+            aggregator.save(summary_path(path), sha1)
+        # the header of the results only
+        columns = list(df.columns) if df is not None else list(read_results(path, nrows=0).columns)
+
+        stat = os.stat(path)
+        fields.update({
+            "path": rel,
+            "growth_year": int(fields["growth_year"]) if fields.get("growth_year") is not None else None,
+            "start_day": int(fields["start_day"]) if fields.get("start_day") is not None else None,
+            "uncertainty": float(fields.get("uncertainty") or 0.),
+            "n_episodes": aggregator.n_episodes,
+            "n_steps": aggregator.n_steps,
+            "columns": json.dumps(columns),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sha1": sha1,
+        })
+        summaries = aggregator.summary()
+        with self._connect() as con:
+            con.execute(
+                f"INSERT OR REPLACE INTO files ({', '.join(FILE_FIELDS)}) VALUES ({', '.join('?' * len(FILE_FIELDS))})",
+                [fields.get(name) for name in FILE_FIELDS]
+            )
+            con.execute("DELETE FROM summaries WHERE path = ?", (rel,))
+            con.executemany(
+                f"INSERT INTO summaries (path, metric, {SUMMARY_COLUMNS}) VALUES ({', '.join('?' * (len(SUMMARY_FIELDS) + 2))})",
+                [(rel, metric, *[s[f] for f in SUMMARY_FIELDS]) for metric, s in summaries.items()]
+            )
+        return aggregator
+
+    def scan(self) -> List[str]:
+        """Indexes the results files under the root that are new or changed, and removes deleted files."""
+        with self._connect() as con:
+            known = {row[0]: (row[1], row[2]) for row in con.execute("SELECT path, size, mtime FROM files")}
+        found, updated = set(), []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = join(dirpath, name)
+                rel = self._relpath(path)
+                if RESULT_PATTERN.fullmatch(rel) is None:
+                    continue
+                found.add(rel)
+                stat = os.stat(path)
+                if known.get(rel) != (stat.st_size, stat.st_mtime):
+                    self.register(path)
+                    updated.append(rel)
+        with self._connect() as con:
+            for rel in set(known) - found:
+                con.execute("DELETE FROM files WHERE path = ?", (rel,))
+                con.execute("DELETE FROM summaries WHERE path = ?", (rel,))
+        return updated
+
+    @staticmethod
+    def _where(filters: Dict[str, Any], table: str = "files"):
+        clauses, values = [], []
+        for name, value in filters.items():
+            if name not in FILE_FIELDS:
+                raise ValueError(f"Unknown result field: {name}")
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple, set)):
+                clauses.append(f"{table}.{name} IN ({', '.join('?' * len(value))})")
+                values.extend(value)
+            else:
+                clauses.append(f"{table}.{name} = ?")
+                values.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", values
+
+    def query(self, **filters: Any) -> pd.DataFrame:
+        """
+        The indexed files that match the filters, e.g., `query(mode="stochastic", algorithm=["ppo", "sac"], growth_year=2010)`.
+        A list matches any of its values, None matches all.
+        """
+        where, values = self._where(filters)
+        with self._connect() as con:
+            files = pd.read_sql_query(f"SELECT * FROM files{where} ORDER BY path", con, params=values)
+        files["columns"] = files["columns"].map(json.loads)
+        return files
+
+    def summaries(self, metrics: Optional[Sequence[str]] = None, **filters: Any) -> pd.DataFrame:
+        """
+        The summary metrics of the matching files, a row per file with the columns `<metric> <stat>` for the
+        statistics of the episode totals (`STATS`, and `n` the number of episodes) next to the file fields,
+        such that summary plots do not read the raw results.
+        """
+        where, values = self._where(filters, table="f")
+        with self._connect() as con:
+            long = pd.read_sql_query(
+                f"SELECT s.path, s.metric, {', '.join(f's.{column}' for column in SUMMARY_COLUMNS.split(', '))} "
+                f"FROM summaries s JOIN files f ON s.path = f.path{where}",
+                con, params=values,
+            )
+        if metrics is not None:
+            long = long[long["metric"].isin(metrics)]
+        wide = long.pivot(index="path", columns="metric", values=SUMMARY_FIELDS)
+        wide.columns = [f"{metric} {stat}" for stat, metric in wide.columns]
+        files = self.query(**filters).drop(columns=["columns", "size", "mtime", "sha1"])
+        return files.merge(wide, left_on="path", right_index=True, how="left")
+
+    def summary(self, path: str) -> EpisodeAggregator:
+        """The saved summaries of an indexed results file, e.g., for the statistics of the cumulative curves."""
+        sha1 = self.query(path=path)["sha1"].iloc[0]
+        aggregator = EpisodeAggregator.load(summary_path(join(self.root, path)), sha1)
+        if aggregator is None:
+            aggregator = self.register(join(self.root, path))
+        return aggregator
+
+    def episode_totals(self, metrics: Optional[Sequence[str]] = None, **filters: Any) -> pd.DataFrame:
+        """The totals of every episode of the matching files, from the saved summaries, with the file fields."""
+        files = self.query(**filters).drop(columns=["columns", "size", "mtime", "sha1"])
+        frames = []
+        for _, file in files.iterrows():
+            totals = self.summary(file["path"]).totals()
+            if metrics is not None:
+                totals = totals[[metric for metric in metrics if metric in totals.columns]]
+            frames.append(totals.reset_index().assign(**file.to_dict()))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=list(files.columns))
+
+    def pooled_summaries(
+        self,
+        metrics: Sequence[str],
+        by: Sequence[str] = ("algorithm", "model", "uncertainty"),
+        quantiles: Sequence[float] = QUANTILES,
+        **filters: Any,
+    ) -> pd.DataFrame:
+        """
+        Statistics of the episode totals pooled over the matching files, e.g., per uncertainty over growth years,
+        start days and locations. Computed from the saved summaries, a row per group with `<metric> <stat>` columns.
+        """
+        totals = self.episode_totals(metrics, **filters)
+        grouped = totals.groupby(list(by))[list(metrics)]
+        stats = {"mean": grouped.mean(), "std": grouped.std(), "n": grouped.count()}
+        for q in quantiles:
+            stats[f"q{q:g}"] = grouped.quantile(q)
+        pooled = pd.concat(stats, axis=1)
+        pooled.columns = [f"{metric} {stat}" for stat, metric in pooled.columns]
+        return pooled
+
+    def load(self, path: str, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Reads an indexed results file, only the given columns if these are given."""
+        return read_results(join(self.root, path), columns=columns)
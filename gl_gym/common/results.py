@@ -1,6 +1,14 @@
+import csv
+import os
+import warnings
+from typing import Dict, Optional, Sequence
+
 import pandas as pd
 import numpy as np
 
+# columnar formats of the results, these require pyarrow
+COLUMNAR_FORMATS = {".parquet": "parquet", ".feather": "feather"}
+
 class Results:
     def __init__(self, col_names):
         self.col_names = col_names
@@ -14,4 +22,94 @@ class Results:
         self.df = self.df._append(pd.DataFrame(data=data, columns=self.col_names), ignore_index=True)
 
     def save(self, filename):
-        self.df.to_csv(filename, index=False)
+        """Saves the results as CSV, or in a columnar format for the extensions in COLUMNAR_FORMATS."""
+        fmt = COLUMNAR_FORMATS.get(os.path.splitext(filename)[1])
+        if fmt == "parquet":
+            self.df.to_parquet(filename, index=False)
+        elif fmt == "feather":
+            self.df.to_feather(filename)
+        else:
+            self.df.to_csv(filename, index=False)
+
+def read_results(
+    source,
+    name: str = None,
+    columns: Optional[Sequence[str]] = None,
+    nrows: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Reads a results file, saved by `Results.save`.
+    The delimiter of CSV files (comma, tab or semicolon) is sniffed from the header, such that the fast C parser is used.
+
+    Args:
+        source: path, or a file-like object such as an uploaded file.
+        name (str, optional): file name of a file-like object, to recognise the format. Defaults to `source.name`.
+        columns (Sequence[str], optional): only read these columns.
+        nrows (int, optional): only read the first rows, e.g., 0 for the header.
+    """
+    columns = list(columns) if columns is not None else None
+    name = name or (source if isinstance(source, str) else getattr(source, "name", ""))
+    fmt = COLUMNAR_FORMATS.get(os.path.splitext(str(name))[1])
+    if fmt == "parquet":
+        return pd.read_parquet(source, columns=columns)[:nrows]
+    if fmt == "feather":
+        return pd.read_feather(source, columns=columns)[:nrows]
+
+    if isinstance(source, str):
+        with open(source, newline="") as f:
+            header = f.readline()
+    else:
+        header = source.readline()
+        header = header.decode() if isinstance(header, bytes) else header
+        source.seek(0)
+    try:
+        sep = csv.Sniffer().sniff(header, delimiters=",\t;").delimiter
+    except csv.Error:
+        sep = ","
+    return pd.read_csv(source, sep=sep, usecols=columns, nrows=nrows)
+
+def episode_bands(
+    df: pd.DataFrame,
+    columns: Sequence[str],
+    quantiles: Sequence[float] = (0.05, 0.95),
+    cumulative: bool = False,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Aggregates per-timestep results across the episodes of a results file.
+
+    Args:
+        df (pd.DataFrame): results, with an `episode` column. Without it all rows form a single episode.
+        columns (Sequence[str]): the columns to aggregate, missing columns are skipped.
+        quantiles (Sequence[float]): quantiles of the bands.
+        cumulative (bool): aggregate the cumulative sums of the episodes instead.
+
+    Returns:
+        Dict[str, pd.DataFrame]: per column a frame indexed by the time step of the episode,
+            with the mean and a column per quantile, e.g., `q0.05`.
+    """
+    columns = [col for col in columns if col in df.columns]
+    if "episode" in df.columns:
+        step = df.groupby("episode", sort=False).cumcount().to_numpy()
+        episode = pd.factorize(df["episode"])[0]
+    else:
+        step = np.arange(len(df))
+        episode = np.zeros(len(df), dtype=int)
+    n_steps, n_episodes = step.max() + 1, episode.max() + 1
+
+    bands = {}
+    for col in columns:
+        # (n_steps, n_episodes) array, NaN where an episode is shorter
+        values = np.full((n_steps, n_episodes), np.nan)
+        values[step, episode] = df[col].to_numpy(dtype=float)
+        if cumulative:
+            values = np.cumsum(values, axis=0)
+        with warnings.catch_warnings():
+            # time steps of which all values are NaN
+            warnings.simplefilter("ignore", RuntimeWarning)
+            frame = {"mean": np.nanmean(values, axis=1)}
+            # nanquantile is much slower, it is only needed for unequal episodes or missing values
+            quantile = np.nanquantile if np.isnan(values).any() else np.quantile
+            for q, band in zip(quantiles, quantile(values, quantiles, axis=1)):
+                frame[f"q{q:g}"] = band
+        bands[col] = pd.DataFrame(frame, index=pd.RangeIndex(n_steps, name="timestep"))
+    return bands
@@ -0,0 +1,272 @@
+import os
+import json
+import hashlib
+from os.path import join
+from typing import Dict, Optional
+
+import numpy as np
+from scipy.stats import qmc
+
+from gl_gym.environments.ensemble import EnsembleSimulator, economic_summary
+
+# season outputs on which the sensitivity indices are computed
+OUTPUT_KEYS = ["cFruit", "EPI", "heat_cost", "co2_cost", "elec_cost", "temp_violation", "co2_violation", "rh_violation"]
+
+
+def saltelli_design(n_factors: int, n_samples: int, seed: int = 0):
+    """
+    Base matrices A and B of the Saltelli design, taken from one scrambled Sobol sequence of dimension 2k.
+    The sequence is deterministic for a given seed, so a larger design extends a smaller one.
+
+    Returns:
+        A, B (np.ndarray): (n_samples, n_factors) points in the unit hypercube.
+    """
+    sampler = qmc.Sobol(d=2*n_factors, scramble=True, seed=seed)
+    base = sampler.random(n_samples)
+    return base[:, :n_factors], base[:, n_factors:]
+
+
+def saltelli_points(A: np.ndarray, B: np.ndarray) -> np.ndarray:
+    """
+    Evaluation points of the Saltelli design, grouped per base sample:
+    [A_j, B_j, AB_j^1, ..., AB_j^k], where AB^i equals A with column i taken from B.
+
+    Returns:
+        np.ndarray: (n_samples, k+2, k) points.
+    """
+    n, k = A.shape
+    AB = np.repeat(A[:, None, :], k, axis=1)
+    AB[:, np.arange(k), np.arange(k)] = B
+    return np.concatenate([A[:, None], B[:, None], AB], axis=1)
+
+
+def sobol_indices(y: np.ndarray):
+    """
+    First-order (Saltelli et al., 2010) and total (Jansen, 1999) Sobol indices.
+
+    Args:
+        y (np.ndarray): (n_samples, k+2) model outputs at the points of `saltelli_points`.
+    Returns:
+        S1, ST (np.ndarray): (k,) first-order and total indices.
+    """
+    yA, yB, yAB = y[:, 0], y[:, 1], y[:, 2:]
+    var = np.var(np.concatenate([yA, yB]))
+    if var == 0:
+        return np.zeros(yAB.shape[1]), np.zeros(yAB.shape[1])
+    S1 = np.mean(yB[:, None] * (yAB - yA[:, None]), axis=0) / var
+    ST = 0.5 * np.mean((yA[:, None] - yAB)**2, axis=0) / var
+    return S1, ST
+
+
+def morris_design(n_factors: int, n_trajectories: int, levels: int = 4, seed: int = 0) -> np.ndarray:
+    """
+    One-at-a-time trajectories of the Morris method on a grid with `levels` levels.
+    Trajectories are drawn with a generator per trajectory, so adding trajectories keeps the existing ones.
+
+    Returns:
+        np.ndarray: (n_trajectories, k+1, k) points in the unit hypercube.
+    """
+    delta = levels / (2*(levels-1))
+    grid = np.arange(levels//2) / (levels-1)
+    trajectories = np.empty((n_trajectories, n_factors+1, n_factors))
+    for r in range(n_trajectories):
+        rng = np.random.default_rng([seed, r])
+        x = rng.choice(grid, size=n_factors)
+        trajectories[r, 0] = x
+        for step, i in enumerate(rng.permutation(n_factors)):
+            x = x.copy()
+            x[i] += delta
+            trajectories[r, step+1] = x
+        # mirror the trajectory per factor, such that the steps are also taken downwards
+        flip = rng.random(n_factors) < 0.5
+        trajectories[r][:, flip] = 1 - trajectories[r][:, flip]
+    return trajectories
+
+
+def morris_indices(points: np.ndarray, y: np.ndarray):
+    """
+    Elementary effects statistics of the Morris method.
+
+    Args:
+        points (np.ndarray): (r, k+1, k) trajectories from `morris_design`.
+        y (np.ndarray): (r, k+1) model outputs.
+    Returns:
+        mu_star, sigma (np.ndarray): (k,) mean absolute elementary effect and its standard deviation.
+    """
+    r, _, k = points.shape
+    effects = np.empty((r, k))
+    dx = np.diff(points, axis=1)
+    dy = np.diff(y, axis=1)
+    for t in range(r):
+        factor = np.argmax(np.abs(dx[t]), axis=1)
+        effects[t, factor] = dy[t] / dx[t, np.arange(k), factor]
+    return np.abs(effects).mean(axis=0), effects.std(axis=0)
+
+
+class SensitivityAnalysis:
+    """
+    Global sensitivity analysis of season outputs with respect to a set of model parameters.
+    The design points are evaluated in batches with the `EnsembleSimulator` and cached on disk,
+    such that a larger design only simulates the points that were not evaluated before.
+
+    The parameters are varied uniformly between `bounds`, which default to ±`rel_range` around the
+    nominal parameters of the environment. The simulation starts from the state after `env.reset()`.
+
+    Args:
+        env: the GreenLight environment, reset to the season that is analysed.
+        indices (list): indices of the varied parameters.
+        method (str): `sobol` (Saltelli design) or `morris`.
+        controller: controller that closes the loop, e.g., `RuleBasedController`.
+        controls (np.ndarray): (N, nu) control trajectory if no controller is given (open loop).
+        bounds (np.ndarray): (k, 2) lower and upper bounds of the varied parameters.
+        rel_range (float): relative range around the nominal parameters if no bounds are given.
+        batch_size (int): number of ensemble members that are simulated at once.
+        n_threads (int): number of threads of the ensemble simulator.
+        cache_dir (str): directory of the evaluation cache, None disables caching.
+        seed (int): seed of the design.
+    """
+    def __init__(
+        self,
+        env,
+        indices,
+        method: str = "sobol",
+        controller=None,
+        controls: Optional[np.ndarray] = None,
+        bounds: Optional[np.ndarray] = None,
+        rel_range: float = 0.1,
+        batch_size: int = 64,
+        n_threads: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        seed: int = 0,
+    ):
+        if method not in ["sobol", "morris"]:
+            raise ValueError(f"Unknown sensitivity method {method}, choose from ['sobol', 'morris']")
+        self.env = env
+        self.indices = np.asarray(indices)
+        self.method = method
+        self.controls = controls
+        self.seed = seed
+        nominal = np.asarray(env.p, dtype=float)[self.indices]
+        if bounds is None:
+            bounds = np.column_stack([nominal*(1-rel_range), nominal*(1+rel_range)])
+        self.bounds = np.sort(np.asarray(bounds, dtype=float), axis=1)
+        self.simulator = EnsembleSimulator(env, batch_size, controller, n_threads=n_threads)
+        self.batch_size = batch_size
+
+        self.x0 = np.copy(env.x)
+        self.weather = np.copy(env.weather_data[env.timestep:env.N])
+        self.cache_file = None
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.cache_file = join(cache_dir, f"{self.design_key(controller)}.npz")
+
+    def design_key(self, controller) -> str:
+        """Hash of everything that determines the outputs at a design point."""
+        key = {
+            "method": self.method,
+            "indices": self.indices.tolist(),
+            "bounds": self.bounds.round(12).tolist(),
+            "seed": self.seed,
+            "controller": None if controller is None else type(controller).__name__,
+            "controls": None if self.controls is None else hashlib.sha1(np.ascontiguousarray(self.controls)).hexdigest(),
+        }
+        digest = hashlib.sha1(json.dumps(key, sort_keys=True).encode())
+        digest.update(np.ascontiguousarray(self.env.p, dtype=float).tobytes())
+        digest.update(np.ascontiguousarray(self.env.x, dtype=float).tobytes())
+        digest.update(np.ascontiguousarray(self.env.weather_data[self.env.timestep:self.env.N], dtype=float).tobytes())
+        return f"{self.method}-{digest.hexdigest()[:16]}"
+
+    def design(self, n_samples: int) -> np.ndarray:
+        """
+        Design points in the unit hypercube, grouped per base sample (Sobol) or trajectory (Morris).
+
+        Returns:
+            np.ndarray: (n_samples, points per sample, k) points.
+        """
+        k = len(self.indices)
+        if self.method == "sobol":
+            return saltelli_points(*saltelli_design(k, n_samples, self.seed))
+        return morris_design(k, n_samples, seed=self.seed)
+
+    def _load_cache(self) -> Dict[str, np.ndarray]:
+        if self.cache_file is None or not os.path.exists(self.cache_file):
+            return {}
+        with np.load(self.cache_file) as cache:
+            return {key: cache[key] for key in cache.files}
+
+    def _save_cache(self, outputs: Dict[str, np.ndarray]) -> None:
+        if self.cache_file is None:
+            return
+        tmp_file = self.cache_file + ".tmp.npz"
+        np.savez(tmp_file, **outputs)
+        os.replace(tmp_file, self.cache_file)
+
+    def evaluate(self, points: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Simulates the season at design points in the unit hypercube.
+
+        Args:
+            points (np.ndarray): (n, k) points.
+        Returns:
+            dict: (n,) arrays of the season outputs, keys as in `OUTPUT_KEYS`.
+        """
+        n = len(points)
+        outputs = {key: np.empty(n) for key in OUTPUT_KEYS}
+        lower, upper = self.bounds[:, 0], self.bounds[:, 1]
+        for start in range(0, n, self.batch_size):
+            batch = points[start:start+self.batch_size]
+            params = np.tile(np.asarray(self.env.p, dtype=float), (self.batch_size, 1))
+            params[:len(batch)][:, self.indices] = lower + batch*(upper-lower)
+            if self.controls is None:
+                states, controls = self.simulator.simulate(params, x0=self.x0, weather=self.weather)
+            else:
+                states, controls = self.simulator.simulate(params, x0=self.x0, controls=self.controls, weather=self.weather)
+            summary = economic_summary(self.env, states, controls)
+            summary["cFruit"] = states[:, -1, 25]
+            for key in OUTPUT_KEYS:
+                outputs[key][start:start+len(batch)] = summary[key][:len(batch)]
+        return outputs
+
+    def run(self, n_samples: int) -> Dict[str, np.ndarray]:
+        """
+        Evaluates the design with `n_samples` base samples (Sobol) or trajectories (Morris).
+        Points that are already in the cache are not simulated again.
+
+        Returns:
+            dict: (n_samples, points per sample) arrays of the season outputs.
+        """
+        design = self.design(n_samples)
+        n_points = design.shape[1]
+        cached = self._load_cache()
+        n_cached = min(len(cached.get("points", [])), n_samples)
+        if n_cached > 0 and not np.allclose(cached["points"][:n_cached], design[:n_cached]):
+            raise ValueError(f"Cache {self.cache_file} does not match the design")
+
+        if n_cached < n_samples:
+            new = self.evaluate(design[n_cached:].reshape(-1, len(self.indices)))
+            new = {key: value.reshape(-1, n_points) for key, value in new.items()}
+            if n_cached > 0:
+                new = {key: np.concatenate([cached[key][:n_cached], new[key]]) for key in OUTPUT_KEYS}
+            self._save_cache({"points": design, **new})
+            outputs = new
+        else:
+            outputs = {key: cached[key][:n_samples] for key in OUTPUT_KEYS}
+        return outputs
+
+    def analyse(self, n_samples: int) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        Computes the sensitivity indices of every season output.
+
+        Returns:
+            dict: per output key, `S1` and `ST` (Sobol) or `mu_star` and `sigma` (Morris), (k,) arrays.
+        """
+        outputs = self.run(n_samples)
+        results = {}
+        for key in OUTPUT_KEYS:
+            if self.method == "sobol":
+                S1, ST = sobol_indices(outputs[key])
+                results[key] = {"S1": S1, "ST": ST}
+            else:
+                mu_star, sigma = morris_indices(self.design(n_samples), outputs[key])
+                results[key] = {"mu_star": mu_star, "sigma": sigma}
+        return results
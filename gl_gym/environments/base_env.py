@@ -30,6 +30,7 @@ class GreenLightEnv(gym.Env):
         end_train_day (int, optional): end day for training. Defaults to 284.
         reward_function (str, optional): reward function to use. Defaults to "None".
         training (bool, optional): whether we are training or testing. Defaults to True.
+        action_repeat (int, optional): number of time steps dt an action is applied for. Defaults to 1.
         options (Dict[str, Any], optional): options for the GreenLight model. Defaults to {}.
     """
     # gl_model: GreenLight
@@ -55,6 +56,7 @@ class GreenLightEnv(gym.Env):
         start_train_day: int = 265, 	# start day of the year for training
         end_train_day: int = 284,       # end day of the year for training
         training: bool = True,          # whether we are training or testing
+        action_repeat: int = 1,         # number of time steps dt per action
     ) -> None:
         super(GreenLightEnv, self).__init__()
 
@@ -79,6 +81,9 @@ class GreenLightEnv(gym.Env):
 
         self.training = training
         self.eval_idx = 0
+        if action_repeat < 1:
+            raise ValueError(f"action_repeat must be a positive integer, got {action_repeat}.")
+        self.action_repeat = int(action_repeat)
 
         self.season_length = season_length
         self.N = int(self.season_length * self.c/self.dt)
@@ -159,6 +164,98 @@ class GreenLightEnv(gym.Env):
     def increase_eval_idx(self):
         self.eval_idx += 1
 
+    def reconfigure(
+        self,
+        env_specific_params: Optional[Dict[str, Any]] = None,
+        base_env_params: Optional[Dict[str, Any]] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        """
+        Re-parameterize the environment in place, e.g., between experiments that share env workers.
+        Only parameters that do not change the model or the observation space can be updated.
+        The parameters that are shared by the environments are updated here,
+        the parameters of a specific environment in its `_reconfigure_env`.
+        Takes effect at the next reset.
+
+        Args:
+            env_specific_params (Dict[str, Any], optional): (partial) parameters of the specific environment.
+            base_env_params (Dict[str, Any], optional): (partial) GreenLightEnv parameters.
+            seed (int, optional): new seed for the random number generator of the environment.
+        """
+        params = dict(base_env_params or {})
+        for name in ("num_params", "nx", "nu", "nd", "dt", "pred_horizon", "action_repeat"):
+            if name in params and params.pop(name) != getattr(self, name):
+                raise ValueError(f"Cannot reconfigure {name}, a new environment is required.")
+
+        if "weather_data_dir" in params:
+            self.weather_data_dir = params.pop("weather_data_dir")
+        if "location" in params:
+            self.location = params.pop("location")
+        if "u_min" in params:
+            self.u_min = np.array(params.pop("u_min"), dtype=np.float32)
+        if "u_max" in params:
+            self.u_max = np.array(params.pop("u_max"), dtype=np.float32)
+        if "delta_u_max" in params:
+            self.delta_u_max = np.ones(self.nu, dtype=np.float32) * params.pop("delta_u_max")
+        if "season_length" in params:
+            self.season_length = params.pop("season_length")
+            self.N = int(self.season_length * self.c/self.dt)
+        if "training" in params:
+            self.training = params.pop("training")
+
+        start_year = params.pop("start_train_year", self.train_years[0])
+        end_year = params.pop("end_train_year", self.train_years[-1])
+        self.train_years = list(range(start_year, end_year+1))
+        start_day = params.pop("start_train_day", self.train_days[0])
+        end_day = params.pop("end_train_day", self.train_days[-1])
+        self.train_days = list(range(start_day, end_day+1))
+
+        if params:
+            raise ValueError(f"Unknown environment parameters: {list(params.keys())}")
+
+        params = dict(env_specific_params or {})
+        observation_modules = params.pop("observation_modules", None)
+        if observation_modules is not None and \
+                list(observation_modules) != [type(module).__name__ for module in self.observation_modules]:
+            raise ValueError("Cannot reconfigure observation_modules, a new environment is required.")
+        self._reconfigure_env(params)
+
+        if "uncertainty_scale" in params:
+            self.uncertainty_scale = params.pop("uncertainty_scale")
+        if "eval_options" in params:
+            self.eval_options = params.pop("eval_options")
+        if "constraints" in params:
+            constraints = params.pop("constraints")
+            self.constraints_low = np.array([
+                constraints["co2_min"],
+                constraints["temp_min"],
+                constraints["rh_min"],
+            ])
+            self.constraints_high = np.array([
+                constraints["co2_max"],
+                constraints["temp_max"],
+                constraints["rh_max"],
+            ])
+
+        reward_function = params.pop("reward_function", type(self.reward).__name__)
+        reward_params = params.pop("reward_params", None)
+        if reward_params is not None or reward_function != type(self.reward).__name__:
+            self.reward = self._init_rewards(reward_function, reward_params or {})
+
+        if params:
+            raise ValueError(f"Unknown environment parameters: {list(params.keys())}")
+
+        if seed is not None:
+            self.set_seed(seed)
+        self._reset_eval_idx()
+
+    def _reconfigure_env(self, params: Dict[str, Any]) -> None:
+        """
+        Updates the parameters of the specific environment, popping them from `params`.
+        Called by `reconfigure` before the shared parameters are updated.
+        """
+        pass
+
     def set_seed(self, seed):
         """
         Seed the environment.
@@ -1,4 +1,5 @@
 import numpy as np
+import casadi as ca
 from gl_gym.environments.utils import co2dens2ppm, satVp
 
 class RuleBasedController:
@@ -67,14 +68,42 @@ class RuleBasedController:
     
     def predict(self, x, d, env):
         u = np.zeros(env.nu)
+        u[:6] = self._control_law(x, d, env.hour_of_day, env.day_of_year, min, max)
+        return u
+
+    def casadi_function(self, nx, nu, nd):
+        """
+        Symbolic version of the controller, u = f(x, d, [hour_of_day, day_of_year]).
+        Allows closed-loop simulations that run entirely in CasADi (see `models.utils.define_closed_loop_model`).
+
+        Args:
+            nx (int): number of states
+            nu (int): number of control inputs
+            nd (int): number of disturbances
+        Returns:
+            casadi.Function: the rule-based control law
+        """
+        x = ca.SX.sym("x", nx)
+        d = ca.SX.sym("d", nd)
+        t = ca.SX.sym("t", 2)
+        u = self._control_law(x, d, t[0], t[1], ca.fmin, ca.fmax)
+        u = ca.vertcat(*u, ca.SX.zeros(nu-len(u)))
+        return ca.Function("rb_controller", [x, d, t], [u], ["x", "d", "t"], ["u"])
+
+    def _control_law(self, x, d, hour_of_day, day_of_year, fmin, fmax):
+        """
+        Control law that is shared by the numerical and the symbolic controller.
+        Only uses operations that work on floats and CasADi expressions,
+        with fmin/fmax as min/max (builtin for floats, ca.fmin/ca.fmax for symbols).
+        """
 
         # Control of the lamp according to the time of day [0/1]
         # if p.lampsOn < p.lampsOff, lamps are on from p.lampsOn to p.lampsOff each day
         # if p.lampsOn > p.lampsOff, lamps are on from p.lampsOn until p.lampsOff the next day
         # if p.lampsOn == p.lampsOff, lamps are always off
         # for continuous light, set p.lampsOn = -1, p.lampsOff = 25
-        lampTimeOfDay = ((self.lamps_on <= self.lamps_off) * (self.lamps_on < env.hour_of_day and env.hour_of_day < self.lamps_off) + \
-                            (1-(self.lamps_on <= self.lamps_off)) * (self.lamps_on < env.hour_of_day or env.hour_of_day < self.lamps_off))
+        lampTimeOfDay = ((self.lamps_on <= self.lamps_off) * (self.lamps_on < hour_of_day) * (hour_of_day < self.lamps_off) + \
+                            (1-(self.lamps_on <= self.lamps_off)) * fmax(self.lamps_on < hour_of_day, hour_of_day < self.lamps_off))
 
         # CURRENTLY UNUSED...
         # Control of the lamp according to the day of year [0/1]
@@ -82,8 +111,8 @@ class RuleBasedController:
         # if p.dayLampStart > p.dayLampStop, lamps are on from p.lampsOn until p.lampsOff the next year
         # if p.dayLampStart == p.dayLampStop, lamps are always off
         # for no influence of day of year, set p.dayLampStart = -1, p.dayLampStop > 366
-        lampDayOfYear = ((self.lamps_day_start <= self.lamps_day_stop) * (self.lamps_day_start < env.day_of_year and env.day_of_year < self.lamps_day_stop) + \
-                            (1-(self.lamps_day_start <= self.lamps_day_stop)) * (self.lamps_day_start < env.day_of_year or env.day_of_year < self.lamps_day_stop))
+        lampDayOfYear = ((self.lamps_day_start <= self.lamps_day_stop) * (self.lamps_day_start < day_of_year) * (day_of_year < self.lamps_day_stop) + \
+                            (1-(self.lamps_day_start <= self.lamps_day_stop)) * fmax(self.lamps_day_start < day_of_year, day_of_year < self.lamps_day_stop))
 
 
         # THIS VARIABLE MAINLY REPRESENTS WHETHER WE ARE IN LIGHT PERIOD OF THE GREENHOUSE
@@ -104,20 +133,20 @@ class RuleBasedController:
         # 1 at lampOn, 0 one hour before lampOn, with linear transition
         # Note: this current function doesn't do a linear interpolation if
         # lampOn == 0
-        linearLampSwitchOn = max(0, min(1, env.hour_of_day-self.lamps_on + 1))
+        linearLampSwitchOn = fmax(0, fmin(1, hour_of_day-self.lamps_on + 1))
 
         # Linear version of lamp switching on: 
         # 1 at lampOff, 0 one hour after lampOff, with linear transition
         # Note: this current function doesn't do a linear interpolation if
         # lampOff == 24
-        linearLampSwitchOff = max(0, min(1, self.lamps_off - env.hour_of_day + 1))
+        linearLampSwitchOff = fmax(0, fmin(1, self.lamps_off - hour_of_day + 1))
 
         # Combination of linear transitions above
         # if p.lampsOn < p.lampsOff, take the minimum of the above
         # if p.lampsOn > p.lampsOn, take the maximum
         # if p.lampsOn == p.lampsOff, set at 0
-        linearLampBothSwitches = (self.lamps_on!=self.lamps_off)*((self.lamps_on<self.lamps_off)*min(linearLampSwitchOn,linearLampSwitchOff)
-            + (1-(self.lamps_on<self.lamps_off))*max(linearLampSwitchOn,linearLampSwitchOff))
+        linearLampBothSwitches = (self.lamps_on!=self.lamps_off)*((self.lamps_on<self.lamps_off)*fmin(linearLampSwitchOn,linearLampSwitchOff)
+            + (1-(self.lamps_on<self.lamps_off))*fmax(linearLampSwitchOn,linearLampSwitchOff))
 
         # Smooth (linear) approximation of the lamp control
         # To allow smooth transition between light period and dark period setpoints
@@ -130,7 +159,7 @@ class RuleBasedController:
         # Indicates whether daytime climate settings should be used, i.e., if
         # the sun is out or the lamps are on
         # 1 if day, 0 if night. If lamps are on it is considered day
-        isDayInside = max(smoothLamp, d[8])
+        isDayInside = fmax(smoothLamp, d[8])
 
         # Heating set point [°C]
         heatSetPoint = isDayInside*self.temp_setpoint_day + (1-isDayInside)* self.temp_setpoint_night + self.heat_correction*lampNoCons
@@ -167,7 +196,7 @@ class RuleBasedController:
         thScrHeat = self.proportional_control(x[2], heatSetPoint+ self.thScrDeadZone, -self.thScrPband, 1, 0)
 
         # Opening of thermal screen due to high humidity [0-1, 0 is fully open]
-        thScrRh = max(self.proportional_control(rhIn, self.rhMax+self.thScrRh, self.thScrRhPband, 1, 0), 1-ventCold)
+        thScrRh = fmax(self.proportional_control(rhIn, self.rhMax+self.thScrRh, self.thScrRhPband, 1, 0), 1-ventCold)
 
             # if 1-ventCold == 0 (it's too cold inside to ventilate)
             # don't force to open the screen (even if RH says it should be 0)
@@ -187,7 +216,7 @@ class RuleBasedController:
                             # don't stop illuminating in this case. 
         lampOn = lampNoCons * self.proportional_control(x[2], heatMax + self.lampExtraHeat, -0.5, 0, 1) *\
                     (d[9] + (1-d[9])) *\
-                    max(self.proportional_control(rhIn, self.rhMax + self.blScrExtraRh, -0.5, 0, 1), 1-ventCold)
+                    fmax(self.proportional_control(rhIn, self.rhMax + self.blScrExtraRh, -0.5, 0, 1), 1-ventCold)
 
         # Control for the interlights: 
         # 1 if interlights are on, 0 if interlights are off
@@ -206,21 +235,18 @@ class RuleBasedController:
         #             fmax(self.proportional_control(rhIn, self.rhMax + self.blScrExtraRh, -0.5, 0, 1), 1-ventCold)
 
 
-        # boiler, co2, thscr, roof, lamps, intlamps, boilgro, blscr
-        u[0] = self.proportional_control(x[2], heatSetPoint, self.tHeatBand, 0, 1)
-        u[1] = self.proportional_control(co2InPpm, co2SetPoint, self.co2Band, 0, 1)
-        u[2] = min(thScrCold, max(thScrHeat, thScrRh))
-        u[3] = min(ventCold, max(ventHeat, ventRh))
-        u[4] = lampOn
-        u[5] = self.useBlScr * (1-d[9]) * lampOn
-
-        # u[5] = intLampOn * self.intLamps
-        # u[6] = self.proportional_control(x[2], heatSetPoint, self.tHeatBand, 0, 1) * self.pBoilGro
-        # UNUSED shading screen, permanent shading screen, side ventilation
-        # u[8] = 0
-        # u[9] = 0
-        # u[10] = 0
-        return u
+        # boiler, co2, thscr, roof, lamps, blscr
+        # UNUSED intlamps, boilgro, shading screen, permanent shading screen, side ventilation
+        # intLampOn * self.intLamps
+        # self.proportional_control(x[2], heatSetPoint, self.tHeatBand, 0, 1) * self.pBoilGro
+        return [
+            self.proportional_control(x[2], heatSetPoint, self.tHeatBand, 0, 1),
+            self.proportional_control(co2InPpm, co2SetPoint, self.co2Band, 0, 1),
+            fmin(thScrCold, fmax(thScrHeat, thScrRh)),
+            fmin(ventCold, fmax(ventHeat, ventRh)),
+            lampOn,
+            self.useBlScr * (1-d[9]) * lampOn,
+        ]
 
 
     def proportional_control(self, processVar, setPt, pBand, minVal, maxVal):
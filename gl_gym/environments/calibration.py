@@ -0,0 +1,216 @@
+import time
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import casadi as ca
+
+from gl_gym.environments.models.utils import define_model
+from gl_gym.environments.mpc import X_NOMINAL
+
+
+class ModelCalibration:
+    """
+    Fits a subset of the model parameters to measured state trajectories with multiple shooting.
+
+    The measurement horizon is split into shooting intervals of `interval_length` time steps.
+    Each interval is simulated with the cvodes integrator of the environment, the intervals are
+    mapped over `n_threads` threads, and continuity between the intervals is enforced as a constraint.
+    The gradients and constraint Jacobians are computed from the exact forward/adjoint sensitivities
+    of cvodes, the Hessian of the Lagrangian is approximated with L-BFGS.
+
+    The calibrated parameters are multipliers on their nominal values, p[i] = theta_i * p_nominal[i],
+    bounded by `bounds`. The objective is the sum of squared, scaled residuals of the measured states;
+    missing measurements are NaN.
+
+    Args:
+        nx, nu, nd (int): model dimensions.
+        dt (float): time step of the measurements [s].
+        p_nominal (np.ndarray): nominal parameter vector.
+        indices (list): indices of the calibrated parameters.
+        measured_states (list): indices of the measured states, e.g., [0, 2, 15, 25] for CO2, temperature, vapour pressure and fruit dry matter.
+        interval_length (int): number of time steps per shooting interval.
+        bounds (tuple): lower and upper bound of the parameter multipliers.
+        scale (np.ndarray): scale of the residuals per measured state, defaults to the nominal state magnitudes.
+        n_threads (int): number of threads that evaluate the shooting intervals.
+        max_iter (int): maximum number of solver iterations.
+        tol (float): solver tolerance.
+        verbose (bool): print solver output.
+    """
+    def __init__(
+        self,
+        nx: int,
+        nu: int,
+        nd: int,
+        dt: float,
+        p_nominal: np.ndarray,
+        indices: Sequence[int],
+        measured_states: Sequence[int],
+        interval_length: int = 12,
+        bounds: tuple = (0.5, 2.0),
+        scale: Optional[np.ndarray] = None,
+        n_threads: int = 1,
+        max_iter: int = 100,
+        tol: float = 1e-8,
+        verbose: bool = False,
+    ):
+        self.nx, self.nu, self.nd = nx, nu, nd
+        self.dt = dt
+        self.p_nominal = np.asarray(p_nominal, dtype=float)
+        self.n_params = len(self.p_nominal)
+        self.indices = np.asarray(indices)
+        self.measured_states = np.asarray(measured_states)
+        self.interval_length = interval_length
+        self.bounds = bounds
+        self.scale = X_NOMINAL[self.measured_states] if scale is None else np.asarray(scale, dtype=float)
+        self.n_threads = n_threads
+        self.max_iter = max_iter
+        self.tol = tol
+        self.verbose = verbose
+
+        F = define_model(nx, nu, nd, self.n_params, dt)
+        x = ca.MX.sym("x", nx)
+        u = ca.MX.sym("u", nu)
+        d = ca.MX.sym("d", nd)
+        p = ca.MX.sym("p", self.n_params)
+        step = ca.Function("step", [x, u, d, p], [F(x0=x, u=u, p=ca.vertcat(d, p))["xf"]])
+
+        # trajectory of a single shooting interval
+        L = interval_length
+        U = ca.MX.sym("U", nu, L)
+        D = ca.MX.sym("D", nd, L)
+        X = step.mapaccum("steps", L)(x, U, D, ca.repmat(p, 1, L))
+        self.interval = ca.Function("interval", [x, U, D, p], [X], ["x0", "U", "D", "p"], ["X"])
+        self._solvers = {}
+
+    def parameters(self, theta) -> np.ndarray:
+        """Parameter vector for the multipliers theta."""
+        p = np.copy(self.p_nominal)
+        p[self.indices] *= np.asarray(theta, dtype=float)
+        return p
+
+    def _build_solver(self, n_intervals: int):
+        """Multiple-shooting NLP for a horizon of `n_intervals` shooting intervals."""
+        k = len(self.indices)
+        L = self.interval_length
+        n_steps = n_intervals * L
+        n_meas = len(self.measured_states)
+
+        theta = ca.MX.sym("theta", k)
+        S_scaled = ca.MX.sym("S", self.nx, n_intervals+1)
+        S = ca.repmat(X_NOMINAL, 1, n_intervals+1) * S_scaled
+
+        x0 = ca.MX.sym("x0", self.nx)
+        U = ca.MX.sym("U", self.nu, n_steps)
+        D = ca.MX.sym("D", self.nd, n_steps)
+        Y = ca.MX.sym("Y", n_meas, n_steps+1)
+        W = ca.MX.sym("W", n_meas, n_steps+1)
+
+        selection = np.zeros((self.n_params, k))
+        selection[self.indices, np.arange(k)] = self.p_nominal[self.indices]
+        p_fixed = np.copy(self.p_nominal)
+        p_fixed[self.indices] = 0
+        p = p_fixed + ca.mtimes(selection, theta)
+
+        shooting = self.interval.map(n_intervals, "thread", self.n_threads)
+        X = shooting(S[:, :-1], U, D, p)
+        X_end = X[:, L-1::L]
+
+        X_all = ca.horzcat(S[:, 0], X)
+        residuals = (X_all[self.measured_states.tolist(), :] - Y) / ca.repmat(self.scale, 1, n_steps+1)
+        J = 0.5 * ca.sumsqr(ca.sqrt(W) * residuals)
+
+        g = ca.vertcat(
+            ca.vec((S[:, 0] - x0) / X_NOMINAL),
+            ca.vec((S[:, 1:] - X_end) / ca.repmat(X_NOMINAL, 1, n_intervals)),
+        )
+        nlp = {
+            "x": ca.vertcat(theta, ca.vec(S_scaled)),
+            "p": ca.vertcat(x0, ca.vec(U), ca.vec(D), ca.vec(Y), ca.vec(W)),
+            "f": J,
+            "g": g,
+        }
+        opts = {
+            "print_time": self.verbose,
+            "ipopt": {
+                "max_iter": self.max_iter,
+                "tol": self.tol,
+                "hessian_approximation": "limited-memory",
+                "print_level": 5 if self.verbose else 0,
+                "sb": "yes",
+            },
+        }
+        return ca.nlpsol("calibration", "ipopt", nlp, opts)
+
+    def fit(
+        self,
+        x0: np.ndarray,
+        controls: np.ndarray,
+        weather: np.ndarray,
+        measurements: np.ndarray,
+        theta0: Optional[np.ndarray] = None,
+    ) -> Dict[str, Any]:
+        """
+        Calibrates the parameters on one measured trajectory. Time steps beyond the last complete
+        shooting interval are not used.
+
+        Args:
+            x0 (np.ndarray): (nx,) initial state.
+            controls (np.ndarray): (N, nu) applied control inputs.
+            weather (np.ndarray): (N, nd) weather data.
+            measurements (np.ndarray): (N+1, n_measured) measured states, NaN where missing.
+            theta0 (np.ndarray): initial guess of the parameter multipliers, defaults to ones.
+        Returns:
+            dict: fitted `params` and multipliers `theta`, the `states` at the shooting nodes,
+                final `cost`, solver `status`, `iterations` and `solve_time` [s].
+        """
+        L = self.interval_length
+        n_intervals = len(controls) // L
+        if n_intervals == 0:
+            raise ValueError(f"At least {L} time steps are required, got {len(controls)}")
+        n_steps = n_intervals * L
+        if n_intervals not in self._solvers:
+            self._solvers[n_intervals] = self._build_solver(n_intervals)
+        solver = self._solvers[n_intervals]
+
+        controls = np.asarray(controls, dtype=float)[:n_steps]
+        weather = np.asarray(weather, dtype=float)[:n_steps]
+        measurements = np.asarray(measurements, dtype=float)[:n_steps+1]
+        weights = np.isfinite(measurements).astype(float)
+        measurements = np.nan_to_num(measurements)
+
+        k = len(self.indices)
+        theta0 = np.ones(k) if theta0 is None else np.asarray(theta0, dtype=float)
+
+        # initialise the shooting nodes with a simulation at the initial guess
+        p0 = self.parameters(theta0)
+        S0 = [np.asarray(x0, dtype=float)]
+        for j in range(n_intervals):
+            X = self.interval(S0[-1], controls[j*L:(j+1)*L].T, weather[j*L:(j+1)*L].T, p0).full()
+            S0.append(X[:, -1])
+        S0 = np.column_stack(S0) / X_NOMINAL[:, None]
+
+        n_nodes = self.nx * (n_intervals+1)
+        lbw = np.concatenate([np.full(k, self.bounds[0]), np.full(n_nodes, -np.inf)])
+        ubw = np.concatenate([np.full(k, self.bounds[1]), np.full(n_nodes, np.inf)])
+        params = np.concatenate([
+            x0, controls.T.flatten(order="F"), weather.T.flatten(order="F"),
+            measurements.T.flatten(order="F"), weights.T.flatten(order="F")
+        ])
+
+        start = time.time()
+        sol = solver(x0=np.concatenate([theta0, S0.flatten(order="F")]), lbx=lbw, ubx=ubw, lbg=0, ubg=0, p=params)
+        solve_time = time.time() - start
+        stats = solver.stats()
+
+        w = sol["x"].full().flatten()
+        theta = w[:k]
+        states = np.reshape(w[k:], (self.nx, n_intervals+1), order="F") * X_NOMINAL[:, None]
+        return {
+            "params": self.parameters(theta),
+            "theta": theta,
+            "states": states.T,
+            "cost": float(sol["f"]),
+            "status": stats["return_status"],
+            "iterations": stats["iter_count"],
+            "solve_time": solve_time,
+        }
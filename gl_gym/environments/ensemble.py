@@ -0,0 +1,143 @@
+import numpy as np
+import casadi as ca
+
+from gl_gym.environments.models.utils import define_model, define_closed_loop_model, satVp_cpp, co2dens2ppm
+
+# economic and constraint summaries that are returned per ensemble member
+SUMMARY_KEYS = ["EPI", "revenue", "heat_cost", "co2_cost", "elec_cost", "temp_violation", "co2_violation", "rh_violation"]
+
+
+def ensemble_outputs(states):
+    """
+    CO2 concentration [ppm], air temperature [°C] and relative humidity [%] of a batch of states,
+    as in `IndoorClimateObservations`.
+
+    Args:
+        states (np.ndarray): (..., nx) array of states.
+    Returns:
+        np.ndarray: (..., 3) array of outputs.
+    """
+    co2 = co2dens2ppm(states[..., 2], 1e-6*states[..., 0])
+    rh = 100*states[..., 15]/satVp_cpp(states[..., 2])
+    return np.stack([co2, states[..., 2], rh], axis=-1)
+
+
+def economic_summary(env, states, controls):
+    """
+    Accumulates the economic performance and the constraint violations of ensemble trajectories,
+    with the terms of the reward function of `env` (see `GreenhouseReward.compute_reward`).
+
+    Args:
+        env: environment with a `GreenhouseReward`.
+        states (np.ndarray): (M, N+1, nx) state trajectories, including the initial state.
+        controls (np.ndarray): (M, N, nu) control trajectories.
+    Returns:
+        dict: (M,) arrays with the season totals, keys as in `SUMMARY_KEYS`.
+    """
+    r = env.reward
+    # states and controls on the first axis
+    x = np.moveaxis(states, -1, 0)
+    u = np.moveaxis(controls, -1, 0)
+    heat_cost, co2_cost, elec_cost = r.control_costs(u)
+    revenue = r.fruit_value(x[..., 1:]) - r.fruit_value(x[..., :-1])
+    violations = r.climate_violations(x[..., 1:])
+
+    summary = {
+        "EPI": revenue - heat_cost - co2_cost - elec_cost,
+        "revenue": revenue,
+        "heat_cost": heat_cost,
+        "co2_cost": co2_cost,
+        "elec_cost": elec_cost,
+        "co2_violation": violations[0],
+        "temp_violation": violations[1],
+        "rh_violation": violations[2],
+    }
+    return {key: summary[key].sum(axis=1) for key in SUMMARY_KEYS}
+
+
+class EnsembleSimulator:
+    """
+    Simulates an ensemble of greenhouse models with different parameter vectors in lockstep.
+    All members are advanced with a single call of the mapped integrator per time step,
+    which CasADi evaluates in parallel over `n_threads` threads.
+
+    The ensemble is either driven by a controller with a CasADi representation (e.g., `RuleBasedController`),
+    which is evaluated per member at the start of every step like `define_closed_loop_model`,
+    or by a precomputed control trajectory (open loop).
+
+    Args:
+        env: the GreenLight environment that provides the model dimensions and the time step.
+        n_members (int): number of ensemble members M.
+        controller: controller with a `casadi_function(nx, nu, nd)` method. If None, the controls are passed to `simulate`.
+        parallelization (str): CasADi map parallelization, `serial`, `openmp` or `thread`.
+        n_threads (int): number of threads for the `thread` parallelization, defaults to `n_members`.
+    """
+    def __init__(self, env, n_members, controller=None, parallelization="thread", n_threads=None):
+        self.env = env
+        self.nx, self.nu, self.nd, self.n_params = env.nx, env.nu, env.nd, env.num_params
+        self.dt = env.dt
+        self.n_members = n_members
+        self.closed_loop = controller is not None
+        n_threads = n_members if n_threads is None else n_threads
+
+        if self.closed_loop:
+            step = define_closed_loop_model(
+                self.nx, self.nu, self.nd, self.n_params, self.dt,
+                controller.casadi_function(self.nx, self.nu, self.nd)
+            )
+        else:
+            F = define_model(self.nx, self.nu, self.nd, self.n_params, self.dt)
+            x = ca.MX.sym("x", self.nx)
+            u = ca.MX.sym("u", self.nu)
+            d = ca.MX.sym("d", self.nd)
+            p = ca.MX.sym("p", self.n_params)
+            xf = F(x0=x, u=u, p=ca.vertcat(d, p))["xf"]
+            step = ca.Function("open_loop", [x, u, d, p], [xf], ["x", "u", "d", "p"], ["x_next"])
+        self.step = step.map(n_members, parallelization, n_threads)
+
+    def simulate(self, params, x0=None, controls=None, weather=None, n_steps=None):
+        """
+        Simulates all ensemble members over `n_steps` time steps. The initial state, weather and
+        start time default to the current state of the environment, so call `env.reset()` first.
+
+        Args:
+            params (np.ndarray): (M, n_params) parameter vectors, e.g., from `parametric_ensemble`.
+            x0 (np.ndarray): (nx,) initial state shared by the members, or (M, nx). Defaults to `env.x`.
+            controls (np.ndarray): (N, nu) control trajectory shared by the members, or (M, N, nu). Only in open loop.
+            weather (np.ndarray): (N, nd) weather trajectory. Defaults to the weather data of the env from its current time step.
+            n_steps (int): number of time steps N. Defaults to the remaining steps of the season of the env.
+        Returns:
+            states (np.ndarray): (M, N+1, nx) state trajectories, including the initial state.
+            controls (np.ndarray): (M, N, nu) applied controls.
+        """
+        M = self.n_members
+        params = np.asarray(params, dtype=float)
+        if params.shape != (M, self.n_params):
+            raise ValueError(f"Expected parameters of shape {(M, self.n_params)}, got {params.shape}")
+        if self.closed_loop == (controls is not None):
+            raise ValueError("Pass controls in open loop only, the closed-loop ensemble computes its own controls")
+
+        if n_steps is None:
+            n_steps = self.env.N - self.env.timestep if controls is None else np.shape(controls)[-2]
+        if weather is None:
+            weather = self.env.weather_data[self.env.timestep:self.env.timestep+n_steps]
+        if len(weather) < n_steps:
+            raise ValueError(f"Weather data covers {len(weather)} steps, {n_steps} steps requested")
+        x0 = self.env.x if x0 is None else x0
+
+        states = np.empty((M, n_steps+1, self.nx))
+        states[:, 0] = x0
+        if controls is not None:
+            controls = np.broadcast_to(controls, (M, n_steps, self.nu))
+            for k in range(n_steps):
+                states[:, k+1] = self.step(states[:, k].T, controls[:, k].T, weather[k], params.T).full().T
+            return states, np.array(controls)
+
+        controls = np.empty((M, n_steps, self.nu))
+        z = np.vstack([states[:, 0].T, np.tile([[self.env.hour_of_day], [self.env.day_of_year]], M)])
+        for k in range(n_steps):
+            z, u = self.step(z, weather[k], params.T)
+            z = z.full()
+            states[:, k+1] = z[:self.nx].T
+            controls[:, k] = u.full().T
+        return states, controls
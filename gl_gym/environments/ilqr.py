@@ -0,0 +1,166 @@
+import time
+
+import numpy as np
+import casadi as ca
+
+
+class ILQRController:
+    """
+    Iterative LQR controller for the economic objective of `GreenhouseReward`.
+
+    The summed reward over the horizon is rewritten as a stage cost l(x, u) and a terminal cost l_f(x):
+    the fruit growth telescopes into the terminal fruit dry matter, the heating, CO2 and electricity costs
+    depend on the control inputs and the output violations are charged on the state at the start of each stage.
+    Like the environment, the controller acts on normalised control changes a in [-1, 1],
+    u = clip(u_prev + a * delta_u_max, u_min, u_max), so the state is augmented with the previous control input.
+    The dynamics are linearised along the nominal trajectory with `TomatoEnv.linearize`, whose cache
+    makes the shifted trajectory of the previous time step free to linearise.
+
+    Args:
+        env: the GreenLight environment (TomatoEnv) to control.
+        Np (int): number of time steps in the horizon.
+        max_iter (int): maximum number of iLQR iterations per time step.
+        tol (float): relative cost decrease at which the iterations stop.
+        reg (float): initial Levenberg-Marquardt regularisation of the control Hessian.
+        alphas (tuple): step sizes of the backtracking line search.
+    """
+    def __init__(self, env, Np=12, max_iter=5, tol=1e-4, reg=1e-2, alphas=(1.0, 0.5, 0.25, 0.1)):
+        self.env = env
+        self.nx, self.nu = env.nx, env.nu
+        self.Np = Np
+        self.max_iter = max_iter
+        self.tol = tol
+        self.reg0 = reg
+        self.alphas = alphas
+        self.u_min, self.u_max = env.u_min, env.u_max
+        self.delta_u_max = env.delta_u_max
+        self._build_costs()
+        self.solve_times = []
+        self.solver_stats = []
+        self.reset()
+
+    def reset(self):
+        """Forget the previous solution, the next solve starts from constant control inputs."""
+        self.actions = None
+        self.reg = self.reg0
+
+    def _build_costs(self):
+        r = self.env.reward
+        scale = 1 / (r.max_profit - r.min_profit)
+        nz = self.nx + self.nu
+        z = ca.SX.sym("z", nz)
+        a = ca.SX.sym("a", self.nu)
+        x = z[:self.nx]
+        u = z[self.nx:] + a*self.delta_u_max
+
+        penalty = r.violation_penalty(x)
+        l = sum(r.control_costs(u)) * scale + penalty
+        lf = penalty - r.fruit_value(x) * scale
+        lz, la = ca.gradient(l, z), ca.gradient(l, a)
+        stage = ca.Function("stage", [z, a], [l, lz, la, ca.jacobian(lz, z), ca.jacobian(la, a), ca.jacobian(la, z)])
+        self.stage = stage.map(self.Np)
+        lfz = ca.gradient(lf, z)
+        self.terminal = ca.Function("terminal", [z], [lf, lfz, ca.jacobian(lfz, z)])
+
+    def _cost(self, Z, actions):
+        return float(ca.sum2(self.stage(Z[:-1].T, actions.T)[0])) + float(self.terminal(Z[-1])[0])
+
+    def _forward(self, z0, Z_bar, actions_bar, k, K, alpha, d, p):
+        """Simulates the feedback policy a = a_bar + alpha*k + K(z - z_bar). Returns the states, actions and applied controls."""
+        Z = np.empty((self.Np+1, self.nx+self.nu))
+        actions = np.empty((self.Np, self.nu))
+        U = np.empty((self.Np, self.nu))
+        Z[0] = z0
+        for t in range(self.Np):
+            x, u_prev = Z[t, :self.nx], Z[t, self.nx:]
+            actions[t] = np.clip(actions_bar[t] + alpha*k[t] + K[t] @ (Z[t] - Z_bar[t]), -1, 1)
+            U[t] = np.clip(u_prev + actions[t]*self.delta_u_max, self.u_min, self.u_max)
+            x_next = self.env.F(x0=x, u=U[t], p=ca.vertcat(d[t], p))["xf"].full().flatten()
+            Z[t+1] = np.concatenate([x_next, U[t]])
+        return Z, actions, U
+
+    def _backward(self, Z, actions, A, B):
+        nx, nu, nz = self.nx, self.nu, self.nx+self.nu
+        _, lz, la, lzz, laa, laz = (v.full() for v in self.stage(Z[:-1].T, actions.T))
+        lzz = lzz.reshape(nz, self.Np, nz).transpose(1, 0, 2)
+        laa = laa.reshape(nu, self.Np, nu).transpose(1, 0, 2)
+        laz = laz.reshape(nu, self.Np, nz).transpose(1, 0, 2)
+        _, Vz, Vzz = (v.full() for v in self.terminal(Z[-1]))
+        Vz = Vz.flatten()
+
+        k = np.zeros((self.Np, nu))
+        K = np.zeros((self.Np, nu, nz))
+        for t in reversed(range(self.Np)):
+            # augmented dynamics: z_next = [f(x, u_prev + a*delta_u_max); u_prev + a*delta_u_max]
+            Fz = np.block([[A[t], B[t]], [np.zeros((nu, nx)), np.eye(nu)]])
+            Fa = np.vstack([B[t], np.eye(nu)]) * self.delta_u_max
+            Qz = lz[:, t] + Fz.T @ Vz
+            Qa = la[:, t] + Fa.T @ Vz
+            Qzz = lzz[t] + Fz.T @ Vzz @ Fz
+            Qaa = laa[t] + Fa.T @ Vzz @ Fa + self.reg*np.eye(nu)
+            Qaz = laz[t] + Fa.T @ Vzz @ Fz
+            Qaa_inv = np.linalg.inv(0.5*(Qaa + Qaa.T))
+            k[t] = -Qaa_inv @ Qa
+            K[t] = -Qaa_inv @ Qaz
+            Vz = Qz + K[t].T @ Qaa @ k[t] + K[t].T @ Qa + Qaz.T @ k[t]
+            Vzz = Qzz + K[t].T @ Qaa @ K[t] + K[t].T @ Qaz + Qaz.T @ K[t]
+            Vzz = 0.5*(Vzz + Vzz.T)
+        return k, K
+
+    def solve(self, x0, u_prev, timestep):
+        """
+        Optimises the control sequence over the horizon that starts at `timestep` of the environment.
+
+        Returns:
+            U (np.ndarray): control inputs over the horizon, shape (Np, nu)
+            X (np.ndarray): predicted states over the horizon, shape (Np+1, nx)
+        """
+        start = time.time()
+        env = self.env
+        d = env.weather_data[timestep:timestep+self.Np]
+        p = env.p
+        z0 = np.concatenate([x0, u_prev])
+        if self.actions is None:
+            actions_bar = np.zeros((self.Np, self.nu))
+        else:
+            actions_bar = np.vstack([self.actions[1:], self.actions[-1]])
+
+        nz = self.nx + self.nu
+        no_feedback = (np.zeros((self.Np, self.nu)), np.zeros((self.Np, self.nu, nz)))
+        Z_bar, actions_bar, U_bar = self._forward(z0, np.zeros((self.Np, nz)), actions_bar, *no_feedback, 0.0, d, p)
+        J = self._cost(Z_bar, actions_bar)
+        status = "Maximum_Iterations_Exceeded"
+        for _ in range(self.max_iter):
+            _, A, B = env.linearize(Z_bar[:-1, :self.nx], U_bar, timestep)
+            k, K = self._backward(Z_bar, actions_bar, A, B)
+            for alpha in self.alphas:
+                Z, actions, U = self._forward(z0, Z_bar, actions_bar, k, K, alpha, d, p)
+                J_new = self._cost(Z, actions)
+                if J_new < J:
+                    break
+            if J_new < J:
+                converged = (J - J_new) < self.tol * abs(J)
+                Z_bar, actions_bar, U_bar, J = Z, actions, U, J_new
+                self.reg = max(self.reg / 2, 1e-6)
+                if converged:
+                    status = "Solve_Succeeded"
+                    break
+            elif self.reg >= 1e6:
+                # no descent even for tiny steps: a local optimum
+                status = "Solve_Succeeded"
+                break
+            else:
+                self.reg = min(self.reg * 10, 1e6)
+
+        self.actions = actions_bar
+        self.solve_times.append(time.time() - start)
+        self.solver_stats.append(status)
+        return U_bar, Z_bar[:, :self.nx]
+
+    def predict(self, x, d, env):
+        """
+        Returns the first control input of the optimised plan, with the same signature as `EconomicMPC.predict`.
+        The weather over the horizon is taken from the environment.
+        """
+        U, _ = self.solve(np.asarray(x, dtype=float), np.asarray(env.u, dtype=float), env.timestep)
+        return U[0]
@@ -39,6 +39,8 @@ class LettuceEnv(GreenLightEnv):
         uncertainty_scale = 0.0
         ) -> None:
         super(LettuceEnv, self).__init__(**base_env_params)
+        if self.action_repeat != 1:
+            raise ValueError("LettuceEnv integrates a single time step per action, action_repeat must be 1.")
 
         self.uncertainty_scale = uncertainty_scale
 
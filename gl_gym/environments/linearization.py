@@ -0,0 +1,126 @@
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import casadi as ca
+
+from gl_gym.environments.models.utils import define_model
+
+
+class TrajectoryLinearization:
+    """
+    Jacobians A = df/dx and B = df/du of the discrete GreenLight step x_next = f(x, u, d, p) along a trajectory.
+
+    The Jacobians of all points of a trajectory are computed in one mapped call of the CasADi `jacobian`
+    of the integrator. Results are cached per (state, control input, weather index) in an LRU cache,
+    such that overlapping trajectories, e.g., the shifted nominal trajectory of a receding-horizon controller,
+    only linearise the new points. The cache is cleared when the weather data or the parameters change.
+
+    Args:
+        nx, nu, nd (int): model dimensions.
+        n_params (int): number of model parameters.
+        dt (float): time step [s].
+        cache_size (int): maximum number of cached linearisation points.
+        n_threads (int): number of threads that evaluate the mapped Jacobians.
+        F (ca.Function): the discrete step with the interface of `define_model`, e.g., the configured integrator
+            of the environment, such that the Jacobians are those of the model that is simulated. Defaults to `define_model`.
+    """
+    def __init__(
+        self,
+        nx: int,
+        nu: int,
+        nd: int,
+        n_params: int,
+        dt: float,
+        cache_size: int = 10000,
+        n_threads: int = 1,
+        F: Optional[ca.Function] = None,
+    ):
+        self.nx, self.nu, self.nd, self.n_params = nx, nu, nd, n_params
+        self.cache_size = cache_size
+        self.n_threads = n_threads
+
+        F = define_model(nx, nu, nd, n_params, dt) if F is None else F
+        x = ca.MX.sym("x", nx)
+        u = ca.MX.sym("u", nu)
+        d = ca.MX.sym("d", nd)
+        p = ca.MX.sym("p", n_params)
+        x_next = F(x0=x, u=u, p=ca.vertcat(d, p))["xf"]
+        self.jacobian = ca.Function(
+            "linearize", [x, u, d, p], [x_next, ca.jacobian(x_next, x), ca.jacobian(x_next, u)],
+            ["x", "u", "d", "p"], ["x_next", "A", "B"]
+        )
+        self._mapped: Dict[int, ca.Function] = {}
+        self._cache: "OrderedDict[Tuple, Tuple[np.ndarray, np.ndarray, np.ndarray]]" = OrderedDict()
+        self._context = None
+        self.hits = 0
+        self.misses = 0
+
+    def _mapped_jacobian(self, n: int) -> ca.Function:
+        """Jacobian mapped over a batch of n points."""
+        if n not in self._mapped:
+            self._mapped[n] = self.jacobian.map(n, "thread", self.n_threads)
+        return self._mapped[n]
+
+    def _set_context(self, weather: np.ndarray, p: np.ndarray) -> None:
+        digest = hashlib.sha1(np.ascontiguousarray(weather, dtype=float).tobytes())
+        digest.update(np.ascontiguousarray(p, dtype=float).tobytes())
+        context = digest.hexdigest()
+        if context != self._context:
+            self.clear()
+            self._context = context
+
+    def clear(self) -> None:
+        """Empty the cache."""
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def linearize(self, X: np.ndarray, U: np.ndarray, indices: np.ndarray, weather: np.ndarray, p: np.ndarray):
+        """
+        Linearises the step at the points (X[k], U[k], weather[indices[k]]).
+
+        Args:
+            X (np.ndarray): (N, nx) states.
+            U (np.ndarray): (N, nu) control inputs.
+            indices (np.ndarray): (N,) indices of the time steps in `weather`.
+            weather (np.ndarray): weather data of the season, e.g., `env.weather_data`.
+            p (np.ndarray): model parameters.
+        Returns:
+            X_next (np.ndarray): (N, nx) next states.
+            A (np.ndarray): (N, nx, nx) state Jacobians.
+            B (np.ndarray): (N, nx, nu) input Jacobians.
+        """
+        self._set_context(weather, p)
+        X = np.asarray(X, dtype=float)
+        U = np.asarray(U, dtype=float)
+        N = len(X)
+        X_next = np.empty((N, self.nx))
+        A = np.empty((N, self.nx, self.nx))
+        B = np.empty((N, self.nx, self.nu))
+
+        keys = [(X[k].tobytes(), U[k].tobytes(), int(indices[k])) for k in range(N)]
+        missing = []
+        for k, key in enumerate(keys):
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                X_next[k], A[k], B[k] = self._cache[key]
+                self.hits += 1
+            else:
+                missing.append(k)
+        self.misses += len(missing)
+
+        if missing:
+            n = len(missing)
+            d = np.asarray(weather, dtype=float)[np.asarray(indices)[missing]]
+            x_next, A_new, B_new = self._mapped_jacobian(n)(X[missing].T, U[missing].T, d.T, np.asarray(p, dtype=float))
+            x_next = x_next.full().T
+            A_new = np.reshape(A_new.full(), (self.nx, n, self.nx)).transpose(1, 0, 2)
+            B_new = np.reshape(B_new.full(), (self.nx, n, self.nu)).transpose(1, 0, 2)
+            for j, k in enumerate(missing):
+                X_next[k], A[k], B[k] = x_next[j], A_new[j], B_new[j]
+                self._cache[keys[k]] = (x_next[j], A_new[j], B_new[j])
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return X_next, A, B
@@ -89,7 +89,19 @@ def airMc(f12, c1, c2):
     """
     return ca.fabs(f12) * (c1 - c2)
 
-def update(x, u, d, p):
+def smoothAbs(z, eps):
+    """Absolute value, smoothed as sqrt(z^2 + eps^2) if eps > 0"""
+    return ca.fabs(z) if eps == 0 else ca.sqrt(z * z + eps * eps)
+
+def smoothMin(a, b, eps):
+    """Minimum of a and b, smoothed if eps > 0"""
+    return ca.fmin(a, b) if eps == 0 else 0.5 * (a + b - smoothAbs(a - b, eps))
+
+def smoothMax(a, b, eps):
+    """Maximum of a and b, smoothed if eps > 0"""
+    return ca.fmax(a, b) if eps == 0 else 0.5 * (a + b + smoothAbs(a - b, eps))
+
+def update(x, u, d, p, smoothing=0.):
     """Update function for auxiliary variables
     Args:
         x: State vector (CasADi SX)
@@ -102,6 +114,8 @@ def update(x, u, d, p):
             u[5] = uBlScr
         d: Disturbance vector (CasADi SX)
         p: Parameter vector (CasADi SX)
+        smoothing: Smoothing of the kinks of the absolute values in the convective fluxes and of the minima and maxima,
+            in the units of their arguments. 0 gives the original model.
     Returns:
         CasADi SX vector of auxiliary variables
     """
@@ -736,7 +750,7 @@ def update(x, u, d, p):
     # Equation 65 [1]
     a[133] = a[130] / p[46] * \
         ca.sqrt(
-            1e-8 + ca.constpow((a[123] * a[126] / ca.sqrt(ca.fmax(a[123]*a[123] + a[126]*a[126], 0.01))), 2) *
+            1e-8 + ca.constpow((a[123] * a[126] / ca.sqrt(smoothMax(a[123]*a[123] + a[126]*a[126], 0.01, smoothing))), 2) *
             (2 * p[26] * p[62] * (x[2] - d[1]) / (0.5 * x[2] + 0.5 * d[1] + 273.15)) + 
             (ca.constpow((a[123] + a[126]/2.), 2) * a[131] * (d[4] * d[4]))
         )
@@ -763,7 +777,7 @@ def update(x, u, d, p):
     a[136] = ca.if_else(
         a[127] >= p[8],
         p[57] * a[132] + p[204] * a[135],
-        p[57] * (ca.fmax(u[2], u[5]) * a[132] + (1 - ca.fmax(u[2], u[5])) * a[133] * a[127]) + p[204] * a[135]
+        p[57] * (smoothMax(u[2], u[5], smoothing) * a[132] + (1 - smoothMax(u[2], u[5], smoothing)) * a[133] * a[127]) + p[204] * a[135]
     )
 
     # # Total ventilation through side vents [m^{3} m^{-2} s^{-1}]
@@ -771,7 +785,7 @@ def update(x, u, d, p):
     a[137] = ca.if_else(
         a[127] >= p[8],
         p[57] * a[134] + (1 - p[204]) * a[135],
-        p[57] * (ca.fmax(u[2], u[5]) * a[134] + (1 - ca.fmax(u[2], u[5])) * a[133] * a[129]) + (1 - p[204]) * a[135]
+        p[57] * (smoothMax(u[2], u[5], smoothing) * a[134] + (1 - smoothMax(u[2], u[5], smoothing)) * a[133] * a[129]) + (1 - p[204]) * a[135]
     )
 
     # CO2 concentration in main compartment [ppm]
@@ -794,20 +808,20 @@ def update(x, u, d, p):
     # There is also a mistake in [4], whenever sqrt is taken, abs should be included
     # addAux(gl, 'fThScr', u.thScr*p[84].*(abs((x.tAir-x.tTop)).^0.66) +  
     #     ((1-u.thScr)./gl.a[141]).*sqrt(0.5*gl.a[141].*(1-u.thScr).*p[26].*abs(gl.a[140]-gl.a[139])))
-    a[142] = u[2] * p[84] * ca.constpow(ca.fabs(x[2] - x[3] + 1e-10), 0.66) + \
-        ((1. - u[2]) / a[141]) * ca.sqrt(0.5 * a[141] * (1. - u[2]) * p[26] * ca.fabs(a[140] - a[139]) + 1e-10)
+    a[142] = u[2] * p[84] * ca.constpow(smoothAbs(x[2] - x[3] + 1e-10, smoothing), 0.66) + \
+        ((1. - u[2]) / a[141]) * ca.sqrt(0.5 * a[141] * (1. - u[2]) * p[26] * smoothAbs(a[140] - a[139], smoothing) + 1e-10)
 
     # Air flux through the blackout screen [m s^{-1}]
     # Equation A37 [5]
     # addAux(gl, 'fBlScr', u.blScr*p[94].*(abs((x.tAir-x.tTop)).^0.66) +  
     #     ((1-u.blScr)./gl.a[141]).*sqrt(0.5*gl.a[141].*(1-u.blScr).*p[26].*abs(gl.a[140]-gl.a[139])))
-    a[143] = u[5] * p[94] * ca.constpow(ca.fabs(x[2] - x[3] + 1e-10), 0.66) + \
-        ((1. - u[5]) / a[141]) * ca.sqrt(0.5 * a[141] * (1. - u[5]) * p[26] * ca.fabs(a[140] - a[139]) + 1e-10)
+    a[143] = u[5] * p[94] * ca.constpow(smoothAbs(x[2] - x[3] + 1e-10, smoothing), 0.66) + \
+        ((1. - u[5]) / a[141]) * ca.sqrt(0.5 * a[141] * (1. - u[5]) * p[26] * smoothAbs(a[140] - a[139], smoothing) + 1e-10)
 
     # Air flux through the screens [m s^{-1}]
     # Equation A38 [5]
     # addAux(gl, 'fScr', min(gl.a[142],gl.a[143]))
-    a[144] = ca.fmin(a[142], a[143])
+    a[144] = smoothMin(a[142], a[143], smoothing)
 
     #  Convective and conductive heat fluxes [W m^{-2}] ####
 
@@ -822,20 +836,20 @@ def update(x, u, d, p):
     # # Between air in main compartment and floor [W m^{-2}]
     a[147] = ca.if_else(
         x[8] > x[2],
-        sensible(1.7 * ca.constpow(ca.fabs(x[8] - x[2] + 1e-10), (1./3.)), x[2], x[8]),
-        sensible(1.3 * ca.constpow(ca.fabs(x[2] - x[8] + 1e-10), (1./4.)), x[2], x[8])
+        sensible(1.7 * ca.constpow(smoothAbs(x[8] - x[2] + 1e-10, smoothing), (1./3.)), x[2], x[8]),
+        sensible(1.3 * ca.constpow(smoothAbs(x[2] - x[8] + 1e-10, smoothing), (1./4.)), x[2], x[8])
     )
     # # Between air in main compartment and thermal screen [W m^{-2}]
     # addAux(gl, 'hAirThScr', sensible(1.7.*u.thScr.*nthroot(abs(x.tAir-x.tThScr),3),
     #     x.tAir,x.tThScr))
-    a[148] = sensible(1.7 * u[2] * ca.constpow(ca.fabs(x[2] - x[7] + 1e-10), (1./3.)), x[2], x[7])
+    a[148] = sensible(1.7 * u[2] * ca.constpow(smoothAbs(x[2] - x[7] + 1e-10, smoothing), (1./3.)), x[2], x[7])
 
     # # Between air in main compartment and blackout screen [W m^{-2}]
     # # Equations A28, A32 [5]
     # addAux(gl, 'hAirBlScr', sensible(1.7.*u.blScr.*nthroot(abs(x.tAir-x.tBlScr),3),
     #     x.tAir,x.tBlScr))
 
-    a[149] = sensible(1.7 * u[5] * ca.constpow(ca.fabs(x[2] - x[20] + 1e-10), (1./3.)), x[2], x[20])
+    a[149] = sensible(1.7 * u[5] * ca.constpow(smoothAbs(x[2] - x[20] + 1e-10, smoothing), (1./3.)), x[2], x[20])
         
     # # Between air in main compartment and outside air [W m^{-2}]
     # addAux(gl, 'hAirOut', sensible(p[111]*p[23]*(gl.a[137]+gl.a[145]),
@@ -849,17 +863,17 @@ def update(x, u, d, p):
     # # Between thermal screen and top compartment [W m^{-2}]
     # addAux(gl, 'hThScrTop', sensible(1.7.*u.thScr.*nthroot(abs(x.tThScr-x.tTop),3),
     #     x.tThScr,x.tTop))
-    a[152] = sensible(1.7 * u[2] * ca.constpow(ca.fabs(x[7] - x[3] + 1e-10), (1./3.)), x[7], x[3])
+    a[152] = sensible(1.7 * u[2] * ca.constpow(smoothAbs(x[7] - x[3] + 1e-10, smoothing), (1./3.)), x[7], x[3])
 
     # # Between blackout screen and top compartment [W m^{-2}]
     # addAux(gl, 'hBlScrTop', sensible(1.7.*u.blScr.*nthroot(abs(x.tBlScr-x.tTop),3),
     #     x.tBlScr,x.tTop))
-    a[153] = sensible(1.7 * u[5] * ca.constpow(ca.fabs(x[20] - x[3] + 1e-10), (1./3.)), x[20], x[3])
+    a[153] = sensible(1.7 * u[5] * ca.constpow(smoothAbs(x[20] - x[3] + 1e-10, smoothing), (1./3.)), x[20], x[3])
 
     # # Between top compartment and cover [W m^{-2}]
     # addAux(gl, 'hTopCovIn', sensible(params[50]*nthroot(abs(x.tTop-x.tCovIn),3)*p[47]/p[46],
     #     x.tTop, x.tCovIn))
-    a[154] = sensible(p[50] * ca.constpow(ca.fabs(x[3] - x[5] + 1e-10), (1./3.)) * p[47] / p[46], x[3], x[5])
+    a[154] = sensible(p[50] * ca.constpow(smoothAbs(x[3] - x[5] + 1e-10, smoothing), (1./3.)) * p[47] / p[46], x[3], x[5])
 
     # # Between top compartment and outside air [W m^{-2}]
     # addAux(gl, 'hTopOut', sensible(p[111]*p[23]*gl.a[136], x.tTop, d.tOut))
@@ -875,7 +889,7 @@ def update(x, u, d, p):
     # addAux(gl, 'hPipeAir', sensible(
     #     1.99*pi*p[105]*p[107]*(abs(x.tPipe-x.tAir)).^0.32,
     #     x.tPipe, x.tAir))
-    a[157] = sensible(1.99 * ca.pi * p[105] * p[107] * ca.constpow(ca.fabs(x[9] - x[2] + 1e-10), 0.32), x[9], x[2])
+    a[157] = sensible(1.99 * ca.pi * p[105] * p[107] * ca.constpow(smoothAbs(x[9] - x[2] + 1e-10, smoothing), 0.32), x[9], x[2])
 
     # # Between floor and soil layer 1 [W m^{-2}]
     # addAux(gl, 'hFlrSo1', sensible(
@@ -923,7 +937,7 @@ def update(x, u, d, p):
     # addAux(gl, 'hGroPipeAir', sensible(
         # 1.99*pi*p[167]*p[166]*(abs(x.tGroPipe-x.tAir)).^0.32, 
     #     x.tGroPipe, x.tAir))
-    a[166] = sensible(1.99 * ca.pi * p[167] * p[166] * ca.constpow(ca.fabs(x[19] - x[2] + 1e-10), 0.32), x[19], x[2])
+    a[166] = sensible(1.99 * ca.pi * p[167] * p[166] * ca.constpow(smoothAbs(x[19] - x[2] + 1e-10, smoothing), 0.32), x[19], x[2])
 
     # # Between interlights and air in main compartment [W m^{-2}]
     # # Equation A30 [5]
@@ -952,13 +966,13 @@ def update(x, u, d, p):
     # CO2 influence on stomatal resistance [-]
     # Equation 49 [1]
     # addAux(gl, 'rfCo2', min(1.5, 1 + gl.a[169].* (p[7]*x.co2Air-200).^2))
-    a[172] = ca.fmin(1.5, 1. + a[169] * ca.constpow((p[7] * x[0] - 200), 2))
+    a[172] = smoothMin(1.5, 1. + a[169] * ca.constpow((p[7] * x[0] - 200), 2), smoothing)
         # perhpas replace p[7]*x.co2Air with a[138]
 
     # Vapor pressure influence on stomatal resistance [-]
     # Equation 49 [1]
     # addAux(gl, 'rfVp', min(5.8, 1+gl.a[170].*(satVP(x.tCan)-x.vpAir).^2))
-    a[173] = ca.fmin(5.8, 1. + a[170] * ca.constpow((satVP(x[4]) - x[15]), 2))
+    a[173] = smoothMin(5.8, 1. + a[170] * ca.constpow((satVP(x[4]) - x[15]), 2), smoothing)
 
     # Stomatal resistance [s m^{-1}]
     # Equation 48 [1]
@@ -992,19 +1006,19 @@ def update(x, u, d, p):
     # Table 4 [1], Equation 42 [1]
     # addAux(gl, 'mvAirThScr', cond(1.7*u.thScr.*nthroot(abs(x.tAir-x.tThScr),3), 
     #     x.vpAir, satVP(x.tThScr)))
-    a[181] = cond(1.7 * u[2] * ca.constpow(ca.fabs(x[2] - x[7] + 1e-10), (1./3.)), x[15], satVP(x[7]))
+    a[181] = cond(1.7 * u[2] * ca.constpow(smoothAbs(x[2] - x[7] + 1e-10, smoothing), (1./3.)), x[15], satVP(x[7]))
 
     # Condensation from main compartment on blackout screen [kg m^{-2} s^{-1}]
     # Equatio A39 [5], Equation 7.39 [7]
     # addAux(gl, 'mvAirBlScr', cond(1.7*u.blScr.*nthroot(abs(x.tAir-x.tBlScr),3), 
     #     x.vpAir, satVP(x.tBlScr)))
-    a[182] = cond(1.7 * u[5] * ca.constpow(ca.fabs(x[2] - x[20] + 1e-10), (1./3.)), x[15], satVP(x[20]))
+    a[182] = cond(1.7 * u[5] * ca.constpow(smoothAbs(x[2] - x[20] + 1e-10, smoothing), (1./3.)), x[15], satVP(x[20]))
 
     # Condensation from top compartment to cover [kg m^{-2} s^{-1}]
     # Table 4 [1]
     # addAux(gl, 'mvTopCovIn', cond(params[50]*nthroot(abs(x.tTop-x.tCovIn),3)*p[47]/p[46],
     #     x.vpTop, satVP(x.tCovIn)))
-    a[183] = cond(p[50]* ca.constpow(ca.fabs(x[3] - x[5] + 1e-10), (1./3.)) * p[47]/p[46], x[16], satVP(x[5]))
+    a[183] = cond(p[50]* ca.constpow(smoothAbs(x[3] - x[5] + 1e-10, smoothing), (1./3.)) * p[47]/p[46], x[16], satVP(x[5]))
 
     # Vapor flux from main to top compartment [kg m^{-2} s^{-1}]
     # addAux(gl, 'mvAirTop', airMv(gl.a[144], x.vpAir, x.vpTop, x.tAir, x.tTop))
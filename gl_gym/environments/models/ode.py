@@ -1,7 +1,7 @@
 import casadi as ca
 import numpy as np
 
-def ODE(x: np.ndarray, u: np.ndarray, d: np.ndarray, p: np.ndarray):
+def ODE(x: np.ndarray, u: np.ndarray, d: np.ndarray, p: np.ndarray, smoothing: float = 0.):
     """
     Computes the time derivatives of the state variables
     for a greenhouse climate and crop model.
@@ -11,13 +11,14 @@ def ODE(x: np.ndarray, u: np.ndarray, d: np.ndarray, p: np.ndarray):
         u (array-like): Control input vector.
         d (array-like): Disturbance vector (e.g., external weather conditions).
         p (array-like): Parameter vector containing model parameters and constants.
+        smoothing (float): Smoothing of the kinks of the model, e.g., for gradient-based optimisation. 0 gives the original model.
     Returns
         dxdt (casadi.SX): Vector of time derivatives for each state variable.
     """
     from gl_gym.environments.models.aux_states import update
 
     # Compute the auxiliary variables
-    a = update(x, u, d, p)
+    a = update(x, u, d, p, smoothing)
     dxdt = ca.SX.zeros(x.shape[0])
 
     # Carbon concentration of main compartment [mg m^{-3} s^{-1}]
@@ -1,10 +1,12 @@
+from typing import Optional
+
 import casadi as ca
 import numpy as np
 import pandas as pd
 
 from gl_gym.environments.models.ode import ODE
 
-def define_model(nx: int, nu: int, nd: int, n_params: int, dt: float):
+def define_model(nx: int, nu: int, nd: int, n_params: int, dt: float, abstol: float = 1e-4, reltol: float = 1e-4):
     """
     Defines a CasADi integrator model for a given system's ODE.
 
@@ -14,6 +16,8 @@ def define_model(nx: int, nu: int, nd: int, n_params: int, dt: float):
         nd (int): Number of disturbance variables.
         n_params (int): Number of model parameters.
         dt (float): Integration time step.
+        abstol (float): Absolute tolerance of cvodes.
+        reltol (float): Relative tolerance of cvodes.
 
     Returns:
         casadi.integrator: A CasADi integrator object configured for the system ODE.
@@ -27,7 +31,7 @@ def define_model(nx: int, nu: int, nd: int, n_params: int, dt: float):
     dxdt = ODE(x, u, d, p)
     input_args_sym = ca.vertcat(d, p)
 
-    int_opts = {"abstol": 1e-4, "reltol": 1e-4, "max_num_steps": 7e4}
+    int_opts = {"abstol": abstol, "reltol": reltol, "max_num_steps": 7e4}
     # int_opts = {}
     F = ca.integrator(
         "F", "cvodes",
@@ -37,6 +41,247 @@ def define_model(nx: int, nu: int, nd: int, n_params: int, dt: float):
 
     return F
 
+# states of the crop (carbohydrate buffer, leaves, stem, fruit), temperature sum and time
+CROP_STATES = list(range(22, 28))
+
+def define_multirate_model(
+    nx: int,
+    nu: int,
+    nd: int,
+    n_params: int,
+    dt: float,
+    crop_substeps: int = 1,
+    abstol: float = 1e-4,
+    reltol: float = 1e-4,
+):
+    """
+    Defines a multi-rate, operator-splitting integrator of the system ODE with the interface of `define_model`.
+
+    Within a crop sub-step of dt/crop_substeps the crop states (CROP_STATES) are frozen, and only the fast
+    climate states are integrated by cvodes. The crop fluxes are integrated as quadratures along the climate
+    trajectory, and the crop states are updated with these averaged fluxes at the end of the sub-step.
+    The stiff Newton iterations of cvodes then only involve the climate states.
+
+    Args:
+        nx (int): Number of state variables.
+        nu (int): Number of control input variables.
+        nd (int): Number of disturbance variables.
+        n_params (int): Number of model parameters.
+        dt (float): Integration time step.
+        crop_substeps (int): Number of crop updates per time step.
+        abstol (float): Absolute tolerance of cvodes.
+        reltol (float): Relative tolerance of cvodes.
+
+    Returns:
+        casadi.Function: (x0, u, p) -> xf, with p = [d; params], called as the integrator of `define_model`.
+    """
+    fast = [i for i in range(nx) if i not in CROP_STATES]
+    slow = [i for i in range(nx) if i in CROP_STATES]
+
+    x_fast = ca.SX.sym("x_fast", len(fast))
+    x_slow = ca.SX.sym("x_slow", len(slow))
+    u = ca.SX.sym("u", nu)
+    d = ca.SX.sym("d", nd)
+    p = ca.SX.sym("p", n_params)
+    x = ca.SX.zeros(nx)
+    x[fast] = x_fast
+    x[slow] = x_slow
+
+    dxdt = ODE(x, u, d, p)
+    int_opts = {"abstol": abstol, "reltol": reltol, "max_num_steps": 7e4}
+    F_fast = ca.integrator(
+        "F_fast", "cvodes",
+        {"x": x_fast, "u": u, "p": ca.vertcat(x_slow, d, p), "ode": dxdt[fast], "quad": dxdt[slow]},
+        0.0, dt/crop_substeps, int_opts
+    )
+
+    # one crop sub-step: climate with frozen crop states, then the crop update with the integrated fluxes
+    xk = ca.MX.sym("x", nx)
+    uk = ca.MX.sym("u", nu)
+    dp = ca.MX.sym("p", nd+n_params)
+    res = F_fast(x0=xk[fast], u=uk, p=ca.vertcat(xk[slow], dp))
+    x_next = ca.MX.zeros(nx)
+    x_next[fast] = res["xf"]
+    x_next[slow] = xk[slow] + res["qf"]
+    substep = ca.Function("substep", [xk, uk, dp], [x_next])
+
+    xf = xk
+    for _ in range(crop_substeps):
+        xf = substep(xf, uk, dp)
+    return ca.Function("F_multirate", [xk, uk, dp], [xf], ["x0", "u", "p"], ["xf"])
+
+# external cover temperature and top lamp temperature, the internal and external cover temperatures
+# cannot both be in quasi-steady state, their coupled steady state becomes singular under condensation
+QSS_STATES = [6, 17]
+
+def define_reduced_model(
+    nx: int,
+    nu: int,
+    nd: int,
+    n_params: int,
+    dt: float,
+    qss_states: list = QSS_STATES,
+    abstol: float = 1e-4,
+    reltol: float = 1e-4,
+):
+    """
+    Defines a reduced-order model with the interface of `define_model`, in which the fast states
+    `qss_states` are replaced by their quasi-steady state, dx_i/dt = 0.
+
+    The resulting semi-explicit DAE is integrated with idas, the quasi-steady states are algebraic
+    variables that are initialised consistently from the given state at the start of every step.
+    States with a degenerate steady state, e.g., the temperature of lamps or screens that are not
+    installed, cannot be reduced.
+
+    Args:
+        nx (int): Number of state variables.
+        nu (int): Number of control input variables.
+        nd (int): Number of disturbance variables.
+        n_params (int): Number of model parameters.
+        dt (float): Integration time step.
+        qss_states (list): Indices of the states in quasi-steady state.
+        abstol (float): Absolute tolerance of idas.
+        reltol (float): Relative tolerance of idas.
+
+    Returns:
+        casadi.Function: (x0, u, p) -> xf, with p = [d; params], called as the integrator of `define_model`.
+    """
+    diff = [i for i in range(nx) if i not in qss_states]
+    alg = [i for i in range(nx) if i in qss_states]
+
+    x_diff = ca.SX.sym("x_diff", len(diff))
+    z = ca.SX.sym("z", len(alg))
+    u = ca.SX.sym("u", nu)
+    d = ca.SX.sym("d", nd)
+    p = ca.SX.sym("p", n_params)
+    x = ca.SX.zeros(nx)
+    x[diff] = x_diff
+    x[alg] = z
+
+    dxdt = ODE(x, u, d, p)
+    int_opts = {"abstol": abstol, "reltol": reltol, "max_num_steps": 7e4}
+    F_dae = ca.integrator(
+        "F_reduced", "idas",
+        {"x": x_diff, "z": z, "u": u, "p": ca.vertcat(d, p), "ode": dxdt[diff], "alg": dxdt[alg]},
+        0.0, dt, int_opts
+    )
+
+    xk = ca.MX.sym("x", nx)
+    uk = ca.MX.sym("u", nu)
+    dp = ca.MX.sym("p", nd+n_params)
+    res = F_dae(x0=xk[diff], z0=xk[alg], u=uk, p=dp)
+    xf = ca.MX.zeros(nx)
+    xf[diff] = res["xf"]
+    xf[alg] = res["zf"]
+    return ca.Function("F_reduced", [xk, uk, dp], [xf], ["x0", "u", "p"], ["xf"])
+
+def define_repeat_model(
+    nx: int,
+    nu: int,
+    nd: int,
+    n_params: int,
+    dt: float,
+    n_intervals: int,
+    abstol: float = 1e-4,
+    reltol: float = 1e-4,
+):
+    """
+    Defines a model that applies the same control input for `n_intervals` consecutive time steps,
+    integrated by a single cvodes call with an output grid at every time step.
+
+    The weather is piecewise constant on the grid, as in `define_model`, and is therefore passed
+    together with the control input as the (piecewise constant) input u of the integrator.
+    The states at the grid points are the same as those of `n_intervals` calls of `define_model`,
+    but the solver is not restarted in between.
+
+    Args:
+        nx (int): Number of state variables.
+        nu (int): Number of control input variables.
+        nd (int): Number of disturbance variables.
+        n_params (int): Number of model parameters.
+        dt (float): Integration time step.
+        n_intervals (int): Number of time steps per call.
+        abstol (float): Absolute tolerance of cvodes.
+        reltol (float): Relative tolerance of cvodes.
+
+    Returns:
+        casadi.Function: (x0, u, d, p) -> xf, with d the (nd, n_intervals) weather
+            and xf the (nx, n_intervals) states at the end of every time step.
+    """
+    x = ca.SX.sym("x", nx)
+    u = ca.SX.sym("u", nu)
+    d = ca.SX.sym("d", nd)
+    p = ca.SX.sym("p", n_params)
+
+    int_opts = {"abstol": abstol, "reltol": reltol, "max_num_steps": 7e4}
+    F_grid = ca.integrator(
+        "F_grid", "cvodes",
+        {"x": x, "u": ca.vertcat(u, d), "p": p, "ode": ODE(x, u, d, p)},
+        0.0, [dt*(k+1) for k in range(n_intervals)], int_opts
+    )
+
+    xk = ca.MX.sym("x", nx)
+    uk = ca.MX.sym("u", nu)
+    D = ca.MX.sym("d", nd, n_intervals)
+    pk = ca.MX.sym("p", n_params)
+    xf = F_grid(x0=xk, u=ca.vertcat(ca.repmat(uk, 1, n_intervals), D), p=pk)["xf"]
+    return ca.Function("F_repeat", [xk, uk, D, pk], [xf], ["x0", "u", "d", "p"], ["xf"])
+
+def define_closed_loop_model(
+    nx: int, nu: int, nd: int, n_params: int, dt: float, controller: ca.Function, feedback: bool = False, F: Optional[ca.Function] = None
+):
+    """
+    Defines a single closed-loop step of the greenhouse model with a symbolic controller,
+    such that complete seasons can be simulated in CasADi with `mapaccum`.
+
+    The accumulated input is z = [x; hour_of_day; day_of_year], the controller is evaluated
+    at the start of the step (zero-order hold), similar to `TomatoEnv.step_raw_control`.
+    With feedback=True the controller is embedded in the ODE instead, and the control inputs
+    are updated at every solver sub-step as in the original GreenLight model.
+
+    Args:
+        nx (int): Number of state variables.
+        nu (int): Number of control input variables.
+        nd (int): Number of disturbance variables.
+        n_params (int): Number of model parameters.
+        dt (float): Integration time step.
+        controller (casadi.Function): control law u = f(x, d, [hour_of_day, day_of_year]).
+        feedback (bool): Whether to evaluate the controller within the integration step.
+        F (casadi.Function): the discrete step with the interface of `define_model`, e.g., the configured integrator
+            of the environment. Defaults to `define_model`. Cannot be combined with feedback=True.
+
+    Returns:
+        casadi.Function: (z, d, p) -> (z_next, u), with u the control input at the start of the step.
+    """
+    if feedback and F is not None:
+        raise ValueError("With feedback=True the controller is embedded in the ODE, a discrete step F cannot be used")
+    z = ca.MX.sym("z", nx+2)
+    d = ca.MX.sym("d", nd)
+    p = ca.MX.sym("p", n_params)
+    x, t = z[:nx], z[nx:]
+    u = controller(x, d, t)
+
+    if feedback:
+        xs = ca.SX.sym("x", nx)
+        ds = ca.SX.sym("d", nd)
+        ps = ca.SX.sym("p", n_params)
+        ts = ca.SX.sym("t", 2)
+        tau = ca.SX.sym("tau")
+        us = controller(xs, ds, ca.vertcat(ca.fmod(ts[0] + tau/3600, 24), ts[1] + tau/86400))
+        int_opts = {"abstol": 1e-4, "reltol": 1e-4, "max_num_steps": 7e4}
+        F = ca.integrator(
+            "F_feedback", "cvodes",
+            {"x": xs, "t": tau, "p": ca.vertcat(ds, ps, ts), "ode": ODE(xs, us, ds, ps)},
+            0.0, dt, int_opts
+        )
+        xf = F(x0=x, p=ca.vertcat(d, p, t))["xf"]
+    else:
+        F = define_model(nx, nu, nd, n_params, dt) if F is None else F
+        xf = F(x0=x, u=u, p=ca.vertcat(d, p))["xf"]
+
+    t_next = ca.vertcat(ca.fmod(t[0] + dt/3600, 24), t[1] + (dt/86400) % 365)
+    return ca.Function("closed_loop", [z, d, p], [ca.vertcat(xf, t_next), u], ["z", "d", "p"], ["z_next", "u"])
+
 def satVp_cpp(temp):
     """
     Calculates saturation vapor pressure.
@@ -227,7 +472,7 @@ def vaporPres2rh(temp, vaporPres):
     Returns:
         float: Relative humidity in percentage.
     """
-    return ca.fmin(100*vaporPres/satVp(temp), 100)
+    return np.fmin(100*vaporPres/satVp(temp), 100)
 
 def convert_rh_ppm(X: np.ndarray) -> np.ndarray:
     """
@@ -241,5 +486,5 @@ def convert_rh_ppm(X: np.ndarray) -> np.ndarray:
         np.ndarray: Converted array with CO2 concentration in ppm and relative humidity.
     """
     X[0, : ] = co2dens2ppm(X[2, :], X[0, :]*1e-6)
-    X[15, :] = vaporPres2rh(X[2, :], X[15, :]).toarray().ravel()
+    X[15, :] = np.asarray(vaporPres2rh(X[2, :], X[15, :])).ravel()
     return X
@@ -0,0 +1,321 @@
+import time
+
+import numpy as np
+import casadi as ca
+
+from gl_gym.environments.models.ode import ODE
+
+# typical magnitudes of the states, used to scale the decision variables and the dynamics constraints
+X_NOMINAL = np.array(
+    [1e3, 1e3] +            # co2Air, co2Top [mg m^-3]
+    [20.]*13 +              # tAir ... tSo5 [°C]
+    [1.5e3, 1.5e3] +        # vpAir, vpTop [Pa]
+    [20.]*5 +               # tLamp, tIntLamp, tGroPipe, tBlScr, tCan24 [°C]
+    [1e4, 1e5, 1e5, 1e5] +  # cBuf, cLeaf, cStem, cFruit [mg{CH2O} m^-2]
+    [1e3, 1e2]              # tCanSum [°C day], time [days]
+)
+
+
+class EconomicMPC:
+    """
+    Economic model predictive controller for the GreenLight model.
+
+    Solves a multiple-shooting NLP over the prediction horizon of the environment at every time step.
+    The dynamics in each shooting interval are discretised with Radau collocation, which is stable
+    for the stiff greenhouse climate dynamics (explicit Runge-Kutta schemes require step sizes of seconds).
+    The objective is the (scaled) reward of `GreenhouseReward`: fruit growth revenue minus heating,
+    CO2 and electricity costs, with the climate constraints as soft constraints via slack variables.
+    The weather forecast over the horizon is assumed to be perfect.
+
+    The kinks of the model (e.g., the convective fluxes through the screens and the minima and maxima)
+    are smoothed in the NLP, without smoothing the solver cycles between the sides of a kink at longer horizons.
+    A solve without a previous solution starts from a simulation of the current control input over the horizon.
+
+    Args:
+        env: the GreenLight environment (TomatoEnv) to control.
+        Np (int): number of control intervals in the horizon. Defaults to the forecast horizon of the env.
+        collocation_degree (int): number of Radau collocation points per interval.
+        smoothing (float): smoothing of the kinks of the model in the NLP, see `ODE`.
+        solver (str): NLP solver, `ipopt` or `sqpmethod`.
+        max_iter (int): maximum number of solver iterations per step.
+        tol (float): solver tolerance.
+        hessian_approximation (str): `exact` or `limited-memory` (ipopt only).
+        codegen (bool): JIT-compile the NLP functions to C (requires a C compiler).
+        verbose (bool): print solver output.
+    """
+    def __init__(
+        self,
+        env,
+        Np=None,
+        collocation_degree=2,
+        smoothing=1e-3,
+        solver="ipopt",
+        max_iter=300,
+        tol=1e-4,
+        hessian_approximation="exact",
+        codegen=False,
+        verbose=False,
+    ):
+        self.nx, self.nu, self.nd, self.n_params = env.nx, env.nu, env.nd, env.num_params
+        self.dt = env.dt
+        self.Np = env.Np if Np is None else Np
+        self.u_min, self.u_max = env.u_min, env.u_max
+        self.delta_u_max = env.delta_u_max
+        self.constraints_low = env.constraints_low
+        self.constraints_high = env.constraints_high
+        self.reward = env.reward
+        self.degree = collocation_degree
+        self.smoothing = smoothing
+
+        self._build_nlp(solver, max_iter, tol, hessian_approximation, codegen, verbose)
+        self.solve_times = []
+        self.solver_stats = []
+        self.reset()
+
+    def reset(self):
+        """Forget the previous solution, the next solve starts from a simulation of the current control input."""
+        self.w0 = None
+        self.lam_x0 = None
+        self.lam_g0 = None
+
+    def _collocation_matrices(self):
+        """Radau collocation: coefficients of the derivative (C) and the end point (D) of the interpolating polynomial."""
+        tau = np.append(0, ca.collocation_points(self.degree, "radau"))
+        C = np.zeros((self.degree+1, self.degree+1))
+        D = np.zeros(self.degree+1)
+        for j in range(self.degree+1):
+            # Lagrange polynomial that is 1 at tau[j] and 0 at the other points
+            poly = np.poly1d([1])
+            for r in range(self.degree+1):
+                if r != j:
+                    poly *= np.poly1d([1, -tau[r]]) / (tau[j] - tau[r])
+            D[j] = poly(1.0)
+            dpoly = np.polyder(poly)
+            for r in range(self.degree+1):
+                C[j, r] = dpoly(tau[r])
+        return C, D
+
+    def _state_bounds(self):
+        """
+        Physical bounds on the states. Keeps the solver iterates in the region where the model is defined,
+        e.g., non-negative CO2 concentrations, vapour pressures and carbohydrate buffers.
+        """
+        x_min = np.full(self.nx, -np.inf)
+        x_max = np.full(self.nx, np.inf)
+        x_min[[0, 1, 15, 16, 22, 23, 24, 25]] = 0                       # co2, vapour pressure, carbohydrates
+        temperatures = [2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 17, 18, 19, 20, 21]
+        x_min[temperatures] = -50
+        x_max[temperatures] = 150
+        return x_min, x_max
+
+    def _stage_reward(self, x, x_next, u, p):
+        """Scaled economic reward of a single time step, the profit of `GreenhouseReward.compute_reward`."""
+        r = self.reward
+        return r.scale_reward(r.step_profit(x, x_next, u, p), r.min_profit, r.max_profit)
+
+    def _build_nlp(self, solver, max_iter, tol, hessian_approximation, codegen, verbose):
+        x = ca.SX.sym("x", self.nx)
+        u = ca.SX.sym("u", self.nu)
+        d = ca.SX.sym("d", self.nd)
+        p = ca.SX.sym("p", self.n_params)
+        dxdt = ODE(x, u, d, p, self.smoothing)
+        f = ca.Function("f", [x, u, d, p], [dxdt])
+        C, D = self._collocation_matrices()
+        # simulates an interval of the smoothed model, with the states at the collocation points as outputs
+        tau = ca.collocation_points(self.degree, "radau")
+        self.rollout = ca.integrator(
+            "rollout", "cvodes", {"x": x, "u": u, "p": ca.vertcat(d, p), "ode": dxdt},
+            0.0, [self.dt*t for t in tau], {"abstol": 1e-6, "reltol": 1e-6, "max_num_steps": 7e4}
+        )
+
+        # NLP parameters: initial state, previous control input, weather forecast, model parameters
+        x0 = ca.MX.sym("x0", self.nx)
+        u_prev = ca.MX.sym("u_prev", self.nu)
+        Dk = ca.MX.sym("D", self.nd, self.Np)
+        P = ca.MX.sym("P", self.n_params)
+
+        # the states are optimised in scaled form, X = x_nom * X_scaled
+        x_nom = X_NOMINAL
+        X_scaled = ca.MX.sym("X", self.nx, self.Np+1)
+        XC_scaled = ca.MX.sym("XC", self.nx, self.Np*self.degree)
+        X = ca.repmat(x_nom, 1, self.Np+1) * X_scaled
+        XC = ca.repmat(x_nom, 1, self.Np*self.degree) * XC_scaled
+        U = ca.MX.sym("U", self.nu, self.Np)
+        S = ca.MX.sym("S", 3, self.Np)
+
+        g, lbg, ubg = [(X[:, 0] - x0) / x_nom], [np.zeros(self.nx)], [np.zeros(self.nx)]
+        J = 0
+        max_violations = self.reward.max_state_violations
+        for k in range(self.Np):
+            # collocation equations of the shooting interval
+            Xk = [X[:, k]] + [XC[:, k*self.degree+j] for j in range(self.degree)]
+            x_end = D[0]*Xk[0]
+            for j in range(1, self.degree+1):
+                xp = sum(C[r, j]*Xk[r] for r in range(self.degree+1))
+                g.append((self.dt*f(Xk[j], U[:, k], Dk[:, k], P) - xp) / x_nom)
+                lbg.append(np.zeros(self.nx)); ubg.append(np.zeros(self.nx))
+                x_end = x_end + D[j]*Xk[j]
+            # continuity between the shooting intervals
+            g.append((X[:, k+1] - x_end) / x_nom)
+            lbg.append(np.zeros(self.nx)); ubg.append(np.zeros(self.nx))
+
+            # rate constraints on the control inputs
+            g.append(U[:, k] - (u_prev if k == 0 else U[:, k-1]))
+            lbg.append(-self.delta_u_max); ubg.append(self.delta_u_max)
+
+            # soft climate constraints, the slacks are scaled by the maximum violations
+            y = ca.vertcat(*self.reward.climate_outputs(X[:, k+1])) / max_violations
+            g.append(y + S[:, k]); lbg.append(self.constraints_low / max_violations); ubg.append(np.full(3, np.inf))
+            g.append(y - S[:, k]); lbg.append(np.full(3, -np.inf)); ubg.append(self.constraints_high / max_violations)
+
+            J -= self._stage_reward(X[:, k], X[:, k+1], U[:, k], P)
+            J += ca.sum1(S[:, k])
+
+        self._w_shapes = [X.shape, XC.shape, U.shape, S.shape]
+        w = ca.vertcat(*[ca.vec(v) for v in [X_scaled, XC_scaled, U, S]])
+        x_min, x_max = self._state_bounds()
+        x_min, x_max = x_min / x_nom, x_max / x_nom
+        n_states = self.Np+1 + self.Np*self.degree
+        self.lbw = np.concatenate([
+            np.tile(x_min, n_states),
+            np.tile(self.u_min, self.Np),
+            np.zeros(S.numel()),
+        ])
+        self.ubw = np.concatenate([
+            np.tile(x_max, n_states),
+            np.tile(self.u_max, self.Np),
+            np.full(S.numel(), np.inf),
+        ])
+        self.lbg = np.concatenate(lbg)
+        self.ubg = np.concatenate(ubg)
+
+        nlp = {"x": w, "p": ca.vertcat(x0, u_prev, ca.vec(Dk), P), "f": J, "g": ca.vertcat(*g)}
+        opts = {"print_time": verbose}
+        if codegen:
+            opts.update({"jit": True, "compiler": "shell", "jit_options": {"flags": ["-O1"]}})
+        warm_opts = opts
+        if solver == "ipopt":
+            ipopt_opts = {
+                "max_iter": max_iter,
+                "tol": tol,
+                "print_level": 5 if verbose else 0,
+                "hessian_approximation": hessian_approximation,
+                "mu_strategy": "monotone",
+                "sb": "yes",
+            }
+            # the rollout is feasible up to the collocation error, a cold start stays close to it
+            opts["ipopt"] = dict(ipopt_opts, mu_init=1e-2, bound_push=1e-4, bound_frac=1e-4)
+            # a warm start begins with a small barrier parameter and keeps the iterates close to the shifted solution
+            warm_opts = dict(opts, ipopt=dict(
+                ipopt_opts, warm_start_init_point="yes", mu_init=1e-5,
+                warm_start_bound_push=1e-6, warm_start_slack_bound_push=1e-6, warm_start_mult_bound_push=1e-6,
+            ))
+        else:
+            opts.update({"max_iter": max_iter, "tol_pr": tol, "tol_du": tol, "print_header": verbose, "print_iteration": verbose})
+            opts.update({"qpsol": "qrqp", "qpsol_options": {"print_iter": False, "print_header": False, "error_on_fail": False}})
+            if hessian_approximation == "limited-memory":
+                opts["hessian_approximation"] = "limited-memory"
+        self.solver = ca.nlpsol("mpc", solver, nlp, opts)
+        self.warm_solver = ca.nlpsol("mpc_warm", solver, nlp, warm_opts)
+
+    def _split(self, w, unscale=True):
+        """Splits the decision variables into the (unscaled) states, collocation states, controls and slacks."""
+        out, i = [], 0
+        for shape in self._w_shapes:
+            n = shape[0]*shape[1]
+            out.append(np.reshape(w[i:i+n], shape, order="F"))
+            i += n
+        if unscale:
+            out[0] = out[0] * X_NOMINAL[:, None]
+            out[1] = out[1] * X_NOMINAL[:, None]
+        return out
+
+    def _join(self, X, XC, U, S):
+        X, XC = X / X_NOMINAL[:, None], XC / X_NOMINAL[:, None]
+        return np.concatenate([v.flatten(order="F") for v in [X, XC, U, S]])
+
+    def _initial_guess(self, x0, u_prev, d, p):
+        if self.w0 is None:
+            # simulate the current control input over the horizon
+            X, XC = [x0], []
+            for k in range(self.Np):
+                xc = self.rollout(x0=X[-1], u=u_prev, p=np.concatenate([d[k], p]))["xf"].full()
+                XC.append(xc)
+                X.append(xc[:, -1])
+            X, XC = np.column_stack(X), np.column_stack(XC)
+            U = np.tile(u_prev[:, None], (1, self.Np))
+            # the smallest slacks for the simulated climate
+            y = np.array(self.reward.climate_outputs(X[:, 1:]))
+            violations = np.fmax(self.constraints_low[:, None] - y, 0) + np.fmax(y - self.constraints_high[:, None], 0)
+            S = violations / self.reward.max_state_violations[:, None]
+            return self._join(X, XC, U, S), {}
+
+        # shift the previous solution and its multipliers one interval and repeat the last interval
+        X, XC, U, S = self._shift(*self._split(self.w0))
+        X[:, 0] = x0
+        lam_x0 = np.concatenate([v.flatten(order="F") for v in self._shift(*self._split(self.lam_x0, unscale=False))])
+        # the constraints of an interval are contiguous, after the initial state constraint,
+        # the continuity constraint of the first interval becomes the initial state constraint
+        lam_intervals = self.lam_g0[self.nx:].reshape(self.Np, -1)
+        lam_init = lam_intervals[0, self.degree*self.nx:(self.degree+1)*self.nx]
+        lam_g0 = np.concatenate([lam_init, lam_intervals[1:].ravel(), lam_intervals[-1]])
+        return self._join(X, XC, U, S), {"lam_x0": lam_x0, "lam_g0": lam_g0}
+
+    def _shift(self, X, XC, U, S):
+        """Shifts the trajectories of the decision variables one interval and repeats the last interval."""
+        X = np.column_stack([X[:, 1:], X[:, -1]])
+        XC = np.column_stack([XC[:, self.degree:], XC[:, -self.degree:]])
+        U = np.column_stack([U[:, 1:], U[:, -1]])
+        S = np.column_stack([S[:, 1:], S[:, -1]])
+        return X, XC, U, S
+
+    def solve(self, x0, u_prev, d, p):
+        """
+        Solves the NLP for the current state.
+
+        Args:
+            x0 (np.ndarray): current state
+            u_prev (np.ndarray): control input that is currently applied
+            d (np.ndarray): weather forecast over the horizon, shape (Np, nd)
+            p (np.ndarray): model parameters
+        Returns:
+            U (np.ndarray): optimal control inputs over the horizon, shape (Np, nu)
+            X (np.ndarray): predicted states over the horizon, shape (Np+1, nx)
+        """
+        x0 = np.asarray(x0, dtype=float)
+        u_prev = np.asarray(u_prev, dtype=float)
+        d = np.asarray(d, dtype=float)[:self.Np]
+        w0, multipliers = self._initial_guess(x0, u_prev, d, p)
+        params = np.concatenate([x0, u_prev, d.T.flatten(order="F"), p])
+
+        solver = self.warm_solver if multipliers else self.solver
+        start = time.perf_counter()
+        sol = solver(x0=w0, p=params, lbx=self.lbw, ubx=self.ubw, lbg=self.lbg, ubg=self.ubg, **multipliers)
+        self.solve_times.append(time.perf_counter() - start)
+        self.solver_stats.append(solver.stats()["return_status"])
+
+        w_opt = sol["x"].full().flatten()
+        if solver.stats()["success"]:
+            self.w0 = w_opt
+            self.lam_x0 = sol["lam_x"].full().flatten()
+            self.lam_g0 = sol["lam_g"].full().flatten()
+        else:
+            # do not warm start from a failed solve
+            self.reset()
+        X, _, U, _ = self._split(w_opt)
+        return U.T, X.T
+
+    def predict(self, x, d, env):
+        """
+        Returns the first control input of the optimal plan, like `RuleBasedController.predict`.
+
+        Args:
+            x (np.ndarray): current state
+            d (np.ndarray): weather forecast over the horizon, shape (Np, nd)
+            env: the environment, provides the applied control input and the model parameters
+        """
+        U, _ = self.solve(x, env.u, d, env.p)
+        # feasible up to the solver tolerance, or not at all if the solve failed
+        u_low = np.maximum(self.u_min, env.u - self.delta_u_max)
+        u_high = np.minimum(self.u_max, env.u + self.delta_u_max)
+        return np.clip(U[0], u_low, u_high)
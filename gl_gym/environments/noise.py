@@ -1,5 +1,8 @@
 import numpy as np
 
+# crop parameters that are perturbed by the parametric uncertainty
+CROP_PARAM_INDICES = np.arange(128, 162)
+
 def parametric_crop_uncertainty(parameters, uncertainty, RNG):
     """
     Adds uncertainty to a vector of parameters based on the uncertainty parameter.
@@ -13,7 +16,7 @@ def parametric_crop_uncertainty(parameters, uncertainty, RNG):
         np.ndarray: Parameter vector with added uncertainty.
     """
     # The following crop parameters in the parameter vector are perturbed
-    indices = np.arange(128, 162)
+    indices = CROP_PARAM_INDICES
     parameters = np.array(parameters)
     noise = RNG.uniform(-uncertainty/2, uncertainty/2, size=indices.shape)
     parameters[indices] += noise*parameters[indices]
@@ -21,3 +24,26 @@ def parametric_crop_uncertainty(parameters, uncertainty, RNG):
     # cLeafMax is dependent of laiMax and sla
     parameters[144] = parameters[141] /parameters[142]
     return parameters
+
+def parametric_ensemble(parameters, n_members, uncertainty, RNG, indices=None):
+    """
+    Samples an ensemble of perturbed parameter vectors, the batched version of `parametric_crop_uncertainty`.
+
+    Args:
+        parameters (np.ndarray): The original parameter vector.
+        n_members (int): Number of parameter vectors to sample.
+        uncertainty (float): The level of uncertainty to add.
+        RNG: random number generator.
+        indices (np.ndarray): Indices of the perturbed parameters, defaults to the crop parameters.
+
+    Returns:
+        np.ndarray: (n_members, n_params) matrix of perturbed parameter vectors.
+    """
+    indices = CROP_PARAM_INDICES if indices is None else np.asarray(indices)
+    parameters = np.tile(np.array(parameters), (n_members, 1))
+    noise = RNG.uniform(-uncertainty/2, uncertainty/2, size=(n_members, len(indices)))
+    parameters[:, indices] += noise*parameters[:, indices]
+
+    # cLeafMax is dependent of laiMax and sla
+    parameters[:, 144] = parameters[:, 141] / parameters[:, 142]
+    return parameters
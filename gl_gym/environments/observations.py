@@ -5,6 +5,7 @@ import numpy as np
 from gymnasium import spaces
 
 from gl_gym.environments.utils import co2dens2ppm, vaporPres2rh
+from gl_gym.environments.weather_forecast import forecast_weather
 
 class BaseObservations(ABC):
     """
@@ -162,12 +163,20 @@ class TimeObservations(BaseObservations):
 
 class WeatherForecastObservations(BaseObservations):
     """Observer module, which gives control over the observations we want to our RL algorithm to use.
+    The forecasts of the whole episode are generated at once when the weather data changes (see `forecast_weather`),
+    configured by the `weather_forecast` parameters of the environment: the horizon [days] and the error profile.
     """
     def __init__(self, env) -> None:
         self.env = env
-        self.n_obs = 5*self.env.Np
-        self.obs_names = ["glob_rad", "temp_out", "rh_out", "co2_out", "wind_speed"]*self.env.Np
-
+        params = getattr(self.env, "weather_forecast", None) or {}
+        horizon = params.get("horizon")
+        self.Np = self.env.Np if horizon is None else int(horizon * self.env.c/self.env.dt)
+        if not 0 < self.Np <= self.env.Np:
+            raise ValueError(f"The forecast horizon must be positive and at most pred_horizon ({self.env.pred_horizon} days).")
+        self.n_obs = 5*self.Np
+        self.obs_names = ["glob_rad", "temp_out", "rh_out", "co2_out", "wind_speed"]*self.Np
+        self.forecasts = None
+        self._weather = None
 
     def observation_space(self):
         return spaces.Box(low=-1e-4, high=1e4, shape=(self.n_obs,), dtype=np.float32)
@@ -176,7 +185,15 @@ class WeatherForecastObservations(BaseObservations):
         """
         Compute, and retrieve observations from GreenLight and the weather.
         """
-        forecast = []
-        for i in range(1, self.env.Np+1):
-            forecast.extend(self.env.weather_data[self.env.timestep+i][0:5])        # Only the first 5 weather variables
-        return np.array(forecast)
\ No newline at end of file
+        if self._weather is not self.env.weather_data:
+            params = getattr(self.env, "weather_forecast", None) or {}
+            self.forecasts = forecast_weather(
+                self.env.weather_data,
+                self.Np,
+                self.env._np_random,
+                error_std=params.get("error_std"),
+                error_corr=params.get("error_corr", 0.99),
+                n_issues=self.env.N+1,
+            )
+            self._weather = self.env.weather_data
+        return self.forecasts[self.env.timestep].ravel()
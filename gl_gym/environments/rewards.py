@@ -2,6 +2,9 @@ from abc import ABC, abstractmethod
 from typing import SupportsFloat, List, Optional
 
 import numpy as np
+import casadi as ca
+
+from gl_gym.environments.models.utils import co2dens2ppm, vaporPres2rh
 
 class BaseReward(ABC):
     profit: float
@@ -161,12 +164,7 @@ class GreenhouseReward(BaseReward):
         Returns:
             float: The total variable costs.
         """
-        heating_energy = self.env.u[0] * self.env.p[108] / self.env.p[46] * self.env.dt/3600*1e-3   # convert W/aFlr to kWh/m2
-        elec_use = self.env.u[4] * self.env.p[172] * self.env.dt/3600*1e-3                          # convert W/aFlr to kWh/m2
-        co2_dosing = self.env.u[1] * self.env.p[109] / self.env.p[46] * self.env.dt * 1e-6          # convert to kg/m2
-        self.heat_costs = heating_energy * self.heating_price
-        self.co2_costs = co2_dosing * self.co2_price
-        self.elec_costs = elec_use * self.elec_price
+        self.heat_costs, self.co2_costs, self.elec_costs = self.control_costs(self.env.u)
         return sum([self.heat_costs, self.co2_costs, self.elec_costs])
 
     def _gains(self):
@@ -178,19 +176,21 @@ class GreenhouseReward(BaseReward):
         2. Converts the fruit DW to fruit fresh weight (FFW) in (kg/m2) using dmfm conversion factor
         3. Multiplies the daily FFW growth by the fruit price, which resembles €/kg.
         """
-        fruit_growth_dm = self.env.x[25] - self.env.x_prev[25]
-        fruit_growth_ffw = fruit_growth_dm * 1e-6 / self.dmfm
-        return fruit_growth_ffw * self.fruit_price
+        return self.fruit_value(self.env.x) - self.fruit_value(self.env.x_prev)
 
-    def output_violations(self):
+    def output_violations(self, outputs: Optional[np.ndarray] = None):
         """
         Function that computes the absolute penalties for violating system constraints.
         System constraints are currently non-dynamical, and based on observation bounds of gym environment.
         We do not look at dry mass bounds, since those are non-existent in real greenhouse.
+        The CO2 concentration, temperature and relative humidity are taken from the observation,
+        unless they are given as `outputs`, e.g., for time steps without an observation.
         """
-        lowerbound = self.env.constraints_low[:] - self.env.obs[[0, 1, 2]]
+        if outputs is None:
+            outputs = self.env.obs[[0, 1, 2]]
+        lowerbound = self.env.constraints_low[:] - outputs
         lowerbound[lowerbound < 0] = 0
-        upperbound = self.env.obs[[0, 1, 2]] - self.env.constraints_high[:]
+        upperbound = outputs - self.env.constraints_high[:]
         upperbound[upperbound < 0] = 0
         self.co2_violation = lowerbound[0] + upperbound[0]
         self.temp_violation = lowerbound[1] + upperbound[1]
@@ -215,13 +215,13 @@ class GreenhouseReward(BaseReward):
         self.control_violation()
         return self.lamp_violation * self.pen_lamp
 
-    def compute_reward(self) -> SupportsFloat:
+    def compute_reward(self, outputs: Optional[np.ndarray] = None) -> SupportsFloat:
         self.variable_costs = self._variable_costs()
         self.gains = self._gains()
         # self.profit = self.gains - self.variable_costs - self.fixed_costs
         self.profit = self.gains - self.variable_costs
 
-        violations = self.output_violations()
+        violations = self.output_violations(outputs)
         self.penalty = self.output_penalty_reward(violations)
         self.control_pen = self.control_penalty()
 
@@ -229,3 +229,50 @@ class GreenhouseReward(BaseReward):
         scaled_pen = np.sum(self.scale_reward(violations, self.min_state_violations, self.max_state_violations))
         # r_pen = self.scale_reward(self.penalty, 0, 1)
         return scaled_profit - scaled_pen - self.control_pen
+
+    def control_costs(self, u, p=None):
+        """
+        Heating, CO2 and electricity costs [€/m2] of the control input u over a time step, as in `_variable_costs`.
+        Like the other terms of the reward below, works on CasADi expressions and on numpy arrays
+        with the controls on the first axis. The model parameters p default to the nominal parameters of the environment.
+        """
+        p = self.env.p if p is None else p
+        dt = self.env.dt
+        heat_costs = u[0] * p[108] / p[46] * dt/3600*1e-3 * self.heating_price     # convert W/aFlr to kWh/m2
+        co2_costs = u[1] * p[109] / p[46] * dt * 1e-6 * self.co2_price              # convert to kg/m2
+        elec_costs = u[4] * p[172] * dt/3600*1e-3 * self.elec_price                 # convert W/aFlr to kWh/m2
+        return heat_costs, co2_costs, elec_costs
+
+    def fruit_value(self, x):
+        """Value [€/m2] of the fruit dry matter of the state x, the gains of `_gains` are its increase over a time step."""
+        return x[25] * 1e-6 / self.dmfm * self.fruit_price
+
+    def step_profit(self, x_prev, x, u, p=None):
+        """Gains minus the variable costs of a time step, the unscaled profit of `compute_reward`."""
+        return self.fruit_value(x) - self.fruit_value(x_prev) - sum(self.control_costs(u, p))
+
+    def climate_outputs(self, x):
+        """CO2 concentration [ppm], air temperature [°C] and relative humidity [%] of the state x, as in the observation."""
+        return co2dens2ppm(x[2], 1e-6*x[0]), x[2], vaporPres2rh(x[2], x[15])
+
+    def climate_violations(self, x):
+        """Violations of the CO2, temperature and humidity constraints by the state x, as in `output_violations`."""
+        low, high = self.env.constraints_low, self.env.constraints_high
+        return tuple(np.fmax(low[i] - y, 0) + np.fmax(y - high[i], 0) for i, y in enumerate(self.climate_outputs(x)))
+
+    def violation_penalty(self, x):
+        """Sum of the scaled violations of the state x, the penalty of `compute_reward`."""
+        bounds = zip(self.climate_violations(x), self.min_state_violations, self.max_state_violations)
+        return sum(self.scale_reward(v, min_v, max_v) for v, min_v, max_v in bounds)
+
+    def casadi_function(self, nx: int, nu: int) -> ca.Function:
+        """
+        Symbolic version of `compute_reward` for a single time step, (x_prev, x, u) -> reward,
+        with x the state at the end of the time step and u the control input that was applied.
+        The costs are computed with the nominal parameters of the environment, as in `compute_reward`.
+        """
+        x_prev = ca.SX.sym("x_prev", nx)
+        x = ca.SX.sym("x", nx)
+        u = ca.SX.sym("u", nu)
+        scaled_profit = self.scale_reward(self.step_profit(x_prev, x, u), self.min_profit, self.max_profit)
+        return ca.Function("reward", [x_prev, x, u], [scaled_profit - self.violation_penalty(x)], ["x_prev", "x", "u"], ["reward"])
@@ -0,0 +1,304 @@
+from typing import Any, Dict, List, Optional, Sequence, SupportsFloat, Tuple
+
+import numpy as np
+import pandas as pd
+import torch
+from torch import nn
+from stable_baselines3.common.vec_env import DummyVecEnv
+from stable_baselines3.common.vec_env.base_vec_env import VecEnvStepReturn
+
+from gl_gym.environments.tomato_env import TomatoEnv
+from gl_gym.environments.ensemble import EnsembleSimulator, ensemble_outputs
+from gl_gym.environments.noise import parametric_ensemble
+
+
+class SurrogateModel(nn.Module):
+    """
+    Residual MLP surrogate of the GreenLight step, x_next = x + f(x, u, d).
+
+    The inputs and the state increments are standardised with the statistics of the training data,
+    which are stored as buffers such that they are saved with the weights.
+
+    Args:
+        nx, nu, nd (int): model dimensions.
+        hidden_sizes (list): sizes of the hidden layers.
+    """
+    def __init__(self, nx: int, nu: int, nd: int, hidden_sizes: Sequence[int] = (256, 256, 256)):
+        super().__init__()
+        self.nx, self.nu, self.nd = nx, nu, nd
+        self.hidden_sizes = list(hidden_sizes)
+        layers, n_in = [], nx + nu + nd
+        for size in hidden_sizes:
+            layers += [nn.Linear(n_in, size), nn.SiLU()]
+            n_in = size
+        layers.append(nn.Linear(n_in, nx))
+        self.net = nn.Sequential(*layers)
+        self.register_buffer("in_mean", torch.zeros(nx + nu + nd))
+        self.register_buffer("in_std", torch.ones(nx + nu + nd))
+        self.register_buffer("out_mean", torch.zeros(nx))
+        self.register_buffer("out_std", torch.ones(nx))
+
+    def set_normalization(self, inputs: np.ndarray, increments: np.ndarray) -> None:
+        """Sets the standardisation from (n, nx+nu+nd) training inputs and (n, nx) state increments."""
+        for name, data in [("in", inputs), ("out", increments)]:
+            getattr(self, f"{name}_mean").copy_(torch.as_tensor(data.mean(0)))
+            getattr(self, f"{name}_std").copy_(torch.as_tensor(np.maximum(data.std(0), 1e-8)))
+
+    def forward(self, x: torch.Tensor, u: torch.Tensor, d: torch.Tensor) -> torch.Tensor:
+        """Standardised state increment for a batch of states, control inputs and weather."""
+        return self.net((torch.cat([x, u, d], dim=-1) - self.in_mean) / self.in_std)
+
+    @torch.no_grad()
+    def predict(self, x: np.ndarray, u: np.ndarray, d: np.ndarray) -> np.ndarray:
+        """
+        Next states for a batch of (..., nx) states, (..., nu) control inputs and (..., nd) weather.
+        The increment is added in float64, the crop states are large compared to their increments.
+        """
+        inputs = [torch.as_tensor(np.asarray(v, dtype=np.float32)) for v in (x, u, d)]
+        increment = self(*inputs) * self.out_std + self.out_mean
+        return np.asarray(x, dtype=float) + increment.numpy().astype(float)
+
+    def save(self, path: str) -> None:
+        torch.save({"dims": (self.nx, self.nu, self.nd), "hidden_sizes": self.hidden_sizes, "state_dict": self.state_dict()}, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SurrogateModel":
+        checkpoint = torch.load(path, map_location="cpu")
+        model = cls(*checkpoint["dims"], hidden_sizes=checkpoint["hidden_sizes"])
+        model.load_state_dict(checkpoint["state_dict"])
+        model.eval()
+        return model
+
+
+def generate_transitions(
+    env: TomatoEnv,
+    controller,
+    scenarios: List[Tuple[int, int]],
+    n_members: int = 16,
+    control_noise: float = 0.5,
+    uncertainty: float = 0.0,
+    seed: int = 666,
+    n_threads: Optional[int] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Generates (x, u, d, x_next) transitions of the real model with the `EnsembleSimulator`.
+
+    For every (year, start_day) scenario the season is first simulated with the controller, then
+    `n_members` members replay its control inputs with a mean-reverting random perturbation of
+    `control_noise` times `delta_u_max` (member 0 without perturbation) in one mapped simulation.
+    This covers the states around the controlled trajectories that an exploring agent visits.
+
+    Args:
+        env (TomatoEnv): environment that provides the model, the weather data and the season length.
+        controller: controller with a `casadi_function`, e.g., `RuleBasedController`.
+        scenarios (list): (year, start_day) pairs of the simulated seasons.
+        n_members (int): number of perturbed control trajectories per scenario.
+        control_noise (float): standard deviation of the control perturbation, relative to `delta_u_max`.
+        uncertainty (float): parametric uncertainty of the members, see `parametric_ensemble`.
+        seed (int): seed of the perturbations.
+        n_threads (int): number of threads of the ensemble simulation.
+    Returns:
+        dict: (n, nx) `x`, (n, nu) `u`, (n, nd) `d` and (n, nx) `x_next` arrays.
+    """
+    rng = np.random.default_rng(seed)
+    closed_loop = EnsembleSimulator(env, 1, controller, n_threads=1)
+    open_loop = EnsembleSimulator(env, n_members, n_threads=n_threads)
+    data = {key: [] for key in ["x", "u", "d", "x_next"]}
+    for year, start_day in scenarios:
+        env.reconfigure(base_env_params={
+            "start_train_year": year, "end_train_year": year, "start_train_day": start_day, "end_train_day": start_day
+        })
+        env.reset(seed=seed)
+        _, controls = closed_loop.simulate(env.p[None])
+        n_steps = controls.shape[1]
+
+        noise = np.zeros((n_members, n_steps, env.nu))
+        for k in range(1, n_steps):
+            noise[:, k] = 0.95*noise[:, k-1] + control_noise*env.delta_u_max*rng.normal(size=(n_members, env.nu))
+        noise[0] = 0
+        controls = np.clip(controls + noise, env.u_min, env.u_max)
+
+        params = parametric_ensemble(env.p, n_members, uncertainty, rng)
+        states, _ = open_loop.simulate(params, controls=controls)
+        weather = env.weather_data[env.timestep:env.timestep+n_steps]
+        data["x"].append(states[:, :-1].reshape(-1, env.nx))
+        data["x_next"].append(states[:, 1:].reshape(-1, env.nx))
+        data["u"].append(controls.reshape(-1, env.nu))
+        data["d"].append(np.broadcast_to(weather, (n_members,) + weather.shape).reshape(-1, env.nd))
+    return {key: np.concatenate(values) for key, values in data.items()}
+
+
+def fit_surrogate(
+    data: Dict[str, np.ndarray],
+    hidden_sizes: Sequence[int] = (256, 256, 256),
+    n_epochs: int = 50,
+    batch_size: int = 1024,
+    learning_rate: float = 1e-3,
+    validation_split: float = 0.1,
+    seed: int = 666,
+    verbose: bool = False,
+) -> Tuple[SurrogateModel, Dict[str, List[float]]]:
+    """
+    Trains a `SurrogateModel` on transitions from `generate_transitions` with the MSE of the standardised increments.
+
+    Returns:
+        model (SurrogateModel): trained surrogate in evaluation mode.
+        history (dict): training and validation loss per epoch.
+    """
+    torch.manual_seed(seed)
+    rng = np.random.default_rng(seed)
+    nx, nu, nd = data["x"].shape[1], data["u"].shape[1], data["d"].shape[1]
+    inputs = np.concatenate([data["x"], data["u"], data["d"]], axis=1)
+    increments = data["x_next"] - data["x"]
+
+    n = len(inputs)
+    perm = rng.permutation(n)
+    n_val = int(validation_split * n)
+    val, train = perm[:n_val], perm[n_val:]
+
+    model = SurrogateModel(nx, nu, nd, hidden_sizes)
+    model.set_normalization(inputs[train], increments[train])
+    targets = (torch.as_tensor(increments.astype(np.float32)) - model.out_mean) / model.out_std
+    x, u, d = (torch.as_tensor(data[key].astype(np.float32)) for key in ["x", "u", "d"])
+
+    optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate)
+    scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, n_epochs)
+    history = {"train_loss": [], "val_loss": []}
+    for epoch in range(n_epochs):
+        model.train()
+        losses = []
+        rng.shuffle(train)
+        for start in range(0, len(train), batch_size):
+            idx = torch.as_tensor(train[start:start+batch_size])
+            loss = nn.functional.mse_loss(model(x[idx], u[idx], d[idx]), targets[idx])
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            losses.append(loss.item())
+        scheduler.step()
+
+        model.eval()
+        with torch.no_grad():
+            val_idx = torch.as_tensor(val)
+            val_loss = nn.functional.mse_loss(model(x[val_idx], u[val_idx], d[val_idx]), targets[val_idx]).item() if n_val else float("nan")
+        history["train_loss"].append(float(np.mean(losses)))
+        history["val_loss"].append(val_loss)
+        if verbose:
+            print(f"epoch {epoch}: train loss {history['train_loss'][-1]:.3e}, validation loss {val_loss:.3e}")
+    return model, history
+
+
+def fidelity_report(
+    model: SurrogateModel,
+    states: np.ndarray,
+    controls: np.ndarray,
+    weather: np.ndarray,
+    dt: float,
+    horizons: Sequence[float] = (1, 7, 60),
+    n_starts: int = 20,
+) -> pd.DataFrame:
+    """
+    Open-loop rollout error of the surrogate against a trajectory of the real model.
+
+    For every horizon (in days) the surrogate is rolled out from up to `n_starts` states of the real trajectory,
+    which are evenly spread over the trajectory, with the real control inputs and weather.
+    Horizons longer than the trajectory are skipped.
+
+    Args:
+        model (SurrogateModel): the surrogate.
+        states (np.ndarray): (N+1, nx) states of the real model.
+        controls (np.ndarray): (N, nu) applied control inputs.
+        weather (np.ndarray): (N, nd) weather data.
+        dt (float): time step [s].
+        horizons (list): rollout horizons [days].
+        n_starts (int): maximum number of rollouts per horizon.
+    Returns:
+        pd.DataFrame: per horizon the RMSE of the CO2 concentration [ppm], air temperature [°C] and
+            relative humidity [%] over the rollouts, and the relative error of the fruit growth at the horizon.
+    """
+    N = len(controls)
+    rows = []
+    for days in horizons:
+        H = int(round(days * 86400 / dt))
+        if H > N:
+            continue
+        starts = np.unique(np.linspace(0, N - H, n_starts).astype(int))
+        x = states[starts]
+        predicted = [x]
+        for k in range(H):
+            x = model.predict(x, controls[starts + k], weather[starts + k])
+            predicted.append(x)
+        predicted = np.stack(predicted, axis=1)
+        real = states[starts[:, None] + np.arange(H+1)]
+        error = ensemble_outputs(predicted) - ensemble_outputs(real)
+        growth = real[:, -1, 25] - real[:, 0, 25]
+        rows.append({
+            "horizon_days": days,
+            "n_rollouts": len(starts),
+            "co2_rmse": np.sqrt(np.mean(error[..., 0]**2)),
+            "temp_rmse": np.sqrt(np.mean(error[..., 1]**2)),
+            "rh_rmse": np.sqrt(np.mean(error[..., 2]**2)),
+            "fruit_rel_error": np.mean(np.abs(predicted[:, -1, 25] - real[:, -1, 25]) / np.maximum(np.abs(growth), 1e-8)),
+        })
+    return pd.DataFrame(rows)
+
+
+class SurrogateTomatoEnv(TomatoEnv):
+    """
+    TomatoEnv whose step is computed by a trained `SurrogateModel` instead of the cvodes integrator.
+    The observation and reward modules, the action space and the bookkeeping are those of `TomatoEnv`,
+    so agents that are pretrained on the surrogate can be fine-tuned on `TomatoEnv` directly.
+    The parametric uncertainty of the environment is not represented by the surrogate.
+
+    Args:
+        surrogate_path (str): path of the saved `SurrogateModel`.
+        **kwargs: arguments of `TomatoEnv`.
+    """
+    def __init__(self, surrogate_path: str, **kwargs):
+        super(SurrogateTomatoEnv, self).__init__(**kwargs)
+        if self.action_repeat != 1:
+            raise ValueError("SurrogateTomatoEnv predicts a single time step, action_repeat must be 1.")
+        self.surrogate_path = surrogate_path
+        self.surrogate = SurrogateModel.load(surrogate_path)
+
+    def reconfigure(
+        self,
+        env_specific_params: Optional[Dict[str, Any]] = None,
+        base_env_params: Optional[Dict[str, Any]] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        params = dict(env_specific_params or {})
+        surrogate_path = params.pop("surrogate_path", self.surrogate_path)
+        if surrogate_path != self.surrogate_path:
+            self.surrogate_path = surrogate_path
+            self.surrogate = SurrogateModel.load(surrogate_path)
+        super(SurrogateTomatoEnv, self).reconfigure(params, base_env_params, seed)
+
+    def step(self, action: np.ndarray) -> Tuple[np.ndarray, SupportsFloat, bool, bool, Dict[str, Any]]:
+        u = self.action_to_control(action)
+        x_next = self.surrogate.predict(self.x, u, self.weather_data[self.timestep])
+        return self.step_precomputed(u, x_next)
+
+
+class SurrogateVecEnv(DummyVecEnv):
+    """
+    Vectorised `SurrogateTomatoEnv`s that are advanced with a single batched forward pass of the surrogate
+    of the first environment. Otherwise it behaves like `DummyVecEnv`.
+    """
+    def step_wait(self) -> VecEnvStepReturn:
+        controls = np.stack([env.action_to_control(action) for env, action in zip(self.envs, self.actions)])
+        x = np.stack([env.x for env in self.envs])
+        d = np.stack([env.weather_data[env.timestep] for env in self.envs])
+        x_next = self.envs[0].surrogate.predict(x, controls, d)
+
+        for env_idx, env in enumerate(self.envs):
+            obs, self.buf_rews[env_idx], terminated, truncated, self.buf_infos[env_idx] = env.step_precomputed(
+                controls[env_idx], x_next[env_idx]
+            )
+            self.buf_dones[env_idx] = terminated or truncated
+            self.buf_infos[env_idx]["TimeLimit.truncated"] = truncated and not terminated
+            if self.buf_dones[env_idx]:
+                self.buf_infos[env_idx]["terminal_observation"] = obs
+                obs, self.reset_infos[env_idx] = env.reset()
+            self._save_obs(env_idx, obs)
+        return (self._obs_from_buf(), np.copy(self.buf_rews), np.copy(self.buf_dones), [dict(info) for info in self.buf_infos])
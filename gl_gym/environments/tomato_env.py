@@ -1,5 +1,6 @@
 
 from typing import Any, Dict, List, Optional, Tuple, SupportsFloat
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import casadi as ca
@@ -10,14 +11,19 @@ from gl_gym.environments.observations import *
 from gl_gym.environments.rewards import BaseReward, GreenhouseReward
 # from gl_gym.environments.models.greenlight_model import GreenLight
 
-from gl_gym.environments.models.utils import define_model
+from gl_gym.environments.models.utils import define_model, define_multirate_model, define_reduced_model, define_repeat_model
+from gl_gym.environments.linearization import TrajectoryLinearization
 
 from gl_gym.environments.utils import load_weather_data, init_state
+from gl_gym.environments.weather_catalog import get_catalog
+from gl_gym.environments.weather_augmentation import augment_weather
 from gl_gym.environments.parameters import init_default_params
 from gl_gym.environments.noise import parametric_crop_uncertainty
 
 REWARDS = {"GreenhouseReward": GreenhouseReward}
 
+INTEGRATORS = {"monolithic": define_model, "multirate": define_multirate_model, "reduced": define_reduced_model}
+
 OBSERVATION_MODULES = {
     "StateObservations": StateObservations,
     "IndoorClimateObservations": IndoorClimateObservations,
@@ -36,7 +42,14 @@ class TomatoEnv(GreenLightEnv):
         eval_options: Dict[str, Any],           # days for evaluation
         reward_params: Dict[str, Any] = {},     # reward function arguments
         base_env_params: Dict[str, Any] = {},   # base environment parameters
-        uncertainty_scale = 0.0
+        uncertainty_scale = 0.0,
+        integrator: str = "monolithic",         # integration scheme of the model
+        integrator_params: Dict[str, Any] = {}, # integration scheme arguments
+        prefetch: bool = False,                 # prepare the next episode in a background thread
+        weather_catalog: bool = False,          # load the weather through the cached catalog of weather_data_dir
+        train_locations: Optional[List[str]] = None,  # draw training seasons uniformly from the catalog
+        weather_augmentation: Optional[Dict[str, Any]] = None,  # arguments of augment_weather, None disables it
+        weather_forecast: Optional[Dict[str, Any]] = None,      # forecast horizon and errors, None gives perfect forecasts
         ) -> None:
         super(TomatoEnv, self).__init__(**base_env_params)
 
@@ -46,18 +59,13 @@ class TomatoEnv(GreenLightEnv):
         self.eval_options = eval_options
 
         # initialise the observation and action spaces
+        self.weather_forecast = weather_forecast
         self.observation_modules = self._init_observations(observation_modules)
         self.observation_space = self._generate_observation_space()
         self.action_space = self._generate_action_space()
 
         # self.gl_model = GreenLight(self.nx, self.nu, self.nd, self.num_params, self.dt)
-        self.F = define_model(
-            nx=self.nx,
-            nu=self.nu,
-            nd=self.nd,
-            n_params=self.num_params,
-            dt=self.dt,
-        )
+        self._init_integrator(integrator, integrator_params)
 
         self.constraints_low = np.array([
             constraints["co2_min"],
@@ -76,6 +84,47 @@ class TomatoEnv(GreenLightEnv):
         # initialise the reward function
         self.reward = self._init_rewards(reward_function, reward_params)
 
+        # the weather and initial state of the next episode, loaded in the background during the current one
+        self.prefetch = prefetch
+        self._executor = None
+        self._next_episode = None
+        # the episodes are drawn from a child generator of the environment's seed, with and without prefetching,
+        # such that prefetching does not change the order of the other random draws.
+        # Note that a seed thus gives other episodes than when they were drawn from the environment's generator itself.
+        self._episode_rng = None
+
+        self.weather_catalog = weather_catalog
+        self.train_locations = train_locations
+        self.weather_augmentation = weather_augmentation
+
+    def _reconfigure_env(self, params: Dict[str, Any]) -> None:
+        """
+        Updates the TomatoEnv parameters of `reconfigure`.
+        The integrator is only rebuilt when `integrator` or `integrator_params` change,
+        e.g., to fine-tune on the full model after pretraining on the reduced model.
+        """
+        # the prefetched episode was sampled with the old parameters
+        self._next_episode = None
+
+        integrator = params.pop("integrator", self.integrator)
+        integrator_params = params.pop("integrator_params", self.integrator_params)
+        if integrator != self.integrator or dict(integrator_params) != self.integrator_params:
+            self._init_integrator(integrator, integrator_params)
+
+        if "prefetch" in params:
+            self.prefetch = params.pop("prefetch")
+        if "weather_catalog" in params:
+            self.weather_catalog = params.pop("weather_catalog")
+        if "train_locations" in params:
+            self.train_locations = params.pop("train_locations")
+        if "weather_augmentation" in params:
+            self.weather_augmentation = params.pop("weather_augmentation")
+        if "weather_forecast" in params:
+            weather_forecast = params.pop("weather_forecast")
+            if (weather_forecast or {}).get("horizon") != (self.weather_forecast or {}).get("horizon"):
+                raise ValueError("Cannot reconfigure the forecast horizon, a new environment is required.")
+            self.weather_forecast = weather_forecast
+
     def _terminalState(self) -> bool:
         """
         Function that checks whether the simulation has reached a terminal state.
@@ -111,6 +160,32 @@ class TomatoEnv(GreenLightEnv):
     def _init_rewards(self, reward_function: str, reward_params: Dict[str, Any]) -> BaseReward:
         return REWARDS[reward_function](self, **reward_params)
 
+    def _init_integrator(self, integrator: str, integrator_params: Dict[str, Any]) -> None:
+        self.integrator = integrator
+        self.integrator_params = dict(integrator_params)
+        self.F = INTEGRATORS[integrator](
+            nx=self.nx,
+            nu=self.nu,
+            nd=self.nd,
+            n_params=self.num_params,
+            dt=self.dt,
+            **integrator_params,
+        )
+        # Jacobians of the integrator's step along trajectories, created on first use
+        self.linearization = None
+        # with action_repeat the monolithic model integrates all time steps of an action in one call
+        self.F_repeat = None
+        if self.action_repeat > 1 and integrator == "monolithic":
+            self.F_repeat = define_repeat_model(
+                nx=self.nx,
+                nu=self.nu,
+                nd=self.nd,
+                n_params=self.num_params,
+                dt=self.dt,
+                n_intervals=self.action_repeat,
+                **integrator_params,
+            )
+
     def _get_reward(self) -> SupportsFloat:
         return self.reward.compute_reward()
 
@@ -126,6 +201,8 @@ class TomatoEnv(GreenLightEnv):
     def step(self, action: np.ndarray) -> Tuple[np.ndarray, SupportsFloat, bool, bool, Dict[str, Any]]:
         # scale the action from controller (between -1, 1) to (u_min, u_max)
         self.u = self.action_to_control(action)
+        if self.action_repeat > 1:
+            return self._step_repeat()
         params = parametric_crop_uncertainty(self.p, self.uncertainty_scale, self._np_random)
         try:
             p_dyn = ca.vertcat(ca.DM(self.weather_data[self.timestep]), params)
@@ -160,8 +237,82 @@ class TomatoEnv(GreenLightEnv):
                 info
                 )
 
+    def _step_repeat(self) -> Tuple[np.ndarray, SupportsFloat, bool, bool, Dict[str, Any]]:
+        """
+        Applies the control input self.u for `action_repeat` time steps.
+        The states of all time steps come from a single call of F_repeat (or consecutive calls of F
+        for the other integrators), the rewards and info of the time steps are summed,
+        and the observation is only computed at the end. The season can end within the action.
+        """
+        params = parametric_crop_uncertainty(self.p, self.uncertainty_scale, self._np_random)
+        d = self.weather_data[self.timestep:self.timestep+self.action_repeat]
+        try:
+            if self.F_repeat is not None:
+                X = self.F_repeat(x0=ca.DM(self.x), u=ca.DM(self.u), d=ca.DM(d.T), p=ca.DM(params))["xf"].full().T
+            else:
+                X = [self.x]
+                for k in range(self.action_repeat):
+                    p_dyn = ca.vertcat(ca.DM(d[k]), params)
+                    X.append(self.F(x0=ca.DM(X[-1]), u=ca.DM(self.u), p=p_dyn)["xf"].full().flatten())
+                X = np.array(X[1:])
+        except:
+            print("Error in ODE approximation")
+            self.terminated = True
+            X = np.tile(self.x, (self.action_repeat, 1))
+
+        reward = 0.
+        infos = []
+        for k, x in enumerate(X):
+            self.x = x
+            # update time
+            self.day_of_year += (self.dt/self.c) % 365
+            self.hour_of_day +=  (self.dt/3600)
+            self.hour_of_day = self.hour_of_day % 24
+
+            if self._terminalState():
+                self.terminated = True
+            last = self.terminated or k == len(X)-1
+            if last:
+                self.obs = self._get_obs()
+            # outputs as in IndoorClimateObservations, without computing the observation
+            outputs = np.array(self.reward.climate_outputs(x))
+            reward += self.reward.compute_reward(outputs)
+            infos.append(self._get_info())
+            self.timestep += 1
+            self.x_prev = np.copy(self.x)
+            if last:
+                break
+
+        info = {key: sum(step_info[key] for step_info in infos) for key in infos[0] if key != "controls"}
+        info["controls"] = self.u
+        return (
+                self.obs,
+                reward,
+                self.terminated,
+                False,
+                info
+                )
+
+    def linearize(self, X: np.ndarray, U: np.ndarray, timestep: Optional[int] = None):
+        """
+        Jacobians of the discrete step of the configured integrator along a trajectory of states X and control inputs U,
+        starting at `timestep` (defaults to the current time step). See `TrajectoryLinearization`.
+
+        Returns:
+            X_next (np.ndarray): (N, nx) next states.
+            A (np.ndarray): (N, nx, nx) state Jacobians.
+            B (np.ndarray): (N, nx, nu) input Jacobians.
+        """
+        if self.linearization is None:
+            self.linearization = TrajectoryLinearization(self.nx, self.nu, self.nd, self.num_params, self.dt, F=self.F)
+        timestep = self.timestep if timestep is None else timestep
+        indices = timestep + np.arange(len(X))
+        return self.linearization.linearize(X, U, indices, self.weather_data, self.p)
+
     def step_raw_control(self, control: np.ndarray):
         self.u = control
+        if self.action_repeat > 1:
+            return self._step_repeat()
         params = parametric_crop_uncertainty(self.p, self.uncertainty_scale, self._np_random)
         p_dyn = ca.vertcat(ca.DM(self.weather_data[self.timestep]), params)
         res = self.F(x0=ca.DM(self.x), u=ca.DM(self.u), p=p_dyn)
@@ -189,6 +340,35 @@ class TomatoEnv(GreenLightEnv):
                 self._get_info()
                 )
 
+    def step_precomputed(self, control: np.ndarray, x_next: np.ndarray):
+        """
+        Step with a control input and next state that were simulated outside the environment,
+        e.g., a closed-loop season in CasADi. Computes the observations, reward and info as in `step_raw_control`.
+        """
+        self.u = control
+        self.x = np.array(x_next, dtype=float)
+
+        # update time
+        self.day_of_year += (self.dt/self.c) % 365
+        self.hour_of_day +=  (self.dt/3600)
+        self.hour_of_day = self.hour_of_day % 24
+
+        self.obs = self._get_obs()
+
+        if self._terminalState():
+            self.terminated = True
+        # compute reward
+        reward = self._get_reward()
+        self.timestep += 1
+        self.x_prev = np.copy(self.x)
+        return (
+                self.obs,
+                reward,
+                self.terminated,
+                False,
+                self._get_info()
+                )
+
     def step_raw_control_pipeinput(self, control: np.ndarray):
         self.u = control
 
@@ -253,39 +433,104 @@ class TomatoEnv(GreenLightEnv):
         self.x[25] = cFruit
         self.x[26] = tCanSum
 
+    def _sample_episode(self) -> Tuple[str, int, int]:
+        """
+        Pick a random growth year and start day if we are training, or the next evaluation episode.
+        With the weather catalog and `train_locations` ("all" for every location), training seasons are
+        drawn uniformly from all seasons of these locations in the catalog, instead of from the train years and days.
+        Returns the location, growth year and start day.
+        """
+        if self._episode_rng is None:
+            self._episode_rng = self._np_random.spawn(1)[0]
+        rng = self._episode_rng
+        if self.training and self.weather_catalog and self.train_locations is not None:
+            locations = None if self.train_locations == "all" else self.train_locations
+            return get_catalog(self.weather_data_dir).sample(rng, self.season_length, self.Np+1, locations)
+        if self.training:
+            growth_year = rng.choice(self.train_years)
+            start_day = rng.choice(self.train_days)
+            return self.location, growth_year, start_day
+        growth_year = rng.choice(self.eval_options["eval_years"])
+        start_day = rng.choice(self.eval_options["eval_days"])
+        return self.eval_options["location"], growth_year, start_day
+
+    def _load_episode(self, location: str, growth_year: int, start_day: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Load in the weather data of an episode and its initial state.
+        Does not touch the environment's state, such that it can run in a background thread.
+        """
+        if self.weather_catalog:
+            weather_data = get_catalog(self.weather_data_dir).load(
+                location, growth_year, start_day, self.season_length, self.Np+1, self.dt, self.nd
+            )
+            return weather_data, init_state(weather_data[0])
+        weather_data = load_weather_data(
+            self.weather_data_dir,
+            location,
+            growth_year,
+            start_day,
+            self.season_length,
+            self.Np+1,
+            self.dt,
+            self.nd
+        )
+        return weather_data, init_state(weather_data[0])
+
+    def _prefetch_episode(self) -> None:
+        """
+        Sample the next episode with the episode generator, in the main thread such that the episodes
+        are the same as without prefetching, and load it in a background thread.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        episode = self._sample_episode()
+        self._next_episode = (episode, self._executor.submit(self._load_episode, *episode))
+
     def reset(self, seed: Optional[int] = None) -> Tuple[np.ndarray, Dict[str, Any]]:
         super().reset(seed=seed)
 
-        # pick a random growth year and start day if we are training
-        if self.training:
-            self.growth_year = self._np_random.choice(self.train_years)
-            self.start_day = self._np_random.choice(self.train_days)
+        # a new seed invalidates the prefetched episode
+        if seed is not None:
+            self._episode_rng = None
+        if seed is not None or self._next_episode is None:
+            episode = self._sample_episode()
+            weather_data, x0 = self._load_episode(*episode)
         else:
-            self.growth_year = self._np_random.choice(self.eval_options["eval_years"])
-            self.start_day = self._np_random.choice(self.eval_options["eval_days"])
-            self.location = self.eval_options["location"]
+            episode, future = self._next_episode
+            weather_data, x0 = future.result()
+        self.location, self.growth_year, self.start_day = episode
+        if not self.training:
             self.increase_eval_idx()
+        # synthetic training seasons, drawn in the main thread with the environment's random number generator
+        if self.training and self.weather_augmentation is not None:
+            weather_data = augment_weather(weather_data, self.dt, self._np_random, **self.weather_augmentation)
+            x0 = init_state(weather_data[0])
+        self.weather_data = weather_data
+        self._next_episode = None
+        if self.prefetch:
+            self._prefetch_episode()
 
         self.day_of_year = self.start_day
         self.hour_of_day = 0
 
-        # load in weather data for specific simulation
-        self.weather_data = load_weather_data(
-            self.weather_data_dir,
-            self.location,
-            self.growth_year,
-            self.start_day,
-            self.season_length,
-            self.Np+1,
-            self.dt,
-            self.nd
-        )
-
         self.u = np.zeros(self.nu)
-        self.x = init_state(self.weather_data[0])
+        self.x = x0
         self.x_prev = np.copy(self.x)
         self.timestep = 0
         self.obs = self._get_obs()
 
         self.terminated = False
         return self.obs, {}
+
+    def set_seed(self, seed):
+        super(TomatoEnv, self).set_seed(seed)
+        # the episodes of the new seed
+        self._episode_rng = None
+        self._next_episode = None
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        self._next_episode = None
+        super(TomatoEnv, self).close()
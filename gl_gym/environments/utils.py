@@ -87,7 +87,6 @@ def load_weather_data(
     weatherDataPath = join(join(weatherDataDir, location), str(growthYear)) + ".csv"
 
     c = 86400      # seconds in a day
-    CO2_PPM = 400  # assumed constant outdoor co2 concentration [ppm]
     rawWeather = pd.read_csv(weatherDataPath, sep=",")
 
     time = rawWeather["time"].values    # time since start of the year in [s]
@@ -99,6 +98,36 @@ def load_weather_data(
     # check whether we exceed data length and we are in the final season
     if N0+Ns+Np > len(time):
         rawWeather = expandWeatherData(weatherDataDir, rawWeather, location, growthYear, time, dt)
+    return processRawWeather(rawWeather, startDay, nDays, predHorizon, h, nd)
+
+def processRawWeather(
+                        rawWeather: pd.DataFrame,
+                        startDay: int,
+                        nDays: int,
+                        predHorizon: int,
+                        h: float,
+                        nd: int
+                    ) -> np.ndarray:
+    """
+    Converts raw weather data, which starts at the beginning of the growth year and may continue
+    into the next years, to the interpolated weather variables of `load_weather_data`.
+
+    Args:
+        rawWeather      - raw weather data, with the columns of the weather files
+        startDay        - at which day of the year do we start the simulation
+        nDays           - how many days do we simulate forward in time
+        predHorizon     - prediction horizon [days]
+        h               - sample time of the solver in seconds
+        nd              - number of weather variables
+    """
+    c = 86400      # seconds in a day
+    CO2_PPM = 400  # assumed constant outdoor co2 concentration [ppm]
+    time = rawWeather["time"].values    # time since start of the year in [s]
+    dt = np.mean(np.diff(time-time[0])) # sample period of data [s]
+    N0 = int(np.ceil(startDay*c/dt))    # Start index
+    Ns = int(np.ceil(nDays*c/dt))       # Number of samples we need from regular data
+    Np = int(np.ceil(predHorizon*c/dt))+1 # Number of samples into the future we need from regular data
+
     weatherData = np.zeros((Ns+Np, nd))                                         # preallocate weather data matrix
     time = rawWeather["time"].values[N0:N0+Ns+Np]                               # time since start of the year in [s]
     weatherData[:, 0] = rawWeather["global radiation"][N0:N0+Ns+Np]             # iGlob
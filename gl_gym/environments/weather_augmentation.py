@@ -0,0 +1,84 @@
+import numpy as np
+
+from gl_gym.environments.utils import co2ppm2dens, satVp
+
+# columns of the weather data of `load_weather_data`
+IGLOB, TOUT, VPOUT, CO2OUT, WIND, TSKY, TSOOUT, DLI, ISDAY, ISDAYSMOOTH = range(10)
+
+def augment_weather(
+    weather,
+    dt,
+    RNG,
+    block_days=3,
+    window_days=10,
+    temp_offset_std=1.0,
+    temp_day_std=1.0,
+    rad_std=0.15,
+):
+    """
+    Synthetic season from recorded weather data, for training-time augmentation.
+
+    1. Local block bootstrap of days: the season is split into blocks of `block_days` days, and every block
+       is replaced by the consecutive days that start up to `window_days` earlier or later in the record.
+       Whole days are moved, such that the daily cycles, the DLI and the day/night features stay aligned.
+    2. Temperature perturbation: a season offset plus a daily offset, linearly interpolated between midnights.
+       The sky temperature is shifted equally and the relative humidity is kept: the vapour pressure
+       is scaled with the saturation vapour pressure, the closed form of converting the relative humidity
+       with `rh2vaporDens` and `vaporDens2pres` at the new temperature. The outdoor CO2 density is recomputed.
+    3. Radiation perturbation: a log-normal factor per day with mean 1. The DLI is linear in the
+       radiation and scales with the same factor; the day/night features do not change.
+
+    The outdoor soil temperature, a function of the time of year, is not changed.
+    The rows after the last whole day (e.g., the end of the prediction horizon) are not bootstrapped.
+
+    Args:
+        weather (np.ndarray): (N, 10) weather data of `load_weather_data`, starting at midnight.
+        dt (float): [s] sample period of the weather data.
+        RNG: random number generator.
+        block_days (int): number of days per bootstrap block.
+        window_days (int): maximum shift of a block in days, 0 disables the bootstrap.
+        temp_offset_std (float): [°C] standard deviation of the season temperature offset.
+        temp_day_std (float): [°C] standard deviation of the daily temperature offset.
+        rad_std (float): standard deviation of the log of the daily radiation factor.
+
+    Returns:
+        np.ndarray: (N, 10) augmented weather data.
+    """
+    weather = np.asarray(weather, dtype=float)
+    steps_per_day = int(round(86400 / dt))
+    n_days = len(weather) // steps_per_day
+    n_rows = n_days * steps_per_day
+
+    # 1. local block bootstrap of whole days
+    if window_days > 0 and n_days > block_days:
+        n_blocks = -(-n_days // block_days)
+        starts = np.arange(n_blocks) * block_days + RNG.integers(-window_days, window_days+1, size=n_blocks)
+        starts = np.clip(starts, 0, n_days - block_days)
+        source = (starts[:, None] + np.arange(block_days)).ravel()[:n_days]
+        augmented = weather.copy()
+        # whole days are contiguous blocks of rows
+        augmented[:n_rows] = weather[:n_rows].reshape(n_days, -1)[source].reshape(n_rows, -1)
+        augmented[:, TSOOUT] = weather[:, TSOOUT]
+    else:
+        augmented = weather.copy()
+
+    # 2. temperature offsets at the midnights, interpolated over the rows
+    offsets = RNG.normal(0, temp_offset_std) + RNG.normal(0, temp_day_std, size=n_days+1)
+    frac = np.arange(steps_per_day) / steps_per_day
+    delta_temp = np.empty(len(weather))
+    delta_temp[:n_rows] = (offsets[:-1, None] * (1 - frac) + offsets[1:, None] * frac).ravel()
+    delta_temp[n_rows:] = offsets[-1]
+    temp = augmented[:, TOUT] + delta_temp
+    augmented[:, VPOUT] *= satVp(temp) / satVp(augmented[:, TOUT])
+    augmented[:, TOUT] = temp
+    augmented[:, TSKY] += delta_temp
+    augmented[:, CO2OUT] = co2ppm2dens(temp, 400) * 1e6
+
+    # 3. daily radiation factors, the rows after the last whole day take the factor of the last day
+    factors = np.exp(RNG.normal(-rad_std**2/2, rad_std, size=max(n_days, 1)))
+    row_factors = np.empty(len(weather))
+    row_factors[:n_rows] = np.repeat(factors[:n_days], steps_per_day)
+    row_factors[n_rows:] = factors[-1]
+    augmented[:, IGLOB] *= row_factors
+    augmented[:, DLI] *= row_factors
+    return augmented
@@ -0,0 +1,237 @@
+import os
+import re
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from os.path import join
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from gl_gym.environments.utils import processRawWeather
+
+# catalogs that are shared by the environments of a process, by weather directory
+_CATALOGS = {}
+
+
+def get_catalog(weather_data_dir: str) -> "WeatherCatalog":
+    """Returns the catalog of the weather directory, which is scanned on first use."""
+    key = os.path.abspath(weather_data_dir)
+    if key not in _CATALOGS:
+        _CATALOGS[key] = WeatherCatalog(weather_data_dir)
+    return _CATALOGS[key]
+
+
+class WeatherCatalog:
+    """
+    Index of the weather files `<weather_data_dir>/<location>/<year>.csv`.
+
+    The directory is scanned once and every file is summarised by its sample period, row count,
+    time span and checksum. The summaries are stored in `<weather_data_dir>/.catalog.json`,
+    such that a next scan only reads the files that changed.
+    The raw data of the years is cached, seasons that run past the end of the year are
+    resolved by concatenating the cached years instead of re-reading the files.
+    The cache is thread-safe, such that seasons can be loaded in the background (`TomatoEnv.prefetch`).
+
+    Args:
+        weather_data_dir (str): root directory of the weather data.
+        max_cached_years (int): maximum number of years of raw data that is kept in memory.
+    """
+    INDEX_FILE = ".catalog.json"
+
+    def __init__(self, weather_data_dir: str, max_cached_years: int = 32) -> None:
+        self.weather_data_dir = weather_data_dir
+        self.max_cached_years = max_cached_years
+        self.index = {}
+        self._raw = OrderedDict()
+        self._lock = threading.Lock()
+        self._valid_starts = {}
+        self.scan()
+
+    def scan(self) -> None:
+        """(Re-)builds the index of location -> year -> file summary."""
+        index_path = join(self.weather_data_dir, self.INDEX_FILE)
+        previous = {}
+        try:
+            with open(index_path) as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            # missing or unreadable, the files are summarised again
+            pass
+
+        index = {}
+        for location in sorted(os.listdir(self.weather_data_dir)):
+            location_dir = join(self.weather_data_dir, location)
+            if location.startswith(".") or not os.path.isdir(location_dir):
+                continue
+            years = {}
+            for name in os.listdir(location_dir):
+                match = re.fullmatch(r"(\d{4})\.csv", name)
+                if match is None:
+                    continue
+                path = join(location_dir, name)
+                stat = os.stat(path)
+                entry = previous.get(location, {}).get(match.group(1))
+                if entry is None or entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime:
+                    entry = self._summarise(path, stat)
+                years[match.group(1)] = entry
+            if years:
+                index[location] = dict(sorted(years.items()))
+
+        self.index = index
+        self._raw.clear()
+        self._valid_starts.clear()
+        if index != previous:
+            # written atomically, the environment workers scan the same directory in parallel
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=self.weather_data_dir, prefix=self.INDEX_FILE, suffix=".tmp")
+            except OSError:
+                # e.g., a read-only weather directory, the index is rebuilt on the next scan
+                return
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(index, f, indent=1)
+                os.replace(tmp_path, index_path)
+            except OSError:
+                os.remove(tmp_path)
+
+    @staticmethod
+    def _summarise(path: str, stat: os.stat_result) -> Dict[str, float]:
+        with open(path, "rb") as f:
+            checksum = hashlib.sha1(f.read()).hexdigest()
+        time = pd.read_csv(path, usecols=["time"])["time"].to_numpy()
+        return {
+            "sample_period": float(np.mean(np.diff(time))),
+            "n_rows": int(len(time)),
+            "start": float(time[0]),
+            "end": float(time[-1]),
+            "sha1": checksum,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+        }
+
+    def locations(self) -> List[str]:
+        return list(self.index)
+
+    def years(self, location: str) -> List[int]:
+        return [int(year) for year in self.index.get(location, {})]
+
+    def summary(self) -> pd.DataFrame:
+        """The index as a table with a row per location and year."""
+        rows = [
+            {"location": location, "year": int(year), **entry}
+            for location, years in self.index.items() for year, entry in years.items()
+        ]
+        return pd.DataFrame(rows)
+
+    def raw_weather(self, location: str, year: int) -> pd.DataFrame:
+        """The raw data of a year, read from the cache if possible."""
+        key = (location, int(year))
+        with self._lock:
+            if key in self._raw:
+                self._raw.move_to_end(key)
+                return self._raw[key]
+        if str(year) not in self.index.get(location, {}):
+            raise KeyError(f"No weather data for {location} in {year}.")
+        raw = pd.read_csv(join(self.weather_data_dir, location, f"{year}.csv"), sep=",")
+        with self._lock:
+            self._raw[key] = raw
+            if len(self._raw) > self.max_cached_years:
+                self._raw.popitem(last=False)
+        return raw
+
+    def _consecutive_rows(self, location: str, year: int) -> np.ndarray:
+        """Cumulative number of rows of the consecutive years from `year` on."""
+        rows = []
+        while str(year) in self.index.get(location, {}):
+            rows.append(self.index[location][str(year)]["n_rows"])
+            year += 1
+        return np.cumsum(rows)
+
+    def load(
+        self,
+        location: str,
+        growth_year: int,
+        start_day: int,
+        season_length: float,
+        pred_horizon: float,
+        h: float,
+        nd: int,
+    ) -> np.ndarray:
+        """
+        Weather data of a season, as returned by `load_weather_data`, for seasons that may continue
+        into the next years. Raises a ValueError when the consecutive years do not cover the season.
+        """
+        entry = self.index[location][str(growth_year)]
+        dt = entry["sample_period"]
+        c = 86400
+        needed = int(np.ceil(start_day*c/dt)) + int(np.ceil(season_length*c/dt)) + int(np.ceil(pred_horizon*c/dt)) + 1
+        rows = self._consecutive_rows(location, growth_year)
+        n_years = int(np.searchsorted(rows, needed)) + 1
+        if n_years > len(rows):
+            raise ValueError(
+                f"The weather data of {location} does not cover a season of {season_length} days "
+                f"from day {start_day} of {growth_year}."
+            )
+
+        frames = []
+        offset = 0.
+        for year in range(growth_year, growth_year + n_years):
+            raw = self.raw_weather(location, year)
+            if offset:
+                raw = raw.assign(time=raw["time"] + offset)
+            frames.append(raw)
+            offset = frames[-1]["time"].iloc[-1] + self.index[location][str(year)]["sample_period"]
+        raw = frames[0] if n_years == 1 else pd.concat(frames, ignore_index=True)
+        return processRawWeather(raw, start_day, season_length, pred_horizon, h, nd)
+
+    def valid_start_days(self, location: str, year: int, season_length: float, pred_horizon: float) -> np.ndarray:
+        """Start days of the year of which the season and prediction horizon are covered by the weather data."""
+        key = (location, int(year), season_length, pred_horizon)
+        if key not in self._valid_starts:
+            entry = self.index[location][str(year)]
+            dt = entry["sample_period"]
+            c = 86400
+            days = np.arange(int(np.ceil((entry["end"] + dt) / c)))
+            needed = np.ceil(days*c/dt) + np.ceil(season_length*c/dt) + np.ceil(pred_horizon*c/dt) + 1
+            rows = self._consecutive_rows(location, int(year))
+            self._valid_starts[key] = days[needed <= rows[-1]]
+        return self._valid_starts[key]
+
+    def sample(
+        self,
+        rng: np.random.Generator,
+        season_length: float,
+        pred_horizon: float,
+        locations: Optional[List[str]] = None,
+        years: Optional[List[int]] = None,
+    ) -> Tuple[str, int, int]:
+        """
+        Draws a (location, year, start day) uniformly from all seasons that are covered by the weather data.
+
+        Args:
+            rng (np.random.Generator): random number generator, e.g., of the environment.
+            season_length (float): [days] length of the season.
+            pred_horizon (float): [days] prediction horizon of the weather forecast.
+            locations (List[str], optional): the locations to draw from. Defaults to all locations.
+            years (List[int], optional): the growth years to draw from. Defaults to all years.
+        """
+        triples = []
+        counts = []
+        for location in (locations or self.locations()):
+            for year in self.years(location):
+                if years is not None and year not in years:
+                    continue
+                days = self.valid_start_days(location, year, season_length, pred_horizon)
+                if len(days):
+                    triples.append((location, year, days))
+                    counts.append(len(days))
+        if not triples:
+            raise ValueError(f"No weather data covers a season of {season_length} days.")
+        i = rng.integers(sum(counts))
+        k = int(np.searchsorted(np.cumsum(counts), i, side="right"))
+        location, year, days = triples[k]
+        return location, year, int(days[i - sum(counts[:k])])
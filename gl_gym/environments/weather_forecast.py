@@ -0,0 +1,57 @@
+from typing import Optional, Sequence, Union
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from gl_gym.environments.weather_augmentation import TOUT
+
+# the forecasted weather variables, the first columns of the weather data
+N_FORECAST_VARS = 5
+
+def forecast_weather(
+    weather,
+    n_lead,
+    RNG,
+    error_std: Optional[Sequence[float]] = None,
+    error_corr: Union[float, Sequence[float]] = 0.99,
+    n_issues: Optional[int] = None,
+):
+    """
+    Weather forecasts of an episode, issued at every time step for the next `n_lead` time steps.
+
+    The forecast errors follow an AR(1) process over the lead time, per variable and per issue time:
+    e_1 = w_1, e_k = error_corr*e_{k-1} + w_k, with w_k ~ N(0, error_std^2 (1 - error_corr^2)).
+    The standard deviation of the error grows with the lead time, error_std*sqrt(1 - error_corr^(2k)),
+    towards `error_std`. The temperature error is additive [°C], the errors of the radiation, vapour pressure,
+    CO2 density and wind speed are relative, such that their forecasts stay non-negative and the radiation is zero at night.
+
+    Args:
+        weather (np.ndarray): (N, nd) weather data of the episode.
+        n_lead (int): number of forecasted time steps.
+        RNG: random number generator.
+        error_std (Sequence[float], optional): long-lead standard deviation of the error of the
+            glob_rad [-], temp_out [°C], vp_out [-], co2_out [-] and wind_speed [-] forecasts. None gives perfect forecasts.
+        error_corr (float or Sequence[float]): correlation of the error between consecutive lead times, per variable.
+        n_issues (int, optional): number of issue times, e.g., the number of time steps in the episode plus one.
+            Defaults to all time steps of which the weather data covers the forecast horizon.
+
+    Returns:
+        np.ndarray: (n_issues, n_lead, 5) forecasts, forecast[t, k] is the forecast of weather[t+k+1] issued at time step t.
+    """
+    weather = np.asarray(weather)
+    # a read-only view on the weather data, without errors nothing is copied
+    truth = sliding_window_view(weather[1:, :N_FORECAST_VARS], n_lead, axis=0).transpose(0, 2, 1)
+    if n_issues is not None:
+        truth = truth[:n_issues]
+    if error_std is None or not np.any(error_std):
+        return truth
+
+    std = np.broadcast_to(np.asarray(error_std, dtype=float), (N_FORECAST_VARS,))
+    corr = np.broadcast_to(np.asarray(error_corr, dtype=float), (N_FORECAST_VARS,))
+    errors = RNG.standard_normal(truth.shape) * (std * np.sqrt(1 - corr**2))
+    for k in range(1, n_lead):
+        errors[:, k] += corr * errors[:, k-1]
+
+    forecast = truth * np.maximum(1 + errors, 0)
+    forecast[..., TOUT] = truth[..., TOUT] + errors[..., TOUT]
+    return forecast
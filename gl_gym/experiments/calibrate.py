@@ -0,0 +1,57 @@
+import argparse
+import os
+
+import pandas as pd
+
+from gl_gym.environments.parameters import init_default_params
+from gl_gym.environments.calibration import ModelCalibration
+from gl_gym.experiments.gl_predefined_controls import init_mat_state, set_matlab_params
+
+STATE_COLUMNS = [
+    "co2Air", "co2Top", "tAir", "tTop", "tCan", "tCovIn", "tCovE",
+    "tThScr", "tFlr", "tPipe", "tSo1", "tSo2", "tSo3", "tSo4", "tSo5",
+    "vpAir", "vpTop", "tLamp", "tIntLamp", "tGroPipe", "tBlScr", "tCan24",
+    "cBuf", "cLeaf", "cStem", "cFruit", "tCanSum", "time"
+]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data_dir", type=str, default="data/AgriControl/comparison/matlab/", help="Directory with the measured trajectories")
+    parser.add_argument("--suffix", type=str, default="pipe2009", help="Suffix of the states/controls/weather csv files")
+    parser.add_argument("--indices", type=int, nargs="+", required=True, help="Indices of the calibrated parameters")
+    parser.add_argument("--measured", type=str, nargs="+", default=["co2Air", "tAir", "vpAir", "cFruit"], help="Measured states")
+    parser.add_argument("--days", type=float, default=2, help="Length of the calibration horizon [days]")
+    parser.add_argument("--dt", type=float, default=300, help="Time step of the data [s]")
+    parser.add_argument("--interval_length", type=int, default=12, help="Time steps per shooting interval")
+    parser.add_argument("--n_threads", type=int, default=os.cpu_count(), help="Threads that evaluate the shooting intervals")
+    parser.add_argument("--max_iter", type=int, default=100, help="Maximum number of solver iterations")
+    parser.add_argument("--verbose", action="store_true", help="Print solver output")
+    args = parser.parse_args()
+
+    N = int(args.days * 86400 / args.dt)
+    states = pd.read_csv(os.path.join(args.data_dir, f"states_{args.suffix}.csv"))[:N+1]
+    controls = pd.read_csv(os.path.join(args.data_dir, f"controls_{args.suffix}.csv")).values[:N, :6]
+    weather = pd.read_csv(os.path.join(args.data_dir, f"weather_{args.suffix}.csv")).values[:N]
+    measured_states = [STATE_COLUMNS.index(name) for name in args.measured]
+
+    p = set_matlab_params(init_default_params(208))
+    x0 = init_mat_state(weather[0], states[["tAir", "co2Air", "vpAir"]].values[0])
+    calibration = ModelCalibration(
+        nx=28, nu=controls.shape[1], nd=weather.shape[1], dt=args.dt, p_nominal=p,
+        indices=args.indices, measured_states=measured_states, interval_length=args.interval_length,
+        n_threads=args.n_threads, max_iter=args.max_iter, verbose=args.verbose
+    )
+    result = calibration.fit(x0, controls, weather, states[args.measured].values)
+
+    print(f"{result['status']} after {result['iterations']} iterations in {result['solve_time']:.1f}s, cost {result['cost']:.4g}")
+    for i, theta in zip(args.indices, result["theta"]):
+        print(f"p[{i}]: {p[i]:.6g} -> {result['params'][i]:.6g} (x{theta:.4f})")
+
+    save_dir = "data/AgriControl/calibration/"
+    os.makedirs(save_dir, exist_ok=True)
+    pd.DataFrame({
+        "index": args.indices,
+        "nominal": p[args.indices],
+        "calibrated": result["params"][args.indices],
+        "multiplier": result["theta"],
+    }).to_csv(f"{save_dir}/params_{args.suffix}.csv", index=False)
@@ -0,0 +1,66 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from gl_gym.environments.tomato_env import TomatoEnv
+from gl_gym.environments.baseline import RuleBasedController
+from gl_gym.environments.ensemble import EnsembleSimulator, economic_summary
+from gl_gym.environments.noise import parametric_ensemble
+from gl_gym.common.utils import load_env_params, load_model_hyperparams
+from gl_gym.common.result_index import ResultIndex
+
+# the summary keys as the result columns of the evaluation scripts
+RESULT_COLUMNS = {
+    "EPI": "EPI", "revenue": "Revenue", "heat_cost": "Heat costs", "co2_cost": "CO2 costs", "elec_cost": "Elec costs",
+    "temp_violation": "temp_violation", "co2_violation": "co2_violation", "rh_violation": "rh_violation",
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--project", type=str, default="AgriControl", help="Name of the project (in wandb)")
+    parser.add_argument("--env_id", type=str, default="TomatoEnv", help="Environment ID")
+    parser.add_argument("--uncertainty_scale", type=float, help="Uncertainty scale", required=True)
+    parser.add_argument("--n_members", type=int, default=1000, help="Number of ensemble members")
+    parser.add_argument("--n_threads", type=int, default=os.cpu_count(), help="Number of threads that evaluate the ensemble")
+    parser.add_argument("--indices", type=int, nargs="+", default=None, help="Perturbed parameter indices (defaults to the crop parameters)")
+    parser.add_argument("--seed", type=int, default=666, help="Seed of the parameter samples")
+    parser.add_argument("--save_states", action="store_true", help="Also save the (M, N+1, nx) state trajectories")
+    args = parser.parse_args()
+    env_config_path = f"gl_gym/configs/envs/"
+    # an episode per member, such that the result index and param_uncertainty.py read the ensemble like evaluations
+    save_dir = f"data/{args.project}/stochastic/rb_ensemble/{args.uncertainty_scale}/"
+    os.makedirs(save_dir, exist_ok=True)
+
+    env_base_params, env_specific_params = load_env_params(args.env_id, env_config_path)
+    env_base_params['training'] = True
+    env = TomatoEnv(base_env_params=env_base_params, **env_specific_params)
+    env.reset(seed=args.seed)
+
+    rb_controller = RuleBasedController(**load_model_hyperparams('rule_based', args.env_id))
+    ensemble = EnsembleSimulator(env, args.n_members, rb_controller, n_threads=args.n_threads)
+    params = parametric_ensemble(env.p, args.n_members, args.uncertainty_scale, np.random.default_rng(args.seed), indices=args.indices)
+
+    start = time.time()
+    states, controls = ensemble.simulate(params)
+    print(f"simulated {args.n_members} members for {states.shape[1]-1} steps in {time.time()-start:.1f}s")
+
+    summary = pd.DataFrame(economic_summary(env, states, controls)).rename(columns=RESULT_COLUMNS)
+    summary["episode"] = np.arange(args.n_members)
+    print(summary.describe().loc[["mean", "std", "min", "max"]])
+
+    save_name = f"rb_ensemble-{env.growth_year}{env.start_day}-{env.location}"
+    summary.to_csv(f"{save_dir}/{save_name}.csv", index=False)
+    ResultIndex("data").register(
+        f"{save_dir}/{save_name}.csv", df=summary, project=args.project, mode="stochastic", algorithm="rb_ensemble",
+        model="rb_ensemble", growth_year=env.growth_year, start_day=env.start_day, location=env.location,
+        uncertainty=args.uncertainty_scale,
+    )
+    np.save(f"{save_dir}/{save_name}-params.npy", params)
+    if args.save_states:
+        np.save(f"{save_dir}/{save_name}-states.npy", states)
+        np.save(f"{save_dir}/{save_name}-controls.npy", controls)
+    print("saving results to", save_dir)
@@ -3,24 +3,25 @@ import os
 
 from gl_gym.environments.tomato_env import TomatoEnv
 from gl_gym.environments.baseline import RuleBasedController
+from gl_gym.environments.models.utils import define_closed_loop_model
+from gl_gym.environments.noise import parametric_crop_uncertainty
 from gl_gym.common.utils import load_env_params, load_model_hyperparams
 from gl_gym.common.results import Results
+from gl_gym.common.aggregation import EpisodeAggregator
+from gl_gym.common.result_index import ResultIndex
 import os
 import numpy as np
 from tqdm import tqdm
 
-def evaluate_controller(env, controller, rank=0):
+def collect_results(env, step_fn):
     epi, revenue, heat_cost, co2_cost, elec_cost = np.zeros(env.N+1), np.zeros(env.N+1), np.zeros(env.N+1), np.zeros(env.N+1),np.zeros(env.N+1)
     temp_violation, co2_violation, rh_violation = np.zeros(env.N+1), np.zeros(env.N+1), np.zeros(env.N+1)
     rewards = np.zeros(env.N+1)
     episodic_obs = np.zeros((env.N+1, 23))
-    obs = env.reset(seed=666+rank)
     done = False
     timestep = 0
     while not done:
-        control = controller.predict(env.x, env.weather_data[env.timestep], env)
-
-        obs, r, done, _, info = env.step_raw_control(control)
+        obs, r, done, _, info = step_fn()
         rewards[timestep] += r
         episodic_obs[timestep] += obs[:23]
         epi[timestep] += info["EPI"]
@@ -37,12 +38,50 @@ def evaluate_controller(env, controller, rank=0):
     return result_data
 
 
+def evaluate_controller(env, controller, rank=0):
+    obs = env.reset(seed=666+rank)
+    return collect_results(env, lambda: env.step_raw_control(controller.predict(env.x, env.weather_data[env.timestep], env)))
+
+def define_season_model(env, controller, feedback=False):
+    """
+    Closed-loop season of the rule-based controller that runs entirely in CasADi.
+    The steps use the configured integrator of the environment, like `evaluate_controller`.
+    With feedback=True the controller is embedded in a monolithic cvodes integration,
+    which is rejected for environments that are configured with another integrator.
+    """
+    if feedback and env.integrator != "monolithic":
+        raise ValueError(f"feedback requires the monolithic integrator, the environment uses {env.integrator}")
+    step = define_closed_loop_model(
+        env.nx, env.nu, env.nd, env.num_params, env.dt,
+        controller.casadi_function(env.nx, env.nu, env.nd),
+        feedback=feedback, F=None if feedback else env.F
+    )
+    return step.mapaccum("season", env.N+1)
+
+def evaluate_controller_native(env, season_model, rank=0):
+    """
+    Simulates the season with `season_model` and replays the trajectory in the environment to compute the rewards.
+    The parametric uncertainty is sampled up front, in the same order as the step-wise evaluation.
+    """
+    obs = env.reset(seed=666+rank)
+    if env.uncertainty_scale > 0:
+        params = np.column_stack([parametric_crop_uncertainty(env.p, env.uncertainty_scale, env._np_random) for _ in range(env.N+1)])
+    else:
+        params = env.p
+    z0 = np.concatenate([env.x, [env.hour_of_day, env.day_of_year]])
+    Z, U = season_model(z0, env.weather_data[:env.N+1].T, params)
+    X, U = Z.full()[:env.nx].T, U.full().T
+    return collect_results(env, lambda: env.step_precomputed(U[env.timestep], X[env.timestep]))
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--project", type=str, default="AgriControl", help="Name of the project (in wandb)")
     parser.add_argument("--env_id", type=str, default="TomatoEnv", help="Environment ID")
     parser.add_argument("--uncertainty_scale", type=float, help="Uncertainty scale", required=True)
     parser.add_argument("--mode", type=str, choices=['deterministic', 'stochastic'], required=True)
+    parser.add_argument("--native", action="store_true", help="Simulate the closed-loop seasons in CasADi")
+    parser.add_argument("--feedback", action="store_true", help="Evaluate the controller at every solver sub-step (requires --native)")
     args = parser.parse_args()
     save_dir = f"data/{args.project}/{args.mode}/rb_baseline/"
     env_config_path = f"gl_gym/configs/envs/"
@@ -68,12 +107,21 @@ if __name__ == "__main__":
     result_columns.extend(["temp_violation", "co2_violation", "rh_violation"])
     result_columns.extend(["episode"])
     result = Results(result_columns)
+    aggregator = EpisodeAggregator()
+
+    if args.native:
+        season_model = define_season_model(eval_env, rb_controller, feedback=args.feedback)
 
     for sim in tqdm(range(n_sims)):
-        result_data = evaluate_controller(eval_env, rb_controller, rank=sim)
+        if args.native:
+            result_data = evaluate_controller_native(eval_env, season_model, rank=sim)
+        else:
+            result_data = evaluate_controller(eval_env, rb_controller, rank=sim)
         sim_column = np.full((result_data.shape[0], 1), sim)
         result_data = np.column_stack((result_data, sim_column))
         result.update_result(result_data)
+        # summaries of the finished simulation
+        aggregator.add(result_data, result_columns, episode=sim)
 
         # data.append(results_data)
 
@@ -84,6 +132,10 @@ if __name__ == "__main__":
     save_name = f"rb_baseline-{growth_year}{start_day}-{location}.csv"
     print("saving results to", save_name)
     result.save(f"{save_dir}/{save_name}")
+    ResultIndex("data").register(
+        f"{save_dir}/{save_name}", df=result.df, aggregator=aggregator, project=args.project, mode=args.mode, algorithm="rb_baseline", model="rb_baseline",
+        growth_year=growth_year, start_day=start_day, location=location, uncertainty=args.uncertainty_scale,
+    )
 
 
     # plt.figure(figsize=(10, 6))
@@ -0,0 +1,100 @@
+import argparse
+import os
+
+import numpy as np
+from tqdm import tqdm
+
+from gl_gym.environments.tomato_env import TomatoEnv
+from gl_gym.environments.mpc import EconomicMPC
+from gl_gym.environments.ilqr import ILQRController
+from gl_gym.common.utils import load_env_params, load_model_hyperparams
+from gl_gym.common.results import Results
+from gl_gym.common.aggregation import EpisodeAggregator
+from gl_gym.common.result_index import ResultIndex
+from gl_gym.experiments.evaluate_baseline import collect_results
+
+CONTROLLERS = {"mpc": EconomicMPC, "ilqr": ILQRController}
+
+def evaluate_mpc(env, mpc, rank=0):
+    """
+    Closed-loop evaluation of the MPC (or iLQR) controller; the forecast over the horizon is taken from the weather data of the env.
+    """
+    env.reset(seed=666+rank)
+    mpc.reset()
+    mpc.solve_times = []
+
+    def step():
+        d = env.weather_data[env.timestep:env.timestep+mpc.Np]
+        return env.step_raw_control(mpc.predict(env.x, d, env))
+
+    result_data = collect_results(env, step)
+    solve_times = np.zeros(env.N+1)
+    solve_times[:len(mpc.solve_times)] = mpc.solve_times
+    return np.column_stack((result_data, solve_times))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--project", type=str, default="AgriControl", help="Name of the project (in wandb)")
+    parser.add_argument("--env_id", type=str, default="TomatoEnv", help="Environment ID")
+    parser.add_argument("--uncertainty_scale", type=float, help="Uncertainty scale", required=True)
+    parser.add_argument("--mode", type=str, choices=['deterministic', 'stochastic'], required=True)
+    parser.add_argument("--n_sims", type=int, default=None, help="Number of simulations (defaults to 30 in stochastic mode)")
+    parser.add_argument("--controller", type=str, choices=list(CONTROLLERS), default="mpc", help="Model-based controller")
+    parser.add_argument("--season_length", type=int, default=None, help="Overrides the season length of the env config [days]")
+    args = parser.parse_args()
+    env_config_path = f"gl_gym/configs/envs/"
+
+    if args.mode == "stochastic":
+        save_dir = f"data/{args.project}/{args.mode}/{args.controller}/{args.uncertainty_scale}/"
+        n_sims = 30
+    else:
+        save_dir = f"data/{args.project}/{args.mode}/{args.controller}/"
+        n_sims = 1
+    if args.n_sims is not None:
+        n_sims = args.n_sims
+    os.makedirs(save_dir, exist_ok=True)
+
+    env_base_params, env_specific_params = load_env_params(args.env_id, env_config_path)
+    env_base_params['training'] = True
+    if args.season_length is not None:
+        env_base_params['season_length'] = args.season_length
+    env_specific_params["uncertainty_scale"] = args.uncertainty_scale
+    eval_env = TomatoEnv(base_env_params=env_base_params, **env_specific_params)
+
+    mpc_params = load_model_hyperparams(args.controller, args.env_id)
+    mpc = CONTROLLERS[args.controller](eval_env, **mpc_params)
+
+    result_columns = eval_env.get_obs_names()[:23]
+    result_columns.extend(["Rewards", "EPI", "Revenue", "Heat costs", "CO2 costs", "Elec costs"])
+    result_columns.extend(["temp_violation", "co2_violation", "rh_violation"])
+    result_columns.extend(["solve_time", "episode"])
+    result = Results(result_columns)
+    aggregator = EpisodeAggregator()
+
+    for sim in tqdm(range(n_sims)):
+        result_data = evaluate_mpc(eval_env, mpc, rank=sim)
+        sim_column = np.full((result_data.shape[0], 1), sim)
+        result_data = np.column_stack((result_data, sim_column))
+        result.update_result(result_data)
+        # summaries of the finished simulation
+        aggregator.add(result_data, result_columns, episode=sim)
+
+        solve_times = np.array(mpc.solve_times)
+        n_failed = sum(status not in ("Solve_Succeeded", "Solved_To_Acceptable_Level") for status in mpc.solver_stats[-len(solve_times):])
+        print(f"sim {sim}: EPI {result_data[:, 24].sum():.3f} €/m2, "
+              f"solve time mean {solve_times.mean():.2f}s / max {solve_times.max():.2f}s / total {solve_times.sum():.0f}s, {n_failed} failed solves")
+        if eval_env.linearization is not None:
+            print(f"linearisation cache: {eval_env.linearization.hits} hits, {eval_env.linearization.misses} misses")
+
+    start_day = eval_env.start_day
+    growth_year = eval_env.growth_year
+    location = eval_env.location
+
+    save_name = f"{args.controller}-{growth_year}{start_day}-{location}.csv"
+    print("saving results to", save_name)
+    result.save(f"{save_dir}/{save_name}")
+    ResultIndex("data").register(
+        f"{save_dir}/{save_name}", df=result.df, aggregator=aggregator, project=args.project, mode=args.mode, algorithm=args.controller, model=args.controller,
+        growth_year=growth_year, start_day=start_day, location=location, uncertainty=args.uncertainty_scale,
+    )
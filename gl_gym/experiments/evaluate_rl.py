@@ -1,25 +1,40 @@
 import argparse
 import os
+import math
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
 from os.path import join
+from typing import Any, Dict, List, Tuple
 from tqdm import tqdm
 import pandas as pd
 import numpy as np
 
 from stable_baselines3 import PPO, SAC
+from sb3_contrib import RecurrentPPO
 from stable_baselines3.common.vec_env import VecNormalize, DummyVecEnv
 
 from gl_gym.RL.utils import make_vec_env
+from gl_gym.RL.env_pool import EnvPool
 from gl_gym.common.results import Results
+from gl_gym.common.aggregation import EpisodeAggregator
+from gl_gym.common.eval_cache import EvaluationCache
+from gl_gym.common.result_index import ResultIndex
 from gl_gym.common.utils import load_env_params, load_model_hyperparams
 
 ALG = {"ppo": PPO, 
-       "sac": SAC}
+       "sac": SAC,
+       "recurrentppo": RecurrentPPO}
 
+# state of an evaluation process: the pooled environments and the last loaded model
+_worker: Dict[str, Any] = {}
 
-def load_env(env_id, model_name, env_base_params, env_specific_params, load_path):
+
+def load_env(env_id, model_name, env_base_params, env_specific_params, load_path, env_pool=None):
     env_base_params["training"] = False
-    # Setup new environment for training
-    env = make_vec_env(
+    # Setup new environment for training, or reconfigure a pooled environment
+    env = (env_pool.make_vec_env if env_pool is not None else make_vec_env)(
         env_id, 
         env_base_params, 
         env_specific_params,
@@ -57,6 +72,8 @@ def evaluate(model, env):
             deterministic=True,
     )
         observations, rewards, dones, infos = env.step(actions)
+        # the recurrent state is only reset at the start of an episode
+        episode_starts = dones
         episode_rewards[timestep] += rewards[0]
         episodic_obs[timestep] += env.unnormalize_obs(observations)[0, :23]
         epi[timestep] += infos[0]["EPI"]
@@ -72,14 +89,162 @@ def evaluate(model, env):
     result_data = np.column_stack((episodic_obs, episode_rewards, epi, revenue, heat_cost, co2_cost, elec_cost, temp_violation, co2_violation, rh_violation))
     return result_data[:-1]
 
+def get_result_columns(env) -> List[str]:
+    result_columns = env.env_method("get_obs_names")[0][:23]
+    result_columns.extend(["Rewards", "EPI", "Revenue", "Heat costs", "CO2 costs", "Elec costs"])
+    result_columns.extend(["temp_violation", "co2_violation", "rh_violation"])
+    return result_columns
+
+def checkpoint_paths(load_path, model_name):
+    """The model checkpoint and VecNormalize statistics of a trained model."""
+    return (
+        join(load_path + "models", f"{model_name}/best_model.zip"),
+        join(load_path + "envs", f"{model_name}/best_vecnormalize.pkl"),
+    )
+
+def scenario_params(env_specific_params, growth_year, start_day, location, uncertainty):
+    """Environment parameters that evaluate a single scenario."""
+    params = deepcopy(env_specific_params)
+    params["eval_options"] = {"eval_years": [int(growth_year)], "eval_days": [int(start_day)], "location": location}
+    params["uncertainty_scale"] = uncertainty
+    return params
+
+def evaluate_cells(task: Dict[str, Any]) -> Tuple[List[np.ndarray], List[str]]:
+    """
+    Evaluates a trained model on a scenario for a number of seeds.
+    The model and environment are loaded once for all seeds.
+    If the task has a cache directory, the results are stored under the keys of the task.
+
+    Args:
+        task (Dict): env_id, algorithm, model_name, load_path, env_base_params, env_specific_params,
+            growth_year, start_day, location, uncertainty, seeds, and optionally keys and cache_root.
+
+    Returns:
+        Tuple[List[np.ndarray], List[str]]: the results per seed and the result columns.
+    """
+    env_specific_params = scenario_params(
+        task["env_specific_params"], task["growth_year"], task["start_day"], task["location"], task["uncertainty"]
+    )
+    env_pool = _worker.get("env_pool")
+    env = load_env(
+        task["env_id"], task["model_name"], deepcopy(task["env_base_params"]), env_specific_params, task["load_path"], env_pool
+    )
+    model = _load_model(task["algorithm"], checkpoint_paths(task["load_path"], task["model_name"])[0])
+    columns = get_result_columns(env)
+    cache = EvaluationCache(task["cache_root"]) if task.get("cache_root") else None
+
+    results = []
+    for i, seed in enumerate(task["seeds"]):
+        env.env_method("set_seed", seed)
+        result_data = evaluate(model, env)
+        if cache is not None:
+            cache.put(
+                task["keys"][i], result_data, columns, model=task["model_name"], algorithm=task["algorithm"],
+                growth_year=task["growth_year"], start_day=task["start_day"], location=task["location"],
+                uncertainty=task["uncertainty"], seed=seed,
+            )
+        results.append(result_data)
+    if env_pool is None:
+        env.close()
+    return results, columns
+
+def _evaluate_cached(task: Dict[str, Any]) -> List[str]:
+    # the results are read from the cache, instead of sending them back to the main process
+    evaluate_cells(task)
+    return task["keys"]
+
+def _load_model(algorithm, model_path):
+    # the tasks of a model are scheduled consecutively, an evaluation process keeps the last model
+    key = (algorithm, model_path, os.path.getmtime(model_path))
+    if _worker.get("model_key") != key:
+        _worker["model"] = ALG[algorithm].load(model_path, device="cpu")
+        _worker["model_key"] = key
+    return _worker["model"]
+
+def _init_worker():
+    # the workers evaluate in parallel, a thread each
+    import torch
+    torch.set_num_threads(1)
+    # the environments are reconfigured for the next scenario, instead of restarted
+    _worker["env_pool"] = EnvPool()
+    # closed before the environment processes of the worker are terminated on exit
+    multiprocessing.util.Finalize(_worker["env_pool"], _worker["env_pool"].close, exitpriority=10)
+
+def evaluate_missing(
+    cells: List[Dict[str, Any]],
+    env_base_params: Dict[str, Any],
+    env_specific_params: Dict[str, Any],
+    cache: EvaluationCache,
+    n_workers: int = 1,
+    ) -> List[str]:
+    """
+    Evaluates the cells that are not in the cache, in parallel over `n_workers` processes.
+    A cell is a simulation: env_id, algorithm, model_name, load_path, growth_year, start_day, location, uncertainty and seed.
+    The missing seeds of a model and scenario are evaluated by the same worker, which loads the model once.
+    The tasks are handed out in the order of the cells, in chunks, such that a worker evaluates consecutive
+    scenarios of a model with the loaded model and its environment reconfigured for the next scenario.
+
+    Returns:
+        List[str]: the cache keys of the cells.
+    """
+    keys, tasks = [], defaultdict(list)
+    for cell in cells:
+        model_path, vecnormalize_path = checkpoint_paths(cell["load_path"], cell["model_name"])
+        key = cache.key(
+            model_path, vecnormalize_path, [env_base_params, env_specific_params, {"env_id": cell["env_id"]}],
+            cell["growth_year"], cell["start_day"], cell["location"], cell["uncertainty"], cell["seed"],
+        )
+        keys.append(key)
+        if key not in cache:
+            group = tuple(cell[name] for name in (
+                "env_id", "algorithm", "model_name", "load_path", "growth_year", "start_day", "location", "uncertainty"
+            ))
+            tasks[group].append((cell["seed"], key))
+
+    tasks = [
+        {
+            "env_id": env_id, "algorithm": algorithm, "model_name": model_name, "load_path": load_path,
+            "growth_year": growth_year, "start_day": start_day, "location": location, "uncertainty": uncertainty,
+            "env_base_params": env_base_params, "env_specific_params": env_specific_params,
+            "seeds": [seed for seed, _ in seeds], "keys": [key for _, key in seeds], "cache_root": cache.root,
+        }
+        for (env_id, algorithm, model_name, load_path, growth_year, start_day, location, uncertainty), seeds in tasks.items()
+    ]
+    if not tasks:
+        return keys
+    print(f"evaluating {sum(len(task['seeds']) for task in tasks)} of {len(cells)} simulations, the others are cached")
+    if n_workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(
+            max_workers=min(n_workers, len(tasks)),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        ) as executor:
+            chunksize = max(1, math.ceil(len(tasks) / (4 * n_workers)))
+            list(tqdm(executor.map(_evaluate_cached, tasks, chunksize=chunksize), total=len(tasks)))
+    else:
+        _worker["env_pool"] = EnvPool()
+        try:
+            for task in tqdm(tasks):
+                _evaluate_cached(task)
+        finally:
+            _worker.pop("env_pool").close()
+            _worker.pop("model", None)
+            _worker.pop("model_key", None)
+    return keys
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--project", type=str, default="AgriControl", help="Name of the project (in wandb)")
     parser.add_argument("--env_id", type=str, default="TomatoEnv", help="Environment ID")
     parser.add_argument("--model_name", type=str, default="cosmic-music-45", help="Name of the trained RL model")
-    parser.add_argument("--algorithm", type=str, default="ppo", help="Name of the algorithm (ppo or sac)")
+    parser.add_argument("--algorithm", type=str, default="ppo", help="Name of the algorithm (ppo, sac or recurrentppo)")
     parser.add_argument("--uncertainty_scale", type=float, help="Uncertainty scale", required=True)
     parser.add_argument("--mode", type=str, choices=['deterministic', 'stochastic'], required=True)
+    parser.add_argument("--growth_year", type=int, help="Growth year to evaluate, defaults to the first year of the eval options")
+    parser.add_argument("--start_day", type=int, help="Start day to evaluate, defaults to the first day of the eval options")
+    parser.add_argument("--location", type=str, help="Location to evaluate, defaults to the location of the eval options")
+    parser.add_argument("--n_workers", type=int, default=1, help="Number of processes that evaluate the simulations")
+    parser.add_argument("--no_cache", action="store_true", help="Evaluate all simulations, instead of reading cached results")
     args = parser.parse_args()
 
     assert not (args.mode == "deterministic" and args.uncertainty_scale != 0.0), \
@@ -95,33 +260,47 @@ if __name__ == "__main__":
         n_sims = 1
     os.makedirs(save_dir, exist_ok=True)
 
-    # load in the environment and model
     env_base_params, env_specific_params = load_env_params(args.env_id, env_config_path)
-    model_params = load_model_hyperparams(args.algorithm, args.env_id)
-    env_specific_params["uncertainty_scale"] = args.uncertainty_scale
-    eval_env = load_env(args.env_id, args.model_name, env_base_params, env_specific_params, load_path)
+    env_base_params["training"] = False
+    eval_options = env_specific_params["eval_options"]
+    growth_year = args.growth_year if args.growth_year is not None else eval_options["eval_years"][0]
+    start_day = args.start_day if args.start_day is not None else eval_options["eval_days"][0]
+    location = args.location or eval_options["location"]
 
-    model = ALG[args.algorithm].load(join(load_path + f"models", f"{args.model_name}/best_model.zip"), device="cpu")
+    # a simulation per seed, the results of previous evaluations are read from the cache
+    cells = [
+        {"env_id": args.env_id, "algorithm": args.algorithm, "model_name": args.model_name, "load_path": load_path,
+         "growth_year": growth_year, "start_day": start_day, "location": location,
+         "uncertainty": args.uncertainty_scale, "seed": 666+sim}
+        for sim in range(n_sims)
+    ]
+    if args.no_cache:
+        task = {key: value for key, value in cells[0].items() if key != "seed"}
+        task.update({"env_base_params": env_base_params, "env_specific_params": env_specific_params,
+                     "seeds": [cell["seed"] for cell in cells]})
+        sims, result_columns = evaluate_cells(task)
+    else:
+        cache = EvaluationCache()
+        keys = evaluate_missing(cells, env_base_params, env_specific_params, cache, n_workers=args.n_workers)
+        sims, columns = zip(*(cache.get(key) for key in keys))
+        result_columns = list(columns[0])
 
-    result_columns = eval_env.env_method("get_obs_names")[0][:23]
-    result_columns.extend(["Rewards", "EPI", "Revenue", "Heat costs", "CO2 costs", "Elec costs"])
-    result_columns.extend(["temp_violation", "co2_violation", "rh_violation"])
     result_columns.extend(["episode"])
     result = Results(result_columns)
+    aggregator = EpisodeAggregator()
 
-    for sim in tqdm(range(n_sims)):
-        # eval_env.set_seed(sim)
-        eval_env.env_method("set_seed", 666+sim)
-        result_data = evaluate(model, eval_env)
+    for sim, result_data in enumerate(sims):
         sim_column = np.full((result_data.shape[0], 1), sim)
         result_data = np.column_stack((result_data, sim_column))
 
         result.update_result(result_data)
-
-    start_day = eval_env.get_attr("start_day")[0]
-    growth_year = eval_env.get_attr("growth_year")[0]
-    location = eval_env.get_attr("location")[0]
+        # summaries of the finished simulation
+        aggregator.add(result_data, result_columns, episode=sim)
 
     save_name = f"{args.model_name}-{growth_year}{start_day}-{location}.csv"
     print("saving results to", save_name)
     result.save(f"{save_dir}/{save_name}")
+    ResultIndex("data").register(
+        f"{save_dir}/{save_name}", df=result.df, aggregator=aggregator, project=args.project, mode=args.mode, algorithm=args.algorithm, model=args.model_name,
+        growth_year=growth_year, start_day=start_day, location=location, uncertainty=args.uncertainty_scale,
+    )
@@ -0,0 +1,147 @@
+import argparse
+import os
+import itertools
+from os.path import join
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from tqdm import tqdm
+
+from gl_gym.RL.utils import ENVS
+from gl_gym.environments.baseline import RuleBasedController
+from gl_gym.common.utils import load_env_params, load_model_hyperparams
+from gl_gym.common.dataset import EpisodeBuffer, control_to_action, write_index
+
+# environment and policy that are reused by the consecutive scenarios of a worker process
+_ENV = None
+_POLICY = None
+
+
+def _get_env(env_id, env_base_params, env_specific_params, scenario):
+    """Creates the worker env once and re-parameterizes it for every scenario."""
+    global _ENV
+    base_params = dict(env_base_params)
+    base_params.update({
+        "training": True,
+        "start_train_year": scenario["year"],
+        "end_train_year": scenario["year"],
+        "start_train_day": scenario["start_day"],
+        "end_train_day": scenario["start_day"],
+    })
+    specific_params = dict(env_specific_params)
+    specific_params["uncertainty_scale"] = scenario["uncertainty"]
+
+    if _ENV is None:
+        _ENV = ENVS[env_id](**specific_params, base_env_params=base_params)
+    else:
+        _ENV.reconfigure(env_specific_params=specific_params, base_env_params=base_params)
+    return _ENV
+
+
+def _load_policy(controller, env_id, model_path, vecnormalize_path, env):
+    """
+    Returns a function that maps the unnormalised observation of the env to a normalised action.
+    """
+    if controller == "rule_based":
+        rb_controller = RuleBasedController(**load_model_hyperparams("rule_based", env_id))
+
+        def policy(obs):
+            u = rb_controller.predict(env.x, env.weather_data[env.timestep], env)
+            return control_to_action(u, env.u, env.delta_u_max)
+        return policy
+
+    from stable_baselines3 import PPO, SAC
+    from stable_baselines3.common.vec_env import VecNormalize, DummyVecEnv
+    model = {"ppo": PPO, "sac": SAC}[controller].load(model_path, device="cpu")
+    vec_norm = None
+    if vecnormalize_path is not None:
+        vec_norm = VecNormalize.load(vecnormalize_path, DummyVecEnv([lambda: env]))
+
+    def policy(obs):
+        if vec_norm is not None:
+            obs = vec_norm.normalize_obs(obs)
+        action, _ = model.predict(obs, deterministic=True)
+        return action.astype(np.float32)
+    return policy
+
+
+def generate_episode(scenario, settings):
+    """
+    Runs one episode for a (year, start_day, seed, uncertainty) scenario and writes it as a dataset chunk.
+    The actions are stored in the normalised [-1, 1] action space of the environment;
+    the rule-based controls are converted to (rate-limited) actions before they are applied,
+    so each stored transition is exactly what the environment produced.
+    """
+    global _POLICY
+    env = _get_env(settings["env_id"], settings["env_base_params"], settings["env_specific_params"], scenario)
+    if _POLICY is None:
+        _POLICY = _load_policy(settings["controller"], settings["env_id"], settings["model_path"], settings["vecnormalize_path"], env)
+    policy = _POLICY
+
+    buffer = EpisodeBuffer()
+    obs, _ = env.reset(seed=scenario["seed"])
+    done = False
+    while not done:
+        action = policy(obs)
+        next_obs, reward, done, _, info = env.step(action)
+        buffer.add(obs, action, reward, next_obs, done, info)
+        obs = next_obs
+
+    chunk = {"name": scenario["name"], "length": buffer.save(join(settings["dataset_dir"], scenario["name"]))}
+    chunk.update({key: scenario[key] for key in ["year", "start_day", "seed", "uncertainty"]})
+    return chunk
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--project", type=str, default="AgriControl", help="Name of the project (in wandb)")
+    parser.add_argument("--env_id", type=str, default="TomatoEnv", help="Environment ID")
+    parser.add_argument("--controller", type=str, default="rule_based", choices=["rule_based", "ppo", "sac"], help="Controller that generates the data")
+    parser.add_argument("--model_name", type=str, default=None, help="Name of the trained RL model (ppo/sac)")
+    parser.add_argument("--mode", type=str, choices=["deterministic", "stochastic"], default="deterministic", help="Folder the RL model was saved in")
+    parser.add_argument("--dataset_name", type=str, required=True, help="Name of the dataset")
+    parser.add_argument("--years", type=int, nargs="+", required=True, help="Growth years")
+    parser.add_argument("--start_days", type=int, nargs="+", required=True, help="Start days of the growing seasons")
+    parser.add_argument("--n_seeds", type=int, default=1, help="Number of seeds per (year, start day, uncertainty)")
+    parser.add_argument("--uncertainties", type=float, nargs="+", default=[0.0], help="Parametric uncertainty scales")
+    parser.add_argument("--n_workers", type=int, default=1, help="Number of parallel processes")
+    args = parser.parse_args()
+
+    env_config_path = f"gl_gym/configs/envs/"
+    dataset_dir = f"data/{args.project}/datasets/{args.dataset_name}/"
+    os.makedirs(dataset_dir, exist_ok=True)
+
+    model_path, vecnormalize_path = None, None
+    if args.controller != "rule_based":
+        load_path = f"train_data/{args.project}/{args.controller}/{args.mode}/"
+        model_path = join(load_path, "models", f"{args.model_name}/best_model.zip")
+        vecnormalize_path = join(load_path, "envs", f"{args.model_name}/best_vecnormalize.pkl")
+
+    env_base_params, env_specific_params = load_env_params(args.env_id, env_config_path)
+    settings = {
+        "env_id": args.env_id,
+        "env_base_params": env_base_params,
+        "env_specific_params": env_specific_params,
+        "controller": args.controller,
+        "model_path": model_path,
+        "vecnormalize_path": vecnormalize_path,
+        "dataset_dir": dataset_dir,
+    }
+
+    controller_name = args.controller if args.model_name is None else args.model_name
+    scenarios = [
+        {
+            "name": f"{controller_name}-{year}{start_day}-{seed}-{uncertainty}",
+            "year": year,
+            "start_day": start_day,
+            "seed": 666 + seed,
+            "uncertainty": uncertainty,
+        }
+        for year, start_day, seed, uncertainty in itertools.product(args.years, args.start_days, range(args.n_seeds), args.uncertainties)
+    ]
+
+    with ProcessPoolExecutor(max_workers=args.n_workers) as executor:
+        chunks = list(tqdm(executor.map(generate_episode, scenarios, itertools.repeat(settings)), total=len(scenarios)))
+
+    write_index(dataset_dir, chunks, metadata={"env_id": args.env_id, "location": env_base_params["location"]})
+    print(f"saved {sum(chunk['length'] for chunk in chunks)} transitions to {dataset_dir}")
@@ -0,0 +1,89 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from gl_gym.environments.tomato_env import TomatoEnv, INTEGRATORS
+from gl_gym.environments.baseline import RuleBasedController
+from gl_gym.environments.ensemble import ensemble_outputs
+from gl_gym.common.utils import load_env_params, load_model_hyperparams
+
+
+def replay(F, x0, controls, weather, p):
+    """Open-loop simulation of the control inputs with integrator F. Returns the (N+1, nx) states and the wall time."""
+    states = [np.asarray(x0, dtype=float)]
+    start = time.time()
+    for k in range(len(controls)):
+        res = F(x0=states[-1], u=controls[k], p=np.concatenate([weather[k], p]))
+        states.append(res["xf"].full().flatten())
+    return np.array(states), time.time() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--project", type=str, default="AgriControl", help="Name of the project (in wandb)")
+    parser.add_argument("--env_id", type=str, default="TomatoEnv", help="Environment ID")
+    parser.add_argument("--season_length", type=int, default=10, help="Number of simulated days")
+    parser.add_argument("--crop_substeps", type=int, nargs="+", default=[1, 2, 4], help="Crop updates per time step of the multi-rate schemes")
+    parser.add_argument("--tolerances", type=float, nargs="+", default=[1e-4, 1e-6], help="cvodes tolerances of the compared schemes")
+    parser.add_argument("--ref_tolerance", type=float, default=1e-8, help="cvodes tolerance of the monolithic reference")
+    parser.add_argument("--seed", type=int, default=666, help="Seed of the environment")
+    args = parser.parse_args()
+    env_config_path = f"gl_gym/configs/envs/"
+    save_dir = f"data/{args.project}/integration/"
+    os.makedirs(save_dir, exist_ok=True)
+
+    env_base_params, env_specific_params = load_env_params(args.env_id, env_config_path)
+    env_base_params["season_length"] = args.season_length
+    env = TomatoEnv(base_env_params=env_base_params, **env_specific_params)
+    env.reset(seed=args.seed)
+    p = np.asarray(env.p, dtype=float)
+
+    # the control inputs of the rule-based controller are replayed open loop by every scheme
+    rb_controller = RuleBasedController(**load_model_hyperparams("rule_based", args.env_id))
+    x0 = np.copy(env.x)
+    controls = []
+    done = False
+    while not done:
+        u = rb_controller.predict(env.x, env.weather_data[env.timestep], env)
+        controls.append(u)
+        _, _, done, _, _ = env.step_raw_control(u)
+    controls = np.array(controls)
+    weather = env.weather_data[:len(controls)]
+
+    dims = dict(nx=env.nx, nu=env.nu, nd=env.nd, n_params=env.num_params, dt=env.dt)
+    F_ref = INTEGRATORS["monolithic"](**dims, abstol=args.ref_tolerance, reltol=args.ref_tolerance)
+    X_ref, ref_time = replay(F_ref, x0, controls, weather, p)
+    Y_ref = ensemble_outputs(X_ref)
+
+    schemes = [("monolithic", {"abstol": tol, "reltol": tol}) for tol in args.tolerances]
+    schemes += [
+        ("multirate", {"crop_substeps": n, "abstol": tol, "reltol": tol})
+        for tol in args.tolerances for n in args.crop_substeps
+    ]
+    schemes += [("reduced", {"abstol": tol, "reltol": tol}) for tol in args.tolerances]
+    results = []
+    for integrator, integrator_params in schemes:
+        X, wall_time = replay(INTEGRATORS[integrator](**dims, **integrator_params), x0, controls, weather, p)
+        error = np.abs(ensemble_outputs(X) - Y_ref)
+        results.append({
+            "integrator": integrator,
+            "crop_substeps": integrator_params.get("crop_substeps"),
+            "tolerance": integrator_params["abstol"],
+            "time_per_step": wall_time / len(controls),
+            "speedup": ref_time / wall_time,
+            "co2_max_error": error[:, 0].max(),
+            "temp_max_error": error[:, 1].max(),
+            "rh_max_error": error[:, 2].max(),
+            "fruit_rel_error": abs(X[-1, 25] - X_ref[-1, 25]) / abs(X_ref[-1, 25] - X_ref[0, 25]),
+            "tsum_error": abs(X[-1, 26] - X_ref[-1, 26]),
+        })
+
+    df = pd.DataFrame(results)
+    print(f"reference: monolithic, tolerance {args.ref_tolerance:.0e}, {ref_time/len(controls)*1e3:.2f} ms per step")
+    print(df.to_string(index=False))
+    save_name = f"integration-{env.growth_year}{env.start_day}-{env.location}-{args.season_length}d"
+    df.to_csv(f"{save_dir}/{save_name}.csv", index=False)
+    print("saving results to", save_dir)
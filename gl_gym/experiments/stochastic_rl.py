@@ -5,6 +5,7 @@ import numpy as np
 from RL.experiment_manager import ExperimentManager
 from gl_gym.common.utils import load_model_hyperparams
 from RL.utils import load_env_params
+from gl_gym.RL.env_pool import EnvPool
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -27,6 +28,8 @@ if __name__ == "__main__":
     uncertainties = np.linspace(0.0, 0.3, 7)
     uncertainties.round(2)
     print(uncertainties)
+    # reuse the env workers over the runs, only the uncertainty scale changes
+    env_pool = EnvPool()
     for uncertainty in uncertainties:
         hyperparameters = load_model_hyperparams(args.algorithm, args.env_id)
         group = f"{args.algorithm}-stoch-{uncertainty}"
@@ -46,7 +49,9 @@ if __name__ == "__main__":
             stochastic=True,
             save_model=args.save_model,
             save_env=args.save_env,
-            device=args.device
+            device=args.device,
+            env_pool=env_pool
         )
         experiment_manager.run_experiment()
+    env_pool.close()
 
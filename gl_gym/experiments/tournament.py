@@ -0,0 +1,206 @@
+import argparse
+import os
+from glob import glob
+from os.path import join
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from gl_gym.common.aggregation import EpisodeAggregator
+from gl_gym.common.eval_cache import EvaluationCache
+from gl_gym.common.utils import load_env_params
+from gl_gym.environments.weather_catalog import get_catalog
+from gl_gym.experiments.evaluate_rl import ALG, checkpoint_paths, evaluate_missing
+
+# metrics of which lower totals are better
+LOWER_IS_BETTER = ("Penalty", "temp_violation", "co2_violation", "rh_violation", "Heat costs", "CO2 costs", "Elec costs")
+
+
+def discover_models(
+    train_dir: str = "train_data",
+    project: str = "AgriControl",
+    algorithms: Optional[Sequence[str]] = None,
+    modes: Optional[Sequence[str]] = None,
+    ) -> List[Dict[str, str]]:
+    """
+    The trained models with saved VecNormalize statistics,
+    `<train_dir>/<project>/<algorithm>/<mode>/models/<model_name>/best_model.zip`.
+    """
+    models = []
+    for model_path in sorted(glob(join(train_dir, project, "*", "*", "models", "*", "best_model.zip"))):
+        model_dir = os.path.dirname(model_path)
+        mode_dir = os.path.dirname(os.path.dirname(model_dir))
+        model_name = os.path.basename(model_dir)
+        mode = os.path.basename(mode_dir)
+        algorithm = os.path.basename(os.path.dirname(mode_dir))
+        if algorithm not in ALG or (algorithms and algorithm not in algorithms) or (modes and mode not in modes):
+            continue
+        load_path = mode_dir + "/"
+        if not os.path.exists(checkpoint_paths(load_path, model_name)[1]):
+            print(f"skipping {model_path}, it has no VecNormalize statistics")
+            continue
+        models.append({"algorithm": algorithm, "mode": mode, "model_name": model_name, "load_path": load_path})
+    return models
+
+
+def weather_horizon(env_base_params: Dict[str, Any]) -> int:
+    """
+    [days] The weather that the environment loads past the end of the season, `Np+1`,
+    see `TomatoEnv._load_episode`.
+    """
+    return int(env_base_params["pred_horizon"] * 86400 / env_base_params["dt"]) + 1
+
+
+def discover_scenarios(
+    weather_data_dir: str,
+    season_length: float,
+    pred_horizon: float,
+    start_days: Sequence[int],
+    locations: Optional[Sequence[str]] = None,
+    years: Optional[Sequence[int]] = None,
+    ) -> List[Tuple[str, int, int]]:
+    """
+    The (location, growth year, start day) scenarios of which the season is covered by the weather data,
+    over all locations and years of the weather catalog unless these are given.
+    `pred_horizon` is the weather that the environment loads past the season, see `weather_horizon`.
+    """
+    catalog = get_catalog(weather_data_dir)
+    scenarios = []
+    for location in (locations or catalog.locations()):
+        for year in catalog.years(location):
+            if years and year not in years:
+                continue
+            valid = catalog.valid_start_days(location, year, season_length, pred_horizon)
+            scenarios.extend((location, year, int(day)) for day in start_days if day in valid)
+    return scenarios
+
+
+def bootstrap_ci(
+    values: np.ndarray,
+    confidence: float = 0.95,
+    n_bootstrap: int = 2000,
+    rng: Optional[np.random.Generator] = None,
+    ) -> Tuple[float, float]:
+    """Percentile bootstrap confidence interval of the mean."""
+    values = np.asarray(values, dtype=float)
+    if len(values) < 2:
+        return np.nan, np.nan
+    rng = rng if rng is not None else np.random.default_rng(0)
+    means = values[rng.integers(len(values), size=(n_bootstrap, len(values)))].mean(axis=1)
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(means, [alpha, 1 - alpha])
+    return float(low), float(high)
+
+
+def leaderboard(
+    totals: pd.DataFrame,
+    metric: str = "Rewards",
+    metrics: Sequence[str] = ("EPI", "Penalty"),
+    confidence: float = 0.95,
+    n_bootstrap: int = 2000,
+    ascending: Optional[bool] = None,
+    ) -> pd.DataFrame:
+    """
+    Ranks the models by the mean episode total of `metric` over the scenarios.
+    The totals are first averaged over the seeds of a scenario, and the confidence interval is bootstrapped
+    over the scenarios, such that the scenarios, instead of the simulations, are the unit of comparison.
+
+    Args:
+        totals (pd.DataFrame): the episode totals, a row per model, scenario, uncertainty and seed.
+        metric (str): the ranking metric.
+        metrics (Sequence[str]): other metrics of which the mean is reported.
+        confidence (float): level of the confidence intervals.
+        n_bootstrap (int): number of bootstrap samples.
+        ascending (bool, optional): whether lower is better. Defaults to True for the costs and violations.
+    """
+    if ascending is None:
+        ascending = metric in LOWER_IS_BETTER
+    models = ["algorithm", "mode", "model_name", "uncertainty"]
+    metrics = [m for m in metrics if m in totals.columns and m != metric]
+    scenarios = totals.groupby(models + ["location", "growth_year", "start_day"])[[metric, *metrics]].mean()
+    n_sims = totals.groupby(models).size()
+
+    rng = np.random.default_rng(0)
+    rows = []
+    for model, scores in scenarios.groupby(level=models):
+        low, high = bootstrap_ci(scores[metric].to_numpy(), confidence, n_bootstrap, rng)
+        rows.append({
+            **dict(zip(models, model)),
+            f"{metric} mean": scores[metric].mean(),
+            f"{metric} ci_low": low,
+            f"{metric} ci_high": high,
+            f"{metric} std": scores[metric].std(),
+            **{f"{m} mean": scores[m].mean() for m in metrics},
+            "n_scenarios": len(scores),
+            "n_sims": int(n_sims.loc[model]),
+        })
+    board = pd.DataFrame(rows).sort_values(f"{metric} mean", ascending=ascending, ignore_index=True)
+    board.insert(0, "rank", np.arange(1, len(board) + 1))
+    return board
+
+
+def episode_totals(cells: List[Dict[str, Any]], keys: List[str], cache: EvaluationCache) -> pd.DataFrame:
+    """The episode totals of the evaluated cells, read from the cache."""
+    rows = []
+    for cell, key in zip(cells, keys):
+        data, columns = cache.get(key)
+        aggregator = EpisodeAggregator()
+        aggregator.add(data, columns)
+        totals = aggregator.totals().iloc[0].to_dict()
+        rows.append({name: value for name, value in cell.items() if name not in ("load_path", "env_id")} | totals)
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate all trained models on all weather scenarios and rank them.")
+    parser.add_argument("--project", type=str, default="AgriControl", help="Name of the project (in wandb)")
+    parser.add_argument("--env_id", type=str, default="TomatoEnv", help="Environment ID")
+    parser.add_argument("--train_dir", type=str, default="train_data", help="Directory of the trained models")
+    parser.add_argument("--algorithms", nargs="+", help="Algorithms to include, defaults to all")
+    parser.add_argument("--modes", nargs="+", choices=["deterministic", "stochastic"], help="Training modes to include, defaults to all")
+    parser.add_argument("--locations", nargs="+", help="Locations to evaluate, defaults to all locations of the weather data")
+    parser.add_argument("--years", nargs="+", type=int, help="Growth years to evaluate, defaults to all years of the weather data")
+    parser.add_argument("--start_days", nargs="+", type=int, help="Start days to evaluate, defaults to the days of the eval options")
+    parser.add_argument("--uncertainty_scales", nargs="+", type=float, default=[0.0], help="Uncertainty scales to evaluate")
+    parser.add_argument("--n_seeds", type=int, default=1, help="Number of simulations per model, scenario and uncertainty")
+    parser.add_argument("--metric", type=str, default="Rewards", help="Metric to rank the models by")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Level of the confidence intervals")
+    parser.add_argument("--n_workers", type=int, default=os.cpu_count(), help="Number of evaluation processes")
+    args = parser.parse_args()
+
+    env_config_path = f"gl_gym/configs/envs/"
+    save_dir = f"data/{args.project}/tournament/"
+    os.makedirs(save_dir, exist_ok=True)
+
+    env_base_params, env_specific_params = load_env_params(args.env_id, env_config_path)
+    env_base_params["training"] = False
+    models = discover_models(args.train_dir, args.project, args.algorithms, args.modes)
+    scenarios = discover_scenarios(
+        env_base_params["weather_data_dir"],
+        env_base_params["season_length"],
+        weather_horizon(env_base_params),
+        args.start_days or env_specific_params["eval_options"]["eval_days"],
+        args.locations,
+        args.years,
+    )
+    print(f"{len(models)} models, {len(scenarios)} scenarios, {len(args.uncertainty_scales)} uncertainty scales, {args.n_seeds} seeds")
+
+    # the matrix in the order of the models, such that the workers evaluate the scenarios of a model consecutively
+    cells = [
+        {"env_id": args.env_id, **model, "growth_year": growth_year, "start_day": start_day, "location": location,
+         "uncertainty": uncertainty, "seed": 666+seed}
+        for model in models
+        for uncertainty in args.uncertainty_scales
+        for location, growth_year, start_day in scenarios
+        for seed in range(args.n_seeds)
+    ]
+    cache = EvaluationCache()
+    keys = evaluate_missing(cells, env_base_params, env_specific_params, cache, n_workers=args.n_workers)
+
+    totals = episode_totals(cells, keys, cache)
+    totals.to_csv(join(save_dir, "episode_totals.csv"), index=False)
+    board = leaderboard(totals, args.metric, confidence=args.confidence)
+    board.to_csv(join(save_dir, f"leaderboard-{args.metric}.csv"), index=False)
+    with pd.option_context("display.max_columns", None, "display.width", 200):
+        print(board)
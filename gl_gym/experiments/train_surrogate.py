@@ -0,0 +1,90 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from gl_gym.environments.tomato_env import TomatoEnv
+from gl_gym.environments.baseline import RuleBasedController
+from gl_gym.environments.ensemble import EnsembleSimulator
+from gl_gym.environments.surrogate import generate_transitions, fit_surrogate, fidelity_report
+from gl_gym.common.utils import load_env_params, load_model_hyperparams
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--project", type=str, default="AgriControl", help="Name of the project (in wandb)")
+    parser.add_argument("--env_id", type=str, default="TomatoEnv", help="Environment ID")
+    parser.add_argument("--name", type=str, default="surrogate", help="Name of the surrogate")
+    parser.add_argument("--years", type=int, nargs="+", required=True, help="Growth years of the training data")
+    parser.add_argument("--start_days", type=int, nargs="+", required=True, help="Start days of the training seasons")
+    parser.add_argument("--test_year", type=int, required=True, help="Growth year of the fidelity report")
+    parser.add_argument("--test_start_day", type=int, required=True, help="Start day of the fidelity report")
+    parser.add_argument("--season_length", type=int, default=60, help="Number of days per season")
+    parser.add_argument("--n_members", type=int, default=16, help="Perturbed control trajectories per season")
+    parser.add_argument("--control_noise", type=float, default=0.5, help="Control perturbation relative to delta_u_max")
+    parser.add_argument("--uncertainty", type=float, default=0.0, help="Parametric uncertainty of the training data")
+    parser.add_argument("--n_threads", type=int, default=os.cpu_count(), help="Number of threads of the data generation")
+    parser.add_argument("--hidden_sizes", type=int, nargs="+", default=[256, 256, 256], help="Hidden layer sizes")
+    parser.add_argument("--n_epochs", type=int, default=50, help="Number of training epochs")
+    parser.add_argument("--batch_size", type=int, default=1024, help="Minibatch size")
+    parser.add_argument("--learning_rate", type=float, default=1e-3, help="Learning rate")
+    parser.add_argument("--seed", type=int, default=666, help="Seed of the data generation and training")
+    args = parser.parse_args()
+    env_config_path = f"gl_gym/configs/envs/"
+    save_dir = f"data/{args.project}/surrogate/{args.name}/"
+    model_dir = f"train_data/{args.project}/surrogate/{args.name}/"
+    os.makedirs(save_dir, exist_ok=True)
+    os.makedirs(model_dir, exist_ok=True)
+
+    env_base_params, env_specific_params = load_env_params(args.env_id, env_config_path)
+    env_base_params["season_length"] = args.season_length
+    env_base_params["training"] = True
+    env = TomatoEnv(base_env_params=env_base_params, **env_specific_params)
+    rb_controller = RuleBasedController(**load_model_hyperparams("rule_based", args.env_id))
+
+    start = time.time()
+    scenarios = [(year, start_day) for year in args.years for start_day in args.start_days]
+    data = generate_transitions(
+        env, rb_controller, scenarios, args.n_members, args.control_noise, args.uncertainty, args.seed, args.n_threads
+    )
+    np.savez(f"{save_dir}/transitions.npz", **data)
+    print(f"generated {len(data['x'])} transitions in {time.time()-start:.1f}s")
+
+    start = time.time()
+    model, history = fit_surrogate(
+        data, args.hidden_sizes, args.n_epochs, args.batch_size, args.learning_rate, seed=args.seed, verbose=True
+    )
+    model.save(f"{model_dir}/model.pt")
+    pd.DataFrame(history).to_csv(f"{save_dir}/history.csv", index_label="epoch")
+    print(f"trained the surrogate in {time.time()-start:.1f}s")
+
+    # fidelity on a season that is not in the training data, driven by the rule-based controller
+    env.reconfigure(base_env_params={
+        "start_train_year": args.test_year, "end_train_year": args.test_year,
+        "start_train_day": args.test_start_day, "end_train_day": args.test_start_day,
+    })
+    env.reset(seed=args.seed)
+    states, controls = EnsembleSimulator(env, 1, rb_controller, n_threads=1).simulate(env.p[None])
+    weather = env.weather_data[env.timestep:env.timestep+controls.shape[1]]
+    report = fidelity_report(model, states[0], controls[0], weather, env.dt)
+
+    # throughput of the real model and the (batched) surrogate
+    x, u = states[0, :-1], controls[0]
+    start = time.time()
+    for k in range(96):
+        env.F(x0=x[k], u=u[k], p=np.concatenate([weather[k], env.p]))
+    real_time = (time.time() - start) / 96
+    throughput = {"cvodes": 1 / real_time}
+    for batch_size in [1, 256]:
+        idx = np.arange(batch_size) % len(u)
+        start = time.time()
+        for _ in range(20):
+            model.predict(x[idx], u[idx], weather[idx])
+        throughput[f"surrogate_batch{batch_size}"] = 20 * batch_size / (time.time() - start)
+
+    print(report.to_string(index=False))
+    print("steps per second:", {key: f"{value:.0f}" for key, value in throughput.items()})
+    report.to_csv(f"{save_dir}/fidelity-{args.test_year}{args.test_start_day}.csv", index=False)
+    print("saving results to", save_dir)
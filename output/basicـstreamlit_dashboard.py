@@ -45,22 +45,27 @@ patterns = {
 # ==============================
 # 3. قراءة البيانات مع padding بالـ NaN
 # ==============================
-dataframes = {}
-for model, path in files.items():
-    if not os.path.exists(path):
-        continue
-    with open(path, "r") as f:
-        content = f.read()
-    extracted = {k: re.findall(p, content) for k, p in patterns.items()}
-    max_len = max(len(v) for v in extracted.values() if len(v) > 0)
-    df = pd.DataFrame({
-        k: pd.to_numeric(v + [None]*(max_len - len(v)), errors="coerce")
-        for k, v in extracted.items()
-    })
-    df["model"] = model
-    dataframes[model] = df
+@st.cache_data(show_spinner="Parsing logs...")
+def load_logs(mtimes):
+    """The logs are parsed once per version of the files, `mtimes` invalidates the cache."""
+    dataframes = {}
+    for model, path in files.items():
+        if not os.path.exists(path):
+            continue
+        with open(path, "r") as f:
+            content = f.read()
+        extracted = {k: re.findall(p, content) for k, p in patterns.items()}
+        max_len = max(len(v) for v in extracted.values() if len(v) > 0)
+        df = pd.DataFrame({
+            k: pd.to_numeric(v + [None]*(max_len - len(v)), errors="coerce")
+            for k, v in extracted.items()
+        })
+        df["model"] = model
+        dataframes[model] = df
+
+    return pd.concat(dataframes.values(), ignore_index=True)
 
-df_all = pd.concat(dataframes.values(), ignore_index=True)
+df_all = load_logs(tuple(os.path.getmtime(p) if os.path.exists(p) else None for p in files.values()))
 
 # ==============================
 # 4. دالة الرسم
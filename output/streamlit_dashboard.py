@@ -1,17 +1,76 @@
+import io
+
+import numpy as np
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from gl_gym.common.decimation import lttb, minmax_decimate
+from gl_gym.common.results import episode_bands, read_results
+
 st.set_page_config(page_title="Lettuce RL Dashboard", layout="wide")
 
 st.title("🥬 Lettuce Environment Dashboard")
 
-# ⬆️ رفع ملف CSV
-uploaded_file = st.file_uploader("Upload your evaluation CSV", type=["csv"])
+# number of points per plotted line
+MAX_POINTS = 2000
+
+
+@st.cache_data(show_spinner="Parsing results...")
+def load_results(data: bytes, name: str) -> pd.DataFrame:
+    """Parses the uploaded file once, reruns with the same file read the cache."""
+    df = read_results(io.BytesIO(data), name=name)
+    if all(c in df.columns for c in ["Revenue", "Heat costs", "CO2 costs", "Elec costs"]):
+        df["Total Costs"] = df["Heat costs"] + df["CO2 costs"] + df["Elec costs"]
+        df["Net Profit"] = df["Revenue"] - df["Total Costs"]
+    return df
+
+
+@st.cache_data(show_spinner="Aggregating episodes...")
+def aggregate(df: pd.DataFrame, columns: tuple, quantiles: tuple, cumulative: bool = False) -> dict:
+    """Mean and quantile band across the episodes, decimated for display."""
+    bands = episode_bands(df, columns, quantiles, cumulative)
+    decimated = {}
+    for col, band in bands.items():
+        x = band.index.to_numpy()
+        low, high = band[f"q{quantiles[0]:g}"].to_numpy(), band[f"q{quantiles[1]:g}"].to_numpy()
+        # lttb keeps the shape of the mean, min-max decimation keeps the extremes of the band
+        idx = np.union1d(minmax_decimate(x, low, MAX_POINTS)[0], minmax_decimate(x, high, MAX_POINTS)[0])
+        decimated[col] = {
+            "mean": lttb(x, band["mean"].to_numpy(), MAX_POINTS),
+            "band": (x[idx], low[idx], high[idx]),
+        }
+    return decimated
+
+
+def plot_bands(df, columns, quantiles, ylabel=None, color=None, cumulative=False):
+    """One figure per column with the mean over the episodes and the quantile band."""
+    n_episodes = df["episode"].nunique() if "episode" in df.columns else 1
+    for col, lines in aggregate(df, tuple(columns), quantiles, cumulative).items():
+        fig, ax = plt.subplots()
+        label = f"Cumulative {col}" if cumulative else col
+        ax.plot(*lines["mean"], label=label if n_episodes == 1 else f"{label} (mean)", color=color)
+        if n_episodes > 1:
+            ax.fill_between(*lines["band"], alpha=0.3, color=ax.lines[-1].get_color(),
+                            label=f"{quantiles[0]:.0%}-{quantiles[1]:.0%} of {n_episodes} episodes")
+        ax.set_xlabel("Timestep")
+        ax.set_ylabel(ylabel or label)
+        ax.set_title(f"{label} over time")
+        ax.legend()
+        st.pyplot(fig)
+        plt.close(fig)
+
+
+# ⬆️ رفع ملف النتائج
+uploaded_file = st.file_uploader("Upload your evaluation results", type=["csv", "parquet", "feather"])
 
 if uploaded_file is not None:
-    df = pd.read_csv(uploaded_file, sep="\t|,|;", engine="python")  # يقرا بأي فاصل
-    st.success(f"✅ Loaded {df.shape[0]} timesteps, {df.shape[1]} features")
+    df = load_results(uploaded_file.getvalue(), uploaded_file.name)
+    n_episodes = df["episode"].nunique() if "episode" in df.columns else 1
+    st.success(f"✅ Loaded {df.shape[0]} timesteps of {n_episodes} episodes, {df.shape[1]} features")
+
+    with st.sidebar:
+        quantiles = st.slider("Quantile band across episodes", 0.0, 1.0, (0.05, 0.95), step=0.05)
 
     # Tabs
     tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
@@ -26,118 +85,68 @@ if uploaded_file is not None:
     # ========= Environment States =========
     with tab1:
         st.subheader("🌡️ Environment States")
-        cols = ["temp_air", "co2_air", "rh_air", "pipe_temp", "cFruit", "tSum"]
-        for col in cols:
-            if col in df.columns:
-                fig, ax = plt.subplots()
-                ax.plot(df.index, df[col], label=col)
-                ax.set_xlabel("Timestep")
-                ax.set_ylabel(col)
-                ax.set_title(f"{col} over time")
-                ax.legend()
-                st.pyplot(fig)
+        plot_bands(df, ["temp_air", "co2_air", "rh_air", "pipe_temp", "cFruit", "tSum"], quantiles)
 
     # ========= Control Actions =========
     with tab2:
         st.subheader("🎛️ Control Actions")
-        controls = ["uBoil", "uCo2", "uThScr", "uVent", "uLamp", "uBlScr"]
-        for col in controls:
-            if col in df.columns:
-                fig, ax = plt.subplots()
-                ax.plot(df.index, df[col], label=col, color="orange")
-                ax.set_xlabel("Timestep")
-                ax.set_ylabel("Action level")
-                ax.set_title(f"{col} over time")
-                ax.legend()
-                st.pyplot(fig)
+        plot_bands(df, ["uBoil", "uCo2", "uThScr", "uVent", "uLamp", "uBlScr"], quantiles, ylabel="Action level", color="orange")
 
     # ========= Rewards & Costs =========
     with tab3:
         st.subheader("💰 Rewards and Costs (per timestep)")
-        metrics = ["Rewards", "EPI", "Revenue", "Heat costs", "CO2 costs", "Elec costs"]
-        for col in metrics:
-            if col in df.columns:
-                fig, ax = plt.subplots()
-                ax.plot(df.index, df[col], label=col, color="green")
-                ax.set_xlabel("Timestep")
-                ax.set_ylabel(col)
-                ax.set_title(f"{col} over time")
-                ax.legend()
-                st.pyplot(fig)
+        plot_bands(df, ["Rewards", "EPI", "Revenue", "Heat costs", "CO2 costs", "Elec costs"], quantiles, color="green")
 
         st.subheader("📈 Cumulative Rewards & Costs")
-        cum_metrics = ["Rewards", "Revenue", "Heat costs", "CO2 costs", "Elec costs"]
-        for col in cum_metrics:
-            if col in df.columns:
-                fig, ax = plt.subplots()
-                ax.plot(df.index, df[col].cumsum(), label=f"Cumulative {col}", color="blue")
-                ax.set_xlabel("Timestep")
-                ax.set_ylabel(f"Cumulative {col}")
-                ax.set_title(f"Cumulative {col} over time")
-                ax.legend()
-                st.pyplot(fig)
+        plot_bands(df, ["Rewards", "Revenue", "Heat costs", "CO2 costs", "Elec costs"], quantiles, color="blue", cumulative=True)
 
     # ========= Violations =========
     with tab4:
         st.subheader("⚠️ Constraint Violations")
-        viols = ["temp_violation", "co2_violation", "rh_violation"]
-        for col in viols:
-            if col in df.columns:
-                fig, ax = plt.subplots()
-                ax.plot(df.index, df[col], label=col, color="red")
-                ax.set_xlabel("Timestep")
-                ax.set_ylabel(col)
-                ax.set_title(f"{col} over time")
-                ax.legend()
-                st.pyplot(fig)
+        plot_bands(df, ["temp_violation", "co2_violation", "rh_violation"], quantiles, color="red")
 
     # ========= Profit Analysis =========
-        # ========= Profit Analysis =========
     with tab5:
         st.subheader("📊 Profit Analysis (Revenue vs Costs)")
-        if all(c in df.columns for c in ["Revenue", "Heat costs", "CO2 costs", "Elec costs"]):
-            df["Total Costs"] = df["Heat costs"] + df["CO2 costs"] + df["Elec costs"]
-            df["Net Profit"] = df["Revenue"] - df["Total Costs"]
+        if "Net Profit" in df.columns:
+            plot_bands(df, ["Revenue", "Total Costs", "Net Profit"], quantiles, ylabel="€ (cumulative)", cumulative=True)
 
-            # ---- Line Chart ----
-            fig, ax = plt.subplots()
-            ax.plot(df.index, df["Revenue"].cumsum(), label="Cumulative Revenue", color="green")
-            ax.plot(df.index, df["Total Costs"].cumsum(), label="Cumulative Costs", color="red")
-            ax.plot(df.index, df["Net Profit"].cumsum(), label="Cumulative Net Profit", color="blue")
-            ax.set_xlabel("Timestep")
-            ax.set_ylabel("€ (cumulative)")
-            ax.set_title("Cumulative Revenue, Costs and Net Profit")
-            ax.legend()
-            st.pyplot(fig)
+            # totals per episode, averaged over the episodes
+            by_episode = df.groupby("episode") if "episode" in df.columns else df.groupby(lambda _: 0)
+            totals = by_episode[["Revenue", "Total Costs", "Net Profit", "Heat costs", "CO2 costs", "Elec costs"]].sum()
+            mean_totals = totals.mean()
 
             # ---- Metrics ----
-            st.subheader("📌 Net Profit Summary")
+            st.subheader("📌 Net Profit Summary" + (f" (mean of {n_episodes} episodes)" if n_episodes > 1 else ""))
             col1, col2, col3 = st.columns(3)
-            col1.metric("💰 Total Revenue", f"{df['Revenue'].sum():.2f}")
-            col2.metric("💸 Total Costs", f"{df['Total Costs'].sum():.2f}")
-            col3.metric("📊 Net Profit", f"{df['Net Profit'].sum():.2f}")
+            col1.metric("💰 Total Revenue", f"{mean_totals['Revenue']:.2f}")
+            col2.metric("💸 Total Costs", f"{mean_totals['Total Costs']:.2f}")
+            col3.metric("📊 Net Profit", f"{mean_totals['Net Profit']:.2f}")
 
             # ---- Pie Chart (Costs breakdown) ----
             st.subheader("🥧 Cost Breakdown")
             costs = {
-                "Heat": df["Heat costs"].sum(),
-                "CO₂": df["CO2 costs"].sum(),
-                "Electricity": df["Elec costs"].sum()
+                "Heat": mean_totals["Heat costs"],
+                "CO₂": mean_totals["CO2 costs"],
+                "Electricity": mean_totals["Elec costs"]
             }
             fig, ax = plt.subplots()
             ax.pie(costs.values(), labels=costs.keys(), autopct="%1.1f%%", startangle=90)
             ax.set_title("Cost Distribution")
             st.pyplot(fig)
+            plt.close(fig)
 
             # ---- Bar Chart Revenue vs Costs ----
             st.subheader("📊 Revenue vs Costs (Total)")
             fig, ax = plt.subplots()
-            ax.bar(["Revenue", "Costs", "Net Profit"], 
-                   [df["Revenue"].sum(), df["Total Costs"].sum(), df["Net Profit"].sum()],
+            names = ["Revenue", "Total Costs", "Net Profit"]
+            ax.bar(["Revenue", "Costs", "Net Profit"], mean_totals[names],
+                   yerr=totals[names].std() if n_episodes > 1 else None,
                    color=["green", "red", "blue"])
             ax.set_ylabel("€ (total)")
             ax.set_title("Comparison of Revenue, Costs and Net Profit")
             st.pyplot(fig)
+            plt.close(fig)
 
             # ---- Histogram of Net Profit ----
             st.subheader("📉 Net Profit Distribution (per timestep)")
@@ -147,12 +156,12 @@ if uploaded_file is not None:
             ax.set_ylabel("Frequency")
             ax.set_title("Distribution of Net Profit per timestep")
             st.pyplot(fig)
+            plt.close(fig)
 
     # ========= Raw Data =========
     with tab6:
         st.subheader("📑 Raw Data Preview")
         st.dataframe(df.head(100))
-    # ========= Profit Analysis =========
-    
+
 else:
-    st.info("⬆️ Please upload your evaluation CSV file.")
+    st.info("⬆️ Please upload your evaluation results file.")
@@ -7,8 +7,9 @@ from the NASA POWER API for a given city over a range of years.
 
 Steps:
   1. Geocode the city name to latitude/longitude.
-  2. Fetch hourly data for each year.
-   3. Identify the CSV header line "YEAR,MO,DY,HR".
+  2. Fetch hourly data for all years concurrently (falling back to monthly requests),
+     raw responses are cached on disk such that re-runs make no requests.
+  3. Identify the CSV header line "YEAR,MO,DY,HR".
   4. Read data from that line onward, parse date/time into a datetime index.
   5. Convert global radiation from MJ/h/m² to W/m².
   6. Compute sky temperature from air temperature and cloud cover.
@@ -21,27 +22,35 @@ Steps:
 
 Dependencies:
     pip install requests geopy pandas scipy
+    pip install .[timezone]     (timezonefinder, unless --timezone is given)
 
 Usage:
     python fetch_and_process_power.py "City Name, Country"
 """
 import os
+import hashlib
 import argparse
+import threading
+from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 import pandas as pd
-import calendar
 from geopy.geocoders import Nominatim
-from io import StringIO
-from time import sleep
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError
+from urllib3.util.retry import Retry
 
 # for PCHIP interpolation
 from scipy.interpolate import PchipInterpolator
-from timezonefinder import TimezoneFinder
 import numpy as np
 import pytz
 
+POWER_URL = "https://power.larc.nasa.gov/api/temporal/hourly/point"
+PARAMETERS = ["ALLSKY_SFC_SW_DWN", "T2M", "WS2M", "RH2M", "CLOUD_AMT"]
+
 def compute_sky_temp(air_temp_c, cloud_frac):
+    """Sky temperature [°C] from the air temperature [°C] and cloud fraction [-], scalars or arrays."""
     sigma = 5.67e-8
     C2K = 273.15
     # Clear-sky longwave down
@@ -59,6 +68,14 @@ def get_coordinates(city_name):
         raise ValueError(f"Could not geocode '{city_name}'")
     return loc.latitude, loc.longitude
 
+def get_timezone(lat, lon):
+    """Name of the timezone at the coordinates, requires the optional timezonefinder dependency."""
+    from timezonefinder import TimezoneFinder
+    timezone_str = TimezoneFinder().timezone_at(lat=lat, lng=lon)
+    if timezone_str is None:
+        raise ValueError("Could not determine timezone for the given coordinates")
+    return timezone_str
+
 
 def _parse_power_csv(text):
     """
@@ -81,39 +98,44 @@ def _parse_power_csv(text):
     return df
 
 
-def fetch_process_year(lat, lon, year, city_dir, parameters, community="AG"):
+class PowerClient:
     """
-    Fetch, process, interpolate and save data for a single year.
-    """
-    # compute local start (00:00) and end (23:00) for the year
-    tf = TimezoneFinder()
-    timezone_str = tf.timezone_at(lat=lat, lng=lon)
-    if timezone_str is None:
-        raise ValueError("Could not determine timezone for the given coordinates")
-    tz = pytz.timezone(timezone_str)
-    local_start = tz.localize(pd.Timestamp(f"{year}-01-01 00:00:00"))
-    local_end   = tz.localize(pd.Timestamp(f"{year}-12-31 23:00:00"))
-    # convert to UTC for the API window
-    utc_start   = local_start.astimezone(pytz.UTC)
-    utc_end     = local_end.astimezone(pytz.UTC)
-    
-    local_dt = tz.localize(pd.Timestamp(2001, 1, 1, 0, 0, 0))
-    # 3. Get the UTC offset
-    offset_td    = local_dt.utcoffset()                     # a timedelta
-    offset_hours = offset_td.total_seconds() // 3600.0       # convert to hours
-
-    # format YYYYMMDD for NASA POWER
-    if offset_hours > 0 and year == 2001:
-        start_date  = (utc_start.date() + pd.Timedelta(days=1)).strftime('%Y%m%d')
-        print(start_date)
-    else:
-        start_date  = utc_start.date().strftime('%Y%m%d')
-    end_date    = utc_end.date().strftime('%Y%m%d')
+    Client of the NASA POWER hourly point API with a pooled session and an on-disk cache of the raw responses.
+    The client is shared by the threads of the fetcher, the number of concurrent requests is bounded
+    by `max_connections`. Rate limits and gateway errors are retried with exponential backoff,
+    other server errors are raised such that the caller can split the request.
 
+    Args:
+        base_url (str): URL of the API, e.g., of a local stand-in.
+        cache_dir (str, optional): directory of the cached responses. Defaults to no cache.
+        max_connections (int): maximum number of concurrent requests.
+        retries (int): number of retries of failed connections, rate limits and gateway errors.
+        backoff (float): [s] backoff factor between the retries.
+        timeout (float): [s] timeout of a request.
+    """
+    def __init__(self, base_url=POWER_URL, cache_dir=None, max_connections=8, retries=3, backoff=1.0, timeout=300):
+        self.base_url = base_url
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=["GET"],
+            raise_on_status=False,
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=max_connections, max_retries=retry))
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=max_connections, max_retries=retry))
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+        self.n_requests = 0
 
-    def _build_url(start, end):
+    def url(self, lat, lon, start, end, parameters, community="AG"):
         return (
-            "https://power.larc.nasa.gov/api/temporal/hourly/point"
+            f"{self.base_url}"
             f"?start={start}&end={end}"
             f"&latitude={lat}&longitude={lon}"
             f"&community={community}"
@@ -121,47 +143,116 @@ def fetch_process_year(lat, lon, year, city_dir, parameters, community="AG"):
             "&format=CSV&header=true&time-standard=utc"
         )
 
-    print(f"Fetching full year {year}")
-    # url_year = _build_url(f"{year}0101", f"{year}1231")
-    url_year = _build_url(start_date, end_date)
-    try:
-        resp = requests.get(url_year)
-        resp.raise_for_status()
-        df = _parse_power_csv(resp.text)
-    except HTTPError as e:
-        if e.response is not None and 500 <= e.response.status_code < 600:
-            print(f"  Full-year fetch failed (status {e.response.status_code}), retrying by month...")
-            monthly = []
-            for m in range(1, 13):
-                last = calendar.monthrange(year, m)[1]
-                start = f"{year}{m:02d}01"
-                end   = f"{year}{m:02d}{last:02d}"
-                try:
-                    sleep(1)
-                    r = requests.get(_build_url(start, end))
-                    r.raise_for_status()
-                    monthly.append(_parse_power_csv(r.text))
-                except Exception as me:
-                    print(f"    Month {m:02d} failed: {me}")
-            if not monthly:
-                raise RuntimeError(f"No data for {year}")
-            df = pd.concat(monthly).sort_index()
-        else:
-            raise
+    def _cache_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode()).hexdigest() + ".csv")
+
+    def cached(self, url):
+        """Whether the response of the URL is in the cache."""
+        return self.cache_dir is not None and os.path.exists(self._cache_path(url))
+
+    def get(self, url):
+        """Returns the body of the response, from the cache if the same URL was fetched before."""
+        path = None
+        if self.cache_dir is not None:
+            path = self._cache_path(url)
+            if os.path.exists(path):
+                with open(path) as f:
+                    return f.read()
+
+        with self._slots:
+            with self._lock:
+                self.n_requests += 1
+            resp = self.session.get(url, timeout=self.timeout)
+            resp.raise_for_status()
+        text = resp.text
+
+        if path is not None:
+            # write to a temporary file first, such that an interrupted run leaves no partial responses
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        return text
+
+    def close(self):
+        self.session.close()
+
+
+def utc_offset_hours(timezone_str):
+    """UTC offset of the timezone in (whole) hours, on the first of January."""
+    tz = pytz.timezone(timezone_str)
+    local_dt = tz.localize(pd.Timestamp(2001, 1, 1, 0, 0, 0))
+    return local_dt.utcoffset().total_seconds() // 3600.0
 
+
+def _request_window(year, timezone_str):
+    """First and last UTC day (YYYYMMDD) of the requests of a local calendar year."""
+    tz = pytz.timezone(timezone_str)
+    # compute local start (00:00) and end (23:00) for the year, and convert to UTC for the API window
+    utc_start = tz.localize(pd.Timestamp(f"{year}-01-01 00:00:00")).astimezone(pytz.UTC)
+    utc_end = tz.localize(pd.Timestamp(f"{year}-12-31 23:00:00")).astimezone(pytz.UTC)
+    if utc_offset_hours(timezone_str) > 0 and year == 2001:
+        start_date = (utc_start.date() + pd.Timedelta(days=1)).strftime('%Y%m%d')
+    else:
+        start_date = utc_start.date().strftime('%Y%m%d')
+    return start_date, utc_end.date().strftime('%Y%m%d')
+
+
+def _monthly_windows(start_date, end_date):
+    """Splits the window [start_date, end_date] at the month boundaries."""
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    firsts = [start] + [t for t in pd.date_range(start, end, freq="MS") if t > start]
+    lasts = [t - pd.Timedelta(days=1) for t in firsts[1:]] + [end]
+    return [(a.strftime('%Y%m%d'), b.strftime('%Y%m%d')) for a, b in zip(firsts, lasts)]
+
+
+def fetch_year(client, lat, lon, year, timezone_str, parameters=PARAMETERS, community="AG", max_workers=12):
+    """
+    Fetch the hourly data of a year with a single request. When the server fails on the full year,
+    the year is fetched by concurrent monthly requests over the same UTC window.
+    """
+    start_date, end_date = _request_window(year, timezone_str)
+    windows = _monthly_windows(start_date, end_date)
+    url_year = client.url(lat, lon, start_date, end_date, parameters, community)
+    # a year that was fetched by month before is read from the cache
+    by_month = not client.cached(url_year) and all(client.cached(client.url(lat, lon, *w, parameters, community)) for w in windows)
+    if not by_month:
+        print(f"Fetching full year {year}")
+        try:
+            return _parse_power_csv(client.get(url_year))
+        except HTTPError as e:
+            if e.response is None or not 500 <= e.response.status_code < 600:
+                raise
+            print(f"  Full-year fetch of {year} failed (status {e.response.status_code}), retrying by month...")
+
+    def fetch_month(window):
+        try:
+            return _parse_power_csv(client.get(client.url(lat, lon, *window, parameters, community)))
+        except Exception as me:
+            print(f"    Month {window[0][:6]} failed: {me}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        monthly = [df for df in executor.map(fetch_month, windows) if df is not None]
+    if not monthly:
+        raise RuntimeError(f"No data for {year}")
+    return pd.concat(monthly).sort_index()
+
+
+def process_year(df, year, timezone_str):
+    """Converts the hourly POWER data of a year to the 5-minute weather files of the simulator."""
+    df = df.copy()
     # Convert units and compute features
     # MJ/m2/h to W/m2
     df['ALLSKY_SFC_SW_DWN'] *= (1e6 / 3600)
     # Cloud fraction
     df['cloud_frac'] = df['CLOUD_AMT'] / 100.0
     # Sky temperature
-    df['sky_temperature'] = df.apply(lambda r: compute_sky_temp(r['T2M'], r['cloud_frac']), axis=1)
-    # seconds and day number
-    start_ts = pd.Timestamp(f"{year}-01-01 00:00:00")
-    # CO2 constant
+    df['sky_temperature'] = compute_sky_temp(df['T2M'].to_numpy(), df['cloud_frac'].to_numpy())
 
     n = len(df)
-    # 3) Compute start/end positions
+    offset_hours = utc_offset_hours(timezone_str)
+    # Compute start/end positions of the local calendar year in the UTC data
     if offset_hours > 0:
         # skip first offset_hours rows, and last (offset_hours) rows
         start_idx = 24-offset_hours
@@ -172,19 +263,14 @@ def fetch_process_year(lat, lon, year, city_dir, parameters, community="AG"):
         end_idx   = n - (24+offset_hours)
     else:
         start_idx, end_idx = 0, n
-    print(start_idx, end_idx, n)
-    print(end_idx - start_idx)
-    # 4) Slice by position (keep the DatetimeIndex!)
+    # Slice by position (keep the DatetimeIndex!)
     df = df.iloc[int(start_idx):int(end_idx)]
 
-    # Interpolate to 5-minute using PCHIP
+    # Interpolate to 5-minute using PCHIP, all columns at once
     df5 = df.resample('5min').asfreq()
     cols_interp = ['ALLSKY_SFC_SW_DWN', 'WS2M', 'T2M', 'sky_temperature', 'cloud_frac', 'RH2M']
-    for col in cols_interp:
-        # drop NaNs for interpolation
-        series = df[col]
-        pchip = PchipInterpolator(series.index.astype(int), series.values)
-        df5[col] = pchip(df5.index.astype(int))
+    pchip = PchipInterpolator(df.index.astype(np.int64), df[cols_interp].to_numpy(), axis=0)
+    df5[cols_interp] = pchip(df5.index.astype(np.int64))
     # CO2 constant
     df5['CO2_ppm'] = 400.0
     # Recompute seconds and day number on 5-min grid
@@ -201,10 +287,27 @@ def fetch_process_year(lat, lon, year, city_dir, parameters, community="AG"):
         'sky temperature', 'cloud cover', 'CO2 concentration',
         'day number', 'RH'
     ]
+    return out
+
+
+def fetch_process_years(client, lat, lon, years, city_dir, timezone_str, parameters=PARAMETERS, community="AG", max_workers=4):
+    """
+    Fetch, process, interpolate and save the data of several years concurrently.
+    Returns the years that failed.
+    """
+    def fetch_process_year(year):
+        try:
+            df = fetch_year(client, lat, lon, year, timezone_str, parameters, community)
+            filepath = os.path.join(city_dir, f"{year}.csv")
+            process_year(df, year, timezone_str).to_csv(filepath, index=False)
+            print(f"Saved processed and interpolated data to {filepath}")
+            return None
+        except Exception as e:
+            print(f"Error processing {year}: {e}")
+            return year
 
-    filepath = os.path.join(city_dir, f"{year}.csv")
-    out.to_csv(filepath, index=False)
-    print(f"Saved processed and interpolated data to {filepath}")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return [year for year in executor.map(fetch_process_year, years) if year is not None]
 
 
 def main():
@@ -213,6 +316,11 @@ def main():
     parser.add_argument("--output-dir", default="weather")
     parser.add_argument("--start-year", type=int, default=2001)
     parser.add_argument("--end-year",   type=int, default=2020)
+    parser.add_argument("--timezone", default=None, help="Timezone of the city, e.g. 'Atlantic/Reykjavik'. Defaults to timezonefinder")
+    parser.add_argument("--cache-dir", default=None, help="Cache of the raw responses. Defaults to <output-dir>/.power_cache")
+    parser.add_argument("--base-url", default=POWER_URL, help="URL of the POWER hourly point API")
+    parser.add_argument("--max-workers", type=int, default=4, help="Number of years that are fetched concurrently")
+    parser.add_argument("--max-connections", type=int, default=8, help="Maximum number of concurrent requests")
     args = parser.parse_args()
 
     key = args.city.split(',')[0].capitalize().replace(' ', '_')
@@ -223,14 +331,16 @@ def main():
     print(f"Geocoding {args.city}...")
     lat, lon = get_coordinates(args.city)
     print(f"Coordinates: {lat:.4f}, {lon:.4f}\n")
+    timezone_str = args.timezone or get_timezone(lat, lon)
 
-    params = ["ALLSKY_SFC_SW_DWN", "T2M", "WS2M", "RH2M", "CLOUD_AMT"]
-    for yr in range(args.start_year, args.end_year+1):
-        try:
-            fetch_process_year(lat, lon, yr, base, params)
-            sleep(1)
-        except Exception as e:
-            print(f"Error processing {yr}: {e}")
+    cache_dir = args.cache_dir or os.path.join(args.output_dir, ".power_cache")
+    client = PowerClient(args.base_url, cache_dir, args.max_connections)
+    try:
+        years = range(args.start_year, args.end_year+1)
+        failed = fetch_process_years(client, lat, lon, years, base, timezone_str, max_workers=args.max_workers)
+    finally:
+        client.close()
+    print(f"{client.n_requests} requests, failed years: {failed or 'none'}")
 
 if __name__ == "__main__":
     main()
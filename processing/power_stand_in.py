@@ -0,0 +1,117 @@
+"""
+Local stand-in of the NASA POWER hourly point API, such that the weather fetcher can be tested offline.
+
+The server answers requests like
+    <url>?start=YYYYMMDD&end=YYYYMMDD&latitude=..&longitude=..&parameters=T2M,RH2M,..&format=CSV
+with a canned POWER CSV: a header block followed by hourly rows of deterministic daily cycles.
+Long requests can be made to fail with a server error, like the real API does for large requests.
+
+Usage:
+    with PowerStandIn(max_days=40) as server:
+        client = PowerClient(base_url=server.url)
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+
+# fill value of the POWER API for missing data
+FILL_VALUE = -999.0
+
+
+def canned_power_csv(start, end, parameters, latitude=0.0, longitude=0.0):
+    """
+    POWER CSV with hourly data from 00:00 of the start day up to 23:00 of the end day (UTC).
+
+    Args:
+        start (str): first day, YYYYMMDD.
+        end (str): last day, YYYYMMDD.
+        parameters (list): requested parameters, unknown parameters are filled with FILL_VALUE.
+    """
+    time = pd.date_range(pd.Timestamp(start), pd.Timestamp(end) + pd.Timedelta(hours=23), freq="h")
+    hour = time.hour.to_numpy()
+    day = time.dayofyear.to_numpy()
+    values = {
+        "ALLSKY_SFC_SW_DWN": np.maximum(2.5*np.sin(np.pi*(hour - 6)/12), 0.0),   # MJ/m2/h
+        "T2M": 10 - 8*np.cos(2*np.pi*day/365) + 4*np.sin(2*np.pi*(hour - 9)/24),
+        "WS2M": 3 + np.cos(2*np.pi*hour/24),
+        "RH2M": 75 - 15*np.sin(2*np.pi*(hour - 9)/24),
+        "CLOUD_AMT": 50 + 40*np.sin(2*np.pi*day/7),
+    }
+    data = pd.DataFrame({"YEAR": time.year, "MO": time.month, "DY": time.day, "HR": hour})
+    for name in parameters:
+        data[name] = np.round(values.get(name, np.full(len(time), FILL_VALUE)), 2)
+
+    header = [
+        "-BEGIN HEADER-",
+        "NASA/POWER stand-in Hourly Data",
+        f"Dates (month/day/year): {start} through {end} in UTC",
+        f"Location: latitude  {latitude}   longitude {longitude}",
+        f"The value for missing source data that cannot be computed or is outside of the sources availability range: {FILL_VALUE}",
+        "-END HEADER-",
+    ]
+    return "\n".join(header) + "\n" + data.to_csv(index=False)
+
+
+class PowerStandIn:
+    """
+    Threaded HTTP server on localhost that serves canned POWER CSVs.
+
+    Args:
+        max_days (int, optional): requests longer than this many days fail with status 500.
+        port (int): port of the server, 0 picks a free port.
+    """
+    def __init__(self, max_days=None, port=0):
+        self.max_days = max_days
+        self.requests = []
+        self._lock = threading.Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                try:
+                    start, end = query["start"][0], query["end"][0]
+                    parameters = query["parameters"][0].split(",")
+                    n_days = (pd.Timestamp(end) - pd.Timestamp(start)).days + 1
+                except (KeyError, ValueError):
+                    self.send_error(422, "Invalid request")
+                    return
+                with stand_in._lock:
+                    stand_in.requests.append((start, end))
+                if stand_in.max_days is not None and n_days > stand_in.max_days:
+                    self.send_error(500, "Request too large")
+                    return
+                body = canned_power_csv(
+                    start, end, parameters, query.get("latitude", ["0"])[0], query.get("longitude", ["0"])[0]
+                ).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/csv")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/temporal/hourly/point"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
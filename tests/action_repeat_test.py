@@ -0,0 +1,68 @@
+import unittest
+
+import numpy as np
+
+from gl_gym.environments.lettuce_env import LettuceEnv
+from gl_gym.environments.tomato_env import TomatoEnv
+
+from weather_fixtures import SyntheticWeatherTestCase
+
+
+class TestActionRepeat(SyntheticWeatherTestCase):
+    def setUp(self):
+        super().setUp()
+        # tight tolerances, such that the repeat model matches the consecutive single steps
+        self.env_specific_params["integrator_params"] = {"abstol": 1e-8, "reltol": 1e-8}
+
+    def make_env(self, action_repeat):
+        base_env_params = dict(self.env_base_params, action_repeat=action_repeat)
+        env = TomatoEnv(base_env_params=base_env_params, **self.env_specific_params)
+        env.reset(seed=0)
+        return env
+
+    def test_matches_single_steps(self):
+        action_repeat = 5
+        env = self.make_env(1)
+        env_repeat = self.make_env(action_repeat)
+        rng = np.random.default_rng(0)
+        n_actions = 0
+        terminated = False
+        while not terminated:
+            action = rng.uniform(-1, 1, env.nu)
+            obs, reward, terminated, _, info = env_repeat.step(action)
+            n_actions += 1
+
+            # the same action followed by unchanged controls
+            total_reward, infos = 0., []
+            for k in range(action_repeat):
+                obs_single, r, terminated_single, _, info_single = env.step(action if k == 0 else np.zeros(env.nu))
+                total_reward += r
+                infos.append(info_single)
+                if terminated_single:
+                    break
+            self.assertEqual(terminated, terminated_single)
+            self.assertEqual(env_repeat.timestep, env.timestep)
+            np.testing.assert_allclose(env_repeat.x, env.x, rtol=1e-5, atol=1e-5)
+            np.testing.assert_allclose(obs, obs_single, rtol=1e-5, atol=1e-5)
+            np.testing.assert_allclose(reward, total_reward, rtol=1e-5, atol=1e-5)
+            for key in ["EPI", "heat_cost", "temp_violation"]:
+                np.testing.assert_allclose(info[key], sum(step_info[key] for step_info in infos), rtol=1e-5, atol=1e-5)
+            np.testing.assert_array_equal(info["controls"], env.u)
+
+        # the season ends within the last action
+        self.assertEqual(n_actions, int(np.ceil(env.timestep / action_repeat)))
+        self.assertNotEqual(env.timestep % action_repeat, 0)
+
+    def test_lettuce_env_rejects_action_repeat(self):
+        with self.assertRaises(ValueError):
+            LettuceEnv(
+                reward_function="GreenhouseReward",
+                observation_modules=["IndoorClimateObservations"],
+                constraints={},
+                eval_options={},
+                base_env_params=dict(self.env_base_params, action_repeat=4),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from gl_gym.common.aggregation import EpisodeAggregator, file_sha1, summary_path
+from gl_gym.common.result_index import ResultIndex
+from gl_gym.common.results import read_results
+
+
+def episode(n_steps, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "EPI": rng.random(n_steps),
+        "temp_violation": rng.random(n_steps),
+        "co2_violation": rng.random(n_steps),
+        "rh_violation": np.zeros(n_steps),
+    })
+
+
+class TestAggregation(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        self.episodes = [episode(40, seed) for seed in range(5)]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_incremental_summaries(self):
+        aggregator = EpisodeAggregator()
+        for sim, df in enumerate(self.episodes):
+            aggregator.add(df.to_numpy(), df.columns, episode=sim)
+        df = pd.concat([e.assign(episode=sim) for sim, e in enumerate(self.episodes)], ignore_index=True)
+        totals = df.groupby("episode")[["EPI", "temp_violation"]].sum()
+
+        summary = aggregator.summary()
+        self.assertEqual(summary["EPI"]["n"], 5)
+        self.assertAlmostEqual(summary["EPI"]["mean"], totals["EPI"].mean())
+        self.assertAlmostEqual(summary["EPI"]["std"], totals["EPI"].std())
+        self.assertAlmostEqual(summary["EPI"]["q0.5"], totals["EPI"].median())
+        self.assertAlmostEqual(summary["Penalty"]["mean"], (totals["temp_violation"] + df.groupby("episode")["co2_violation"].sum()).mean())
+        curves = aggregator.curves()["EPI"]
+        np.testing.assert_allclose(curves["mean"], df.groupby("episode")["EPI"].cumsum().to_numpy().reshape(5, 40).mean(0))
+        self.assertEqual(EpisodeAggregator.from_results(df).summary(), summary)
+
+        path = os.path.join(self.root, "summary.npz")
+        aggregator.save(path, "abc")
+        self.assertIsNone(EpisodeAggregator.load(path, "other"))
+        loaded = EpisodeAggregator.load(path, "abc")
+        pd.testing.assert_frame_equal(loaded.totals(), aggregator.totals())
+        np.testing.assert_allclose(loaded.curves()["EPI"], curves, rtol=1e-6)
+
+    def test_index_reads_only_new_results(self):
+        index = ResultIndex(self.root)
+        for model, seeds in [("model-a", range(3)), ("model-b", range(3, 5))]:
+            path = os.path.join(self.root, "AgriControl", "stochastic", "ppo", "0.1", f"{model}-201059-Amsterdam.csv")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            pd.concat([self.episodes[s].assign(episode=s) for s in seeds]).to_csv(path, index=False)
+            if model == "model-a":
+                index.scan()
+        self.assertFalse(os.path.exists(summary_path(path)))
+
+        # only the results of model-b are read, model-a is summarised from its summary file
+        with mock.patch("gl_gym.common.result_index.read_results", wraps=read_results) as read:
+            # e.g., a copied results file
+            os.utime(path.replace("model-b", "model-a"), (0, 0))
+            self.assertEqual(len(index.scan()), 2)
+        full_reads = [call for call in read.call_args_list if call.kwargs.get("nrows") != 0]
+        self.assertEqual([os.path.basename(call.args[0]) for call in full_reads], ["model-b-201059-Amsterdam.csv"])
+        self.assertEqual(EpisodeAggregator.load(summary_path(path)).sha1, file_sha1(path))
+
+        pooled = index.pooled_summaries(["EPI"], by=["uncertainty"])
+        totals = [df["EPI"].sum() for df in self.episodes]
+        self.assertAlmostEqual(pooled.loc[0.1, "EPI mean"], np.mean(totals))
+        self.assertEqual(pooled.loc[0.1, "EPI n"], 5)
+        self.assertAlmostEqual(pooled.loc[0.1, "EPI q0.5"], np.median(totals))
+
+
+if __name__ == "__main__":
+    unittest.main()
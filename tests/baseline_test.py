@@ -0,0 +1,68 @@
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+from gl_gym.environments.baseline import RuleBasedController
+from gl_gym.environments.tomato_env import TomatoEnv
+from gl_gym.common.utils import load_model_hyperparams
+from gl_gym.experiments.evaluate_baseline import define_season_model, evaluate_controller, evaluate_controller_native
+
+from weather_fixtures import SyntheticWeatherTestCase
+
+
+class TestRuleBasedController(unittest.TestCase):
+    def setUp(self):
+        self.controller = RuleBasedController(**load_model_hyperparams("rule_based", "TomatoEnv"))
+        self.nx, self.nu, self.nd = 28, 6, 10
+        self.rng = np.random.default_rng(42)
+
+    def random_inputs(self):
+        x = self.rng.uniform(0, 1, self.nx)
+        x[0] = self.rng.uniform(400, 1500)      # co2Air [mg m^-3]
+        x[2] = self.rng.uniform(10, 30)         # tAir [°C]
+        x[15] = self.rng.uniform(500, 3000)     # vpAir [Pa]
+        d = self.rng.uniform(0, 1, self.nd)
+        d[0] = self.rng.uniform(0, 600)         # iGlob [W m^-2]
+        d[1] = self.rng.uniform(-5, 25)         # tOut [°C]
+        d[7] = self.rng.uniform(0, 20)          # dli [mol m^-2 d^-1]
+        d[8] = self.rng.integers(2)             # isDay
+        env = SimpleNamespace(nu=self.nu, hour_of_day=self.rng.uniform(0, 24), day_of_year=self.rng.uniform(0, 365))
+        return x, d, env
+
+    def test_casadi_function_matches_predict(self):
+        controller_fn = self.controller.casadi_function(self.nx, self.nu, self.nd)
+        with np.errstate(over="ignore"):
+            for _ in range(200):
+                x, d, env = self.random_inputs()
+                u = self.controller.predict(x, d, env)
+                u_sym = controller_fn(x, d, [env.hour_of_day, env.day_of_year]).full().flatten()
+                np.testing.assert_allclose(u_sym, u, atol=1e-10)
+
+
+class TestNativeSeason(SyntheticWeatherTestCase):
+    def setUp(self):
+        super().setUp()
+        self.controller = RuleBasedController(**load_model_hyperparams("rule_based", "TomatoEnv"))
+
+    def make_env(self, **env_specific_params):
+        return TomatoEnv(base_env_params=self.env_base_params, **dict(self.env_specific_params, **env_specific_params))
+
+    def test_matches_step_wise_season(self):
+        # the CasADi controller matches `predict` up to round-off, tight tolerances keep cvodes from amplifying it
+        integrators = [("monolithic", {}), ("multirate", {"crop_substeps": 2, "abstol": 1e-8, "reltol": 1e-8})]
+        for integrator, integrator_params in integrators:
+            env = self.make_env(integrator=integrator, integrator_params=integrator_params)
+            step_wise = evaluate_controller(env, self.controller)
+            native = evaluate_controller_native(env, define_season_model(env, self.controller))
+            self.assertEqual(native.shape, (env.N+1, 32))
+            np.testing.assert_allclose(native, step_wise, rtol=1e-7, atol=1e-9)
+
+    def test_feedback_requires_monolithic_integrator(self):
+        env = self.make_env(integrator="multirate", integrator_params={"crop_substeps": 2})
+        with self.assertRaises(ValueError):
+            define_season_model(env, self.controller, feedback=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+
+import numpy as np
+
+from gl_gym.environments.parameters import init_default_params
+from gl_gym.environments.calibration import ModelCalibration
+from gl_gym.experiments.gl_predefined_controls import init_mat_state
+
+
+class TestModelCalibration(unittest.TestCase):
+    def test_recovers_parameters(self):
+        nx, nu, nd, dt, N = 28, 6, 10, 900., 6
+        weather = np.tile([100., 5., 700., 400., 2., -5., 8., 10., 1., 1.], (N, 1))
+        controls = np.tile([0.5, 0.3, 0., 0.1, 0., 0.], (N, 1))
+        x0 = init_mat_state(np.append(weather[0], 20.), [18., 700., 1500.])
+
+        # cHecIn and cLeakage
+        calibration = ModelCalibration(nx, nu, nd, dt, init_default_params(208), [50, 60], [0, 2, 15], interval_length=3)
+        truth = calibration.parameters([1.2, 0.8])
+        X = [x0]
+        for j in range(N // 3):
+            X.extend(calibration.interval(X[-1], controls[3*j:3*j+3].T, weather[3*j:3*j+3].T, truth).full().T)
+        measurements = np.array(X)[:, [0, 2, 15]]
+        measurements[1::2, 0] = np.nan
+
+        result = calibration.fit(x0, controls, weather, measurements)
+        self.assertEqual(result["status"], "Solve_Succeeded")
+        np.testing.assert_allclose(result["theta"], [1.2, 0.8], rtol=1e-4)
+        np.testing.assert_allclose(result["params"][[50, 60]], truth[[50, 60]], rtol=1e-4)
+
+
+if __name__ == "__main__":
+    unittest.main()
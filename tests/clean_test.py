@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from gl_gym.clean_data.clean import WEATHER_COLUMNS, clean_station_csv
+from gl_gym.environments.utils import load_weather_data
+
+
+class TestCleanStationData(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        # one-minute measurements over the turn of the year, with a two-hour gap in 2010
+        time = pd.date_range("2009-12-31 12:00", "2010-01-01 12:00", freq="60s")
+        time = time[(time < "2010-01-01 03:00") | (time >= "2010-01-01 05:00")]
+        hours = (time - time[0]).total_seconds().to_numpy() / 3600
+        self.temperature = lambda h: 5 + 3*np.sin(2*np.pi*h/24)
+        self.csv_path = os.path.join(self.tmp_dir.name, "station.csv")
+        pd.DataFrame({
+            "Datetime": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "External Total Solar Radiation": np.maximum(100*np.sin(2*np.pi*(hours-6)/24), 0),
+            "External Temperature ": self.temperature(hours),
+            "External Relative Humidity (RH)": 80.,
+            "Wind Speed": 3.,
+            "Day/Night": "Day",
+        }).to_csv(self.csv_path, index=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_clean_in_chunks(self):
+        gaps = clean_station_csv(self.csv_path, self.tmp_dir.name, "Station", chunksize=100)
+        weather = {}
+        for year, n_days in [(2009, 365), (2010, 365)]:
+            weather[year] = pd.read_csv(os.path.join(self.tmp_dir.name, "Station", f"{year}.csv"))
+            self.assertEqual(list(weather[year].columns), WEATHER_COLUMNS)
+            self.assertEqual(len(weather[year]), n_days*288)
+
+        # the interpolation is continuous over the turn of the year
+        w = weather[2010].iloc[:12*3]
+        np.testing.assert_allclose(w["air temperature"], self.temperature(12 + w["time"]/3600), atol=1e-3)
+
+        temp_gaps = gaps[gaps["column"] == "air temperature"]
+        self.assertEqual(list(temp_gaps["year"]), [2009, 2010, 2010])
+        np.testing.assert_allclose(temp_gaps["hours"].iloc[1], 2 + 1/60)
+
+        # the files are read by the environment
+        d = load_weather_data(self.tmp_dir.name, "Station", 2010, 0, 0.25, 0.25, 900, 10)
+        self.assertFalse(np.isnan(d).any())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.buffers import ReplayBuffer
+
+from gl_gym.common.dataset import (
+    COST_KEYS,
+    EpisodeBuffer,
+    OfflineDataset,
+    control_to_action,
+    fill_replay_buffer,
+    write_index,
+)
+
+
+class TestOfflineDataset(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dataset_dir = self.tmp_dir.name
+        self.n_obs, self.nu = 4, 2
+        self.lengths = [5, 7]
+        info = {key: 1.0 for key in COST_KEYS}
+        chunks = []
+        step = 0
+        for c, length in enumerate(self.lengths):
+            buffer = EpisodeBuffer()
+            for t in range(length):
+                obs = np.full(self.n_obs, step)
+                buffer.add(obs, np.zeros(self.nu), step, obs + 1, t == length - 1, info)
+                step += 1
+            chunks.append({"name": f"chunk{c}", "length": buffer.save(f"{self.dataset_dir}/chunk{c}")})
+        write_index(self.dataset_dir, chunks)
+        self.dataset = OfflineDataset(self.dataset_dir)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_across_chunks(self):
+        self.assertEqual(len(self.dataset), sum(self.lengths))
+        indices = np.array([11, 0, 5, 4])
+        batch = self.dataset.get(indices)
+        np.testing.assert_array_equal(batch["rewards"], indices)
+        np.testing.assert_array_equal(batch["obs"][:, 0], indices)
+        np.testing.assert_array_equal(batch["dones"], [True, False, False, True])
+        self.assertEqual(batch["costs"].shape, (4, len(COST_KEYS)))
+
+    def test_iterate_covers_dataset(self):
+        rewards = np.concatenate([batch["rewards"] for batch in self.dataset.iterate(batch_size=3)])
+        np.testing.assert_array_equal(np.sort(rewards), np.arange(len(self.dataset)))
+
+    def test_fill_replay_buffer(self):
+        obs_space = spaces.Box(-np.inf, np.inf, shape=(self.n_obs,), dtype=np.float32)
+        action_space = spaces.Box(-1, 1, shape=(self.nu,), dtype=np.float32)
+        model = SimpleNamespace(replay_buffer=ReplayBuffer(100, obs_space, action_space, n_envs=2))
+        n_added = fill_replay_buffer(model, self.dataset, batch_size=4)
+        self.assertEqual(n_added, 12)
+        self.assertEqual(model.replay_buffer.size(), 6)
+
+    def test_control_to_action(self):
+        action = control_to_action(np.array([0.5, 1.0]), np.array([0.0, 0.0]), np.array([0.1, 2.0]))
+        np.testing.assert_array_almost_equal(action, [1.0, 0.5])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+
+from gl_gym.environments.models.utils import define_model, define_multirate_model
+from gl_gym.environments.parameters import init_default_params
+from gl_gym.environments.rewards import GreenhouseReward
+from gl_gym.experiments.gl_predefined_controls import init_mat_state
+from gl_gym.RL.differentiable import DifferentiableRollout, RolloutFunction, StepFunction
+
+
+class TestDifferentiableRollout(unittest.TestCase):
+    def setUp(self):
+        weather = np.tile([100., 5., 700., 400., 2., -5., 8., 10., 1., 1.], (10, 1))
+        self.env = SimpleNamespace(
+            nx=28, nu=6, nd=10, num_params=208, dt=900., timestep=0,
+            p=init_default_params(208), weather_data=weather, F=define_model(28, 6, 10, 208, 900.),
+            u_min=np.zeros(6), u_max=np.ones(6), delta_u_max=np.full(6, 0.1),
+            constraints_low=np.array([300., 15., 50.]), constraints_high=np.array([1600., 34., 85.]),
+        )
+        self.env.reward = GreenhouseReward(
+            self.env, fixed_greenhouse_cost=15., fixed_co2_cost=0.015, fixed_lamp_cost=0.07, fixed_screen_cost=2.,
+            elec_price=0.3, heating_price=0.09, co2_price=0.3, fruit_price=1.6, pen_weights=[4e-4, 5e-3, 7e-4],
+            pen_lamp=0.1, dmfm=0.065
+        )
+        self.x0 = init_mat_state(np.append(weather[0], 20.), [18., 700., 1500.])
+        self.u0 = np.full(6, 0.5)
+        self.horizon = 4
+        self.model = DifferentiableRollout(self.env, self.horizon)
+        self.actions = np.random.default_rng(0).uniform(-1, 1, (self.horizon, 6))
+
+    def test_gradient_matches_finite_differences(self):
+        total, dR_dA, _, rewards = self.model.rollout(self.x0, self.u0, self.actions)
+        self.assertAlmostEqual(total, rewards.sum())
+        eps = 1e-4
+        for k, i in [(0, 0), (1, 1), (3, 3)]:
+            actions = np.copy(self.actions)
+            actions[k, i] += eps
+            upper = self.model.rollout(self.x0, self.u0, actions)[0]
+            actions[k, i] -= 2*eps
+            lower = self.model.rollout(self.x0, self.u0, actions)[0]
+            self.assertAlmostEqual((upper - lower) / (2*eps), dR_dA[k, i], delta=1e-2*abs(dR_dA[k, i]) + 1e-4)
+
+    def test_step_function_matches_rollout(self):
+        _, dR_dA, _, _ = self.model.rollout(self.x0, self.u0, self.actions)
+        actions = torch.tensor(self.actions, requires_grad=True)
+        params = torch.tensor(np.asarray(self.env.p, dtype=float))
+        x, u, total = torch.tensor(self.x0[None]), torch.tensor(self.u0[None]), 0
+        for k in range(self.horizon):
+            x, u, r = StepFunction.apply(x, u, actions[k][None], torch.tensor(self.env.weather_data[k]), params, self.model)
+            total = total + r.sum()
+        total.backward()
+        np.testing.assert_allclose(actions.grad.numpy(), dR_dA, atol=1e-10)
+
+        batch = torch.tensor(self.actions[None], requires_grad=True)
+        RolloutFunction.apply(batch, params, self.model, self.x0, self.u0, None).sum().backward()
+        np.testing.assert_allclose(batch.grad.numpy()[0], dR_dA, atol=1e-10)
+
+    def test_configured_integrator(self):
+        # the step simulates the integrator of the env
+        self.env.F = define_multirate_model(28, 6, 10, 208, 900., crop_substeps=2)
+        model = DifferentiableRollout(self.env, self.horizon)
+        x_next, u, _ = model.step(self.x0, self.u0, self.actions[0], self.env.weather_data[0], self.env.p)
+        expected = self.env.F(x0=self.x0, u=u, p=np.concatenate([self.env.weather_data[0], self.env.p]))["xf"]
+        np.testing.assert_allclose(x_next.full(), expected.full())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+
+import numpy as np
+
+from gl_gym.environments.ensemble import SUMMARY_KEYS, EnsembleSimulator, economic_summary
+from gl_gym.environments.parameters import init_default_params
+from gl_gym.environments.noise import parametric_crop_uncertainty, parametric_ensemble, CROP_PARAM_INDICES
+from gl_gym.environments.tomato_env import TomatoEnv
+
+from weather_fixtures import SyntheticWeatherTestCase
+
+
+class TestParametricEnsemble(unittest.TestCase):
+    def setUp(self):
+        self.p = init_default_params(208)
+
+    def test_matches_single_samples(self):
+        ensemble = parametric_ensemble(self.p, 5, 0.2, np.random.default_rng(0))
+        rng = np.random.default_rng(0)
+        noise = rng.uniform(-0.1, 0.1, size=(5, len(CROP_PARAM_INDICES)))
+        self.assertEqual(ensemble.shape, (5, 208))
+        np.testing.assert_allclose(ensemble[:, CROP_PARAM_INDICES[:10]], self.p[CROP_PARAM_INDICES[:10]]*(1+noise[:, :10]))
+        # unperturbed parameters are untouched
+        others = np.setdiff1d(np.arange(208), np.append(CROP_PARAM_INDICES, 144))
+        np.testing.assert_array_equal(ensemble[:, others], np.tile(np.asarray(self.p)[others], (5, 1)))
+
+    def test_custom_indices(self):
+        ensemble = parametric_ensemble(self.p, 3, 0.5, np.random.default_rng(1), indices=[10, 20])
+        changed = np.any(ensemble != np.asarray(self.p), axis=0)
+        self.assertTrue(changed[10] and changed[20])
+        # cLeafMax (144) is always recomputed from laiMax and sla
+        self.assertFalse(changed[np.setdiff1d(CROP_PARAM_INDICES, 144)].any())
+
+    def test_zero_uncertainty(self):
+        single = parametric_crop_uncertainty(self.p, 0.0, np.random.default_rng(0))
+        ensemble = parametric_ensemble(self.p, 2, 0.0, np.random.default_rng(0))
+        np.testing.assert_array_equal(ensemble, np.tile(single, (2, 1)))
+
+
+class TestEnsembleSimulator(SyntheticWeatherTestCase):
+    def setUp(self):
+        super().setUp()
+        self.env = TomatoEnv(base_env_params=self.env_base_params, **self.env_specific_params)
+
+    def test_matches_env_rollout(self):
+        n_steps = 12
+        self.env.reset(seed=0)
+        x0, weather = self.env.x.copy(), self.env.weather_data[:n_steps].copy()
+        rng = np.random.default_rng(0)
+        states, controls = [x0], []
+        totals = dict.fromkeys(SUMMARY_KEYS, 0.)
+        for _ in range(n_steps):
+            _, _, _, _, info = self.env.step(rng.uniform(-1, 1, self.env.nu))
+            states.append(self.env.x.copy())
+            controls.append(self.env.u.copy())
+            for key in SUMMARY_KEYS:
+                totals[key] += info[key]
+
+        # member 0 has the nominal parameters of the env
+        params = parametric_ensemble(self.env.p, 3, 0.5, rng)
+        params[0] = self.env.p
+        ensemble = EnsembleSimulator(self.env, 3, parallelization="serial")
+        ens_states, ens_controls = ensemble.simulate(params, x0=x0, controls=np.array(controls), weather=weather)
+        self.assertEqual(ens_states.shape, (3, n_steps+1, self.env.nx))
+        np.testing.assert_allclose(ens_states[0], np.array(states), rtol=1e-6, atol=1e-8)
+        self.assertFalse(np.allclose(ens_states[1], np.array(states)))
+
+        summary = economic_summary(self.env, ens_states, ens_controls)
+        for key in SUMMARY_KEYS:
+            self.assertEqual(summary[key].shape, (3,))
+            np.testing.assert_allclose(summary[key][0], totals[key], rtol=1e-6, atol=1e-9, err_msg=key)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -91,6 +91,26 @@ class TestTomatoEnv(unittest.TestCase):
         self.assertEqual(steps, expected_steps)
         self.assertTrue(terminated)
 
+    def test_reconfigure(self):
+        """Test in-place re-parameterization of the environment"""
+        reward_params = dict(self.env_specific_params["reward_params"])
+        reward_params["fruit_price"] = 2 * reward_params["fruit_price"]
+        self.env.reconfigure(
+            env_specific_params={"uncertainty_scale": 0.1, "reward_params": reward_params},
+            base_env_params={"start_train_day": 100, "end_train_day": 101},
+            seed=7
+        )
+        self.assertEqual(self.env.uncertainty_scale, 0.1)
+        self.assertEqual(self.env.train_days, [100, 101])
+        self.assertEqual(self.env.reward.fruit_price, reward_params["fruit_price"])
+
+        obs, info = self.env.reset()
+        self.assertIn(self.env.start_day, [100, 101])
+        self.assertEqual(len(obs), self.env.observation_space.shape[0])
+
+        with self.assertRaises(ValueError):
+            self.env.reconfigure(base_env_params={"dt": 2 * self.env.dt})
+
 if __name__ == '__main__':
     unittest.main()
     
@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from gl_gym.common import eval_cache
+from gl_gym.common.eval_cache import EvaluationCache
+from gl_gym.experiments import evaluate_rl
+
+
+class TestEvaluationCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        self.load_path = os.path.join(self.root, "train_data") + "/"
+        for name in ["model-a", "model-b"]:
+            model_path, vecnormalize_path = evaluate_rl.checkpoint_paths(self.load_path, name)
+            for path in [model_path, vecnormalize_path]:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(name.encode())
+        self.cache = EvaluationCache(os.path.join(self.root, "cache"))
+        self.env_params = [{"dt": 900, "training": True}, {"uncertainty_scale": 0.1, "eval_options": {}}]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def key(self, model_name="model-a", env_params=None, seed=0):
+        model_path, vecnormalize_path = evaluate_rl.checkpoint_paths(self.load_path, model_name)
+        return self.cache.key(model_path, vecnormalize_path, env_params or self.env_params, 2010, 59, "Amsterdam", 0.1, seed)
+
+    def test_key(self):
+        key = self.key()
+        # the scenario and training flags are part of the key through their arguments
+        self.assertEqual(key, self.key(env_params=[{"training": False, "dt": 900}, {"uncertainty_scale": 0.2}]))
+        self.assertNotEqual(key, self.key(env_params=[{"dt": 300}, {}]))
+        self.assertNotEqual(key, self.key(seed=1))
+        self.assertNotEqual(key, self.key(model_name="model-b"))
+
+        # a retrained model
+        model_path, _ = evaluate_rl.checkpoint_paths(self.load_path, "model-a")
+        with open(model_path, "wb") as f:
+            f.write(b"retrained")
+        os.utime(model_path, (0, 0))
+        self.assertNotEqual(key, self.key())
+
+    def test_code_changes(self):
+        key = self.key()
+        eval_cache.code_sha1.cache_clear()
+        self.assertEqual(self.key(), key)
+        with mock.patch.object(eval_cache, "code_sha1", return_value="changed"):
+            self.assertNotEqual(self.key(), key)
+
+    def test_put_get(self):
+        key = self.key()
+        self.assertIsNone(self.cache.get(key))
+        data = np.arange(12.).reshape(4, 3)
+        self.cache.put(key, data, ["a", "b", "c"], model="model-a")
+        self.assertIn(key, self.cache)
+        cached, columns = self.cache.get(key)
+        np.testing.assert_array_equal(cached, data)
+        self.assertEqual(columns, ["a", "b", "c"])
+
+    def test_evaluate_missing(self):
+        cells = [
+            {"env_id": "TomatoEnv", "algorithm": "ppo", "model_name": model_name, "load_path": self.load_path,
+             "growth_year": 2010, "start_day": 59, "location": "Amsterdam", "uncertainty": 0.1, "seed": seed}
+            for model_name in ["model-a", "model-b"] for seed in range(3)
+        ]
+
+        def evaluate_cells(task):
+            for seed, key in zip(task["seeds"], task["keys"]):
+                EvaluationCache(task["cache_root"]).put(key, np.full((2, 1), seed), ["Rewards"])
+            return [], ["Rewards"]
+
+        with mock.patch.object(evaluate_rl, "evaluate_cells", side_effect=evaluate_cells) as evaluate:
+            keys = evaluate_rl.evaluate_missing(cells[:2], *self.env_params, self.cache)
+            keys = evaluate_rl.evaluate_missing(cells, *self.env_params, self.cache)
+        self.assertEqual(len(set(keys)), 6)
+        # the missing seeds of a model are evaluated together
+        self.assertEqual([call.args[0]["seeds"] for call in evaluate.call_args_list], [[0, 1], [2], [0, 1, 2]])
+        self.assertEqual(self.cache.get(keys[5])[0][0, 0], 2)
+
+        with mock.patch.object(evaluate_rl, "evaluate_cells") as evaluate:
+            self.assertEqual(evaluate_rl.evaluate_missing(cells, *self.env_params, self.cache), keys)
+        evaluate.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from processing.fetch_weather_nasa import PowerClient, compute_sky_temp, fetch_process_years
+from processing.power_stand_in import PowerStandIn
+
+
+class TestFetchWeatherNasa(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.city_dir = os.path.join(self.tmp_dir.name, "Amsterdam")
+        self.cache_dir = os.path.join(self.tmp_dir.name, ".power_cache")
+        os.makedirs(self.city_dir)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_fetch_cached_with_monthly_fallback(self):
+        # full-year requests fail, such that the years are fetched by month
+        with PowerStandIn(max_days=40) as server:
+            client = PowerClient(base_url=server.url, cache_dir=self.cache_dir, backoff=0.0)
+            failed = fetch_process_years(client, 52.37, 4.9, [2009, 2010], self.city_dir, "Europe/Amsterdam")
+            self.assertEqual(failed, [])
+            self.assertEqual(len(server.requests), 2 * (1 + 13))
+            # the monthly requests cover the UTC window of the local year
+            self.assertIn(("20081231", "20081231"), server.requests)
+
+            weather = pd.read_csv(os.path.join(self.city_dir, "2010.csv"))
+            self.assertTrue(np.all(np.diff(weather["time"]) == 300))
+            self.assertEqual(len(weather), (365*24 - 1) * 12 + 1)
+
+            # a re-run is served from the cache
+            client = PowerClient(base_url=server.url, cache_dir=self.cache_dir)
+            fetch_process_years(client, 52.37, 4.9, [2009, 2010], self.city_dir, "Europe/Amsterdam")
+            self.assertEqual(client.n_requests, 0)
+            self.assertEqual(len(server.requests), 28)
+            pd.testing.assert_frame_equal(pd.read_csv(os.path.join(self.city_dir, "2010.csv")), weather)
+
+    def test_sky_temperature_vectorized(self):
+        temp, cloud = np.array([-5., 10., 25.]), np.array([0., 0.5, 1.])
+        expected = [compute_sky_temp(t, c) for t, c in zip(temp, cloud)]
+        np.testing.assert_allclose(compute_sky_temp(temp, cloud), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
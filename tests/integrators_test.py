@@ -0,0 +1,81 @@
+import unittest
+
+import numpy as np
+
+from gl_gym.environments.parameters import init_default_params
+from gl_gym.environments.models.ode import ODE
+from gl_gym.environments.models.utils import CROP_STATES, QSS_STATES, define_model, define_multirate_model, define_reduced_model
+from gl_gym.environments.models.utils import define_repeat_model, convert_rh_ppm, co2dens2ppm, satVp
+from gl_gym.RL.utils import pretrain_integrator_params
+from gl_gym.experiments.gl_predefined_controls import init_mat_state
+
+
+class TestReducedIntegrators(unittest.TestCase):
+    def setUp(self):
+        self.p = init_default_params(208)
+        weather = np.array([300., 5., 700., 400., 2., -5., 8., 10., 1., 1.])
+        self.x0 = init_mat_state(np.append(weather, 20.), [18., 700., 1500.])
+        self.args = dict(x0=self.x0, u=[0.5, 0.3, 0., 0.1, 0.5, 0.], p=np.concatenate([weather, self.p]))
+        self.x_ref = define_model(28, 6, 10, 208, 900., abstol=1e-8, reltol=1e-8)(**self.args)["xf"].full().flatten()
+
+    def test_matches_monolithic(self):
+        errors = []
+        for n in [1, 4]:
+            x = define_multirate_model(28, 6, 10, 208, 900., crop_substeps=n)(**self.args)["xf"].full().flatten()
+            self.assertLess(abs(x[2] - self.x_ref[2]), 1e-2)
+            errors.append(np.linalg.norm(x[CROP_STATES] - self.x_ref[CROP_STATES]))
+        # the splitting is first order, the error of the crop states decreases with the crop sub-step
+        self.assertLess(errors[1], 0.5 * errors[0])
+
+    def test_reduced_model_in_quasi_steady_state(self):
+        x = define_reduced_model(28, 6, 10, 208, 900.)(**self.args)["xf"].full().flatten()
+        d = self.args["p"][:10]
+        dxdt = ODE(x, self.args["u"], d, self.p)
+        np.testing.assert_allclose(np.array([float(dxdt[i]) for i in QSS_STATES]), 0, atol=1e-6)
+        self.assertLess(abs(x[2] - self.x_ref[2]), 0.1)
+
+    def test_repeat_model_matches_consecutive_steps(self):
+        F = define_model(28, 6, 10, 208, 900., abstol=1e-8, reltol=1e-8)
+        d = np.tile(self.args["p"][:10], (3, 1))
+        d[:, 0] = [300., 100., 0.]
+        X = define_repeat_model(28, 6, 10, 208, 900., 3, abstol=1e-8, reltol=1e-8)(
+            x0=self.x0, u=self.args["u"], d=d.T, p=self.p
+        )["xf"].full().T
+        x = self.x0
+        for k in range(3):
+            x = F(x0=x, u=self.args["u"], p=np.concatenate([d[k], self.p]))["xf"].full().flatten()
+            np.testing.assert_allclose(X[k], x, rtol=1e-5, atol=1e-5)
+
+
+class TestConvertRhPpm(unittest.TestCase):
+    def test_numpy_states(self):
+        X = np.tile(init_mat_state(np.append(np.array([300., 5., 700., 400., 2., -5., 8., 10., 1., 1.]), 20.), [18., 700., 1500.])[:, None], (1, 3))
+        X[15] = [1000., 2000., 3000.]
+        expected_rh = np.minimum(100*X[15]/satVp(X[2]), 100)
+        expected_co2 = co2dens2ppm(X[2], X[0]*1e-6)
+        converted = convert_rh_ppm(X.copy())
+        self.assertIsInstance(converted, np.ndarray)
+        np.testing.assert_allclose(converted[15], expected_rh)
+        np.testing.assert_allclose(converted[0], expected_co2)
+        self.assertEqual(converted[15, 2], 100.)
+
+
+class TestPretrainIntegrator(unittest.TestCase):
+    def test_keeps_accepted_params(self):
+        env_specific_params = {"integrator": "multirate", "integrator_params": {"abstol": 1e-6, "reltol": 1e-5, "crop_substeps": 4}}
+        self.assertEqual(
+            pretrain_integrator_params("TomatoEnv", env_specific_params, "reduced"),
+            {"integrator": "reduced", "integrator_params": {"abstol": 1e-6, "reltol": 1e-5}},
+        )
+        env_specific_params["integrator_params"]["qss_states"] = [3]
+        self.assertEqual(pretrain_integrator_params("TomatoEnv", env_specific_params, "reduced")["integrator_params"]["qss_states"], [3])
+
+    def test_rejects_unsupported(self):
+        with self.assertRaises(ValueError):
+            pretrain_integrator_params("LettuceEnv", {}, "reduced")
+        with self.assertRaises(ValueError):
+            pretrain_integrator_params("TomatoEnv", {}, "euler")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+
+import numpy as np
+import casadi as ca
+
+from gl_gym.environments.parameters import init_default_params
+from gl_gym.environments.linearization import TrajectoryLinearization
+from gl_gym.environments.tomato_env import TomatoEnv
+from gl_gym.experiments.gl_predefined_controls import init_mat_state
+
+from weather_fixtures import SyntheticWeatherTestCase
+
+
+class TestTrajectoryLinearization(unittest.TestCase):
+    def setUp(self):
+        self.p = init_default_params(208)
+        self.weather = np.tile([100., 5., 700., 400., 2., -5., 8., 10., 1., 1.], (6, 1))
+        self.weather[:, 0] = np.arange(6) * 50.
+        self.linearization = TrajectoryLinearization(28, 6, 10, 208, 900., cache_size=3)
+        x0 = init_mat_state(np.append(self.weather[0], 20.), [18., 700., 1500.])
+        self.U = np.tile([0.5, 0.3, 0., 0.1, 0., 0.], (3, 1))
+        X = [x0]
+        for k in range(2):
+            X.append(self.linearization.jacobian(X[-1], self.U[k], self.weather[k], self.p)[0].full().flatten())
+        self.X = np.array(X)
+
+    def test_matches_single_jacobians(self):
+        X_next, A, B = self.linearization.linearize(self.X, self.U, np.arange(3), self.weather, self.p)
+        np.testing.assert_allclose(X_next[:2], self.X[1:])
+        for k in range(3):
+            x_next, A_k, B_k = self.linearization.jacobian(self.X[k], self.U[k], self.weather[k], self.p)
+            np.testing.assert_allclose(A[k], A_k.full())
+            np.testing.assert_allclose(B[k], B_k.full())
+
+    def test_cache(self):
+        lin = self.linearization
+        _, A, _ = lin.linearize(self.X, self.U, np.arange(3), self.weather, self.p)
+        # shifted trajectory: two cached points and a new one
+        _, A_shift, _ = lin.linearize(self.X[1:], self.U[1:], np.arange(1, 3), self.weather, self.p)
+        self.assertEqual((lin.hits, lin.misses), (2, 3))
+        np.testing.assert_array_equal(A_shift, A[1:])
+        # a different weather index is a different linearisation point, and evicts the oldest entry
+        lin.linearize(self.X[:1], self.U[:1], [3], self.weather, self.p)
+        self.assertEqual(len(lin._cache), 3)
+        lin.linearize(self.X[:1], self.U[:1], [0], self.weather, self.p)
+        self.assertEqual((lin.hits, lin.misses), (2, 5))
+        # new weather data clears the cache
+        lin.linearize(self.X[:1], self.U[:1], [0], self.weather + 1, self.p)
+        self.assertEqual((lin.hits, lin.misses), (0, 1))
+
+
+class TestEnvLinearization(SyntheticWeatherTestCase):
+    def setUp(self):
+        super().setUp()
+        self.env_specific_params.update({"integrator": "multirate", "integrator_params": {"crop_substeps": 2}})
+        self.env = TomatoEnv(base_env_params=self.env_base_params, **self.env_specific_params)
+        self.env.reset(seed=0)
+
+    def assert_linearizes_integrator(self):
+        env = self.env
+        U = np.tile(env.u_max / 2, (2, 1))
+        X_next, _, _ = env.linearize(np.tile(env.x, (2, 1)), U)
+        x_next = env.F(x0=env.x, u=U[0], p=ca.vertcat(env.weather_data[env.timestep], env.p))["xf"].full().flatten()
+        np.testing.assert_allclose(X_next[0], x_next)
+
+    def test_configured_integrator(self):
+        # the Jacobians are those of the model that the env, and iLQR, simulate
+        self.assert_linearizes_integrator()
+        self.env.reconfigure(env_specific_params={"integrator": "monolithic", "integrator_params": {}})
+        self.assertIsNone(self.env.linearization)
+        self.assert_linearizes_integrator()
+
+
+if __name__ == "__main__":
+    unittest.main()
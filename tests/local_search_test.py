@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+
+from gl_gym.RL import experiment_manager, local_search
+from gl_gym.RL.utils import load_sweep_config
+from gl_gym.RL.local_search import (
+    sample_config,
+    rung_schedule,
+    run_trial,
+    TrialStorage,
+    SuccessiveHalvingPruner,
+    LocalHyperparameterSearch,
+)
+
+
+class TestLocalSearch(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.storage = TrialStorage(os.path.join(self.tmp_dir.name, "study.db"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_sample_sweep_config(self):
+        sweep_config = load_sweep_config("gl_gym/configs/sweeps/", "TomatoEnv", "ppo")
+        parameters = sweep_config["parameters"]
+        config = sample_config(parameters, np.random.default_rng(0))
+        self.assertEqual(set(config.keys()), set(parameters.keys()))
+        for name, spec in parameters.items():
+            if "values" in spec:
+                self.assertIn(config[name], spec["values"])
+            elif "distribution" in spec:
+                self.assertGreaterEqual(config[name], spec["min"])
+                self.assertLessEqual(config[name], spec["max"])
+
+    def test_rung_schedule(self):
+        self.assertEqual(rung_schedule(100, 1000, 3), [100, 300, 900, 1000])
+        self.assertEqual(rung_schedule(1000, 1000, 3), [1000])
+
+    def test_pruner_keeps_top_fraction(self):
+        pruner = SuccessiveHalvingPruner(self.storage, reduction_factor=3)
+        for value in [1., 2., 3., 4., 5., 6.]:
+            trial_id = self.storage.create_trial({"value": value})
+            self.storage.report(trial_id, 0, 100, value)
+        self.assertFalse(pruner.should_prune(0, 6.))
+        self.assertFalse(pruner.should_prune(0, 5.))
+        self.assertTrue(pruner.should_prune(0, 4.))
+        self.assertFalse(pruner.should_prune(1, 0.))
+
+    def test_best_trials(self):
+        for value in [3., 1., 2.]:
+            trial_id = self.storage.create_trial({"value": value})
+            self.storage.finish_trial(trial_id, "complete", value)
+        pruned_id = self.storage.create_trial({"value": 10.})
+        self.storage.finish_trial(pruned_id, "pruned", 10.)
+        best = self.storage.best_trials(n=2)
+        self.assertEqual([t["value"] for t in best], [3., 2.])
+
+    def test_failed_setup(self):
+        settings = {"storage_path": self.storage.path, "reduction_factor": 3}
+        trial_id = self.storage.create_trial({"gamma_offset": 0.01})
+        with mock.patch.object(local_search, "_ENV_POOL", object()), \
+                mock.patch.object(experiment_manager, "ExperimentManager", side_effect=KeyError("env_id")):
+            result = run_trial(trial_id, {"gamma_offset": 0.01}, settings)
+        self.assertEqual(result["state"], "failed")
+        self.assertEqual(self.storage.trials()[0]["state"], "failed")
+
+    def test_failed_worker(self):
+        search = LocalHyperparameterSearch({"parameters": {"x": {"values": [1, 2, 3]}}}, {}, self.storage.path, max_resource=9)
+
+        def trial(trial_id, config, settings):
+            if trial_id == 2:
+                raise RuntimeError("worker died")
+            search.storage.finish_trial(trial_id, "complete", float(trial_id))
+            return {"trial_id": trial_id, "state": "complete", "value": float(trial_id), "timesteps": 9}
+
+        executor = lambda max_workers, mp_context: ThreadPoolExecutor(max_workers)
+        with mock.patch.object(local_search, "ProcessPoolExecutor", executor), \
+                mock.patch.object(local_search, "run_trial", side_effect=trial):
+            best = search.optimize(3)
+        self.assertEqual([t["trial_id"] for t in best], [3, 1])
+        self.assertEqual([t["state"] for t in self.storage.trials()], ["complete", "failed", "complete"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+
+import numpy as np
+import casadi as ca
+
+from gl_gym.environments.mpc import X_NOMINAL, EconomicMPC
+from gl_gym.environments.tomato_env import TomatoEnv
+
+from weather_fixtures import SyntheticWeatherTestCase
+
+
+class TestCollocation(unittest.TestCase):
+    def collocation_matrices(self, degree):
+        mpc = EconomicMPC.__new__(EconomicMPC)
+        mpc.degree = degree
+        return mpc._collocation_matrices()
+
+    def test_polynomials_are_interpolated_exactly(self):
+        for degree in [1, 2, 3]:
+            C, D = self.collocation_matrices(degree)
+            tau = np.append(0, ca.collocation_points(degree, "radau"))
+            for order in range(degree+1):
+                values = tau**order
+                # derivative at the collocation points and value at the end of the interval
+                np.testing.assert_allclose(C[:, 1:].T @ values, order*tau[1:]**max(order-1, 0) if order else 0, atol=1e-10)
+                np.testing.assert_allclose(D @ values, 1.0, atol=1e-10)
+
+
+class TestEconomicMPC(SyntheticWeatherTestCase):
+    def setUp(self):
+        super().setUp()
+        self.env = TomatoEnv(base_env_params=self.env_base_params, **self.env_specific_params)
+        self.env.reset(seed=0)
+
+    def test_short_horizon_solve(self):
+        env = self.env
+        mpc = EconomicMPC(env, Np=3, max_iter=50)
+        for _ in range(2):
+            d = env.weather_data[env.timestep:env.timestep+mpc.Np]
+            U, X = mpc.solve(env.x, env.u, d, env.p)
+            self.assertEqual(U.shape, (mpc.Np, env.nu))
+            self.assertEqual(X.shape, (mpc.Np+1, env.nx))
+            np.testing.assert_allclose(X[0], env.x, rtol=1e-6, atol=1e-9)
+            # the plan satisfies the control bounds and rate constraints up to the solver tolerance
+            tol = 1e-6
+            self.assertTrue(np.all(U >= env.u_min - tol) and np.all(U <= env.u_max + tol))
+            self.assertTrue(np.all(np.abs(np.diff(np.vstack([env.u, U]), axis=0)) <= env.delta_u_max + tol))
+
+            u = mpc.predict(env.x, d, env)
+            self.assertTrue(np.all(u >= env.u_min) and np.all(u <= env.u_max))
+            self.assertTrue(np.all(np.abs(u - env.u) <= env.delta_u_max))
+            env.step_raw_control(u)
+        self.assertEqual(len(mpc.solver_stats), 4)
+
+    def test_default_horizon_solve(self):
+        env = self.env
+        mpc = EconomicMPC(env)
+        self.assertEqual(mpc.Np, env.Np)
+        nlp_g = mpc.solver.get_function("nlp_g")
+        for _ in range(2):
+            d = env.weather_data[env.timestep:env.timestep+mpc.Np]
+            U, X = mpc.solve(env.x, env.u, d, env.p)
+            # the cold start and the shifted warm start converge, to a plan that satisfies the collocation equations
+            self.assertEqual(mpc.solver_stats[-1], "Solve_Succeeded")
+            params = np.concatenate([env.x, env.u, d.T.flatten(order="F"), env.p])
+            g = nlp_g(mpc.w0, params).full().flatten()
+            defect = np.abs(g - mpc.lbg)[mpc.lbg == mpc.ubg]
+            self.assertLess(np.max(defect), 1e-4)
+            env.step_raw_control(U[0])
+
+    def test_shifted_warm_start(self):
+        env = self.env
+        mpc = EconomicMPC(env, Np=3)
+        nx, degree = env.nx, mpc.degree
+        # label the variables and constraints with their interval
+        X, XC, U, S = [np.tile(np.arange(shape[1]) // n, (shape[0], 1)).astype(float)
+                       for shape, n in zip(mpc._w_shapes, [1, degree, 1, 1])]
+        mpc.w0 = mpc._join(X * X_NOMINAL[:, None], XC * X_NOMINAL[:, None], U, S)
+        mpc.lam_x0 = mpc._join(X * X_NOMINAL[:, None], XC * X_NOMINAL[:, None], U, S) + 10
+        mpc.lam_g0 = np.concatenate([np.full(nx, -1.)] + [np.full(len(mpc.lbg[nx:]) // mpc.Np, k) for k in range(mpc.Np)])
+        w0, multipliers = mpc._initial_guess(env.x, env.u, env.weather_data[:mpc.Np], env.p)
+
+        X, XC, U, S = mpc._split(w0)
+        np.testing.assert_allclose(X[:, 0], env.x)
+        np.testing.assert_allclose(X[:, 1:] / X_NOMINAL[:, None], [[2, 3, 3]]*nx)
+        np.testing.assert_allclose(XC[0] / X_NOMINAL[0], [1, 1, 2, 2, 2, 2])
+        np.testing.assert_array_equal(U[0], [1, 2, 2])
+        # the multipliers are shifted like the variables
+        X, XC, U, S = mpc._split(multipliers["lam_x0"], unscale=False)
+        np.testing.assert_array_equal(X[0], [11, 12, 13, 13])
+        np.testing.assert_array_equal(XC[0], [11, 11, 12, 12, 12, 12])
+        np.testing.assert_array_equal(S[0], [11, 12, 12])
+        lam_g0 = multipliers["lam_g0"]
+        self.assertEqual(lam_g0.shape, mpc.lam_g0.shape)
+        np.testing.assert_array_equal(lam_g0[:nx], 0)
+        np.testing.assert_array_equal(np.unique(lam_g0[nx:].reshape(mpc.Np, -1), axis=1).ravel(), [1, 2, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
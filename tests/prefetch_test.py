@@ -0,0 +1,72 @@
+import unittest
+
+import numpy as np
+from gymnasium.utils import seeding
+
+from gl_gym.environments.tomato_env import TomatoEnv
+
+from weather_fixtures import SyntheticWeatherTestCase
+
+
+class TestPrefetch(SyntheticWeatherTestCase):
+    weather_years = [2009, 2010]
+    noisy_weather = True
+
+    def setUp(self):
+        super().setUp()
+        self.env_base_params.update({
+            "start_train_year": 2009, "end_train_year": 2010, "start_train_day": 50, "end_train_day": 150,
+        })
+        self.env_specific_params.update({
+            "uncertainty_scale": 0.1,
+            "eval_options": {"eval_years": [2009, 2010], "eval_days": [59, 100, 200], "location": "Amsterdam"},
+        })
+
+    def run_episodes(self, prefetch, training, n_episodes=4):
+        base_env_params = dict(self.env_base_params, training=training)
+        env_specific_params = dict(self.env_specific_params, prefetch=prefetch)
+        env = TomatoEnv(base_env_params=base_env_params, **env_specific_params)
+        episodes = []
+        env.reset(seed=3)
+        for i in range(n_episodes):
+            if i > 0:
+                env.reset()
+            # the parametric uncertainty draws from the environment's generator
+            for _ in range(2):
+                env.step(np.zeros(env.nu))
+            episodes.append((env.growth_year, env.start_day, env.eval_idx, env.weather_data[0].copy(), env.x.copy()))
+        env.close()
+        return episodes
+
+    def test_same_episodes(self):
+        for training in [True, False]:
+            without = self.run_episodes(prefetch=False, training=training)
+            with_prefetch = self.run_episodes(prefetch=True, training=training)
+            self.assertGreater(len({(year, day) for year, day, *_ in without}), 1)
+            for a, b in zip(without, with_prefetch):
+                self.assertEqual(a[:3], b[:3])
+                np.testing.assert_array_equal(a[3], b[3])
+                np.testing.assert_array_equal(a[4], b[4])
+            if not training:
+                # the evaluation index advances at the reset that starts the episode
+                self.assertEqual([idx for _, _, idx, *_ in with_prefetch], [1, 2, 3, 4])
+
+    def test_episode_generator(self):
+        env = TomatoEnv(base_env_params=self.env_base_params, **self.env_specific_params)
+        episodes = []
+        for i in range(5):
+            env.reset(seed=3 if i == 0 else None)
+            episodes.append((env.growth_year, env.start_day))
+            if i == 0:
+                # the episode is drawn from a child generator, the environment's generator is untouched
+                self.assertEqual(env._np_random.bit_generator.state, seeding.np_random(3)[0].bit_generator.state)
+            env.step(np.zeros(env.nu))
+        env.close()
+
+        rng = seeding.np_random(3)[0].spawn(1)[0]
+        expected = [(rng.choice(env.train_years), rng.choice(env.train_days)) for _ in range(5)]
+        self.assertEqual(episodes, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
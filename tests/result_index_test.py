@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from gl_gym.common.result_index import ResultIndex
+
+
+def results(n_episodes, seed=0):
+    rng = np.random.default_rng(seed)
+    n = 50 * n_episodes
+    return pd.DataFrame({
+        "temp_air": rng.normal(20, 1, n),
+        "Rewards": rng.random(n),
+        "EPI": rng.random(n),
+        "temp_violation": rng.random(n),
+        "co2_violation": np.zeros(n),
+        "rh_violation": np.zeros(n),
+        "episode": np.repeat(np.arange(n_episodes), 50),
+    })
+
+
+class TestResultIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        self.frames = {}
+        for rel, n_episodes in [
+            ("AgriControl/deterministic/ppo/model-a-201059-Amsterdam.csv", 1),
+            ("AgriControl/stochastic/ppo/0.1/model-a-201059-Amsterdam.csv", 3),
+            ("AgriControl/stochastic/rb_baseline/0.1/rb_baseline-2011120-Almeria.csv", 3),
+        ]:
+            path = os.path.join(self.root, rel)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.frames[rel] = results(n_episodes, seed=len(self.frames))
+            self.frames[rel].to_csv(path, index=False)
+        self.index = ResultIndex(self.root)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_scan_and_query(self):
+        self.assertEqual(len(self.index.scan()), 3)
+        self.assertEqual(self.index.scan(), [])
+        files = self.index.query(mode="stochastic", algorithm=["ppo", "rb_baseline"], growth_year=2011)
+        self.assertEqual(list(files["location"]), ["Almeria"])
+        self.assertEqual((files["start_day"].iloc[0], files["uncertainty"].iloc[0], files["n_episodes"].iloc[0]), (120, 0.1, 3))
+        self.assertEqual(self.index.query(model="model-a", uncertainty=0.)["mode"].tolist(), ["deterministic"])
+
+        data = self.index.load(files["path"].iloc[0], columns=["Rewards", "episode"])
+        self.assertEqual(list(data.columns), ["Rewards", "episode"])
+
+    def test_summaries(self):
+        rel = "AgriControl/stochastic/ppo/0.1/model-a-201059-Amsterdam.csv"
+        # registered by an evaluation script, with the results in memory
+        self.index.register(os.path.join(self.root, rel), df=self.frames[rel], algorithm="ppo")
+        summary = self.index.summaries(metrics=["Rewards", "Penalty"], uncertainty=0.1).iloc[0]
+        totals = self.frames[rel].groupby("episode").sum()
+        self.assertAlmostEqual(summary["Rewards mean"], totals["Rewards"].mean())
+        self.assertAlmostEqual(summary["Penalty std"], totals["temp_violation"].std())
+        self.assertEqual(summary["Rewards n"], 3)
+        self.assertNotIn("EPI mean", summary.index)
+
+        os.remove(os.path.join(self.root, rel))
+        self.index.scan()
+        self.assertTrue(self.index.summaries(uncertainty=0.1, algorithm="ppo").empty)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import io
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from gl_gym.common.decimation import lttb, minmax_decimate
+from gl_gym.common.results import episode_bands, read_results
+
+
+class TestResults(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.df = pd.DataFrame({
+            "temp_air": rng.normal(20, 1, 300),
+            "Rewards": np.ones(300),
+            "episode": np.repeat([0, 1, 2], 100),
+        })
+
+    def test_read_sniffed_delimiter(self):
+        for sep in [",", ";", "\t"]:
+            buffer = io.BytesIO(self.df.to_csv(index=False, sep=sep).encode())
+            pd.testing.assert_frame_equal(read_results(buffer, name="results.csv"), self.df)
+
+    def test_episode_bands(self):
+        bands = episode_bands(self.df, ["temp_air", "Rewards", "missing"], quantiles=(0., 1.), cumulative=False)
+        self.assertEqual(set(bands), {"temp_air", "Rewards"})
+        values = self.df["temp_air"].to_numpy().reshape(3, 100)
+        np.testing.assert_allclose(bands["temp_air"]["mean"], values.mean(axis=0))
+        np.testing.assert_allclose(bands["temp_air"]["q0"], values.min(axis=0))
+        cumulative = episode_bands(self.df, ["Rewards"], cumulative=True)["Rewards"]
+        np.testing.assert_allclose(cumulative["mean"], np.arange(1, 101))
+
+    def test_decimation(self):
+        x = np.arange(10000)
+        y = np.sin(x / 500) + (x == 1234) * 5
+        x_min_max, y_min_max = minmax_decimate(x, y, 200)
+        self.assertLessEqual(len(x_min_max), 202)
+        self.assertIn(1234, x_min_max)
+        x_lttb, y_lttb = lttb(x, y, 200)
+        self.assertEqual(len(x_lttb), 200)
+        self.assertIn(1234, x_lttb)
+        self.assertEqual((x_lttb[0], x_lttb[-1]), (0, 9999))
+
+
+if __name__ == "__main__":
+    unittest.main()
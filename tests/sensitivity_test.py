@@ -0,0 +1,97 @@
+import os
+import unittest
+import warnings
+from unittest import mock
+
+import numpy as np
+
+from gl_gym.common.sensitivity import (
+    OUTPUT_KEYS, SensitivityAnalysis, saltelli_design, saltelli_points, sobol_indices, morris_design, morris_indices
+)
+from gl_gym.environments.tomato_env import TomatoEnv
+
+from weather_fixtures import SyntheticWeatherTestCase
+
+
+def ishigami(x, a=7, b=0.1):
+    x = -np.pi + 2*np.pi*x
+    return np.sin(x[..., 0]) + a*np.sin(x[..., 1])**2 + b*x[..., 2]**4*np.sin(x[..., 0])
+
+
+class TestSobol(unittest.TestCase):
+    def test_ishigami(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            points = saltelli_points(*saltelli_design(3, 2**13))
+        S1, ST = sobol_indices(ishigami(points))
+        np.testing.assert_allclose(S1, [0.314, 0.442, 0.0], atol=0.03)
+        np.testing.assert_allclose(ST, [0.558, 0.442, 0.244], atol=0.03)
+
+    def test_larger_design_extends_smaller(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            small = saltelli_points(*saltelli_design(4, 8, seed=3))
+            large = saltelli_points(*saltelli_design(4, 16, seed=3))
+        np.testing.assert_array_equal(large[:8], small)
+
+
+class TestMorris(unittest.TestCase):
+    def test_linear_model(self):
+        points = morris_design(3, 20, seed=1)
+        self.assertTrue(np.all((points >= 0) & (points <= 1)))
+        np.testing.assert_array_equal(morris_design(3, 10, seed=1), points[:10])
+        y = points @ np.array([1.0, -2.0, 0.0])
+        mu_star, sigma = morris_indices(points, y)
+        np.testing.assert_allclose(mu_star, [1.0, 2.0, 0.0])
+        np.testing.assert_allclose(sigma, 0.0, atol=1e-12)
+
+
+class TestSensitivityCache(SyntheticWeatherTestCase):
+    def setUp(self):
+        super().setUp()
+        self.env = TomatoEnv(base_env_params=self.env_base_params, **self.env_specific_params)
+        self.env.reset(seed=0)
+        self.cache_dir = os.path.join(self.tmp_dir.name, "cache")
+
+    def make_analysis(self):
+        controls = np.tile(self.env.u_max / 2, (self.env.N, 1))
+        return SensitivityAnalysis(self.env, [10, 20], method="morris", controls=controls, batch_size=4, cache_dir=self.cache_dir)
+
+    def run_counted(self, analysis, n_samples):
+        with mock.patch.object(analysis, "evaluate", wraps=analysis.evaluate) as evaluate:
+            outputs = analysis.run(n_samples)
+        return outputs, [call.args[0] for call in evaluate.call_args_list]
+
+    def test_extends_cached_design(self):
+        small, evaluated = self.run_counted(self.make_analysis(), 2)
+        self.assertEqual(len(evaluated), 1)
+        self.assertEqual(evaluated[0].shape, (6, 2))
+
+        # a new analysis of the same season only simulates the points of the new trajectories
+        analysis = self.make_analysis()
+        large, evaluated = self.run_counted(analysis, 4)
+        self.assertEqual(len(evaluated), 1)
+        np.testing.assert_array_equal(evaluated[0], analysis.design(4)[2:].reshape(-1, 2))
+        for key in OUTPUT_KEYS:
+            self.assertEqual(large[key].shape, (4, 3))
+            np.testing.assert_array_equal(large[key][:2], small[key])
+
+        # the smaller design is read from the cache
+        cached, evaluated = self.run_counted(self.make_analysis(), 2)
+        self.assertEqual(evaluated, [])
+        for key in OUTPUT_KEYS:
+            np.testing.assert_array_equal(cached[key], small[key])
+
+    def test_mismatching_cache(self):
+        analysis = self.make_analysis()
+        analysis.run(2)
+        with np.load(analysis.cache_file) as cache:
+            outputs = {key: cache[key] for key in cache.files}
+        outputs["points"] = 1 - outputs["points"]
+        np.savez(analysis.cache_file, **outputs)
+        with self.assertRaises(ValueError):
+            self.make_analysis().run(4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from gl_gym.environments.surrogate import SurrogateModel, fit_surrogate, fidelity_report
+
+
+class TestSurrogate(unittest.TestCase):
+    def setUp(self):
+        # linear system with the state layout of GreenLight: CO2 density, temperature, vapour pressure, fruit
+        self.nx, self.nu, self.nd = 28, 2, 1
+        rng = np.random.default_rng(0)
+        self.base = np.zeros(self.nx)
+        self.base[[0, 2, 15, 25]] = [1000., 20., 1500., 5e4]
+        self.scale = np.maximum(self.base / 10, 1.)
+        n = 20000
+        x = self.base + self.scale * rng.normal(size=(n, self.nx))
+        u = rng.uniform(0, 1, (n, self.nu))
+        d = rng.normal(size=(n, self.nd))
+        self.data = {"x": x, "u": u, "d": d, "x_next": self.step(x, u, d)}
+
+    def step(self, x, u, d):
+        return x - 0.1 * (x - self.base) + self.scale * (0.2 * u[:, :1] - 0.1 * u[:, 1:] + 0.05 * d)
+
+    def test_fit_and_fidelity(self):
+        model, history = fit_surrogate(self.data, hidden_sizes=(64, 64), n_epochs=30, batch_size=256)
+        self.assertLess(history["val_loss"][-1], 1e-2)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model.save(os.path.join(tmp_dir, "model.pt"))
+            loaded = SurrogateModel.load(os.path.join(tmp_dir, "model.pt"))
+        x, u, d = self.data["x"][:5], self.data["u"][:5], self.data["d"][:5]
+        np.testing.assert_array_equal(loaded.predict(x, u, d), model.predict(x, u, d))
+
+        N = 96
+        rng = np.random.default_rng(1)
+        controls, weather = rng.uniform(0, 1, (N, self.nu)), rng.normal(size=(N, self.nd))
+        states = [self.base]
+        for k in range(N):
+            states.append(self.step(states[-1][None], controls[k:k+1], weather[k:k+1])[0])
+        report = fidelity_report(model, np.array(states), controls, weather, dt=3600., horizons=(1, 4, 60), n_starts=5)
+        # the 60-day horizon is longer than the trajectory
+        self.assertEqual(list(report["horizon_days"]), [1, 4])
+        self.assertEqual(list(report["n_rollouts"]), [5, 1])
+        self.assertLess(report["temp_rmse"].max(), 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from gl_gym.experiments.tournament import bootstrap_ci, discover_models, discover_scenarios, leaderboard, weather_horizon
+
+
+class TestTournament(unittest.TestCase):
+    def test_discover_models(self):
+        with tempfile.TemporaryDirectory() as root:
+            for rel in [
+                "AgriControl/ppo/stochastic/models/model-a/best_model.zip",
+                "AgriControl/ppo/stochastic/envs/model-a/best_vecnormalize.pkl",
+                "AgriControl/recurrentppo/deterministic/models/model-b/best_model.zip",
+                "AgriControl/recurrentppo/deterministic/envs/model-b/best_vecnormalize.pkl",
+                # no VecNormalize statistics
+                "AgriControl/sac/stochastic/models/model-c/best_model.zip",
+                # not an evaluated algorithm
+                "AgriControl/mpc/stochastic/models/model-d/best_model.zip",
+                "AgriControl/mpc/stochastic/envs/model-d/best_vecnormalize.pkl",
+            ]:
+                path = os.path.join(root, rel)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                open(path, "wb").close()
+
+            models = discover_models(root, "AgriControl")
+            self.assertEqual([(m["algorithm"], m["mode"], m["model_name"]) for m in models],
+                             [("ppo", "stochastic", "model-a"), ("recurrentppo", "deterministic", "model-b")])
+            self.assertEqual(models[0]["load_path"], os.path.join(root, "AgriControl/ppo/stochastic") + "/")
+            self.assertEqual(len(discover_models(root, "AgriControl", modes=["deterministic"])), 1)
+
+    def test_discover_scenarios(self):
+        with tempfile.TemporaryDirectory() as root:
+            os.makedirs(os.path.join(root, "Amsterdam"))
+            for year in [2009, 2010]:
+                time = np.arange(0., 365*86400, 3600.)
+                pd.DataFrame({
+                    "time": time, "global radiation": 0., "wind speed": 3., "air temperature": 10., "sky temperature": 2.,
+                    "??": 0., "CO2 concentration": 400., "day number": time / 86400, "RH": 80.,
+                }).to_csv(os.path.join(root, "Amsterdam", f"{year}.csv"), index=False)
+
+            # the environment loads Np+1 = 49 days of weather past the end of a season with a 0.5 day horizon
+            horizon = weather_horizon({"pred_horizon": 0.5, "dt": 900.})
+            self.assertEqual(horizon, 49)
+            scenarios = discover_scenarios(root, 60, horizon, [59, 250, 300])
+            self.assertEqual(scenarios, [("Amsterdam", 2009, 59), ("Amsterdam", 2009, 250), ("Amsterdam", 2009, 300),
+                                         ("Amsterdam", 2010, 59), ("Amsterdam", 2010, 250)])
+
+    def test_leaderboard(self):
+        rng = np.random.default_rng(0)
+        rows = []
+        for name, offset in [("model-a", 0.), ("model-b", 1.)]:
+            for year in range(2000, 2010):
+                for seed in range(3):
+                    rows.append({
+                        "algorithm": "ppo", "mode": "stochastic", "model_name": name, "uncertainty": 0.1,
+                        "location": "Amsterdam", "growth_year": year, "start_day": 59, "seed": seed,
+                        "Rewards": offset + year - 2000 + rng.normal(0, 0.1), "Penalty": offset,
+                    })
+        totals = pd.DataFrame(rows)
+
+        board = leaderboard(totals, "Rewards")
+        self.assertEqual(board["model_name"].tolist(), ["model-b", "model-a"])
+        self.assertEqual(board[["rank", "n_scenarios", "n_sims"]].iloc[0].tolist(), [1, 10, 30])
+        best = board.iloc[0]
+        self.assertLess(best["Rewards ci_low"], best["Rewards mean"])
+        self.assertGreater(best["Rewards ci_high"], best["Rewards mean"])
+        self.assertAlmostEqual(best["Penalty mean"], 1.)
+        # lower penalties are better
+        self.assertEqual(leaderboard(totals, "Penalty")["model_name"].tolist(), ["model-a", "model-b"])
+
+        self.assertTrue(np.isnan(bootstrap_ci(np.ones(1))[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+import numpy as np
+
+from gl_gym.environments.utils import co2ppm2dens, satVp
+from gl_gym.environments.weather_augmentation import augment_weather, IGLOB, TOUT, VPOUT, CO2OUT, TSOOUT, DLI, ISDAY
+
+
+class TestWeatherAugmentation(unittest.TestCase):
+    def setUp(self):
+        # 20 days and a half-day horizon of hourly weather, every day with its own radiation and temperature
+        self.dt = 3600.
+        n = 20*24 + 12
+        hours = np.arange(n)
+        days = hours // 24
+        self.weather = np.zeros((n, 10))
+        self.weather[:, IGLOB] = np.maximum(np.sin(2*np.pi*(hours - 6)/24), 0) * (100 + 10*days)
+        self.weather[:, TOUT] = 5 + 0.5*days + 3*np.sin(2*np.pi*hours/24)
+        self.weather[:, VPOUT] = 0.8 * satVp(self.weather[:, TOUT])
+        self.weather[:, CO2OUT] = co2ppm2dens(self.weather[:, TOUT], 400) * 1e6
+        self.weather[:, TSOOUT] = np.linspace(8, 9, n)
+        self.weather[:, DLI] = (100 + 10*days) * 0.3
+        self.weather[:, ISDAY] = self.weather[:, IGLOB] > 0
+
+    def test_bootstrap_moves_whole_days(self):
+        no_noise = dict(temp_offset_std=0., temp_day_std=0., rad_std=0.)
+        w = augment_weather(self.weather, self.dt, np.random.default_rng(0), block_days=3, window_days=4, **no_noise)
+        days = w[:480].reshape(20, 24, 10)
+        original = self.weather[:480].reshape(20, 24, 10)
+        for day in days:
+            source = [k for k in range(20) if np.allclose(np.delete(day, TSOOUT, 1), np.delete(original[k], TSOOUT, 1))]
+            self.assertEqual(len(source), 1)
+        np.testing.assert_array_equal(w[:, TSOOUT], self.weather[:, TSOOUT])
+        np.testing.assert_array_equal(w[480:], self.weather[480:])
+
+    def test_perturbations_are_consistent(self):
+        w = augment_weather(self.weather, self.dt, np.random.default_rng(1), temp_offset_std=2., rad_std=0.3)
+        # relative humidity and CO2 concentration are kept, the DLI scales with the radiation
+        np.testing.assert_allclose(w[:, VPOUT] / satVp(w[:, TOUT]), 0.8)
+        np.testing.assert_allclose(w[:, CO2OUT], co2ppm2dens(w[:, TOUT], 400) * 1e6)
+        day = w[:, ISDAY] > 0
+        np.testing.assert_allclose(w[day, IGLOB] / w[day, DLI], self.weather[day, IGLOB] / self.weather[day, DLI], atol=1e-9)
+        self.assertFalse(np.allclose(w[:, TOUT], self.weather[:, TOUT]))
+
+        # reproducible with the same random number generator
+        np.testing.assert_array_equal(
+            augment_weather(self.weather, self.dt, np.random.default_rng(1), temp_offset_std=2., rad_std=0.3), w
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import json
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from gl_gym.environments.utils import load_weather_data
+from gl_gym.environments.weather_catalog import WeatherCatalog
+
+from weather_fixtures import write_weather
+
+
+class TestWeatherCatalog(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.weather_dir = self.tmp_dir.name
+        for location, years in [("Amsterdam", [2009, 2010]), ("Almeria", [2012])]:
+            os.makedirs(os.path.join(self.weather_dir, location))
+            for year in years:
+                n_days = 366 if year % 4 == 0 else 365
+                write_weather(os.path.join(self.weather_dir, location, f"{year}.csv"), n_days, seed=year)
+        self.catalog = WeatherCatalog(self.weather_dir)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_index(self):
+        summary = self.catalog.summary()
+        self.assertEqual(list(summary["location"]), ["Almeria", "Amsterdam", "Amsterdam"])
+        self.assertEqual(list(summary["n_rows"]), [366*24, 365*24, 365*24])
+        self.assertTrue(np.all(summary["sample_period"] == 3600.))
+        # a new catalog reuses the stored index
+        self.assertTrue(os.path.exists(os.path.join(self.weather_dir, WeatherCatalog.INDEX_FILE)))
+        self.assertEqual(WeatherCatalog(self.weather_dir).index, self.catalog.index)
+
+    def test_unreadable_index(self):
+        index_path = os.path.join(self.weather_dir, WeatherCatalog.INDEX_FILE)
+        # e.g., read while another worker writes it
+        with open(index_path, "w") as f:
+            f.write('{"Amsterdam": {"2009": ')
+        self.assertEqual(WeatherCatalog(self.weather_dir).index, self.catalog.index)
+        with open(index_path) as f:
+            self.assertEqual(json.load(f), self.catalog.index)
+        self.assertEqual([name for name in os.listdir(self.weather_dir) if name.endswith(".tmp")], [])
+
+    def test_cross_year_season(self):
+        weather = self.catalog.load("Amsterdam", 2009, 330, 60, 1, 900., 10)
+        expected = load_weather_data(self.weather_dir, "Amsterdam", 2009, 330, 60, 1, 900., 10)
+        np.testing.assert_allclose(weather, expected)
+        with self.assertRaises(ValueError):
+            self.catalog.load("Amsterdam", 2010, 330, 60, 1, 900., 10)
+
+    def test_sample_valid_seasons(self):
+        days = self.catalog.valid_start_days("Amsterdam", 2010, 60, 1)
+        self.assertEqual(days[-1], 365 - 61 - 1)
+        self.assertEqual(len(self.catalog.valid_start_days("Amsterdam", 2009, 60, 1)), 365)
+
+        rng = np.random.default_rng(0)
+        samples = [self.catalog.sample(rng, 60, 1) for _ in range(2000)]
+        counts = pd.Series([location for location, _, _ in samples]).value_counts()
+        # uniform over the seasons: Amsterdam has 365 + 303, Almeria 304 valid start days
+        self.assertAlmostEqual(counts["Amsterdam"] / len(samples), 668 / 972, delta=0.05)
+        for location, year, day in samples:
+            self.assertIn(day, self.catalog.valid_start_days(location, year, 60, 1))
+        self.assertEqual({s[0] for s in [self.catalog.sample(rng, 60, 1, ["Almeria"]) for _ in range(10)]}, {"Almeria"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from gl_gym.common.utils import load_env_params
+
+
+def write_weather(path, n_days, sample_period=3600., seed=None):
+    """Write a synthetic weather year with daily cycles. With a seed, wind, temperature and RH are noisy."""
+    time = np.arange(0., n_days*86400, sample_period)
+    hours = time / 3600
+    noise = np.random.default_rng(seed).random((3, len(time))) if seed is not None else np.zeros((3, len(time)))
+    pd.DataFrame({
+        "time": time,
+        "global radiation": np.maximum(300*np.sin(2*np.pi*(hours - 6)/24), 0),
+        "wind speed": 3 + noise[0],
+        "air temperature": 10 + 5*np.sin(2*np.pi*hours/24) + noise[1],
+        "sky temperature": 2 + 5*np.sin(2*np.pi*hours/24),
+        "??": 0.,
+        "CO2 concentration": 400.,
+        "day number": time / 86400,
+        "RH": 80 + 5*noise[2],
+    }).to_csv(path, index=False)
+
+
+class SyntheticWeatherTestCase(unittest.TestCase):
+    """Loads the TomatoEnv parameters for one-day seasons on synthetic Amsterdam weather, without uncertainty."""
+    weather_years = [2010]
+    noisy_weather = False
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp_dir.name, "Amsterdam"))
+        for year in self.weather_years:
+            seed = year if self.noisy_weather else None
+            write_weather(os.path.join(self.tmp_dir.name, "Amsterdam", f"{year}.csv"), 365, seed=seed)
+        self.env_base_params, self.env_specific_params = load_env_params("TomatoEnv", "gl_gym/configs/envs/")
+        self.env_base_params.update({"weather_data_dir": self.tmp_dir.name, "season_length": 1})
+        self.env_specific_params["uncertainty_scale"] = 0.0
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
@@ -0,0 +1,37 @@
+import unittest
+
+import numpy as np
+
+from gl_gym.environments.weather_forecast import forecast_weather
+
+
+class TestWeatherForecast(unittest.TestCase):
+    def setUp(self):
+        hours = np.arange(200)
+        self.weather = np.zeros((200, 10))
+        self.weather[:, 0] = np.maximum(np.sin(2*np.pi*(hours - 6)/24), 0) * 300
+        self.weather[:, 1:5] = 10 + np.random.default_rng(0).random((200, 4))
+
+    def test_perfect_forecast(self):
+        forecast = forecast_weather(self.weather, 12, np.random.default_rng(0), n_issues=101)
+        self.assertEqual(forecast.shape, (101, 12, 5))
+        for t in [0, 50, 100]:
+            expected = np.concatenate([self.weather[t+i][0:5] for i in range(1, 13)])
+            np.testing.assert_array_equal(forecast[t].ravel(), expected)
+
+    def test_errors_grow_with_lead_time(self):
+        forecast = forecast_weather(
+            self.weather, 12, np.random.default_rng(0), error_std=[0.2, 2., 0.1, 0.1, 0.3], error_corr=0.9,
+        )
+        truth = forecast_weather(self.weather, 12, None)
+        errors = forecast[..., 1] - truth[..., 1]
+        expected_std = 2. * np.sqrt(1 - 0.9**(2*np.arange(1, 13)))
+        np.testing.assert_allclose(errors.std(axis=0), expected_std, rtol=0.2)
+        self.assertLess(errors[:, 0].std(), errors[:, -1].std())
+        # relative errors keep the radiation zero at night and non-negative
+        self.assertTrue(np.all(forecast[truth[..., 0] == 0, 0] == 0))
+        self.assertTrue(np.all(forecast[..., 0] >= 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
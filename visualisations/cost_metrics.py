@@ -1,45 +1,42 @@
 import argparse
-import os
 
 import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_svg import FigureCanvasSVG
 
 import plot_config
+from gl_gym.common.result_index import ResultIndex
 
 width = 85 * 0.03937  # 85 mm ≈ 3.35 inches
 height = width * 0.75  # Adjust aspect ratio (3:2 or 4:3 is ideal)
 
 def load_data(args):
-    base_path = os.path.join(f"data/{args.project}", args.mode)
-
-    def load_and_label(folder, model_name):
-        # For stochastic mode with uncertainty, adjust the path
-        if args.mode == "stochastic" and hasattr(args, 'uncertainty_value') and args.uncertainty_value > 0:
-            folder_path = os.path.join(base_path, folder, str(args.uncertainty_value))
-        else:
-            folder_path = os.path.join(base_path, folder)
-
-        files = [f for f in os.listdir(folder_path) if
-                 all(x in f for x in [args.growth_year, args.start_day, args.location]) and f.endswith(".csv")]
-        if not files:
-            print(f"Warning: No data found for {model_name} in {folder_path}")
-            return pd.DataFrame()  # Return an empty DataFrame if no file is found
-        filepath = os.path.join(folder_path, files[0])
-        data = pd.read_csv(filepath)
-        data["model"] = model_name
-        return data
-
-    ppo_data = load_and_label("ppo", "PPO")
-    sac_data = load_and_label("sac", "SAC")
-    rb_data = load_and_label("rb_baseline", "RB Baseline")
-
-    return pd.concat([ppo_data, sac_data, rb_data], ignore_index=True)
+    """Totals of the cost and violation metrics per model, from the summaries in the result index."""
+    index = ResultIndex("data")
+    # index results that were saved before the evaluation scripts registered them
+    index.scan()
+    uncertainty = args.uncertainty_value if args.mode == "stochastic" and args.uncertainty_value else 0.
+
+    def load_totals(folder, model_name):
+        summaries = index.summaries(
+            project=args.project, mode=args.mode, algorithm=folder, growth_year=int(args.growth_year),
+            start_day=int(args.start_day), location=args.location, uncertainty=uncertainty,
+        )
+        if summaries.empty:
+            print(f"Warning: No data found for {model_name} in data/{args.project}/{args.mode}/{folder}")
+            return None
+        summary = summaries.iloc[0]
+        # the sum over all rows of the results, i.e., over all episodes
+        metrics = [col[:-len(" mean")] for col in summaries.columns if col.endswith(" mean")]
+        return pd.Series({metric: summary[f"{metric} mean"] * summary[f"{metric} n"] for metric in metrics}, name=model_name)
+
+    totals = [load_totals("ppo", "PPO"), load_totals("sac", "SAC"), load_totals("rb_baseline", "RB Baseline")]
+    return pd.DataFrame([t for t in totals if t is not None])
 
 def costs_plot(data):
     metrics = ["EPI", "Revenue", "Heat costs", "Elec costs", "CO2 costs"]
     print(data.keys())
-    models = data["model"].unique()
+    models = data.index
     n_metrics = len(metrics)
 
     # Set up the plot
@@ -51,7 +48,7 @@ def costs_plot(data):
     # Plot bars for each model
     for i, model in enumerate(models):
         
-        values = [data[data["model"] == model][metric].sum() for metric in metrics]
+        values = [data.loc[model, metric] for metric in metrics]
         print(values)
         ax.bar([x + i * bar_width for x in index], values, bar_width, 
                label=model, color=colors[i])
@@ -74,7 +71,7 @@ def costs_plot(data):
 
 def violations_plot(data):
     metrics = ["temp_violation", "co2_violation", "rh_violation"]
-    models = data["model"].unique()
+    models = data.index
     n_metrics = len(metrics)
 
     # Set up the plot
@@ -86,7 +83,7 @@ def violations_plot(data):
 
     # Plot bars for each model
     for i, model in enumerate(models):
-        values = [data[data["model"] == model][metric].sum() for metric in metrics]
+        values = [data.loc[model, metric] for metric in metrics]
         print(values)
         ax.bar([x + i * bar_width for x in index], values, bar_width, 
                label=model, color=colors[i])
@@ -5,6 +5,7 @@ from pathlib import Path
 import matplotlib.pyplot as plt
 
 import plot_config
+from gl_gym.common.result_index import ResultIndex
 
 WIDTH = 85 * 0.03937  # 85 mm ≈ 3.35 inches
 HEIGHT = WIDTH * 0.75  # Adjust aspect ratio (3:2 or 4:3 is ideal)
@@ -17,18 +18,22 @@ def load_data(project):
     # Load data for both algorithms
     ppo_path = load_dir + "ppo_det/rollout.csv"
     sac_path = load_dir +  "sac_det/rollout.csv"
-    baseline_path = load_dir + "rb_baseline-201059-Amsterdam.csv"
-    
+
     ppo_data = pd.read_csv(ppo_path)
     sac_data = pd.read_csv(sac_path)
-    baseline_data = pd.read_csv(baseline_path)
-    return ppo_data, sac_data, baseline_data
+    # cumulative reward of the baseline from the result index, without reading its trajectory
+    index = ResultIndex("data")
+    index.scan()
+    baseline = index.summaries(
+        metrics=["Rewards"], project=project, mode="deterministic", algorithm="rb_baseline",
+        growth_year=2010, start_day=59, location="Amsterdam",
+    )
+    return ppo_data, sac_data, baseline["Rewards mean"].iloc[0]
 
-def plot_learning_curves(ppo_data, sac_data, baseline):
+def plot_learning_curves(ppo_data, sac_data, baseline_rewards):
     """Create learning curve plot"""
     PPO_COLOR = "#003366"
     SAC_COLOR = "#A60000"
-    baseline_rewards = baseline["Rewards"].sum()
 
     fig, ax = plt.subplots(1, figsize=(WIDTH, HEIGHT), dpi=300)
 
@@ -55,10 +60,10 @@ def main():
     args = parser.parse_args()
     
     # Load data
-    ppo_data, sac_data, baseline = load_data(args.project)
+    ppo_data, sac_data, baseline_rewards = load_data(args.project)
 
     # Create plot
-    plot_learning_curves(ppo_data, sac_data, baseline)
+    plot_learning_curves(ppo_data, sac_data, baseline_rewards)
 
 if __name__ == "__main__":
     main()
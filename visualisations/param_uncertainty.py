@@ -6,20 +6,20 @@ import numpy as np
 import matplotlib.pyplot as plt
 
 import plot_config
+from gl_gym.common.result_index import ResultIndex
 
 # WIDTH = 87.5 * 0.03937  # 85 mm ≈ 3.35 inches
 WIDTH = 60 * 0.03937  # 180 mm ≈ 7.08 inches
 
 HEIGHT = WIDTH * 0.75  # Adjust aspect ratio (3:2 or 4:3 is ideal)
 
-def load_data(project, mode, algorithm, growth_year, start_day, location, model_names):
+def load_summaries(index, project, mode, algorithm, growth_year, start_day, location, model_names):
     """
-    Load and organize data from CSV files based on specified parameters.
-    This function reads CSV files from a hierarchical directory structure organized by project,
-    mode, algorithm, and noise levels. It filters files based on growth year, start day, and
-    location parameters.
+    Load the summary metrics of the evaluated models from the result index, without reading the results files.
     Parameters
     ----------
+    index : ResultIndex
+        Index of the evaluation results under data/
     project : str
         The name of the project directory
     mode : str
@@ -27,64 +27,45 @@ def load_data(project, mode, algorithm, growth_year, start_day, location, model_
     algorithm : str
         The algorithm directory name
     growth_year : str
-        Filter parameter for the growth year in filenames
+        The evaluated growth year
     start_day : str
-        Filter parameter for the start day in filenames
+        The evaluated start day
     location : str
-        Filter parameter for the location in filenames
+        The evaluated location
+    model_names : list
+        The evaluated models, the i-th model is evaluated at the i-th noise level (sorted)
     Returns
     -------
-    dict
-        A nested dictionary where:
-        - First level keys are noise levels (as strings)
-        - Values are pandas DataFrames containing the data from matching CSV files
-    Notes
-    -----
-    - The function assumes a specific directory structure: data/project/mode/algorithm/noise_level/
-    - Only processes the first matching CSV file found for each noise level
-    - Noise levels are sorted numerically
-    - Prints warning messages if files are not found or if no matching CSV exists
-    Example
-    -------
-    >>> data = load_data("project1", "mode1", "algo1", "2023", "day1", "weatherlocationA")
+    pd.DataFrame
+        A row per noise level (sorted), with the summary metrics of the results of the model at that noise level
     """
-    base_path = os.path.join("data", project, mode, algorithm)
-    noise_levels = [d for d in os.listdir(base_path) if os.path.isdir(os.path.join(base_path, d))]
-    noise_levels.sort(key=lambda x: float(x))
-    print(noise_levels)
-    data_dict = {}
-    # Initialize dictionary to store DataFrames for each noise level and file
-    data_dict = {noise_level: {} for noise_level in noise_levels}
-    # Get all CSV files from the first noise level folder (assuming same files in all folders)
-    for i, noise_level in enumerate(noise_levels):
-        folder_path = os.path.join(base_path, noise_level)
-        csv_files = [f for f in os.listdir(folder_path) if f.endswith('.csv') 
-                and growth_year in f 
-                and start_day in f 
-                and location in f
-                and model_names[i] in f.lower()]
-        if csv_files:
-            try:
-                data_dict[noise_level] = pd.read_csv(os.path.join(folder_path, csv_files[0]))
-            except FileNotFoundError:
-                print(f"File not found: {os.path.join(folder_path, csv_files[0])}")
-                continue
-        else:
-            print(f"No matching CSV file found in {folder_path}")
-    return data_dict
+    noise_levels = sorted(index.query(project=project, mode=mode, algorithm=algorithm)["uncertainty"].unique())
+    pairs = set(zip(model_names, noise_levels))
+    summaries = index.summaries(
+        project=project, mode=mode, algorithm=algorithm, growth_year=int(growth_year),
+        start_day=int(start_day), location=location, model=sorted(set(model_names)),
+    )
+    # only the results of the model that belongs to the noise level
+    summaries = summaries[[pair in pairs for pair in zip(summaries["model"], summaries["uncertainty"])]]
+    if summaries.empty:
+        print(f"No indexed results found for {algorithm} in data/{project}/{mode}")
+    return summaries.sort_values("uncertainty").set_index("uncertainty")
 
 def plot_cumulative_reward(final_metrics, col2plot, ylabel=None):
 
     fig, ax = plt.subplots(figsize=(WIDTH, HEIGHT), dpi=300)
     colors =[ "#003366", "#A60000", "grey"]
-    labels = ["PPO", "SAC", "RB baseline"]
+    labels = {"ppo": "PPO", "sac": "SAC", "rb_baseline": "RB baseline", "rb_ensemble": "RB ensemble"}
     # ax.plot(final_rewards.index, final_rewards[f"Cumulative {col2plot}"], "o-", label=col2plot)
     for i, (algorithm, final_rewards) in enumerate(final_metrics.items()):
                 # ax.errorbar(final_rewards.index, final_rewards[f"Cumulative {col2plot}"], yerr=final_rewards[f"std {col2plot}"], fmt="o-", markersize=4, color=colors[i], label=algorithm.upper(), capsize=5)
 
+        # e.g., the ensemble has no rewards
+        if f"Cumulative {col2plot}" not in final_rewards.columns:
+            continue
         mean = final_rewards[f"Cumulative {col2plot}"]
         std = (final_rewards[f"std {col2plot}"])
-        ax.plot(final_rewards.index, mean, '-', color=colors[i], label=labels[i], markersize=4)
+        ax.plot(final_rewards.index, mean, '-', color=colors[i], label=labels[algorithm], markersize=4)
         ax.fill_between(final_rewards.index, mean-std, mean+std, alpha=0.2, color=colors[i])
     
     ax.set_xlabel(r"Uncertainty $(\delta)$")
@@ -98,45 +79,34 @@ def plot_cumulative_reward(final_metrics, col2plot, ylabel=None):
     # fig.savefig(f"figures/AgriControl/stochastic/{col2plot}_cumulative_reward.png")
     # fig.savefig(f"figures/AgriControl/stochastic/{col2plot}_cumulative_reward.svg", format="svg", dpi=300)
 
-def compute_cumulative_metrics(data_dict):
+def compute_cumulative_metrics(summaries):
     columns_to_sum = [
         'cFruit', 'Rewards', 'EPI', 'Revenue', 'Heat costs', 'CO2 costs',
         'Elec costs', 'temp_violation', 'co2_violation', 'rh_violation', 'Penalty'
     ]
 
-    # Process each noise level's data
-    for noise_level, data in data_dict.items():
-        # Add a penalty column that sums all violations
-        if all(col in data.columns for col in ['temp_violation', 'co2_violation', 'rh_violation']):
-            data['Penalty'] = data['temp_violation'] + data['co2_violation'] + data['rh_violation']
-        # Group by episode and compute cumsum within each episode
-        for col in columns_to_sum:
-            if col in data.columns:
-                data[f'cumsum {col}'] = data.groupby('episode')[col].cumsum()
-
-    # Create final rewards dataframe with columns for mean and std
-    final_rewards = pd.DataFrame(index=data_dict.keys())
-    for noise_level, data in data_dict.items():
-        for col in columns_to_sum:
-            if f'cumsum {col}' in data.columns:
-                # Get the last value for each episode
-                episode_finals = data.groupby('episode')[f'cumsum {col}'].last()
-                # Calculate mean and std
-                final_rewards.loc[noise_level, f'Cumulative {col}'] = episode_finals.mean()
-                final_rewards.loc[noise_level, f'std {col}'] = 3.291 * episode_finals.std() / np.sqrt(len(episode_finals))
+    # Create final rewards dataframe with columns for mean and std of the episode totals
+    final_rewards = pd.DataFrame(index=summaries.index)
+    for col in columns_to_sum:
+        if f'{col} mean' in summaries.columns:
+            final_rewards[f'Cumulative {col}'] = summaries[f'{col} mean']
+            final_rewards[f'std {col}'] = 3.291 * summaries[f'{col} std'] / np.sqrt(summaries[f'{col} n'])
 
     return final_rewards
 
 def main(args):
-    algorithms = ["ppo", "sac", "rb_baseline"]
+    # the rule-based baseline from the parameter ensemble (experiments/ensemble_simulation.py), instead of evaluate_baseline.py
+    algorithms = ["ppo", "sac", "rb_ensemble" if args.ensemble else "rb_baseline"]
     model_names = [["hopeful-wind-295","light-wave-296","ruby-star-297","eager-resonance-298","rural-eon-300","stellar-durian-301","copper-dawn-303"],
                     ["distinctive-frost-299","stoic-moon-302","graceful-dream-304","copper-frog-305","warm-flower-306","sunny-sky-307","leafy-cloud-308"],
-                    ["rb_baseline", "rb_baseline", "rb_baseline", "rb_baseline", "rb_baseline", "rb_baseline", "rb_baseline"]]
+                    [algorithms[2]] * 7]
     final_metrics  = {}
+    # index results that were saved before the evaluation scripts registered them
+    index = ResultIndex("data")
+    index.scan()
     for i, algorithm in enumerate(algorithms):
-        # data_dict = load_data(args.project, args.mode, args.algorithm, args.growth_year, args.start_day, args.location)
-        data_dict = load_data(args.project, args.mode, algorithm, args.growth_year, args.start_day, args.location, model_names[i])
-        final_rewards = compute_cumulative_metrics(data_dict)
+        summaries = load_summaries(index, args.project, args.mode, algorithm, args.growth_year, args.start_day, args.location, model_names[i])
+        final_rewards = compute_cumulative_metrics(summaries)
         final_metrics[algorithm] = final_rewards
 
     # final_rewards = compute_cumulative_metrics(data_dict)
@@ -154,6 +124,7 @@ if __name__ == "__main__":
     parser.add_argument("--growth_year", type=str, required=True, help="Growth year")
     parser.add_argument("--start_day", type=str, required=True, help="Start day")
     parser.add_argument("--location", type=str, required=True, help="Location")
+    parser.add_argument("--ensemble", action="store_true", help="Plot the rule-based baseline from the ensemble simulations")
     args = parser.parse_args()
 
     main(args)
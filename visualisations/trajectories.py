@@ -5,6 +5,8 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
+from gl_gym.common.result_index import ResultIndex
+
 
 ### Latex font in plots
 plt.rcParams['font.serif'] = "cmr10"
@@ -35,6 +37,9 @@ PPO_COLOR = "#003366"
 SAC_COLOR = "#A60000"
 RB_COLOR = 'grey'
 
+# the plotted columns of the results
+TRAJECTORY_COLUMNS = ["temp_air", "rh_air", "co2_air", "uBoil", "uCo2", "uThScr", "cFruit"]
+
 def state_plot(days2plot, time_steps, dt):
     # Plot key state variables over time for all controllers
     fig, axes = plt.subplots(3, 2, figsize=(12, 10), sharex='col', sharey='row')
@@ -87,27 +92,30 @@ if __name__ == "__main__":
     parser.add_argument("--n_days2plot", type=int, required=True, help="Number of days to visualize")
     args = parser.parse_args()
 
-    # load dir
-    if args.mode == "stochastic":
-        load_dir = f"data/{args.project}/stochastic"
-    else:
-        load_dir = f"data/{args.project}/deterministic"
-
     if args.mode == "stochastic":
         if args.uncertainty_value is None:
             raise ValueError("Uncertainty value must be provided for stochastic mode.")
-    elif not args.mode == "determinisitc":
-        args.uncertainty_value = ""
+        uncertainty = float(args.uncertainty_value)
+    else:
+        uncertainty = 0.
+
+    # look up the results in the index, and only read the plotted columns
+    index = ResultIndex("data")
+    index.scan()
 
-    # File paths
-    ppo_file = f"{load_dir}/ppo/{args.uncertainty_value}/{args.ppo_name}-{args.growth_year}{args.start_day}-{args.location}.csv"
-    sac_file = f"{load_dir}/sac/{args.uncertainty_value}/{args.sac_name}-{args.growth_year}{args.start_day}-{args.location}.csv" 
-    rb_file = f"{load_dir}/rb_baseline/{args.uncertainty_value}/rb_baseline-{args.growth_year}{args.start_day}-{args.location}.csv"
+    def load_trajectory(algorithm, model_name):
+        files = index.query(
+            project=args.project, mode=args.mode, algorithm=algorithm, model=model_name,
+            growth_year=int(args.growth_year), start_day=int(args.start_day), location=args.location, uncertainty=uncertainty,
+        )
+        if files.empty:
+            raise FileNotFoundError(f"No results of {model_name} for {args.growth_year}{args.start_day}-{args.location} in data/{args.project}/{args.mode}/{algorithm}")
+        return index.load(files["path"].iloc[0], columns=TRAJECTORY_COLUMNS)
 
     # Load data
-    ppo_df = pd.read_csv(ppo_file)[:-1]
-    sac_df = pd.read_csv(sac_file)[:-1]
-    rb_df = pd.read_csv(rb_file)[:-1]
+    ppo_df = load_trajectory("ppo", args.ppo_name)[:-1]
+    sac_df = load_trajectory("sac", args.sac_name)[:-1]
+    rb_df = load_trajectory("rb_baseline", "rb_baseline")[:-1]
     dt = 900
 
     # Convert start_day and create timestamps